@@ -0,0 +1,47 @@
+import argparse
+import sys
+from pathlib import Path
+
+# 프로젝트 루트를 임포트 가능하게 설정
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.catalog import CATALOG_PATH, PRESETS, RAW_ROOT, build, select, summary  # noqa: E402
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()  # 명령줄 인자 파서 생성
+    ap.add_argument("--root", type=Path, default=RAW_ROOT, help="Raw MIDI root (recursive)")
+    ap.add_argument("--db", type=Path, default=CATALOG_PATH, help="SQLite catalog path")
+    ap.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: CPU count)"
+    )  # 워커 프로세스 수
+    ap.add_argument(
+        "--rebuild", action="store_true", help="Re-analyze every file"
+    )  # 크기/시각이 같아도 전부 다시 분석
+    ap.add_argument(
+        "--where",
+        default=None,
+        help=f"Only query: print files matching a filter (SQL or one of {sorted(PRESETS)})",
+    )  # 갱신 없이 조회만
+    ap.add_argument("--limit", type=int, default=20, help="Paths to print with --where")
+    args = ap.parse_args()  # 인자 파싱
+
+    if args.where is None:
+        stats = build(args.root, args.db, workers=args.workers, rebuild=args.rebuild)
+        print(
+            f"Done. total={stats['total']} analyzed={stats['analyzed']} "
+            f"removed={stats['removed']} errors={stats['errors']} "
+            f"token_lengths={stats['tokens']} db={args.db}"
+        )
+        for kind, row in summary(args.db).items():  # 종류별 요약
+            print(
+                f"  {kind}: files={row['files']} errors={row['errors']} "
+                f"hours={(row['seconds'] or 0) / 3600:.1f} with_drums={row['with_drums']} "
+                f"tokens={row['tokens'] or 0}"
+            )
+    else:
+        paths = select(args.where, db=args.db)
+        print(f"{len(paths)} files match {args.where!r}")
+        for p in paths[: args.limit]:
+            print(" ", p)
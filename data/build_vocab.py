@@ -1,10 +1,29 @@
+import argparse
 import json
+import math
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
 ROOT = Path(__file__).resolve().parents[1]  # 현재 스크립트의 루트 디렉터리
-# 토큰화된 JSON 파일이 있는 디렉터리 목록
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.batch_tokenize import load_manifest, manifest_path  # noqa: E402
+from models.encoding import DRUM_TOKENS, DRUMS_TOKENS, TS_TOKENS  # noqa: E402
+from models.tempo import BPM_GRID, BPM_TOKENS  # noqa: E402
+from models.token_shards import TokenShard, shard_exists  # noqa: E402
+from models.vocab import KEY_TOKENS  # noqa: E402
+
+# 토큰화된 JSON 파일이 있는 디렉터리 목록 (같은 경로 + .bin/.idx 는 토큰 샤드)
 PROC_DIRS = [ROOT / "data" / "midi_proc" / "melody", ROOT / "data" / "midi_proc" / "drums"]
 OUT = ROOT / "data" / "vocab.json"  # 최종 어휘집 파일 경로
+# 파일별 토큰 빈도 캐시 (바뀐 파일만 다시 세기 위함)
+COUNTS_CACHE = ROOT / "data" / "vocab_counts.json"
 
 # 특별 토큰들을 맨 앞에 예약 (고정된 ID)
 SPECIAL = [
@@ -16,25 +35,166 @@ SPECIAL = [
     "UNK",
 ]  # PAD: 패딩, BOS: 시작, EOS: 끝, BAR: 마디, TS: 시간 이동, UNK: 알 수 없음
 
+# 로그 버킷 격자: 16분음표 기준 길이 1,2,3,4,6,8,12,16,... (점음표 포함)
+_LOG_GRID = sorted({b * m for b in (2**k for k in range(12)) for m in (1, 1.5)} - {1.5})
+
+
+def parse_bucket_rules(specs):
+    """['BPM=5', 'DUR=log'] -> {'BPM': 5, 'DUR': 'log'}"""
+    rules = {}
+    for spec in specs or []:
+        family, _, rule = spec.partition("=")
+        if not rule:
+            raise SystemExit(f"Bad bucket rule {spec!r} (expected FAMILY=STEP or FAMILY=log)")
+        rules[family] = rule if rule == "log" else int(rule)
+    return rules
+
+
+def bucket_token(tok: str, rules: dict) -> str:
+    """
+    숫자 계열 토큰을 버킷 대표값으로 바꿉니다.
+    정수 규칙 N: 가장 가까운 N의 배수 (최소 N), 'log': 1,2,3,4,6,8,12,... 중 로그상 가장 가까운 값
+    """
+    family, sep, value = tok.partition(":")
+    rule = rules.get(family)
+    if rule is None or not sep:
+        return tok
+    try:
+        v = int(value)
+    except ValueError:
+        return tok
+    if rule == "log":
+        if v <= 0:
+            return tok
+        b = min(_LOG_GRID, key=lambda g: abs(math.log(g) - math.log(v)))
+    else:
+        b = max(rule, int(round(v / rule)) * rule)
+    return f"{family}:{int(b)}"
+
+
+def _count_files(paths):
+    """워커: 파일 묶음의 토큰 빈도를 파일별 Counter로 셉니다."""
+    out = []
+    for p in paths:
+        try:
+            obj = json.loads(Path(p).read_text(encoding="utf-8"))  # JSON 파일 내용 읽어 파싱
+            out.append((p, dict(Counter(obj.get("tokens", []))), None))
+        except Exception as e:  # 파일 처리 중 예외 발생 시
+            out.append((p, None, str(e)))
+    return out
+
+
+def _list_token_files(d: Path):
+    """
+    (캐시 키, 경로, 서명) 목록. 토큰화 매니페스트가 있으면 디렉터리를 다시 훑지 않고
+    매니페스트의 내용 해시 + 토크나이저 버전을 서명으로 씁니다.
+    """
+    mpath = manifest_path(d)
+    if mpath.exists():
+        entries = load_manifest(mpath)["files"].values()
+        return [
+            (f"{d.name}/{e['out']}", d / e["out"], f"{e['sha1']}:{e['version']}")
+            for e in entries
+            if e.get("status") == "ok"
+        ]
+    files = []
+    for p in d.glob("*.json"):  # 매니페스트가 없으면 파일 크기/수정 시각을 서명으로 사용
+        st = p.stat()
+        files.append((f"{d.name}/{p.name}", p, f"{st.st_size}:{st.st_mtime_ns}"))
+    return files
 
-def gather_tokens():
-    seen = set()  # 일반 토큰 (특별 토큰은 별도 처리)
+
+def count_json_dir(d: Path, cache: dict, workers: int) -> Counter:
+    """디렉터리의 토큰 빈도 합계. 서명이 같은 파일은 캐시를 재사용하고 나머지만 병렬로 셉니다."""
+    files = _list_token_files(d)
+    todo = [(k, str(p), sig) for k, p, sig in files if cache.get(k, {}).get("sig") != sig]
+    if todo:
+        sig_of = {p: (k, sig) for k, p, sig in todo}
+        paths = [p for _, p, _ in todo]
+        chunk = max(1, min(256, len(paths) // (workers * 4) or 1))
+        chunks = [paths[i : i + chunk] for i in range(0, len(paths), chunk)]
+        if workers == 1 or len(chunks) == 1:
+            batches = list(map(_count_files, chunks))
+        else:  # 워커마다 파일 묶음의 Counter를 만들어 돌려줌
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                batches = list(ex.map(_count_files, chunks))
+        for batch in batches:
+            for p, counts, err in batch:
+                k, sig = sig_of[p]
+                if err is not None:
+                    print(f"[WARN] Skip {Path(p).name}: {err}")  # 경고 메시지 출력
+                    cache.pop(k, None)
+                else:
+                    cache[k] = {"sig": sig, "counts": counts}
+    # 사라진 파일의 캐시 항목 정리
+    live = {k for k, _, _ in files}
+    for k in [k for k in cache if k.startswith(f"{d.name}/") and k not in live]:
+        del cache[k]
+
+    total = Counter()
+    for k in live:
+        if k in cache:
+            total.update(cache[k]["counts"])
+    return total
+
+
+def count_shard(d: Path) -> Counter:
+    """샤드 전체를 한 번의 bincount로 셉니다."""
+    shard = TokenShard(d)
+    freq = np.bincount(shard.ids, minlength=len(shard.tokens)) if len(shard.ids) else []
+    return Counter({t: int(c) for t, c in zip(shard.tokens, freq) if c})
+
+
+def gather_tokens(
+    min_freq: int = 1,
+    bucket_rules: dict | None = None,
+    source: str = "auto",
+    workers: int | None = None,
+    use_cache: bool = True,
+):
+    """
+    토큰 빈도를 모아 어휘집을 만듭니다.
+    min_freq: 이 빈도 미만의 토큰은 어휘집에서 빼고 (패킹 시 UNK), bucket_rules: 숫자 계열 버킷 규칙
+    token_to_id에는 정식 토큰 뒤에 버킷으로 합쳐진 원래 토큰들의 별칭이 이어집니다.
+    """
+    bucket_rules = {"BPM": BPM_GRID, **(bucket_rules or {})}  # BPM은 기본으로 템포 격자에 맞춤
+    workers = workers or os.cpu_count() or 1
+    cache = {}
+    if use_cache and COUNTS_CACHE.exists():
+        cache = json.loads(COUNTS_CACHE.read_text(encoding="utf-8")).get("files", {})
+
+    raw = Counter()  # 원래 토큰 빈도
     for d in PROC_DIRS:  # 각 처리 디렉터리 순회
+        if source == "shard" or (source == "auto" and shard_exists(d)):
+            if shard_exists(d):
+                raw.update(count_shard(d))
+            continue
         if not d.exists():  # 디렉터리가 존재하지 않으면 건너뜀
             continue
-        for p in d.glob("*.json"):  # 해당 디렉터리 내 모든 JSON 파일 검색
-            try:
-                obj = json.loads(p.read_text(encoding="utf-8"))  # JSON 파일 내용 읽어 파싱
-                for t in obj.get("tokens", []):  # "tokens" 키의 값(토큰 목록) 순회
-                    if t not in SPECIAL:  # 특별 토큰이 아닌 경우
-                        seen.add(t)  # seen 집합에 추가
-            except Exception as e:  # 파일 처리 중 예외 발생 시
-                print(f"[WARN] Skip {p.name}: {e}")  # 경고 메시지 출력
-
-    # 결정론적 순서: 특별 토큰 먼저, 그 다음 정렬된 일반 토큰
-    ordered = SPECIAL + sorted(seen)
+        raw.update(count_json_dir(d, cache, workers))
+
+    if use_cache:
+        COUNTS_CACHE.write_text(json.dumps({"files": cache}), encoding="utf-8")
+
+    # 버킷 적용 후 정식 토큰 빈도 집계
+    canon_of = {t: bucket_token(t, bucket_rules) for t in raw}
+    counts = Counter()
+    for t, c in raw.items():
+        counts[canon_of[t]] += c
+
+    # 결정론적 순서: 특별 토큰 먼저, 그 다음 빈도 기준을 넘은 정렬된 일반 토큰
+    kept = {t for t, c in counts.items() if t not in SPECIAL and c >= min_freq}
+    # 조성 24개(models/augment.py 조옮김), BPM 격자 전체(models/tempo.py),
+    # 드럼 클래스 9개와 인코딩 2의 TS:2..16 / DRUMS:<mask> 전체(models/encoding.py)는 항상 포함
+    always = set(KEY_TOKENS) | set(BPM_TOKENS) | set(DRUM_TOKENS) | set(TS_TOKENS)
+    kept = sorted(kept | always | set(DRUMS_TOKENS))
+    ordered = SPECIAL + kept
     tok2id = {t: i for i, t in enumerate(ordered)}  # 토큰 -> ID 매핑 생성
     id2tok = {i: t for t, i in tok2id.items()}  # ID -> 토큰 매핑 생성
+    for t in sorted(raw):  # 버킷으로 합쳐진 원래 토큰 -> 대표 토큰의 ID (별칭)
+        if t not in tok2id and canon_of[t] in tok2id:
+            tok2id[t] = tok2id[canon_of[t]]
+    dropped = sorted(t for t, c in counts.items() if t not in SPECIAL and c < min_freq)
 
     OUT.parent.mkdir(parents=True, exist_ok=True)  # 출력 디렉터리 생성
     OUT.write_text(  # 어휘집 파일을 JSON으로 저장
@@ -43,14 +203,47 @@ def gather_tokens():
                 "token_to_id": tok2id,
                 "id_to_token": id2tok,
                 "size": len(ordered),
-            },  # 토큰->ID, ID->토큰, 전체 크기 포함
+                "counts": {t: counts.get(t, 0) for t in ordered},
+                "min_freq": min_freq,
+                "buckets": bucket_rules,
+                "dropped": dropped,
+            },  # 토큰->ID, ID->토큰, 전체 크기, 빈도 및 빌드 설정 포함
             ensure_ascii=False,  # ASCII 아닌 문자도 그대로 저장
             indent=2,  # 들여쓰기 적용
         ),
         encoding="utf-8",  # UTF-8 인코딩 사용
     )
-    print(f"Vocab size={len(ordered)} → {OUT}")  # 어휘집 크기 및 경로 출력
+    aliases = len(tok2id) - len(ordered)
+    print(
+        f"Vocab size={len(ordered)} (aliases={aliases}, dropped={len(dropped)}) → {OUT}"
+    )  # 어휘집 크기 및 경로 출력
 
 
 if __name__ == "__main__":
-    gather_tokens()  # 메인 함수 실행
+    ap = argparse.ArgumentParser()  # 명령줄 인자 파서 생성
+    ap.add_argument(
+        "--min_freq", type=int, default=1, help="Drop tokens seen fewer times (they map to UNK)"
+    )  # 최소 빈도
+    ap.add_argument(
+        "--bucket",
+        action="append",
+        default=[],
+        help="Bucket a numeric family, e.g. DUR=log or BPM=10 (BPM defaults to the tempo grid)",
+    )  # 숫자 계열 버킷 규칙
+    ap.add_argument(
+        "--source", choices=["auto", "shard", "json"], default="auto", help="Token input format"
+    )  # 입력 형식 (기본: 샤드가 있으면 샤드)
+    ap.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: CPU count)"
+    )  # 워커 프로세스 수
+    ap.add_argument(
+        "--no_cache", action="store_true", help="Recount every file, ignoring the counts cache"
+    )  # 캐시 무시
+    args = ap.parse_args()
+    gather_tokens(
+        min_freq=args.min_freq,
+        bucket_rules=parse_bucket_rules(args.bucket),
+        source=args.source,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+    )  # 메인 함수 실행
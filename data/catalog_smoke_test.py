@@ -0,0 +1,142 @@
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pretty_midi
+
+# 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from data import pack_dataset  # noqa: E402
+from models import catalog  # noqa: E402
+from models.batch_tokenize import find_midis, tokenize_corpus  # noqa: E402
+
+# 트랙 중간에 끊긴 파일 (노트-온의 벨로시티 바이트가 없음)
+BROKEN = b"MThd\x00\x00\x00\x06\x00\x00\x00\x01\x01\xe0MTrk\x00\x00\x00\x08\x00\x90\x3c"
+OPENED = []  # 감사 훅이 기록한 open() 경로
+
+
+def _audit(event, args):
+    if event == "open" and isinstance(args[0], str):
+        OPENED.append(args[0])
+
+
+def write_midi(path: Path, bars: int, meter=(4, 4), bpm=120.0, drums=True, tempo_to=None):
+    """meter 박자로 bars 마디 동안 8분음표를 치는 파일 (tempo_to: 중간에 바뀌는 템포)"""
+    pm = pretty_midi.PrettyMIDI(initial_tempo=bpm)
+    if meter is not None:
+        pm.time_signature_changes.append(pretty_midi.TimeSignature(meter[0], meter[1], 0.0))
+    beats = bars * meter[0] * 4 // meter[1] if meter else bars * 4
+    if tempo_to is not None:  # 곡 중간(틱 기준)에 템포 변경 (pretty_midi에는 공개 API가 없음)
+        half = beats // 2 * pm.resolution
+        pm._tick_scales.append((half, 60.0 / (tempo_to * pm.resolution)))
+        pm._update_tick_to_time(beats * pm.resolution * 2)
+    inst = pretty_midi.Instrument(0, is_drum=drums)
+    for i in range(beats * 2):
+        start = pm.tick_to_time(i * pm.resolution // 2)
+        end = pm.tick_to_time(i * pm.resolution // 2 + pm.resolution // 4)
+        inst.notes.append(pretty_midi.Note(100, 36 if drums else 60 + i % 12, start, end))
+    pm.instruments.append(inst)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pm.write(str(path))
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        raw = tmp / "midi_raw"
+        write_midi(raw / "drums" / "gmd" / "groove.mid", 16)
+        write_midi(raw / "drums" / "gmd" / "waltz.mid", 16, meter=(3, 4))
+        write_midi(raw / "drums" / "gmd" / "short" / "groove.mid", 2)
+        write_midi(raw / "drums" / "egmd" / "rubato.MID", 16, tempo_to=45.0)
+        write_midi(raw / "melody" / "maestro" / "piece.midi", 8, meter=None, drums=False)
+        (raw / "drums" / "gmd" / "broken.mid").write_bytes(BROKEN)
+        (raw / "drums" / "gmd" / "README.txt").write_text("not a midi")
+        catalog.CATALOG_PATH = db = tmp / "catalog.sqlite"
+
+        # 1) 병렬 첫 빌드: 모든 필드 기록, 손상 파일은 error 행, MIDI 아닌 파일은 무시
+        stats = catalog.build(raw, db, workers=2)
+        assert stats == {"total": 6, "analyzed": 6, "removed": 0, "errors": 1, "tokens": 0}, stats
+        conn = catalog.connect(db)
+        rows = {
+            r[0]: r[1:]
+            for r in conn.execute(
+                "SELECT path, status, ts_num, ts_den, n_bars, has_drums, "
+                "tempo_changes, round(tempo_spread, 2), round(bpm) FROM files"
+            )
+        }
+        assert rows["drums/gmd/groove.mid"] == ("ok", 4, 4, 16, 1, 0, 1.0, 120), rows
+        assert rows["drums/gmd/waltz.mid"][1:4] == (3, 4, 16), rows
+        assert rows["drums/egmd/rubato.MID"][5:7] == (1, 2.67), rows
+        assert rows["melody/maestro/piece.midi"][1:5] == (4, 4, 8, 0), rows
+        assert rows["drums/gmd/broken.mid"][0] == "error"
+        print(f"build: {stats}")
+
+        # 2) 증분: 그대로면 0개, 바뀐 파일만 다시 분석, 사라진 파일은 삭제
+        t0 = time.perf_counter()
+        assert catalog.build(raw, db, workers=2)["analyzed"] == 0
+        t_noop = time.perf_counter() - t0
+        p = raw / "drums" / "gmd" / "waltz.mid"
+        os.utime(p, ns=(p.stat().st_atime_ns, p.stat().st_mtime_ns + 10**9))
+        (raw / "drums" / "gmd" / "broken.mid").unlink()
+        stats = catalog.build(raw, db, workers=2)
+        assert (stats["analyzed"], stats["removed"]) == (1, 1), stats
+        print(f"incremental: no-op rebuild {1e3 * t_noop:.1f} ms, touched 1 + removed 1 handled")
+
+        # 3) 필터: 프리셋 / SQL 식 / 하위 디렉터리, 잘못된 식과 쓰기 시도는 거부
+        card = [q.relative_to(raw).as_posix() for q in catalog.select("card")]
+        assert card == ["drums/gmd/groove.mid", "melody/maestro/piece.midi"], card
+        drums = catalog.select("has_drums AND n_bars >= 8", under=raw / "drums")
+        assert [q.name for q in drums] == ["rubato.MID", "groove.mid", "waltz.mid"], drums
+        for bad in ("no_such_column > 1", "1); DELETE FROM files; --"):
+            try:
+                catalog.select(bad)
+                raise AssertionError(f"accepted {bad!r}")
+            except ValueError:
+                pass
+        assert len(catalog.select()) == 5
+        print(f"select: card preset -> {card}")
+
+        # 4) 토크나이저: 필터에서 빠진 파일은 열지 않음, 출력 이름은 필터와 무관
+        proc = tmp / "midi_proc" / "drums"
+        sys.addaudithook(_audit)
+        OPENED.clear()
+        stats = tokenize_corpus("drums", raw / "drums", proc, workers=1, where="card")
+        opened = {Path(o).name for o in OPENED if o.startswith(str(raw))}
+        assert stats["total"] == 1 and stats["saved"] == 1, stats
+        assert opened == {"groove.mid"}, opened
+        out = [q.name for q in proc.glob("*.json")]  # 다른 폴더의 동명 파일과 구분된 이름
+        assert len(out) == 1 and out[0].startswith("groove-"), out
+        print(f"tokenize_corpus(where='card'): opened only {sorted(opened)}")
+
+        # 5) 나머지도 토큰화한 뒤 카탈로그에 토큰 수 반영, pack_dataset 필터
+        tokenize_corpus("drums", raw / "drums", proc, workers=1)
+        conn.close()
+        conn = catalog.connect(db)
+        manifests = [tmp / "midi_proc" / "drums_manifest.json"]
+        assert catalog.sync_tokens(conn, raw.resolve(), manifests) == 4
+        conn.commit()
+        n_tok = conn.execute("SELECT n_tokens FROM files WHERE path = 'drums/gmd/groove.mid'")
+        assert n_tok.fetchone()[0] > 0
+        conn.close()
+        pack_dataset.PROC_DIRS = {"drums": proc}
+        pack_dataset.OUT_DIR = tmp / "ds"
+        names = pack_dataset.selected_names("drums", "card")
+        assert len(names) == 1, names
+        pack_dataset.pack("drums", 0.5, 1024, 1, source="json", where="card")
+        lines = (tmp / "ds" / "drums_train.jsonl").read_text().splitlines()
+        lines += (tmp / "ds" / "drums_val.jsonl").read_text().splitlines()
+        assert len(lines) == 1, lines
+        print(f"pack_dataset(where='card'): 1 of {len(list(proc.glob('*.json')))} token files")
+
+        # find_midis는 한 곳(scandir)에서만 정의
+        assert [q.name for q in find_midis(raw / "drums" / "gmd")] == [
+            "groove.mid",
+            "groove.mid",
+            "waltz.mid",
+        ]
+    print("OK")
@@ -1,14 +1,25 @@
+import argparse
+import base64
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.error
 import urllib.request
 import zipfile
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Tuple
 
 from tqdm import tqdm
 
 # 프로젝트 루트 경로 설정
 ROOT = Path(__file__).resolve().parents[1]
-# 다운로드 및 임시 파일 경로 설정
+# 다운로드 경로 설정
 DL = ROOT / "data" / "downloads"
-TMP = ROOT / "data" / "tmp"
 # MIDI 파일이 저장될 최종 경로 설정
 DEST_MELODY = ROOT / "data" / "midi_raw" / "melody" / "maestro"
 DEST_DRUMS_GMD = ROOT / "data" / "midi_raw" / "drums" / "gmd"
@@ -21,56 +32,276 @@ URLS = {
     # 선택 사항:
     "e_gmd_midionly": "https://storage.googleapis.com/magentadata/datasets/e-gmd/e-gmd-v1.0.0-midi.zip",
 }
+# 데이터셋 이름 -> (URL, 저장할 zip 이름, 압축 해제 위치)
+DATASETS: Dict[str, Tuple[str, str, Path]] = {
+    "gmd": (URLS["gmd_midionly"], "groove-v1.0.0-midionly.zip", DEST_DRUMS_GMD),
+    "maestro": (URLS["maestro_v3_midi"], "maestro-v3.0.0-midi.zip", DEST_MELODY),
+    "egmd": (URLS["e_gmd_midionly"], "e-gmd-v1.0.0-midi.zip", DEST_DRUMS_EGMD),
+}
+DEFAULT_DATASETS = ("gmd", "maestro")
+# 알려진 SHA-256 (이름 -> 16진수). 비어 있으면 서버가 주는 MD5(Content-MD5 / x-goog-hash)로
+# 검증하고, 처음 받은 파일의 SHA-256을 <zip>.sha256에 기록해 이후 실행에서 대조합니다.
+CHECKSUMS: Dict[str, str] = {}
+
+CHUNK = 1 << 20  # 네트워크/압축 해제 복사 단위 (1 MiB)
+TIMEOUT = 60  # 소켓 타임아웃 (초)
+RETRIES = 8  # 연결 끊김 시 이어받기 재시도 횟수
+MIDI_SUFFIXES = (".mid", ".midi")
+
+
+def _server_md5(headers) -> Optional[str]:
+    """응답 헤더의 MD5 (Content-MD5 또는 GCS x-goog-hash: md5=...) -> 16진수, 없으면 None"""
+    values = [headers.get("Content-MD5")] + [
+        part.strip()[4:]
+        for h in headers.get_all("x-goog-hash") or []
+        for part in h.split(",")
+        if part.strip().startswith("md5=")
+    ]
+    for v in values:
+        if v:
+            try:
+                return base64.b64decode(v).hex()
+            except ValueError:
+                continue
+    return None
+
 
+def file_digests(path: Path) -> Tuple[str, str]:
+    """파일을 한 번 읽어 (SHA-256, MD5) 16진수"""
+    sha, md5 = hashlib.sha256(), hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            sha.update(block)
+            md5.update(block)
+    return sha.hexdigest(), md5.hexdigest()
 
-# 파일 다운로드 함수 (진행률 표시 포함)
-def download(url: str, out: Path):
+
+def _read_meta(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def download(
+    url: str,
+    out: Path,
+    sha256: Optional[str] = None,
+    retries: int = RETRIES,
+    backoff: float = 1.0,
+    position: int = 0,
+) -> Path:
+    """
+    HTTP Range로 이어받는 다운로드. 받는 중에는 <out>.part와 <out>.part.json(ETag, 길이, MD5)을
+    두고, 끊기면 받은 바이트 뒤부터 다시 요청합니다 (If-Range로 원본이 바뀌었으면 처음부터).
+    끝나면 sha256(주어진 경우)과 서버 MD5(있는 경우)를 확인한 뒤에만 out으로 옮기고
+    <out>.sha256을 남깁니다. 검증 실패 시 받은 조각을 지우고 ValueError.
+    """
     out.parent.mkdir(parents=True, exist_ok=True)  # 대상 폴더가 없으면 생성
+    part = out.with_name(out.name + ".part")
+    meta_path = out.with_name(out.name + ".part.json")
+    sidecar = out.with_name(out.name + ".sha256")
+
+    if out.exists():  # 이전에 검증을 마친 파일 (예전 스크립트가 받은 파일은 여기서 기록)
+        recorded = sidecar.read_text().strip() if sidecar.exists() else None
+        if recorded is None:
+            recorded = file_digests(out)[0]
+            sidecar.write_text(recorded + "\n")
+        if sha256 and recorded != sha256.lower():
+            raise ValueError(f"{out.name}: SHA-256 {recorded} != expected {sha256}")
+        return out
+
+    meta = _read_meta(meta_path)
+    for attempt in range(retries + 1):
+        have = part.stat().st_size if part.exists() and meta else 0
+        if have and have == meta.get("length"):
+            break
+        req = urllib.request.Request(url, headers={"User-Agent": "bgm-downloader"})
+        if have:
+            req.add_header("Range", f"bytes={have}-")
+            if meta.get("etag"):
+                req.add_header("If-Range", meta["etag"])
+        try:
+            with urllib.request.urlopen(req, timeout=TIMEOUT) as r:
+                resumed = r.status == 206 and r.headers.get("Content-Range", "").startswith(
+                    f"bytes {have}-"
+                )
+                if not resumed:  # 200: 이어받기 불가 또는 원본 변경 -> 처음부터
+                    have = 0
+                    length = r.headers.get("Content-Length")
+                    meta = {
+                        "url": url,
+                        "etag": r.headers.get("ETag"),
+                        "length": int(length) if length is not None else None,
+                        "md5": _server_md5(r.headers),
+                    }
+                    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+                bar = tqdm(
+                    total=meta.get("length"),
+                    initial=have,
+                    unit="B",
+                    unit_scale=True,
+                    unit_divisor=1024,
+                    desc=out.name,
+                    position=position,
+                    leave=False,
+                )
+                with bar, open(part, "ab" if resumed else "wb") as f:
+                    for block in iter(lambda: r.read(CHUNK), b""):
+                        f.write(block)
+                        bar.update(len(block))
+            if meta.get("length") is None or part.stat().st_size == meta["length"]:
+                break
+        except urllib.error.HTTPError as e:
+            if e.code == 416:  # 요청한 범위가 없음: 조각이 어긋났으니 처음부터
+                part.unlink(missing_ok=True)
+                meta = {}
+                continue
+            if e.code < 500 or attempt == retries:
+                raise
+        except (urllib.error.URLError, HTTPException, OSError):
+            if attempt == retries:
+                raise
+        time.sleep(backoff * min(30, 2**attempt))  # 끊긴 뒤 받은 만큼 이어서 다시 시도
+    length = meta.get("length")
+    if not part.exists() or (length is not None and part.stat().st_size != length):
+        raise OSError(f"{out.name}: incomplete after {retries} retries")
 
-    class TqdmUpTo(tqdm):  # tqdm을 상속받아 파일 크기 기반 진행률 표시
-        def update_to(self, b=1, bsize=1, tsize=None):
-            if tsize is not None:
-                self.total = tsize
-            self.update(b * bsize - self.n)
+    got_sha, got_md5 = file_digests(part)
+    problems = []
+    if sha256 and got_sha != sha256.lower():
+        problems.append(f"SHA-256 {got_sha} != expected {sha256}")
+    if meta.get("md5") and got_md5 != meta["md5"]:
+        problems.append(f"MD5 {got_md5} != server {meta['md5']}")
+    if problems:
+        part.unlink()
+        meta_path.unlink(missing_ok=True)
+        raise ValueError(f"{out.name}: " + "; ".join(problems))
+    os.replace(part, out)
+    sidecar.write_text(got_sha + "\n")
+    meta_path.unlink(missing_ok=True)
+    return out
 
-    # urlretrieve를 사용하여 파일을 다운로드하고 reporthook으로 진행률 업데이트
-    with TqdmUpTo(unit="B", unit_scale=True, unit_divisor=1024, miniters=1, desc=out.name) as t:
-        urllib.request.urlretrieve(url, out, reporthook=t.update_to)
 
+def fetch_all(names: List[str], workers: Optional[int] = None, dl_dir: Path = DL) -> List[Path]:
+    """여러 데이터셋 zip을 동시에 받습니다 (네트워크 대기 위주라 스레드)."""
+    jobs = [(DATASETS[n][0], dl_dir / DATASETS[n][1], CHECKSUMS.get(n)) for n in names]
+    with ThreadPoolExecutor(max_workers=workers or len(jobs) or 1) as ex:
+        futures = [
+            ex.submit(download, url, out, sha, position=i) for i, (url, out, sha) in enumerate(jobs)
+        ]
+        return [f.result() for f in futures]
 
-# MIDI 파일 압축 해제 함수
-def extract_midis(zip_path: Path, dest: Path):
+
+def member_paths(names: List[str]) -> Dict[str, PurePosixPath]:
+    """
+    zip 멤버 이름 -> 압축 해제할 상대 경로. 모든 멤버가 같은 최상위 폴더 아래면 그 폴더는 떼고,
+    그 아래 디렉터리 구조는 유지합니다 (다른 폴더의 동명 파일이 서로 덮어쓰지 않음).
+    절대 경로나 '..'이 든 멤버는 제외하고, 대소문자만 다른 경로는 뒤에 번호를 붙입니다.
+    """
+    parts = {}
+    for n in names:
+        p = PurePosixPath(n.replace("\\", "/")).parts
+        if not p or p[0] == "/" or ".." in p or ":" in p[0]:
+            print(f"[WARN] Skipping unsafe zip member {n!r}")
+            continue
+        parts[n] = p
+    tops = {p[0] for p in parts.values()}
+    strip = len(tops) == 1 and all(len(p) > 1 for p in parts.values())
+    out: Dict[str, PurePosixPath] = {}
+    seen = set()
+    for name, p in parts.items():
+        rel = PurePosixPath(*(p[1:] if strip else p))
+        stem, k = rel.with_suffix(""), 1
+        while str(rel).lower() in seen:  # 대소문자 구분 없는 파일 시스템에서도 충돌 없도록
+            rel = stem.with_name(f"{stem.name}-{k}").with_suffix(PurePosixPath(name).suffix)
+            k += 1
+        seen.add(str(rel).lower())
+        out[name] = rel
+    return out
+
+
+def extract_midis(zip_path: Path, dest: Path, workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    zip 안의 MIDI를 dest 아래에 폴더 구조를 유지해 풉니다.
+    멤버마다 z.open 스트림을 CHUNK 단위로 임시 파일에 복사한 뒤 교체하므로 파일 전체를
+    메모리에 올리지 않고, 중단돼도 반쯤 쓴 MIDI가 남지 않습니다. 크기가 같은 기존 파일은 건너뜁니다.
+    멤버들은 스레드마다 따로 연 ZipFile로 병렬 해제합니다 (zlib 해제는 GIL을 놓음).
+    """
     dest.mkdir(parents=True, exist_ok=True)  # 대상 폴더가 없으면 생성
-    TMP.mkdir(parents=True, exist_ok=True)  # 임시 폴더 생성
-    with zipfile.ZipFile(zip_path) as z:  # zip 파일 열기
-        for info in z.infolist():  # zip 파일 내 모든 파일 정보 순회
-            name = info.filename.lower()
-            if name.endswith(".mid") or name.endswith(".midi"):  # MIDI 파일인 경우
-                # 각 MIDI 파일을 dest 폴더에 저장 (디렉터리 구조 평탄화)
-                raw = z.read(info)
-                out = dest / Path(info.filename).name
-                with open(out, "wb") as f:
-                    f.write(raw)
+    with zipfile.ZipFile(zip_path) as z:
+        infos = [i for i in z.infolist() if not i.is_dir()]
+    infos = [i for i in infos if i.filename.lower().endswith(MIDI_SUFFIXES)]
+    targets = member_paths([i.filename for i in infos])
+    todo = []
+    stats = {"extracted": 0, "skipped": 0}
+    for info in infos:
+        if info.filename not in targets:
+            continue
+        out = dest.joinpath(*targets[info.filename].parts)
+        if out.exists() and out.stat().st_size == info.file_size:
+            stats["skipped"] += 1
+        else:
+            todo.append((info, out))
+
+    local = threading.local()
+    handles: List[zipfile.ZipFile] = []
+    lock = threading.Lock()
+
+    def _extract(job: Tuple[zipfile.ZipInfo, Path]) -> None:
+        info, out = job
+        if not hasattr(local, "zip"):
+            local.zip = zipfile.ZipFile(zip_path)
+            with lock:
+                handles.append(local.zip)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(out.name + ".tmp")
+        with local.zip.open(info) as src, open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst, CHUNK)
+        os.replace(tmp, out)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as ex:
+            for _ in tqdm(ex.map(_extract, todo), total=len(todo), desc=zip_path.name):
+                stats["extracted"] += 1
+    finally:
+        for h in handles:
+            h.close()
+    return stats
 
 
 if __name__ == "__main__":
-    # 1) GMD (드럼) 다운로드 및 압축 해제
-    gmd_zip = DL / "groove-v1.0.0-midionly.zip"
-    if not gmd_zip.exists():  # 파일이 없으면 다운로드
-        download(URLS["gmd_midionly"], gmd_zip)
-    extract_midis(gmd_zip, DEST_DRUMS_GMD)  # MIDI 압축 해제
-
-    # 2) MAESTRO v3 MIDI-only (멜로디/화성) 다운로드 및 압축 해제
-    maestro_zip = DL / "maestro-v3.0.0-midi.zip"
-    if not maestro_zip.exists():  # 파일이 없으면 다운로드
-        download(URLS["maestro_v3_midi"], maestro_zip)
-    extract_midis(maestro_zip, DEST_MELODY)  # MIDI 압축 해제
-
-    # 3) (선택 사항) E-GMD 드럼 다운로드 및 압축 해제
-    egmd_zip = DL / "e-gmd-v1.0.0-midi.zip"
-    # 활성화하려면 주석 해제:
-    # if not egmd_zip.exists():
-    #     download(URLS["e_gmd_midionly"], egmd_zip)
-    # extract_midis(egmd_zip, DEST_DRUMS_EGMD)
-
-    print("Done. MIDIs in:", DEST_DRUMS_GMD, DEST_MELODY)  # 완료 메시지 및 MIDI 파일 경로 출력
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--datasets",
+        nargs="+",
+        choices=sorted(DATASETS),
+        default=list(DEFAULT_DATASETS),
+        help="Archives to fetch (egmd is optional and large)",
+    )
+    ap.add_argument(
+        "--sha256",
+        action="append",
+        default=[],
+        help="Expected checksum, e.g. gmd=<hex> (repeatable)",
+    )
+    ap.add_argument("--workers", type=int, default=None, help="Extraction threads per archive")
+    ap.add_argument("--no_extract", action="store_true", help="Only download and verify")
+    args = ap.parse_args()
+
+    for spec in args.sha256:
+        name, _, digest = spec.partition("=")
+        if name not in DATASETS or not digest:
+            raise SystemExit(f"Bad --sha256 {spec!r} (expected NAME=HEX)")
+        CHECKSUMS[name] = digest
+
+    zips = fetch_all(args.datasets)  # 1) 모든 zip을 동시에 이어받기 + 검증
+    for name, zip_path in zip(args.datasets, zips):
+        digest = zip_path.with_name(zip_path.name + ".sha256").read_text().strip()
+        print(f"{name}: {zip_path.name} sha256={digest}")
+    if not args.no_extract:  # 2) 폴더 구조를 유지한 스트리밍 압축 해제
+        for name, zip_path in zip(args.datasets, zips):
+            stats = extract_midis(zip_path, DATASETS[name][2], workers=args.workers)
+            print(f"{name}: extracted={stats['extracted']} skipped={stats['skipped']}")
+
+    print("Done. MIDIs in:", ", ".join(str(DATASETS[n][2]) for n in args.datasets))
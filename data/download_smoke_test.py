@@ -0,0 +1,158 @@
+import base64
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import zipfile
+from http.client import HTTPException
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from data import download_midis  # noqa: E402
+from data.download_midis import download, extract_midis, fetch_all  # noqa: E402
+
+# 가짜 MIDI 한 곡 (헤더 + 빈 트랙)
+TINY_MIDI = (
+    b"MThd\x00\x00\x00\x06\x00\x00\x00\x01\x01\xe0" + b"MTrk\x00\x00\x00\x04\x00\xff\x2f\x00"
+)
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """
+    Range/If-Range를 지원하는 정적 파일 서버 (GCS 대역).
+    drop_after 바이트를 보낸 뒤 연결을 끊는 요청 횟수(drops)를 정할 수 있습니다.
+    """
+
+    drops = 0
+    drop_after = 0
+    log = []
+
+    def log_message(self, *args):  # 테스트 출력 정리
+        pass
+
+    def do_GET(self):
+        path = Path(self.translate_path(self.path))
+        data = path.read_bytes()
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        start = 0
+        rng = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if rng and (if_range is None or if_range == etag):
+            start = int(rng.split("=")[1].split("-")[0])
+            if start >= len(data):
+                self.send_response(416)
+                self.end_headers()
+                return
+        body = data[start:]
+        type(self).log.append((rng, len(body)))
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Content-MD5", base64.b64encode(hashlib.md5(data).digest()).decode())
+        self.end_headers()
+        if type(self).drops > 0:  # 중간에 끊긴 전송 흉내
+            type(self).drops -= 1
+            self.wfile.write(body[: self.drop_after])
+            self.wfile.flush()
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+
+def make_zip(path: Path) -> dict:
+    """
+    같은 이름이 다른 폴더에 있는 MIDI, 대소문자만 다른 이름, MIDI 아닌 파일,
+    안전하지 않은 경로, 큰 멤버를 담은 zip
+    """
+    members = {
+        "maestro-v3.0.0/2004/take.midi": TINY_MIDI + b"a",
+        "maestro-v3.0.0/2006/take.midi": TINY_MIDI + b"b",
+        "maestro-v3.0.0/2006/Take.MIDI": TINY_MIDI + b"c",
+        "maestro-v3.0.0/2008/big.mid": os.urandom(3 << 20),
+        "maestro-v3.0.0/README.txt": b"not a midi",
+        "maestro-v3.0.0/../evil.mid": TINY_MIDI,
+    }
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, data in members.items():
+            z.writestr(name, data)
+    return members
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        serve = tmp / "serve"
+        serve.mkdir()
+        members = make_zip(serve / "archive.zip")
+        blob = (serve / "archive.zip").read_bytes()
+        sha = hashlib.sha256(blob).hexdigest()
+
+        handler = lambda *a, **kw: RangeHandler(*a, directory=str(serve), **kw)  # noqa: E731
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/archive.zip"
+
+        # 1) 전송이 두 번 끊겨도 Range로 이어받고, 받은 바이트 합이 파일 크기와 같음
+        RangeHandler.drops, RangeHandler.drop_after = 2, len(blob) // 3
+        out = download(url, tmp / "dl" / "archive.zip", sha256=sha, backoff=0)
+        assert out.read_bytes() == blob and not out.with_name("archive.zip.part").exists()
+        assert [r is not None for r, _ in RangeHandler.log] == [False, True, True], RangeHandler.log
+        sent = len(blob) // 3 * 2 + RangeHandler.log[-1][1]
+        assert sent == len(blob), (sent, len(blob))
+        print(f"resume: 3 requests, {sent} bytes total for a {len(blob)} byte zip, sha256 ok")
+
+        # 2) 프로세스가 죽고 남은 .part에서 다시 시작해도 나머지만 받음
+        RangeHandler.log.clear()
+        RangeHandler.drops = 1
+        try:
+            download(url, tmp / "dl2" / "archive.zip", retries=0)
+        except (OSError, HTTPException):
+            pass
+        out2 = download(url, tmp / "dl2" / "archive.zip")
+        assert out2.read_bytes() == blob and RangeHandler.log[-1][0] is not None
+        print(f"restart from .part: resumed at byte {len(blob) - RangeHandler.log[-1][1]}")
+
+        # 3) 체크섬이 틀리면 결과 파일을 만들지 않음
+        try:
+            download(url, tmp / "dl3" / "archive.zip", sha256="0" * 64)
+            raise AssertionError("bad checksum accepted")
+        except ValueError as e:
+            assert not (tmp / "dl3" / "archive.zip").exists(), e
+        print("checksum mismatch rejected")
+
+        # 4) 폴더 구조를 유지한 병렬 스트리밍 압축 해제, 두 번째 실행은 전부 건너뜀
+        dest = tmp / "midi_raw"
+        stats = extract_midis(out, dest, workers=4)
+        got = {
+            p.relative_to(dest).as_posix(): p.read_bytes() for p in dest.rglob("*") if p.is_file()
+        }
+        expect = {
+            "2004/take.midi": members["maestro-v3.0.0/2004/take.midi"],
+            "2006/take.midi": members["maestro-v3.0.0/2006/take.midi"],
+            "2006/Take-1.MIDI": members["maestro-v3.0.0/2006/Take.MIDI"],
+            "2008/big.mid": members["maestro-v3.0.0/2008/big.mid"],
+        }
+        assert got == expect, sorted(got)
+        assert extract_midis(out, dest, workers=4) == {"extracted": 0, "skipped": 4}
+        print(f"extract: {stats}, same-named files kept apart, unsafe member skipped")
+
+        # 5) 여러 아카이브 동시 받기 (DATASETS를 로컬 서버로 바꿔서)
+        (serve / "second.zip").write_bytes(blob)
+        RangeHandler.log.clear()
+        download_midis.DATASETS = {
+            "a": (url, "a.zip", dest),
+            "b": (url.replace("archive", "second"), "b.zip", dest),
+        }
+        paths = fetch_all(["a", "b"], dl_dir=tmp / "dl4")
+        assert [p.read_bytes() for p in paths] == [blob, blob] and len(RangeHandler.log) == 2
+        print("fetch_all: 2 archives downloaded concurrently and verified")
+        server.shutdown()
+    print("OK")
@@ -6,6 +6,8 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from models.batch_tokenize import find_midis  # noqa: E402
+
 # 드럼 토크나이저 모듈을 임포트합니다.
 from models.tokenizer_drums import midi_to_drum_tokens, save_tokens  # noqa: E402
 
@@ -15,11 +17,6 @@ IN_DIR = ROOT / "data" / "midi_raw" / "drums" / "gmd"
 OUT_DIR = ROOT / "data" / "midi_proc" / "drums"
 
 
-def find_midis(d: Path):
-    """주어진 디렉터리에서 .mid 또는 .midi 파일을 대소문자 구분 없이 검색합니다."""
-    return [p for p in d.rglob("*") if p.is_file() and p.suffix.lower() in {".mid", ".midi"}]
-
-
 if __name__ == "__main__":
     files = find_midis(IN_DIR)  # MIDI 파일 목록 검색
     if not files:
@@ -0,0 +1,111 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pretty_midi
+
+# 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.batch_tokenize import find_midis  # noqa: E402
+from models.tokenizer_drums import (  # noqa: E402
+    _CLASSES,
+    STEPS_PER_BAR,
+    _cls_for_pitch,
+    _drum_onsets,
+    _grid_to_tokens,
+    _load_midi,
+    drum_hit_grid,
+)
+
+# GMD 드럼 MIDI 파일이 있는 디렉터리 경로
+IN_DIR = ROOT / "data" / "midi_raw" / "drums" / "gmd"
+
+
+def legacy_tokens(pm: pretty_midi.PrettyMIDI, bpm: float):
+    """벡터화 이전의 스텝 루프 구현 (회귀 비교용 기준)"""
+    step_sec = (60.0 / bpm) / 4.0
+    hits = {}
+    min_step, max_step = None, 0
+    for inst in pm.instruments:
+        if not inst.is_drum:
+            continue
+        for n in inst.notes:
+            s = int(round(n.start / step_sec))
+            hits.setdefault(s, set()).add(_cls_for_pitch(n.pitch))
+            if min_step is None or s < min_step:
+                min_step = s
+            if s > max_step:
+                max_step = s
+    if min_step is None:
+        return ["BOS", f"BPM:{int(round(bpm))}", "EOS"]
+    shift = min_step or 0
+    if shift:
+        hits = {s - shift: v for s, v in hits.items()}
+        max_step -= shift
+    tokens = ["BOS", f"BPM:{int(round(bpm))}"]
+    bar_step = 0
+    for step in range(max_step + 1):
+        tokens.append("TS:1")
+        bar_step += 1
+        if bar_step >= STEPS_PER_BAR:
+            tokens.append("BAR")
+            bar_step = 0
+        if step in hits:
+            for cls in _CLASSES:
+                if cls in hits[step]:
+                    tokens.append(f"DRUM:{cls}")
+    tokens.append("EOS")
+    return tokens
+
+
+def vectorized_tokens(notes, bpm: float):
+    """models.tokenizer_drums의 NumPy 경로 (BPM 추정 제외, 노트 배열 입력, 인코딩 1)"""
+    grid = drum_hit_grid(*_drum_onsets(notes), (60.0 / bpm) / 4.0)
+    if grid.shape[0] == 0:
+        return ["BOS", f"BPM:{int(round(bpm))}", "EOS"]
+    return ["BOS", f"BPM:{int(round(bpm))}"] + _grid_to_tokens(grid, encoding=1) + ["EOS"]
+
+
+def main(in_dir: Path, limit: int | None, repeat: int):
+    files = find_midis(in_dir)[:limit]
+    if not files:
+        raise SystemExit(f"No MIDI files in {in_dir}")
+
+    t_legacy = t_vec = 0.0
+    n_tokens = mismatches = 0
+    for p in files:
+        pm = pretty_midi.PrettyMIDI(str(p))  # 로딩/BPM 추정은 두 경로가 같으므로 측정에서 제외
+        notes, bpm = _load_midi(p)
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            ref = legacy_tokens(pm, bpm)
+            t1 = time.perf_counter()
+            out = vectorized_tokens(notes, bpm)
+            t2 = time.perf_counter()
+            t_legacy += t1 - t0
+            t_vec += t2 - t1
+        n_tokens += len(ref)
+        if out != ref:  # 토큰 문자열과 순서까지 완전히 같아야 함
+            mismatches += 1
+            print(f"[MISMATCH] {p.name}")
+
+    runs = len(files) * repeat
+    print(f"files={len(files)} repeat={repeat} tokens/file={n_tokens / len(files):.0f}")
+    print(f"legacy     : {1e3 * t_legacy / runs:8.3f} ms/file")
+    print(f"vectorized : {1e3 * t_vec / runs:8.3f} ms/file  (x{t_legacy / max(t_vec, 1e-12):.1f})")
+    if mismatches:
+        raise SystemExit(f"{mismatches} file(s) differ from the legacy tokenizer")
+    print("OK: identical tokens on all files")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", type=Path, default=IN_DIR, help="Directory with drum MIDIs")
+    ap.add_argument("--limit", type=int, default=None, help="Use only the first N files")
+    ap.add_argument("--repeat", type=int, default=3, help="Timing repetitions per file")
+    args = ap.parse_args()
+    main(args.dir, args.limit, args.repeat)
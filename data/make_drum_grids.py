@@ -0,0 +1,95 @@
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# 프로젝트 루트를 임포트 가능하게 설정
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.batch_tokenize import find_midis, output_names  # noqa: E402
+from models.drum_grid import GridWriter, grid_paths, midi_to_grid, tokens_to_grid  # noqa: E402
+from models.token_shards import TokenShard, shard_exists  # noqa: E402
+
+DRUM_ROOT = ROOT / "data" / "midi_raw" / "drums"  # 벨로시티 면은 원본 MIDI에서만 얻을 수 있음
+TOKEN_DIR = ROOT / "data" / "midi_proc" / "drums"  # 드럼 토큰 JSON (+ .bin/.idx 샤드)
+OUT_DIR = ROOT / "data" / "ds"
+
+
+def token_songs():
+    """(이름, 그리드, BPM, None) - 토큰 샤드가 있으면 샤드, 없으면 JSON 파일에서"""
+    if shard_exists(TOKEN_DIR):
+        shard = TokenShard(TOKEN_DIR)
+        for i, name in enumerate(shard.names):
+            yield (name, *tokens_to_grid(shard.decode(i)), None)
+        return
+    for p in sorted(TOKEN_DIR.glob("*.json")):
+        tokens = json.loads(p.read_text(encoding="utf-8")).get("tokens", [])
+        yield (p.name, *tokens_to_grid(tokens), None)
+
+
+def _midi_job(path: Path):
+    try:
+        grid, vel, bpm = midi_to_grid(path)
+    except Exception as e:  # 손상된 파일은 건너뜀
+        return None, str(e)
+    return (grid, bpm, vel), None
+
+
+def midi_songs(workers: int):
+    """(이름, 그리드, BPM, 벨로시티) - 이름은 드럼 토큰 JSON과 같음 (분할이 일치하도록)"""
+    files = find_midis(DRUM_ROOT)
+    names = output_names(files, DRUM_ROOT)
+    with ProcessPoolExecutor(workers) as ex:
+        for p, (res, err) in zip(files, ex.map(_midi_job, files, chunksize=16)):
+            if res is None:
+                print(f"[WARN] Skip {p.name}: {err}")
+                continue
+            yield (names[p], *res)
+
+
+def main(source: str, velocity: bool, val_ratio: float, seed: int, workers: int):
+    """
+    드럼 코퍼스를 VAE 학습용 비트마스크 그리드 묶음(drums_grid_{train,val})으로 만듭니다.
+    학습/검증 분할은 pack_dataset.py와 같은 규칙(이름순 -> 시드 셔플 -> 앞쪽이 val)입니다.
+    """
+    t0 = time.perf_counter()
+    src = midi_songs(workers) if source == "midi" else token_songs()
+    songs = sorted((s for s in src if len(s[1])), key=lambda s: s[0])
+    if not songs:
+        raise SystemExit(f"No drum songs found ({DRUM_ROOT if source == 'midi' else TOKEN_DIR})")
+    random.Random(seed).shuffle(songs)
+    n_val = max(1, int(len(songs) * val_ratio))
+    for split, part in (("train", songs[n_val:]), ("val", songs[:n_val])):
+        prefix = OUT_DIR / f"drums_grid_{split}"
+        writer = GridWriter(prefix, velocity=velocity)
+        for name, grid, bpm, vel in part:
+            writer.add(name, grid, bpm, vel)
+        stats = writer.close()
+        size = sum(p.stat().st_size for p in grid_paths(prefix).values() if p.exists())
+        print(
+            f"{split}: songs={stats['songs']} steps={stats['steps']} "
+            f"windows={stats['windows']} size={size / 1e6:.2f}MB -> {prefix}.*"
+        )
+    print(f"Done in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--source", choices=["tokens", "midi"], default="tokens", help="Drum tokens or raw MIDI"
+    )
+    ap.add_argument(
+        "--velocity", action="store_true", help="Also store velocity planes (needs --source midi)"
+    )
+    ap.add_argument("--val_ratio", type=float, default=0.05)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workers", type=int, default=None, help="MIDI parse processes")
+    args = ap.parse_args()
+    if args.velocity and args.source != "midi":
+        ap.error("--velocity needs --source midi (tokens carry no velocity)")
+    main(args.source, args.velocity, args.val_ratio, args.seed, args.workers)
@@ -0,0 +1,46 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 프로젝트 루트를 임포트 가능하게 설정
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.token_shards import shard_paths, write_json_dir_shard  # noqa: E402
+
+# 토큰 JSON 디렉터리 (샤드는 같은 경로에 .bin/.idx 로 저장됨)
+PROC_DIRS = {
+    "melody": ROOT / "data" / "midi_proc" / "melody",
+    "drums": ROOT / "data" / "midi_proc" / "drums",
+}
+
+
+def main(kinds):
+    """토큰 JSON 디렉터리를 uint16 토큰 샤드로 묶고 크기를 비교해 출력합니다."""
+    for kind in kinds:
+        d = PROC_DIRS[kind]
+        if not d.exists():  # 디렉터리가 없으면 건너뜀
+            print(f"[SKIP] {kind}: {d} not found")
+            continue
+        t0 = time.perf_counter()
+        stats = write_json_dir_shard(d, d)  # 바뀌지 않은 레코드는 기존 샤드에서 재사용
+        elapsed = time.perf_counter() - t0
+        json_bytes = sum(p.stat().st_size for p in d.glob("*.json"))
+        shard_bytes = sum(p.stat().st_size for p in shard_paths(d))
+        print(
+            f"{kind}: records={stats['records']} reused={stats['reused']} "
+            f"parsed={stats['parsed']} errors={stats['errors']} "
+            f"json={json_bytes / 1e6:.1f}MB shard={shard_bytes / 1e6:.2f}MB "
+            f"({elapsed:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()  # 명령줄 인자 파서 생성
+    ap.add_argument(
+        "--kind", choices=["melody", "drums"], nargs="+", default=["melody", "drums"]
+    )  # 처리할 종류
+    args = ap.parse_args()
+    main(args.kind)
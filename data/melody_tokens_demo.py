@@ -6,6 +6,8 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from models.batch_tokenize import find_midis  # noqa: E402
+
 # 이제 models.tokenizer에서 임포트가 가능합니다.
 from models.tokenizer import midi_to_melody_tokens, save_tokens  # noqa: E402
 
@@ -15,20 +17,9 @@ MELODY_DIR = ROOT / "data" / "midi_raw" / "melody" / "maestro"
 OUT_DIR = ROOT / "data" / "midi_proc" / "melody"
 
 
-def find_midis(dir_path: Path):
-    # .mid / .midi에 대한 대소문자 구분 없는 재귀적 검색
-    return [
-        p
-        for p in dir_path.rglob("*")  # 모든 파일 및 디렉터리 순회
-        if p.is_file()
-        and p.suffix.lower()
-        in {".mid", ".midi"}  # 파일이고 확장자가 .mid 또는 .midi (소문자 변환 후)인 경우
-    ]
-
-
 if __name__ == "__main__":
     # 지정된 디렉터리에서 MIDI 파일 검색
-    midi_files = sorted(find_midis(MELODY_DIR))
+    midi_files = find_midis(MELODY_DIR)
     if not midi_files:  # MIDI 파일이 없으면 오류 메시지 출력 후 종료
         raise SystemExit(f"No MIDI files found under {MELODY_DIR}")
 
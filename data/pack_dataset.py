@@ -1,12 +1,31 @@
 import argparse
 import json
 import random
+import sys
 from pathlib import Path
 
+import numpy as np
+
 ROOT = Path(__file__).resolve().parents[1]  # 현재 스크립트의 루트 디렉터리
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.batch_tokenize import load_manifest, manifest_path  # noqa: E402
+from models.catalog import select  # noqa: E402
+from models.encoding import ENCODING_VERSION, Codec  # noqa: E402
+from models.token_shards import (  # noqa: E402
+    WINDOW_DTYPE,
+    ShardWriter,
+    TokenShard,
+    shard_exists,
+    window_starts,
+    windows_path,
+)
+from models.vocab import Vocab  # noqa: E402
+
 VOCAB_PATH = ROOT / "data" / "vocab.json"  # 어휘집 파일 경로
 
-# 처리된 토큰 파일이 있는 디렉터리들
+# 처리된 토큰 파일이 있는 디렉터리들 (같은 경로 + .bin/.idx 는 토큰 샤드)
 PROC_DIRS = {
     "melody": ROOT / "data" / "midi_proc" / "melody",
     "drums": ROOT / "data" / "midi_proc" / "drums",
@@ -52,6 +71,21 @@ def list_token_files(kind: str):
     return sorted([p for p in d.glob("*.json")])  # .json 파일만 검색하고 정렬
 
 
+def selected_names(kind: str, where: str) -> set:
+    """
+    MIDI 카탈로그 필터(where)를 통과한 소스의 토큰 파일 이름 집합.
+    토큰화 매니페스트의 (소스 상대 경로 -> 출력 이름)으로 잇기 때문에 토큰 파일은 열지 않습니다.
+    """
+    manifest = load_manifest(manifest_path(PROC_DIRS[kind]))
+    if "src_root" not in manifest:
+        raise SystemExit(f"No tokenization manifest for {kind}; run {kind}_tokenize_all.py first")
+    src_root = Path(manifest["src_root"])
+    keep = {p.relative_to(src_root).as_posix() for p in select(where, under=src_root)}
+    return {
+        e["out"] for key, e in manifest["files"].items() if key in keep and e.get("status") == "ok"
+    }
+
+
 def to_ids(tokens, tok2id, max_len: int):
     """토큰 리스트를 ID 리스트로 변환하고, 최대 길이를 초과하면 잘라냅니다."""
     # 토큰을 ID로 매핑. 알 수 없는 토큰은 UNK ID로 변환
@@ -60,7 +94,49 @@ def to_ids(tokens, tok2id, max_len: int):
     return ids[:max_len]
 
 
-def pack(kind: str, val_ratio: float, max_len: int, min_len: int, seed: int = 42):
+def load_records(kind: str, tok2id: dict, source: str = "auto", names=None):
+    """
+    (원본 이름, 토큰 수, 어휘집 ID 배열 로더) 목록을 이름순으로 반환합니다.
+    source="auto"이면 토큰 샤드가 있을 때 샤드를, 없으면 JSON 파일을 읽습니다.
+    names(토큰 파일 이름 집합)가 주어지면 그 레코드만 돌려줍니다.
+    """
+    prefix = PROC_DIRS[kind]
+    if source == "shard" or (source == "auto" and shard_exists(prefix)):
+        shard = TokenShard(prefix)  # 메모리 매핑: 필요한 레코드만 페이지 인
+        lut = shard.lookup_table(tok2id)  # 샤드 ID -> 어휘집 ID
+        return [
+            (name, int(shard.lengths[i]), lambda i=i: lut[shard[i]])
+            for i, name in enumerate(shard.names)
+            if names is None or name in names
+        ]
+
+    vocab = Vocab(tok2id)  # 토큰마다 dict 조회 대신 벡터화된 encode
+
+    def _load_json(p: Path):
+        tokens = json.loads(p.read_text(encoding="utf-8")).get("tokens", [])
+        return vocab.encode(tokens).astype(np.int64)
+
+    # JSON은 길이를 알려면 파싱해야 하므로 토큰 수는 None
+    return [
+        (p.name, None, lambda p=p: _load_json(p))
+        for p in list_token_files(kind)
+        if names is None or p.name in names
+    ]
+
+
+def pack(
+    kind: str,
+    val_ratio: float,
+    max_len: int,
+    min_len: int,
+    seed: int = 42,
+    source: str = "auto",
+    out_format: str = "jsonl",
+    stride: int = 0,
+    snap_bars: bool = False,
+    where=None,
+    encoding: int = ENCODING_VERSION,
+):
     """
     지정된 종류의 토큰 파일들을 학습/검증 데이터셋으로 패킹합니다.
     kind: "melody" 또는 "drums"
@@ -68,48 +144,81 @@ def pack(kind: str, val_ratio: float, max_len: int, min_len: int, seed: int = 42
     max_len: 최대 토큰 길이
     min_len: 최소 토큰 길이 (이보다 짧으면 건너뜀)
     seed: 데이터 셔플링을 위한 시드 값
+    source: "auto" (샤드 우선), "shard" 또는 "json"
+    out_format: "jsonl" ({kind}_{split}.jsonl) 또는 "shard" ({kind}_{split}.bin/.idx, 어휘집 ID)
+    stride: 0보다 크면 자르지 않고 전체 레코드를 샤드로 저장하고, stride 간격의
+            max_len 크롭 윈도 인덱스({kind}_{split}.win.npy)를 함께 씁니다.
+    snap_bars: 크롭 시작을 BAR 토큰 다음(마디 경계)으로 맞춤
+    where: MIDI 카탈로그 필터 (SQL 식 또는 프리셋 이름, 예: "card"); 통과한 파일만 읽음
+    encoding: 출력 토큰 인코딩 (1: TS:1/DRUM, 2: TS:n/DRUMS). 입력 레코드는 버전과 관계없이 변환됨
     """
+    if stride > 0:
+        out_format = "shard"  # 윈도 인덱스는 샤드 오프셋을 가리킴
     tok2id = load_vocab()  # 어휘집 로드
-    files = list_token_files(kind)  # 토큰 파일 목록 가져오기
-    if not files:  # 파일이 없으면 오류 메시지 출력 후 종료
+    names = selected_names(kind, where) if where else None  # 카탈로그 필터
+    records = load_records(kind, tok2id, source, names)  # 레코드 목록 가져오기
+    if not records:  # 레코드가 없으면 오류 메시지 출력 후 종료
         raise SystemExit(f"No token files for {kind} in {PROC_DIRS[kind]}")
 
-    random.Random(seed).shuffle(files)  # 파일 목록을 시드 기반으로 셔플링
-    n_val = max(1, int(len(files) * val_ratio))  # 검증 파일 개수 계산 (최소 1개)
-    val_files = files[:n_val]  # 검증 파일 목록
-    train_files = files[n_val:]  # 학습 파일 목록
+    random.Random(seed).shuffle(records)  # 레코드 목록을 시드 기반으로 셔플링
+    n_val = max(1, int(len(records) * val_ratio))  # 검증 파일 개수 계산 (최소 1개)
+    splits = [("train", records[n_val:]), ("val", records[:n_val])]  # 학습/검증 분할
 
     OUT_DIR.mkdir(parents=True, exist_ok=True)  # 출력 디렉터리 생성
-    out_train = OUT_DIR / f"{kind}_train.jsonl"  # 학습 파일 경로
-    out_val = OUT_DIR / f"{kind}_val.jsonl"  # 검증 파일 경로
-
-    kept_train = kept_val = 0  # 최종 저장된 파일 수 카운터
-    # 학습 및 검증 파일을 쓰기 모드로 열기
-    with out_train.open("w", encoding="utf-8") as ftr, out_val.open("w", encoding="utf-8") as fva:
-        for split, flist, fout in [
-            ("train", train_files, ftr),
-            ("val", val_files, fva),
-        ]:  # 학습, 검증 분할 처리
-            for p in flist:  # 각 파일에 대해 반복
-                obj = json.loads(p.read_text(encoding="utf-8"))  # JSON 파일 읽어 파싱
-                tokens = obj.get("tokens", [])  # 토큰 목록 가져오기
-                if len(tokens) < min_len:  # 최소 길이보다 짧으면 건너뜀
+    id2tok = {}
+    for t, i in tok2id.items():  # 버킷 별칭보다 정식 토큰이 먼저 나옴
+        id2tok.setdefault(i, t)
+    vocab_tokens = [id2tok[i] for i in range(len(id2tok))]  # ID 순서의 토큰 표 (샤드 출력용)
+    kept = {"train": 0, "val": 0}  # 최종 저장된 레코드 수 카운터
+    n_windows = {"train": 0, "val": 0}  # 크롭 윈도 수 카운터
+    bar_id = tok2id["BAR"] if snap_bars else None
+    codec = Codec(Vocab(tok2id))  # 인코딩 변환 (id 배열 그대로)
+    for split, recs in splits:
+        windows = []  # (레코드 번호, 레코드 길이, 시작 위치 배열) 목록
+        if out_format == "shard":  # 실패하면 __exit__가 임시 파일만 지우고 기존 샤드는 그대로
+            out = ShardWriter(OUT_DIR / f"{kind}_{split}", tokens=vocab_tokens)
+        else:
+            out = (OUT_DIR / f"{kind}_{split}.jsonl").open("w", encoding="utf-8")
+        with out:
+            for name, n_tokens, load in recs:  # 각 레코드에 대해 반복
+                # 샤드: 읽기 전에 길이 확인 (인코딩 2로 묶으면 길이는 줄기만 함)
+                if n_tokens is not None and n_tokens < min_len and encoding >= 2:
                     continue
-                ids = to_ids(tokens, tok2id, max_len)  # 토큰을 ID로 변환
-                rec = {
-                    "ids": ids,
-                    "src": p.name,
-                    "kind": kind,
-                }  # 학습 레코드 생성 (ID, 원본 파일명, 종류)
-                fout.write(
-                    json.dumps(rec, ensure_ascii=False) + "\n"
-                )  # JSON 레코드를 파일에 쓰고 줄바꿈
-                if split == "train":
-                    kept_train += 1  # 학습 파일 카운트 증가
+                ids = codec.convert(load(), encoding)  # 어휘집 ID 배열
+                if len(ids) < min_len:  # 최소 길이보다 짧으면 건너뜀
+                    continue
+                if stride > 0:  # 전체를 저장하고 크롭 위치만 기록
+                    starts = window_starts(ids, max_len, stride, min_len, bar_id)
+                    windows.append((kept[split], len(ids), starts))
+                else:
+                    ids = ids[:max_len]  # 간단한 길이 제한 적용
+                if out_format == "shard":
+                    out.add(name, ids)
                 else:
-                    kept_val += 1  # 검증 파일 카운트 증가
+                    rec = {
+                        "ids": ids.tolist(),
+                        "src": name,
+                        "kind": kind,
+                        "encoding": encoding,
+                    }  # 학습 레코드 생성 (ID, 원본 파일명, 종류, 인코딩)
+                    out.write(json.dumps(rec, ensure_ascii=False) + "\n")  # JSON 레코드 한 줄
+                kept[split] += 1
+        if stride > 0:
+            index = np.zeros(sum(len(st) for _, _, st in windows), dtype=WINDOW_DTYPE)
+            if len(index):
+                index["record"] = np.concatenate([np.full(len(st), r) for r, _, st in windows])
+                index["start"] = np.concatenate([st for _, _, st in windows])
+                index["length"] = np.concatenate(
+                    [np.minimum(max_len, n - st) for _, n, st in windows]
+                )
+            np.save(windows_path(OUT_DIR / f"{kind}_{split}"), index)
+            n_windows[split] = len(index)
 
-    print(f"{kind}: train={kept_train}  val={kept_val}  -> {OUT_DIR}")  # 최종 결과 출력
+    print(
+        f"{kind}: train={kept['train']}  val={kept['val']}  encoding={encoding}  -> {OUT_DIR}"
+    )  # 최종 결과 출력
+    if stride > 0:
+        print(f"{kind}: crop windows train={n_windows['train']}  val={n_windows['val']}")
 
 
 if __name__ == "__main__":
@@ -126,5 +235,34 @@ if __name__ == "__main__":
     ap.add_argument(
         "--min_len", type=int, default=32, help="Minimum sequence length in tokens"
     )  # 최소 토큰 길이 (기본 32)
+    ap.add_argument(
+        "--source", choices=["auto", "shard", "json"], default="auto", help="Token input format"
+    )  # 입력 형식 (기본: 샤드가 있으면 샤드)
+    ap.add_argument(
+        "--out_format", choices=["jsonl", "shard"], default="jsonl", help="Packed output format"
+    )  # 출력 형식
+    ap.add_argument(
+        "--stride", type=int, default=0, help="Keep full records and index crops every N tokens"
+    )  # 슬라이딩 윈도 간격 (0이면 기존처럼 자르기)
+    ap.add_argument(
+        "--snap_bars", action="store_true", help="Start crops right after BAR tokens"
+    )  # 마디 경계 맞춤
+    ap.add_argument(
+        "--where", default=None, help="MIDI catalog filter (SQL or preset, e.g. 'card')"
+    )  # 카탈로그 필터
+    ap.add_argument(
+        "--encoding", type=int, choices=[1, 2], default=ENCODING_VERSION, help="Token encoding"
+    )  # 출력 토큰 인코딩 (2: TS:n 런 길이 + DRUMS 비트마스크)
     args = ap.parse_args()
-    pack(args.kind, args.val_ratio, args.max_len, args.min_len)  # 설정값으로 pack 함수 호출
+    pack(
+        args.kind,
+        args.val_ratio,
+        args.max_len,
+        args.min_len,
+        source=args.source,
+        out_format=args.out_format,
+        stride=args.stride,
+        snap_bars=args.snap_bars,
+        where=args.where,
+        encoding=args.encoding,
+    )  # 설정값으로 pack 함수 호출
@@ -0,0 +1,129 @@
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# 모델을 임포트하기 전에 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models import prompt_parser as pp  # noqa: E402
+
+# data/prompt_parser_demo.py 와 models/prompt_parser.py 의 예시 프롬프트
+DEMO = [
+    "lofi chill study bpm 82 in A minor",
+    "citypop bright 105bpm",
+    "hip hop dark 92",
+    "jazzy smooth romantic 120",
+    "classical piano calm in C major",
+    "jazz swing medium density",
+    "hip-hop dark 92",
+    "classical romantic C major",
+]
+
+
+def legacy_parse(prompt: str):
+    """컴파일된 매처 이전의 구현 (결과 비교용 기준)"""
+
+    def first_match(text, table):
+        for k, v in table.items():
+            if k in text:
+                return v
+        return None
+
+    t = prompt.lower()
+    genre = first_match(t, pp.GENRE_MAP) or pp.DEFAULTS["genre"]
+    mood = first_match(t, pp.MOOD_MAP) or pp.DEFAULTS["mood"]
+    density = first_match(t, pp.DENSITY_MAP) or pp.DEFAULTS["density"]
+    m = re.search(r"(\d{2,3})\s*bpm", t, flags=re.I) or re.search(r"\b(\d{2,3})\b", t)
+    bpm = int(m.group(1)) if m and 40 <= int(m.group(1)) <= 220 else None
+    bpm = bpm or pp.DEFAULT_BPM.get(genre, pp.DEFAULTS["bpm"])
+    km = re.search(r"\b([A-Ga-g])([#b]?)(?:\s|-)?(major|minor|maj|min)?\b", t)
+    key = pp.DEFAULTS["key"]
+    if km:
+        qual = km.group(3) or "major"
+        qual = {"maj": "major", "min": "minor"}.get(qual.lower(), qual.lower())
+        key = f"{km.group(1).upper() + km.group(2)}_{qual}"
+    return [f"GENRE:{genre}", f"MOOD:{mood}", f"BPM:{int(bpm)}", f"KEY:{key}", f"DENSITY:{density}"]
+
+
+def fuzz_corpus(n: int, seed: int = 0):
+    """어휘 키, 키 일부, 숫자, 조성, 잡음 단어를 섞은 무작위 프롬프트 (붙여 쓰기/대소문자 포함)"""
+    rng = random.Random(seed)
+    words = list(pp.GENRE_MAP) + list(pp.MOOD_MAP) + list(pp.DENSITY_MAP)
+    noise = ["study", "song", "a", "in", "for", "night", "breakfast", "trapped", "synthwave"]
+    keys = ["C major", "a minor", "F#-min", "Bb maj", "e", "G"]
+    out = []
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(1, 7)):
+            r = rng.random()
+            if r < 0.5:
+                w = rng.choice(words)
+                parts.append(w[: rng.randint(2, len(w))] if rng.random() < 0.1 else w)
+            elif r < 0.7:
+                parts.append(rng.choice(noise))
+            elif r < 0.85:
+                parts.append(f"{rng.randint(1, 400)}{rng.choice(['', ' ', 'bpm', ' BPM'])}")
+            else:
+                parts.append(rng.choice(keys))
+        sep = rng.choice([" ", "  ", "", "-", ", "])
+        text = sep.join(parts)
+        out.append(text.upper() if rng.random() < 0.1 else text)
+    return out
+
+
+def _per_prompt_us(fn, prompts, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for p in prompts:
+            fn(p)
+    return 1e6 * (time.perf_counter() - t0) / (repeat * len(prompts))
+
+
+def traffic(pool, n: int, seed: int = 1):
+    """웹 요청처럼 일부 프롬프트가 자주 반복되는 (1/순위 가중) 요청 목록"""
+    rng = random.Random(seed)
+    weights = [1.0 / (r + 1) for r in range(len(pool))]
+    return rng.choices(pool, weights=weights, k=n)
+
+
+def main(n_fuzz: int, repeat: int):
+    prompts = DEMO + fuzz_corpus(n_fuzz)
+    mismatches = [p for p in prompts if pp.parse_prompt(p) != legacy_parse(p)]
+    for p in mismatches[:10]:
+        print(f"[MISMATCH] {p!r}: {pp.parse_prompt(p)} != {legacy_parse(p)}")
+
+    def uncached(p):
+        return list(pp._parse_normalized.__wrapped__(p.lower().strip()))
+
+    print(f"prompts={len(prompts)} (demo={len(DEMO)}, fuzz={n_fuzz})")
+    print(f"legacy          : {_per_prompt_us(legacy_parse, prompts, repeat):7.2f} us/prompt")
+    print(f"compiled        : {_per_prompt_us(uncached, prompts, repeat):7.2f} us/prompt")
+
+    # 반복 요청: 서로 다른 프롬프트 수가 캐시 크기보다 작은 경우
+    reqs = traffic(prompts[:2000], len(prompts))
+    pp._parse_normalized.cache_clear()
+    legacy_us = _per_prompt_us(legacy_parse, reqs, repeat)
+    cached_us = _per_prompt_us(pp.parse_prompt, reqs, repeat)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        pp.parse_prompts(reqs)
+    batch_us = 1e6 * (time.perf_counter() - t0) / (repeat * len(reqs))
+    print(f"traffic legacy  : {legacy_us:7.2f} us/prompt")
+    print(f"traffic cached  : {cached_us:7.2f} us/prompt")
+    print(f"traffic batch   : {batch_us:7.2f} us/prompt   cache={pp.parse_cache_info()}")
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} prompt(s) differ from the legacy parser")
+    print("OK: identical results on all prompts")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fuzz", type=int, default=2000, help="Number of random prompts")
+    ap.add_argument("--repeat", type=int, default=5, help="Timing repetitions")
+    args = ap.parse_args()
+    main(args.fuzz, args.repeat)
@@ -0,0 +1,397 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pretty_midi
+
+# 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from data import build_vocab, pack_dataset  # noqa: E402
+from data.prompt_parser_bench import DEMO, fuzz_corpus  # noqa: E402
+from models import prompt_parser as pp  # noqa: E402
+from models.batch_tokenize import TOKENIZERS, tokenize_corpus  # noqa: E402
+from models.detokenize import tokens_to_midi  # noqa: E402
+from render.loop_tools.loop import build_loop, loop_bars  # noqa: E402
+from render.synth import SR, render_stems  # noqa: E402
+from web.backend.load_test import PROMPTS  # noqa: E402
+from web.backend.pipeline import controls_for, run_job, stub_generate  # noqa: E402
+
+METRICS_DIR = ROOT / "eval" / "metrics"
+RESULTS_PATH = METRICS_DIR / "pipeline_bench.json"
+BASELINE_PATH = METRICS_DIR / "pipeline_baseline.json"
+SUITE_VERSION = 1  # 지표 이름/정의가 바뀌면 올림 (다른 버전의 기준과는 비교하지 않음)
+TARGET_SEC = 10.0  # 목표: 일반 노트북에서 30초 루프를 10초 안에 (PROJECT_GOALS.md)
+
+# 지표 이름 -> (단위, 좋은 방향). 비교 모드는 이 표에 있는 지표만 봅니다.
+METRICS: Dict[str, tuple] = {
+    "parse_prompt.uncached_us": ("us", "lower"),
+    "parse_prompt.cached_us": ("us", "lower"),
+    "tokenize.drums.files_per_sec": ("files/s", "higher"),
+    "tokenize.drums.tokens_per_sec": ("tokens/s", "higher"),
+    "tokenize.melody.files_per_sec": ("files/s", "higher"),
+    "tokenize.melody.tokens_per_sec": ("tokens/s", "higher"),
+    "tokenize.noop_sec": ("s", "lower"),
+    "build_vocab.sec": ("s", "lower"),
+    "pack_dataset.sec": ("s", "lower"),
+    "render.rtf": ("x", "lower"),
+    "render.sec": ("s", "lower"),
+    "prompt_to_wav.p50_sec": ("s", "lower"),
+    "prompt_to_wav.p95_sec": ("s", "lower"),
+    "prompt_to_wav.generate_sec": ("s", "lower"),
+    "prompt_to_wav.render_sec": ("s", "lower"),
+    "prompt_to_wav.encode_sec": ("s", "lower"),
+}
+
+
+# --- 고정 합성 픽스처 ----------------------------------------------------------
+def write_fixtures(root: Path, n: int, seed: int = 0) -> Dict[str, List[Path]]:
+    """
+    실행할 때마다 같은 내용의 MIDI 픽스처를 만듭니다 (시드 고정, 외부 데이터 없음).
+    drums: 16분음표 격자의 GMD 같은 그루브 (16~64마디, 필인/빈 마디 포함)
+    melody: 피아노 선율 + 베이스 + 코드 (8~32마디, 4/4 또는 3/4)
+    """
+    rng = np.random.default_rng(seed)
+    out: Dict[str, List[Path]] = {"drums": [], "melody": []}
+    for k in range(n):
+        bpm = float(rng.integers(70, 160))
+        pm = pretty_midi.PrettyMIDI(initial_tempo=bpm)
+        step = 15.0 / bpm
+        inst = pretty_midi.Instrument(0, is_drum=True)
+        for s in range(16 * int(rng.integers(16, 65))):
+            if s // 16 % 8 == 7:
+                continue
+            hits = ([42] if s % 2 == 0 else []) + ([36] if s % 8 == 0 else [])
+            hits += [38] if s % 8 == 4 else []
+            if rng.random() < 0.08:
+                hits.append(int(rng.choice([46, 49, 51, 39, 48, 45, 56])))
+            for pitch in hits:
+                vel = int(rng.integers(40, 128))
+                inst.notes.append(pretty_midi.Note(vel, pitch, s * step, s * step + 0.05))
+        pm.instruments.append(inst)
+        out["drums"].append(root / "drums" / f"groove{k:03d}.mid")
+
+        mel = pretty_midi.PrettyMIDI(initial_tempo=bpm)
+        beats = 3 if k % 4 == 3 else 4
+        mel.time_signature_changes.append(pretty_midi.TimeSignature(beats, 4, 0.0))
+        lead = pretty_midi.Instrument(0)
+        bass = pretty_midi.Instrument(33)
+        keys = pretty_midi.Instrument(4)
+        tonic = 48 + int(rng.integers(0, 12))
+        t, pitch = 0.0, tonic + 12
+        bars = int(rng.integers(8, 33))
+        while t < bars * beats * 4 * step:
+            dur = float(rng.choice([1, 2, 2, 4, 6])) * step
+            pitch = int(np.clip(pitch + rng.integers(-4, 5), tonic + 5, tonic + 28))
+            lead.notes.append(pretty_midi.Note(int(rng.integers(60, 110)), pitch, t, t + dur))
+            t += dur
+        for b in range(bars):
+            t0, t1 = b * beats * 4 * step, (b + 1) * beats * 4 * step
+            root_pc = tonic + (0, 5, 7, 3)[b % 4]
+            bass.notes.append(pretty_midi.Note(90, root_pc - 12, t0, t1))
+            for p in (root_pc, root_pc + 4, root_pc + 7):
+                keys.notes.append(pretty_midi.Note(70, p, t0, t1))
+        mel.instruments += [lead, bass, keys]
+        out["melody"].append(root / "melody" / f"piece{k:03d}.mid")
+
+        for p, obj in ((out["drums"][-1], pm), (out["melody"][-1], mel)):
+            p.parent.mkdir(parents=True, exist_ok=True)
+            obj.write(str(p))
+    return out
+
+
+# --- 단계별 측정 -----------------------------------------------------------------
+def _best(fn: Callable[[], object], repeat: int) -> float:
+    """fn을 repeat번 실행한 가장 짧은 시간 (초). 잡음이 적은 벽시계 시간 지표용."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+@contextlib.contextmanager
+def _quiet():
+    """진행 막대/요약 출력을 숨김 (표준 오류의 tqdm 포함)"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+def bench_parse(n_fuzz: int, repeat: int) -> Dict[str, float]:
+    """parse_prompt 한 건의 지연: 캐시 없이 (매처만) / 반복 요청 (LRU 캐시 적중)"""
+    prompts = DEMO + fuzz_corpus(n_fuzz)
+    uncached = pp._parse_normalized.__wrapped__
+    norm = [p.lower().strip() for p in prompts]
+    t_raw = _best(lambda: [uncached(p) for p in norm], repeat)
+    pp.parse_prompts(prompts)  # 캐시 채움
+    t_hit = _best(lambda: pp.parse_prompts(prompts), repeat)
+    return {
+        "parse_prompt.uncached_us": 1e6 * t_raw / len(prompts),
+        "parse_prompt.cached_us": 1e6 * t_hit / len(prompts),
+    }
+
+
+def bench_data(
+    tmp: Path, fixtures: Dict[str, List[Path]], kinds: List[str], workers: int, repeat: int
+) -> Dict[str, float]:
+    """토크나이저 처리량, 변경 없는 재실행, build_vocab / pack_dataset 벽시계 시간"""
+    raw, proc = tmp / "midi_raw", tmp / "midi_proc"
+    out: Dict[str, float] = {}
+    for kind in kinds:
+        sec = _best(
+            lambda: tokenize_corpus(kind, raw / kind, proc / kind, workers=workers, overwrite=True),
+            repeat,
+        )
+        files = list((proc / kind).glob("*.json"))
+        n_tokens = sum(len(json.loads(p.read_text())["tokens"]) for p in files)
+        out[f"tokenize.{kind}.files_per_sec"] = len(fixtures[kind]) / sec
+        out[f"tokenize.{kind}.tokens_per_sec"] = n_tokens / sec
+    out["tokenize.noop_sec"] = _best(
+        lambda: [tokenize_corpus(k, raw / k, proc / k, workers=workers) for k in kinds], repeat
+    )
+
+    # 어휘/패킹 스크립트의 경로를 임시 디렉터리로 돌림 (저장소의 data/는 건드리지 않음)
+    build_vocab.PROC_DIRS = [proc / k for k in kinds]
+    build_vocab.OUT = pack_dataset.VOCAB_PATH = tmp / "vocab.json"
+    build_vocab.COUNTS_CACHE = tmp / "vocab_counts.json"
+    pack_dataset.PROC_DIRS = {k: proc / k for k in kinds}
+    pack_dataset.OUT_DIR = tmp / "ds"
+    out["build_vocab.sec"] = _best(
+        lambda: build_vocab.gather_tokens(source="json", workers=workers, use_cache=False), repeat
+    )
+    out["pack_dataset.sec"] = _best(
+        lambda: [pack_dataset.pack(k, 0.1, 1024, 8, source="json") for k in kinds], repeat
+    )
+    return out
+
+
+def bench_render(prompts: List[str], repeat: int) -> Dict[str, float]:
+    """스텁 토큰 -> MIDI -> 내장 신시사이저 스템 -> 루프 조립의 실시간 배율 (렌더 초 / 오디오 초)"""
+    rtf, secs = [], []
+    for i, prompt in enumerate(prompts):
+        controls = controls_for(prompt)
+        bpm = float(controls[2].split(":", 1)[1])
+        bars = loop_bars(bpm)
+        tokens = stub_generate(controls, i, bars)
+        pm = tokens_to_midi(tokens["melody"], tokens["drums"], bpm=bpm)
+        holder = []
+        sec = _best(lambda: holder.append(build_loop(render_stems(pm, SR), bpm, SR, bars)), repeat)
+        rtf.append(sec / (len(holder[-1]) / SR))
+        secs.append(sec)
+    return {"render.rtf": float(np.median(rtf)), "render.sec": float(np.median(secs))}
+
+
+def bench_prompt_to_wav(prompts: List[str], rounds: int) -> Dict[str, float]:
+    """프롬프트 파싱 + 스텁 생성 + 렌더 + WAV 인코딩 전체 지연 (매번 새 시드, 캐시 없음)"""
+    total, parts = [], {"generate": [], "render": [], "encode": []}
+    for r in range(rounds):
+        for i, prompt in enumerate(prompts):
+            t0 = time.perf_counter()
+            job = run_job(controls_for(prompt), seed=r * len(prompts) + i)
+            total.append(time.perf_counter() - t0)
+            for k in parts:
+                parts[k].append(job["timings"][k])
+    out = {
+        "prompt_to_wav.p50_sec": float(np.percentile(total, 50)),
+        "prompt_to_wav.p95_sec": float(np.percentile(total, 95)),
+    }
+    out.update({f"prompt_to_wav.{k}_sec": float(np.median(v)) for k, v in parts.items()})
+    return out
+
+
+# --- 결과 파일 / 비교 -------------------------------------------------------------
+def _cpu_model() -> str:
+    try:
+        for line in Path("/proc/cpuinfo").read_text().splitlines():
+            if line.startswith("model name"):
+                return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine_info() -> Dict[str, object]:
+    """결과를 해석할 때 필요한 실행 환경 (다른 기계의 기준과 비교하면 경고)"""
+    try:
+        mem = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 2**30
+    except (ValueError, OSError, AttributeError):
+        mem = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "cpu": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "memory_gb": round(mem, 1) if mem else None,
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pretty_midi": getattr(pretty_midi, "__version__", None),
+        "git_commit": commit or None,
+    }
+
+
+def run_suite(args) -> Dict[str, object]:
+    """모든 단계를 측정해 결과 dict (machine/config/metrics/skipped)를 만듭니다."""
+    metrics: Dict[str, float] = {}
+    skipped: Dict[str, str] = {}
+    # 멜로디 토크나이저 모듈이 없는 체크아웃에서는 드럼만 측정
+    kinds = [k for k in ("drums", "melody") if importlib.util.find_spec(TOKENIZERS[k][0])]
+    for k in ("drums", "melody"):
+        if k not in kinds:
+            skipped[f"tokenize.{k}"] = f"tokenizer module {TOKENIZERS[k][0]} is not available"
+
+    t0 = time.perf_counter()
+    metrics.update(bench_parse(args.prompts, args.repeat))
+    print(f"parse_prompt     : {time.perf_counter() - t0:6.2f} s")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        t0 = time.perf_counter()
+        fixtures = write_fixtures(tmp / "midi_raw", args.files)
+        with _quiet():
+            metrics.update(bench_data(tmp, fixtures, kinds, args.workers, args.repeat))
+        print(f"data pipeline    : {time.perf_counter() - t0:6.2f} s ({args.files} files per kind)")
+    t0 = time.perf_counter()
+    metrics.update(bench_render(PROMPTS[: args.loops], args.repeat))
+    print(f"render           : {time.perf_counter() - t0:6.2f} s")
+    t0 = time.perf_counter()
+    metrics.update(bench_prompt_to_wav(PROMPTS[: args.loops], args.repeat))
+    print(f"prompt -> WAV    : {time.perf_counter() - t0:6.2f} s")
+    return {
+        "suite": "pipeline",
+        "version": SUITE_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "config": {
+            "files": args.files,
+            "prompts": args.prompts,
+            "loops": args.loops,
+            "repeat": args.repeat,
+            "workers": args.workers,
+            "generator": "stub",
+            "sr": SR,
+        },
+        "metrics": {
+            name: {"value": v, "unit": METRICS[name][0], "better": METRICS[name][1]}
+            for name, v in metrics.items()
+        },
+        "goal": {
+            "target_sec": TARGET_SEC,
+            "met": metrics["prompt_to_wav.p95_sec"] <= TARGET_SEC,
+        },
+        "skipped": skipped,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    기준 결과와 비교해 표를 출력하고 회귀한 지표 이름 목록을 돌려줍니다.
+    회귀: 좋은 방향의 반대로 tolerance(비율)보다 더 나빠진 지표. 한쪽에만 있는 지표는 건너뜀.
+    """
+    if baseline.get("version") != current.get("version"):
+        print(f"[WARN] Baseline suite version {baseline.get('version')} != {current['version']}")
+    for key in ("cpu", "cpu_count", "python"):
+        if baseline["machine"].get(key) != current["machine"].get(key):
+            print(
+                f"[WARN] Different machine: {key} {baseline['machine'].get(key)!r} "
+                f"vs {current['machine'].get(key)!r}; differences may not be regressions"
+            )
+    regressions = []
+    print(f"{'metric':34s} {'baseline':>12s} {'current':>12s} {'change':>8s}")
+    for name, cur in current["metrics"].items():
+        base = baseline["metrics"].get(name)
+        if base is None or not base["value"]:
+            continue
+        change = cur["value"] / base["value"] - 1
+        worse = change if cur["better"] == "lower" else -change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:34s} {base['value']:12.4g} {cur['value']:12.4g} " f"{100 * change:+7.1f}%{flag}"
+        )
+    return regressions
+
+
+def write_results(results: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="End-to-end pipeline benchmarks")
+    ap.add_argument("--out", type=Path, default=RESULTS_PATH, help="Results JSON path")
+    ap.add_argument(
+        "--results", type=Path, default=None, help="Compare an existing results file (no run)"
+    )  # 측정 없이 저장된 결과만 비교
+    ap.add_argument(
+        "--compare",
+        type=Path,
+        nargs="?",
+        const=BASELINE_PATH,
+        default=None,
+        help=f"Flag regressions against a baseline (default {BASELINE_PATH.name})",
+    )  # 기준 대비 회귀 표시 (회귀가 있으면 종료 코드 1)
+    ap.add_argument(
+        "--save_baseline", action="store_true", help=f"Also write results to {BASELINE_PATH.name}"
+    )
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown ratio")
+    ap.add_argument("--files", type=int, default=40, help="Synthetic MIDI fixtures per kind")
+    ap.add_argument("--prompts", type=int, default=2000, help="Random prompts for parse_prompt")
+    ap.add_argument("--loops", type=int, default=4, help="Prompts rendered to 30 s loops")
+    ap.add_argument("--repeat", type=int, default=3, help="Repetitions (best/median is kept)")
+    ap.add_argument("--workers", type=int, default=1, help="Tokenizer/vocab worker processes")
+    args = ap.parse_args(argv)
+
+    if args.results is not None:
+        results = json.loads(args.results.read_text(encoding="utf-8"))
+    else:
+        results = run_suite(args)
+        write_results(results, args.out)
+        if args.save_baseline:
+            write_results(results, BASELINE_PATH)
+        for name, m in results["metrics"].items():
+            print(f"  {name:34s} {m['value']:12.4g} {m['unit']}")
+        goal = results["goal"]
+        verdict = "met" if goal["met"] else "NOT met"
+        print(f"goal: 30 s loop in <= {goal['target_sec']:.0f} s (p95, stub model) {verdict}")
+        for name, why in results["skipped"].items():
+            print(f"  skipped {name}: {why}")
+        print(f"-> {args.out}")
+
+    if args.compare is not None:
+        if not args.compare.exists():
+            print(f"No baseline at {args.compare}; run with --save_baseline first")
+            return 2
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {100 * args.tolerance:.0f}%")
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.token_shards import ID_DTYPE
+from models.vocab import Vocab, get_vocab, key_token, parse_key
+
+SHIFTS = tuple(range(-6, 6))  # 12개 조 전부 (반음 단위)
+TEMPO_FACTORS = (0.9, 0.95, 1.0, 1.05, 1.1)
+
+
+class Augmenter:
+    """
+    어휘 id 배치([B, L])에 대한 조옮김 + 템포 증강. 모든 변환은 id -> id 조회 테이블 하나씩이라
+    배치 전체에 팬시 인덱싱 한 번으로 적용됩니다 (문자열/재토큰화 없음, 저장 공간 추가 없음).
+    - pitch_lut[s, id]: NOTE:p -> NOTE:p+SHIFTS[s], KEY:X -> KEY:X+SHIFTS[s] (그 외 id는 그대로)
+    - pitch_ok[s, id] : 그 변환 결과가 어휘에 있는지. 행마다 모든 토큰이 어휘 안에 남는
+      이동량만 고르므로 음역 끝에 걸린 곡은 가능한 범위 안에서만 옮겨집니다 (0은 항상 가능).
+    - tempo_lut[f, id]: BPM:b -> b * TEMPO_FACTORS[f]에 가장 가까운 BPM 토큰
+    """
+
+    def __init__(
+        self,
+        vocab: Optional[Vocab] = None,
+        shifts: Sequence[int] = SHIFTS,
+        tempo_factors: Sequence[float] = TEMPO_FACTORS,
+    ):
+        self.vocab = vocab = vocab or get_vocab()
+        self.shifts = np.asarray(shifts, dtype=np.int64)
+        self.tempo_factors = np.asarray(tempo_factors, dtype=np.float64)
+        ident = np.arange(vocab.size, dtype=ID_DTYPE)
+
+        self.pitch_lut = np.tile(ident, (len(self.shifts), 1))
+        self.pitch_ok = np.ones((len(self.shifts), vocab.size), dtype=bool)
+        notes = np.flatnonzero(vocab.in_family(ident, "NOTE"))
+        keys = [(i, parse_key(t[4:])) for i, t in enumerate(vocab.tokens) if _is_key(t)]
+        for s, shift in enumerate(self.shifts.tolist()):
+            target = vocab.family_ids("NOTE", vocab.values[notes] + shift)
+            self.pitch_ok[s, notes] = target != vocab.unk
+            self.pitch_lut[s, notes] = np.where(target != vocab.unk, target, notes)
+            for i, parsed in keys:
+                if parsed is None:  # 해석할 수 없는 조 이름은 조옮김 대상에서 제외
+                    self.pitch_ok[s, i] = shift == 0
+                    continue
+                j = vocab.token_to_id.get(key_token(parsed[0] + shift, parsed[1]))
+                self.pitch_ok[s, i] = j is not None
+                self.pitch_lut[s, i] = i if j is None else j
+
+        self.tempo_lut = np.tile(ident, (len(self.tempo_factors), 1))
+        bpms = np.flatnonzero(vocab.in_family(ident, "BPM"))
+        if len(bpms):
+            values = vocab.values[bpms].astype(np.float64)
+            for f, factor in enumerate(self.tempo_factors.tolist()):
+                nearest = np.abs(values[:, None] * factor - values[None, :]).argmin(axis=1)
+                self.tempo_lut[f, bpms] = bpms[nearest]
+
+    def sample_shifts(self, ids: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """행마다 가능한 이동량 중 하나를 균등하게 골라 SHIFTS 인덱스로 돌려줍니다 ([B])."""
+        ok = self.pitch_ok[:, ids].all(axis=2)  # [S, B]
+        score = np.where(ok, rng.random(ok.shape), -1.0)
+        return score.argmax(axis=0)
+
+    def __call__(
+        self, ids: np.ndarray, rng: np.random.Generator, tempo: bool = True
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ids: [B, L] 어휘 id (PAD 포함 가능) -> (증강된 id [B, L], 행별 반음 이동량 [B]).
+        입력 dtype을 유지합니다.
+        """
+        ids = np.asarray(ids)
+        s = self.sample_shifts(ids, rng)
+        out = self.pitch_lut[s[:, None], ids]
+        if tempo and len(self.tempo_factors) > 1:
+            f = rng.integers(0, len(self.tempo_factors), size=len(ids))
+            out = self.tempo_lut[f[:, None], out]
+        return out.astype(ids.dtype, copy=False), self.shifts[s]
+
+
+def _is_key(tok: Optional[str]) -> bool:
+    return tok is not None and tok.startswith("KEY:")
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from data.pack_dataset import PROC_DIRS  # noqa: E402
+from models.augment import Augmenter  # noqa: E402
+from models.vocab import get_vocab, parse_key  # noqa: E402
+
+
+def load_batch(files, batch: int, seq_len: int, rng: np.random.Generator) -> np.ndarray:
+    """멜로디 토큰 파일에서 seq_len 크롭 batch개 (머리의 KEY/BPM이 포함되도록 절반은 처음부터)"""
+    vocab = get_vocab()
+    songs = [vocab.encode(json.loads(p.read_text(encoding="utf-8"))["tokens"]) for p in files]
+    out = np.zeros((batch, seq_len), dtype=np.int64)
+    for row in range(batch):
+        ids = songs[int(rng.integers(len(songs)))]
+        start = 0 if row % 2 == 0 else int(rng.integers(0, max(1, len(ids) - seq_len)))
+        crop = ids[start : start + seq_len]
+        out[row, : len(crop)] = crop
+    return out
+
+
+def check(aug: Augmenter, ids: np.ndarray, out: np.ndarray, shifts: np.ndarray) -> None:
+    """음표는 정확히 shift만큼, 조성은 같은 만큼 회전, 그 외 토큰은 BPM 말고는 그대로"""
+    v = aug.vocab
+    note = v.in_family(ids, "NOTE")
+    assert (v.in_family(out, "NOTE") == note).all()
+    moved = v.values[out] - v.values[ids]
+    assert (moved[note] == np.broadcast_to(shifts[:, None], ids.shape)[note]).all()
+    assert not ((out == v.unk) & (ids != v.unk)).any(), "augmentation produced UNK"
+    key = v.in_family(ids, "KEY")
+    for b, pos in zip(*np.nonzero(key)):
+        (pc0, q0), (pc1, q1) = (parse_key(v.tokens[x][4:]) for x in (ids[b, pos], out[b, pos]))
+        assert q0 == q1 and (pc1 - pc0 - shifts[b]) % 12 == 0
+    other = ~note & ~key & ~v.in_family(ids, "BPM")
+    assert (out[other] == ids[other]).all()
+    bpm = v.in_family(ids, "BPM")
+    assert v.in_family(out[bpm], "BPM").all()
+
+
+def edge_case(aug: Augmenter) -> None:
+    """음역 끝의 음표가 있는 행은 어휘 밖으로 나가지 않는 방향으로만 옮겨짐"""
+    v = aug.vocab
+    top = int(v.values[v.in_family(np.arange(v.size), "NOTE")].max())
+    row = np.array([[v.bos, v.id("KEY:C_major"), v.id(f"NOTE:{top}"), v.id("DUR:4")]])
+    seen = {int(aug(row, np.random.default_rng(i), tempo=False)[1][0]) for i in range(200)}
+    assert max(seen) <= 0 and len(seen) > 1, seen
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch", type=int, default=24)
+    ap.add_argument("--seq_len", type=int, default=1024)
+    ap.add_argument("--iters", type=int, default=200)
+    args = ap.parse_args()
+
+    files = sorted(PROC_DIRS["melody"].glob("*.json"))
+    if not files:
+        raise SystemExit(f"No melody token files in {PROC_DIRS['melody']}")
+    t0 = time.perf_counter()
+    aug = Augmenter()
+    print(f"LUTs built in {1e3 * (time.perf_counter() - t0):.1f} ms ({aug.vocab.size} ids)")
+    rng = np.random.default_rng(0)
+    ids = load_batch(files, args.batch, args.seq_len, rng)
+
+    hist: Counter = Counter()
+    for _ in range(20):
+        out, shifts = aug(ids, rng)
+        check(aug, ids, out, shifts)
+        hist.update(shifts.tolist())
+    edge_case(aug)
+    print(f"notes/keys/BPM rewritten consistently; shifts used: {dict(sorted(hist.items()))}")
+
+    t0 = time.perf_counter()
+    for _ in range(args.iters):
+        aug(ids, rng)
+    ms = 1e3 * (time.perf_counter() - t0) / args.iters
+    print(f"batch {args.batch}x{args.seq_len}: {ms:.3f} ms per augmented batch")
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import hashlib
+import importlib
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from tqdm import tqdm
+
+from models.encoding import ENCODING_VERSION, compact_tokens, save_tokens
+from models.token_shards import write_json_dir_shard
+
+# 종류별 토크나이저 정의: (모듈, 토큰화 함수, 추가 인자)
+# 워커 프로세스에서 지연 임포트하므로 드럼만 처리할 때 멜로디 모듈이 없어도 됩니다.
+TOKENIZERS: Dict[str, Tuple[str, str, dict]] = {
+    "melody": ("models.tokenizer", "midi_to_melody_tokens", {"key_hint": "C_major"}),
+    "drums": ("models.tokenizer_drums", "midi_to_drum_tokens", {}),
+}
+
+MIDI_SUFFIXES = {".mid", ".midi"}
+
+
+def scan_midis(root: Path) -> List[Tuple[Path, os.stat_result]]:
+    """
+    root 아래의 .mid/.midi 파일(대소문자 무관)과 stat 결과를 경로순으로 돌려줍니다.
+    os.scandir의 디렉터리 항목 정보로 파일/폴더를 가르므로 MIDI가 아닌 경로는 stat하지 않습니다.
+    """
+    found = []
+    stack = [str(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in MIDI_SUFFIXES and entry.is_file():
+                    found.append((Path(entry.path), entry.stat()))
+    found.sort(key=lambda f: f[0])
+    return found
+
+
+def find_midis(root: Path) -> List[Path]:
+    """주어진 디렉터리 내에서 모든 .mid 또는 .midi 파일을 대소문자 구분 없이 검색합니다."""
+    return [p for p, _ in scan_midis(root)]
+
+
+def manifest_path(out_dir: Path) -> Path:
+    """출력 디렉터리에 대응하는 매니페스트 경로 (*.json 글롭에 걸리지 않도록 디렉터리 밖에 둠)"""
+    return out_dir.parent / f"{out_dir.name}_manifest.json"
+
+
+def load_manifest(path: Path) -> dict:
+    """매니페스트를 읽습니다. 없거나 손상되었으면 빈 매니페스트를 반환합니다."""
+    if path.exists():
+        try:
+            obj = json.loads(path.read_text(encoding="utf-8"))
+            if isinstance(obj.get("files"), dict):
+                return obj
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Ignoring broken manifest {path.name}: {e}")
+    return {"files": {}}
+
+
+def save_manifest(manifest: dict, path: Path) -> None:
+    """임시 파일에 쓴 뒤 교체하여 중단되어도 매니페스트가 깨지지 않게 합니다."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def file_sha1(path: Path, chunk: int = 1 << 20) -> str:
+    """파일 내용의 SHA-1 해시 (청크 단위로 읽음, hashlib.file_digest는 3.11 이상에만 있음)"""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while block := f.read(chunk):
+            h.update(block)
+    return h.hexdigest()
+
+
+def tokenizer_version(kind: str) -> str:
+    """토크나이저 모듈의 TOKENIZER_VERSION (없으면 "1") + 출력 토큰 인코딩 버전"""
+    module = importlib.import_module(TOKENIZERS[kind][0])
+    return f"{getattr(module, 'TOKENIZER_VERSION', '1')}.e{ENCODING_VERSION}"
+
+
+def output_names(files: List[Path], root: Path) -> Dict[Path, str]:
+    """
+    소스 파일별 출력 JSON 이름을 정합니다.
+    stem이 유일하면 기존과 같은 <stem>.json, 다른 폴더의 동명 파일끼리는
+    상대 경로 해시를 붙여 서로 덮어쓰지 않도록 합니다.
+    """
+    counts = Counter(p.stem for p in files)
+    names = {}
+    for p in files:
+        if counts[p.stem] == 1:
+            names[p] = p.stem + ".json"
+        else:
+            rel = p.relative_to(root).as_posix()
+            names[p] = f"{p.stem}-{hashlib.sha1(rel.encode('utf-8')).hexdigest()[:8]}.json"
+    return names
+
+
+def _is_current(prior: Optional[dict], st: os.stat_result, version: str, out: Path) -> bool:
+    """크기/수정 시각/버전/출력 이름이 그대로이면 다시 처리할 필요가 없습니다."""
+    if not prior:
+        return False
+    if (
+        prior.get("size") != st.st_size
+        or prior.get("mtime_ns") != st.st_mtime_ns
+        or prior.get("version") != version
+        or prior.get("out") != out.name
+    ):
+        return False
+    # 오류 기록은 파일이 바뀌기 전까지 재시도하지 않음 (--retry_errors로 강제)
+    return prior.get("status") == "error" or out.exists()
+
+
+def _tokenize_job(job: tuple) -> Tuple[str, dict, bool]:
+    """
+    워커 프로세스에서 파일 하나를 처리합니다.
+    반환: (소스 키, 매니페스트 항목, 실제로 토큰화했는지 여부)
+    """
+    kind, key, src, out, version, prior = job
+    module_name, fn_name, kwargs = TOKENIZERS[kind]
+    src, out = Path(src), Path(out)
+    st = src.stat()
+    entry = {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "version": version,
+        "out": out.name,
+    }
+    try:
+        entry["sha1"] = file_sha1(src)
+        # 수정 시각만 바뀌고 내용이 같으면 (touch, 재압축 해제 등) 결과를 재사용
+        if (
+            prior
+            and prior.get("status") == "ok"
+            and prior.get("sha1") == entry["sha1"]
+            and prior.get("version") == version
+            and prior.get("out") == out.name
+            and out.exists()
+        ):
+            entry.update(status="ok", n_tokens=prior.get("n_tokens"), error=None)
+            return key, entry, False
+
+        module = importlib.import_module(module_name)
+        tokens = getattr(module, fn_name)(src, **kwargs)
+        if getattr(module, "ENCODING_VERSION", 1) != ENCODING_VERSION:
+            tokens = compact_tokens(tokens)  # 예전 형식만 내는 토크나이저 (멜로디)
+        save_tokens(tokens, out, ENCODING_VERSION)
+        entry.update(status="ok", n_tokens=len(tokens), error=None)
+    except Exception as e:  # 파일별 오류는 매니페스트에 기록
+        entry.update(status="error", n_tokens=None, error=f"{type(e).__name__}: {e}")
+    return key, entry, True
+
+
+def tokenize_corpus(
+    kind: str,
+    src_root: Path,
+    out_dir: Path,
+    limit: Optional[int] = None,
+    overwrite: bool = False,
+    retry_errors: bool = False,
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    flush_every: int = 500,
+    shard: bool = False,
+    where: Optional[str] = None,
+) -> dict:
+    """
+    src_root 아래의 MIDI를 프로세스 풀로 일괄 토큰화하고 매니페스트를 갱신합니다.
+    매니페스트 항목: 소스 상대 경로 -> (size, mtime_ns, sha1, version, out, status, error, n_tokens)
+    shard=True이면 끝난 뒤 out_dir 옆에 <out_dir>.bin/.idx 토큰 샤드를 (증분으로) 다시 씁니다.
+    where가 주어지면 디렉터리를 훑지 않고 MIDI 카탈로그(models.catalog)에서 식을 만족하는
+    파일만 골라 처리합니다. 제외된 파일은 열지도 stat하지도 않습니다.
+    반환: 처리 통계 dict
+    """
+    if where is None:
+        scanned = scan_midis(src_root)
+        all_files = [p for p, _ in scanned]
+    else:
+        from models.catalog import select  # catalog이 이 모듈을 임포트하므로 지연 임포트
+
+        # 출력 이름은 필터와 무관하게 같아야 하므로 카탈로그의 전체 목록으로 정함
+        all_files = select(None, under=src_root)
+        scanned = []
+        for p in select(where, under=src_root):
+            try:
+                scanned.append((p, p.stat()))
+            except FileNotFoundError:  # 카탈로그가 오래됨: 지워진 파일은 건너뜀
+                print(f"[WARN] Missing {p}; rebuild the MIDI catalog")
+    if not scanned:
+        raise SystemExit(f"No MIDI files under {src_root}")
+    if limit is not None:
+        scanned = scanned[:limit]  # limit 설정 시 N개 파일만 처리
+    files = [p for p, _ in scanned]
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    mpath = manifest_path(out_dir)
+    manifest = load_manifest(mpath)
+    entries = manifest["files"]
+    version = tokenizer_version(kind)
+    # 이름은 limit/where와 무관하게 전체 목록으로 정함 (실행 범위에 따라 바뀌지 않도록)
+    names = output_names(all_files, src_root)
+    claimed = set(names.values())
+    stale = []  # 더는 어떤 소스의 출력도 아닐 수 있는 파일 이름
+
+    # 바뀐 파일만 작업 목록에 추가
+    jobs = []
+    keys = set()
+    for p, st in scanned:
+        key = p.relative_to(src_root).as_posix()
+        keys.add(key)
+        out = out_dir / names[p]
+        prior = entries.get(key)
+        if prior and prior.get("out") != out.name:  # 동명 파일이 생기거나 사라져 이름이 바뀜
+            stale.append(prior.get("out"))
+        if overwrite:
+            prior = None
+        elif retry_errors and prior and prior.get("status") == "error":
+            prior = None
+        elif _is_current(prior, st, version, out):
+            continue
+        jobs.append((kind, key, str(p), str(out), version, prior))
+
+    # 전체 실행일 때만 사라진 소스의 항목을 정리
+    if limit is None and where is None:
+        for key in [k for k in entries if k not in keys]:
+            stale.append(entries.pop(key).get("out"))
+    # build_vocab/pack_dataset은 *.json을 글롭하므로 남은 출력은 중복/유령 레코드가 됨
+    for name in stale:
+        if name and name not in claimed:
+            (out_dir / name).unlink(missing_ok=True)
+
+    stats = {"total": len(files), "saved": 0, "skipped": len(files) - len(jobs), "errors": 0}
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        # 작은 파일이 많으므로 워커당 여러 묶음으로 나눠 IPC 비용과 부하 불균형을 절충
+        chunksize = max(1, min(64, len(jobs) // (workers * 8)))
+
+    def _record(results):
+        for i, (key, entry, worked) in enumerate(
+            tqdm(results, total=len(jobs), desc=f"Tokenizing {kind} MIDIs"), 1
+        ):
+            entries[key] = entry
+            if entry["status"] == "error":
+                stats["errors"] += 1
+                print(f"[ERR] {key}: {entry['error']}")
+            elif worked:
+                stats["saved"] += 1
+            else:
+                stats["skipped"] += 1
+            if i % flush_every == 0:  # 중간 저장: 중단되어도 진행분은 보존
+                save_manifest(manifest, mpath)
+
+    if workers == 1 or len(jobs) <= 1:
+        _record(map(_tokenize_job, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            _record(ex.map(_tokenize_job, jobs, chunksize=chunksize))
+
+    manifest.update(kind=kind, src_root=str(src_root), version=version)
+    save_manifest(manifest, mpath)
+    if shard:
+        stats["shard"] = write_json_dir_shard(out_dir, out_dir)
+    return stats
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from models.batch_tokenize import load_manifest, scan_midis
+from models.midi_events import parse_midi_meter
+from models.tempo import resolve_tempo
+
+ROOT = Path(__file__).resolve().parents[1]
+RAW_ROOT = ROOT / "data" / "midi_raw"
+CATALOG_PATH = ROOT / "data" / "midi_catalog.sqlite"
+MANIFEST_DIR = ROOT / "data" / "midi_proc"  # <kind>_manifest.json 에서 토큰 수를 가져옴
+
+# 행을 계산하는 방식이 바뀌면 올림 -> 다음 build에서 모든 파일을 다시 분석
+CATALOG_VERSION = "1"
+
+# 파일 하나 = 한 행. path는 카탈로그 루트 기준 상대 경로 (posix)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    duration REAL,
+    n_notes INTEGER,
+    n_drum_notes INTEGER,
+    has_drums INTEGER,
+    bpm REAL,
+    tempo_source TEXT,
+    tempo_changes INTEGER,
+    tempo_spread REAL,
+    ts_num INTEGER,
+    ts_den INTEGER,
+    ts_changes INTEGER,
+    n_bars INTEGER,
+    n_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_kind ON files (kind);
+"""
+
+FIELDS = (
+    "duration",
+    "n_notes",
+    "n_drum_notes",
+    "has_drums",
+    "bpm",
+    "tempo_source",
+    "tempo_changes",
+    "tempo_spread",
+    "ts_num",
+    "ts_den",
+    "ts_changes",
+    "n_bars",
+)
+
+# --where 에 이름으로 쓸 수 있는 필터 (docs/dataset_card.md 의 포함/제외 기준)
+PRESETS = {
+    "card": (
+        "ts_num = 4 AND ts_den = 4 AND ts_changes = 0 AND n_bars >= 4 AND tempo_spread <= 1.5"
+    ),
+}
+
+
+def _beats_at(t: float, tempo: np.ndarray, bpm: float) -> float:
+    """0..t초의 박 수. 템포 맵이 있으면 구간마다 (머문 시간 x BPM), 없으면 resolve된 BPM."""
+    if not len(tempo):
+        return t * bpm / 60.0
+    edges = np.minimum(np.append(tempo["time"], t), t)
+    return float(np.sum(np.diff(edges) * tempo["bpm"]) / 60.0)
+
+
+def describe(path: Path) -> dict:
+    """
+    MIDI 파일 하나의 카탈로그 필드를 계산합니다 (midi_events로 한 번만 파싱).
+    박자표가 없으면 SMF 기본값인 4/4. n_bars는 0초부터 마지막 온셋이 든 마디까지의 마디 수,
+    tempo_spread는 템포 맵의 최대/최소 BPM 비 (템포 이벤트가 없거나 하나면 1.0)입니다.
+    """
+    notes, tempo, meter = parse_midi_meter(path.read_bytes())
+    bpm, source = resolve_tempo(notes, tempo)
+    num, den = (int(meter["num"][0]), int(meter["den"][0])) if len(meter) else (4, 4)
+    n_bars = 0
+    if len(notes) and num:
+        n_bars = int(_beats_at(float(notes["start"][-1]), tempo, bpm) // (num * 4.0 / den)) + 1
+    n_drum = int(notes["is_drum"].sum())
+    return {
+        "duration": float(notes["end"].max()) if len(notes) else 0.0,
+        "n_notes": len(notes),
+        "n_drum_notes": n_drum,
+        "has_drums": int(n_drum > 0),
+        "bpm": bpm,
+        "tempo_source": source,
+        "tempo_changes": max(0, len(tempo) - 1),
+        "tempo_spread": float(tempo["bpm"].max() / tempo["bpm"].min()) if len(tempo) else 1.0,
+        "ts_num": num,
+        "ts_den": den,
+        "ts_changes": max(0, len(meter) - 1),
+        "n_bars": n_bars,
+    }
+
+
+def _describe_job(job: Tuple[str, str, int, int]) -> dict:
+    """워커 프로세스에서 파일 하나를 분석합니다. 실패는 status="error" 행으로 남김."""
+    src, rel, size, mtime_ns = job
+    row = {"path": rel, "kind": rel.split("/", 1)[0], "size": size, "mtime_ns": mtime_ns}
+    row.update(version=CATALOG_VERSION, status="ok", error=None)
+    row.update(dict.fromkeys(FIELDS))
+    try:
+        row.update(describe(Path(src)))
+    except Exception as e:  # 손상된 파일도 한 번만 분석하도록 기록
+        row.update(status="error", error=f"{type(e).__name__}: {e}")
+    return row
+
+
+def connect(db: Optional[Path] = None) -> sqlite3.Connection:
+    """카탈로그를 쓰기용으로 엽니다 (없으면 스키마 생성). db 기본값은 CATALOG_PATH."""
+    db = db or CATALOG_PATH
+    db.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _open_readonly(db: Optional[Path]) -> sqlite3.Connection:
+    """필터 조회용 읽기 전용 연결 (사용자 식이 테이블을 바꿀 수 없음)"""
+    db = db or CATALOG_PATH
+    if not db.exists():
+        raise FileNotFoundError(f"No MIDI catalog at {db}; run data/build_catalog.py first")
+    return sqlite3.connect(f"file:{db.as_posix()}?mode=ro", uri=True)
+
+
+def catalog_root(conn: sqlite3.Connection) -> Path:
+    """카탈로그를 만든 MIDI 루트 디렉터리"""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()
+    if row is None:
+        raise ValueError("MIDI catalog is empty; run data/build_catalog.py first")
+    return Path(row[0])
+
+
+def build(
+    root: Path = RAW_ROOT,
+    db: Optional[Path] = None,
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    flush_every: int = 1000,
+    rebuild: bool = False,
+) -> dict:
+    """
+    root 아래 MIDI를 카탈로그에 반영합니다.
+    크기/수정 시각/CATALOG_VERSION이 그대로인 행은 건드리지 않고, 새로 생기거나 바뀐 파일만
+    프로세스 풀로 분석하며, 사라진 파일의 행은 지웁니다. 끝으로 토큰화 매니페스트의 토큰 수를 반영.
+    반환: 처리 통계 dict
+    """
+    root = root.resolve()
+    conn = connect(db)
+    prev = conn.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()
+    if rebuild or (prev is not None and prev[0] != str(root)):
+        conn.execute("DELETE FROM files")  # 다른 루트의 상대 경로는 의미가 없음
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('root', ?)", (str(root),))
+
+    known = {
+        path: (size, mtime_ns, version)
+        for path, size, mtime_ns, version in conn.execute(
+            "SELECT path, size, mtime_ns, version FROM files"
+        )
+    }
+    jobs = []
+    seen = set()
+    for p, st in scan_midis(root):
+        rel = p.relative_to(root).as_posix()
+        seen.add(rel)
+        if known.get(rel) != (st.st_size, st.st_mtime_ns, CATALOG_VERSION):
+            jobs.append((str(p), rel, st.st_size, st.st_mtime_ns))
+    gone = [(rel,) for rel in known if rel not in seen]
+    conn.executemany("DELETE FROM files WHERE path = ?", gone)
+
+    stats = {"total": len(seen), "analyzed": len(jobs), "removed": len(gone), "errors": 0}
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, min(64, len(jobs) // (workers * 8)))
+    columns = ("path", "kind", "size", "mtime_ns", "version", "status", "error") + FIELDS
+    insert = (
+        f"INSERT OR REPLACE INTO files ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
+
+    def _record(rows: Iterable[dict]) -> None:
+        batch = []
+        for row in tqdm(rows, total=len(jobs), desc="Cataloging MIDIs"):
+            if row["status"] == "error":
+                stats["errors"] += 1
+            batch.append(tuple(row[c] for c in columns))
+            if len(batch) >= flush_every:  # 중간 커밋: 중단되어도 진행분은 보존
+                conn.executemany(insert, batch)
+                conn.commit()
+                batch.clear()
+        conn.executemany(insert, batch)
+
+    if workers == 1 or len(jobs) <= 1:
+        _record(map(_describe_job, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            _record(ex.map(_describe_job, jobs, chunksize=chunksize))
+
+    stats["tokens"] = sync_tokens(conn, root)
+    conn.commit()
+    conn.close()
+    return stats
+
+
+def sync_tokens(
+    conn: sqlite3.Connection, root: Path, manifests: Optional[List[Path]] = None
+) -> int:
+    """
+    토큰화 매니페스트(batch_tokenize)의 n_tokens를 카탈로그 행에 옮겨 적습니다.
+    매니페스트 키는 그 src_root 기준이므로 카탈로그 루트 기준 경로로 바꿔 맞춥니다.
+    반환: 갱신한 행 수
+    """
+    if manifests is None:
+        manifests = sorted(MANIFEST_DIR.glob("*_manifest.json"))
+    updates = []
+    for mpath in manifests:
+        manifest = load_manifest(mpath)
+        if "src_root" not in manifest:
+            continue
+        try:
+            prefix = Path(manifest["src_root"]).resolve().relative_to(root).as_posix()
+        except ValueError:  # 카탈로그 밖의 소스
+            continue
+        for key, entry in manifest["files"].items():
+            n = entry.get("n_tokens") if entry.get("status") == "ok" else None
+            rel = key if prefix == "." else f"{prefix}/{key}"
+            updates.append((n, rel, entry.get("size"), entry.get("mtime_ns")))
+    # 소스가 토큰화 뒤에 바뀌었으면 (크기/시각이 다르면) 옛 길이를 붙이지 않음
+    cur = conn.executemany(
+        "UPDATE files SET n_tokens = ? WHERE path = ? AND size = ? AND mtime_ns = ?", updates
+    )
+    return cur.rowcount
+
+
+def filter_sql(where: str) -> str:
+    """PRESETS 이름이면 그 식으로, 아니면 SQL WHERE 식 그대로"""
+    return PRESETS.get(where.strip(), where)
+
+
+def select(
+    where: Optional[str] = None, under: Optional[Path] = None, db: Optional[Path] = None
+) -> List[Path]:
+    """
+    카탈로그에서 분석에 성공했고 where 식(SQL, 예: "ts_num = 4 AND n_bars >= 8" 또는
+    PRESETS 이름)을 만족하는 파일의 절대 경로를 경로순으로 돌려줍니다.
+    under가 주어지면 그 디렉터리 아래만 (경로도 under 기준으로 붙임). 파일은 열지 않습니다.
+    """
+    conn = _open_readonly(db)
+    try:
+        root = catalog_root(conn)
+        sql = "SELECT path FROM files WHERE status = 'ok'"
+        params: list = []
+        base, cut = root, 0
+        if under is not None:
+            prefix = Path(under).resolve().relative_to(root).as_posix()
+            base = Path(under)  # 호출한 쪽이 준 경로 그대로 (relative_to가 맞도록)
+            if prefix != ".":
+                sql += " AND substr(path, 1, ?) = ?"
+                params += [len(prefix) + 1, prefix + "/"]
+                cut = len(prefix) + 1
+        if where:
+            sql += f" AND ({filter_sql(where)})"
+        try:
+            rows = conn.execute(sql + " ORDER BY path", params).fetchall()
+        except sqlite3.Error as e:
+            raise ValueError(f"Bad catalog filter {where!r}: {e}") from None
+    finally:
+        conn.close()
+    return [base / path[cut:] for (path,) in rows]
+
+
+def summary(db: Optional[Path] = None) -> Dict[str, dict]:
+    """종류별 파일 수, 오류 수, 총 길이(초), 드럼 포함 수, 토큰 수 합계"""
+    conn = _open_readonly(db)
+    try:
+        rows = conn.execute(
+            "SELECT kind, COUNT(*), SUM(status = 'error'), SUM(duration), SUM(has_drums), "
+            "SUM(n_tokens) FROM files GROUP BY kind ORDER BY kind"
+        ).fetchall()
+    finally:
+        conn.close()
+    keys = ("files", "errors", "seconds", "with_drums", "tokens")
+    return {kind: dict(zip(keys, vals)) for kind, *vals in rows}
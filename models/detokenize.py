@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pretty_midi
+
+from models.encoding import mask_classes
+
+STEPS_PER_BEAT = 4  # 16분음표 그리드 (TS:1 = 한 스텝)
+STEPS_PER_BAR = 16  # 4/4 한 마디
+DEFAULT_BPM = 90.0
+MELODY_VELOCITY = 80
+DRUM_VELOCITY = 100
+
+# 드럼 클래스 -> 대표 GM 드럼 키 (tokenizer_drums._PITCH2CLS 로 다시 같은 클래스가 됨)
+DRUM_CLASS_PITCH: Dict[str, int] = {
+    "KICK": 36,
+    "SNARE": 38,
+    "HHC": 42,
+    "HHO": 46,
+    "TOM": 45,
+    "RIDE": 51,
+    "CRASH": 49,
+    "CLAP": 39,
+    "PERC": 56,  # 카우벨 (매핑에 없는 키 -> PERC)
+}
+
+
+def header_bpm(tokens: Sequence[str], default: float = DEFAULT_BPM) -> float:
+    """토큰 스트림 머리의 BPM:<n> 값 (없으면 default)"""
+    for tok in tokens:
+        if tok.startswith("BPM:"):
+            try:
+                return float(tok[4:])
+            except ValueError:
+                break
+        if tok.startswith(("TS:", "NOTE:", "DRUM:", "DRUMS:")):  # 머리 영역을 벗어남
+            break
+    return default
+
+
+class BarDetokenizer:
+    """
+    토큰을 하나씩 받아 마디가 확정될 때마다 그 마디의 노트를 내보내는 점진적 디토크나이저.
+    TS:n 은 시간을 n 스텝 진행시키고, 이벤트는 직전 TS가 가리키는 스텝(스텝 = TS 수 - 1)에 놓입니다.
+    DRUM:<CLASS>(인코딩 1)와 DRUMS:<mask>(인코딩 2) 모두 받습니다.
+    마디 b는 다음 마디 첫 스텝의 TS가 들어오면 확정됩니다 (드럼 형식에서는 BAR 바로 다음 스텝).
+    BAR 자체는 표시일 뿐 시간을 바꾸지 않으며, 모르는 토큰은 건너뜁니다.
+    """
+
+    def __init__(self, bpm: float, is_drum: bool = False, steps_per_bar: int = STEPS_PER_BAR):
+        self.is_drum = is_drum
+        self.steps_per_bar = steps_per_bar
+        self.step_sec = 60.0 / bpm / STEPS_PER_BEAT
+        self.ts = 0  # 지금까지의 TS 스텝 수
+        self.done = 0  # 확정되어 내보낸 마디 수
+        self._pending: Optional[int] = None  # DUR을 기다리는 NOTE 피치
+        self._bars: Dict[int, List[pretty_midi.Note]] = {}
+
+    def _emit(self, upto: int) -> List[Tuple[int, List[pretty_midi.Note]]]:
+        out = [(b, self._bars.pop(b, [])) for b in range(self.done, upto)]
+        self.done = max(self.done, upto)
+        return out
+
+    def feed(self, tok: str) -> List[Tuple[int, List[pretty_midi.Note]]]:
+        """토큰 하나를 처리하고 새로 확정된 (마디 번호, 노트 목록)들을 돌려줍니다."""
+        kind, _, value = tok.partition(":")
+        if kind == "TS":
+            self.ts += int(value) if value.isdigit() else 1
+            # 스텝 ts-1 이 열렸으므로 그 이전 마디들은 더 이상 바뀌지 않음
+            return self._emit((self.ts - 1) // self.steps_per_bar)
+        step = max(self.ts - 1, 0)
+        start = step * self.step_sec
+        notes: List[pretty_midi.Note] = []
+        if kind == "NOTE" and value.isdigit():
+            self._pending = int(value)
+        elif kind == "DUR" and self._pending is not None and value.isdigit():
+            end = start + max(1, int(value)) * self.step_sec
+            notes.append(pretty_midi.Note(MELODY_VELOCITY, self._pending, start, end))
+            self._pending = None
+        elif kind == "DRUM" and value in DRUM_CLASS_PITCH:
+            pitch = DRUM_CLASS_PITCH[value]
+            notes.append(pretty_midi.Note(DRUM_VELOCITY, pitch, start, start + self.step_sec))
+        elif kind == "DRUMS" and value.isdigit():  # 인코딩 2: 한 스텝의 클래스 조합
+            for cls in mask_classes(int(value)):
+                pitch = DRUM_CLASS_PITCH[cls]
+                notes.append(pretty_midi.Note(DRUM_VELOCITY, pitch, start, start + self.step_sec))
+        if notes:
+            self._bars.setdefault(step // self.steps_per_bar, []).extend(notes)
+        return []
+
+    def flush(self, bars: Optional[int] = None) -> List[Tuple[int, List[pretty_midi.Note]]]:
+        """스트림 끝: 남은 마디를 모두 확정합니다 (bars를 주면 그 마디 수까지 빈 마디도 채움)."""
+        last = max(self._bars, default=-1) + 1
+        if self.ts:
+            last = max(last, (self.ts - 1) // self.steps_per_bar + 1)
+        return self._emit(max(last, bars or 0))
+
+
+def tokens_to_instrument(
+    tokens: Sequence[str], bpm: float, program: int = 0, is_drum: Optional[bool] = None
+) -> pretty_midi.Instrument:
+    """멜로디(NOTE:p DUR:d) 또는 드럼(DRUM/DRUMS) 토큰 전체를 pretty_midi 악기로 되돌립니다."""
+    if is_drum is None:
+        is_drum = any(t.startswith(("DRUM:", "DRUMS:")) for t in tokens)
+    inst = pretty_midi.Instrument(program=program, is_drum=is_drum)
+    detok = BarDetokenizer(bpm, is_drum)
+    for tok in tokens:
+        for _, notes in detok.feed(tok):
+            inst.notes.extend(notes)
+    for _, notes in detok.flush():
+        inst.notes.extend(notes)
+    return inst
+
+
+def tokens_to_midi(
+    melody: Optional[Sequence[str]] = None,
+    drums: Optional[Sequence[str]] = None,
+    bpm: Optional[float] = None,
+    program: int = 0,
+) -> pretty_midi.PrettyMIDI:
+    """멜로디/드럼 토큰 스트림을 하나의 PrettyMIDI로 합칩니다 (BPM은 멜로디 -> 드럼 머리 순)."""
+    streams: List[Sequence[str]] = [s for s in (melody, drums) if s]
+    if bpm is None:
+        bpm = next((header_bpm(s, 0.0) for s in streams if header_bpm(s, 0.0)), DEFAULT_BPM)
+    pm = pretty_midi.PrettyMIDI(initial_tempo=bpm)
+    if melody:
+        pm.instruments.append(tokens_to_instrument(melody, bpm, program=program, is_drum=False))
+    if drums:
+        pm.instruments.append(tokens_to_instrument(drums, bpm, is_drum=True))
+    return pm
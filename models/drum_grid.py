@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.tokenizer_drums import (
+    _CLASSES,
+    _CLS_INDEX,
+    _PITCH_LUT,
+    STEPS_PER_BAR,
+    _load_midi,
+)
+
+# 드럼 그리드 묶음 형식 (<prefix> = data/ds/drums_grid_{split}):
+#   <prefix>.bits.npy  : 모든 곡의 스텝을 이어 붙인 uint16 비트마스크 (비트 c = _CLASSES[c] 히트)
+#   <prefix>.vel.npy   : (선택) 같은 스텝의 클래스별 최대 벨로시티 uint8 [스텝, 9]
+#   <prefix>.songs.npy : 곡별 시작 오프셋 / 스텝 수 / BPM
+#   <prefix>.win.npy   : 크롭 윈도 (시작 오프셋, 곡 번호) - 곡 경계를 넘지 않음
+#   <prefix>.meta.json : 곡 이름, 클래스 순서, 윈도 길이 등
+GRID_VERSION = "2"
+N_CLASSES = len(_CLASSES)
+BARS = 4  # docs/TRAINING_CFG.md drum_vae.bars
+WINDOW_STEPS = BARS * STEPS_PER_BAR
+SONG_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u4"), ("bpm", "<f4")])
+WINDOW_DTYPE = np.dtype([("offset", "<u8"), ("song", "<u4")])
+_BIT_WEIGHTS = (1 << np.arange(N_CLASSES)).astype(np.uint16)
+_SUFFIXES = ("bits", "vel", "songs", "win")
+
+
+def grid_paths(prefix: Path) -> Dict[str, Path]:
+    """묶음 접두 경로 -> 구성 파일 경로들"""
+    paths = {k: Path(f"{prefix}.{k}.npy") for k in _SUFFIXES}
+    paths["meta"] = Path(f"{prefix}.meta.json")
+    return paths
+
+
+def pack_bits(grid: np.ndarray) -> np.ndarray:
+    """(스텝 x 9) 불리언 그리드 -> 스텝별 uint16 비트마스크"""
+    return (grid.astype(np.uint16) * _BIT_WEIGHTS).sum(axis=-1, dtype=np.uint16)
+
+
+def unpack_bits(bits: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """uint16 비트마스크 [...] -> float32 [..., 9] (0/1)"""
+    hits = (bits[..., None] & _BIT_WEIGHTS) != 0
+    if out is None:
+        return hits.astype(np.float32)
+    np.copyto(out, hits)
+    return out
+
+
+def tokens_to_grid(tokens: Sequence[str]) -> Tuple[np.ndarray, float]:
+    """
+    드럼 토큰열(BOS, BPM, TS:n/BAR/DRUM:*/DRUMS:<mask>, EOS) -> (스텝 x 9) 불리언 그리드와 BPM.
+    DRUM/DRUMS 토큰은 바로 앞 TS까지 누적된 스텝 - 1 위치의 히트입니다
+    (tokenizer_drums와 같은 규칙).
+    """
+    bpm = 90.0
+    adv = np.zeros(len(tokens), dtype=np.int64)
+    cls = np.full(len(tokens), -1, dtype=np.int64)
+    masks = np.zeros(len(tokens), dtype=np.int64)
+    for i, tok in enumerate(tokens):
+        kind, _, value = tok.partition(":")
+        if kind == "TS":
+            adv[i] = int(value)
+        elif kind == "DRUM":
+            cls[i] = _CLS_INDEX.get(value, _CLS_INDEX["PERC"])
+        elif kind == "DRUMS" and value.isdigit():
+            masks[i] = int(value)
+        elif kind == "BPM":
+            bpm = float(value)
+    step = np.cumsum(adv) - 1
+    grid = np.zeros((int(step[-1]) + 1 if len(step) else 0, N_CLASSES), dtype=bool)
+    hit = (cls >= 0) & (step >= 0)
+    grid[step[hit], cls[hit]] = True
+    hit = (masks > 0) & (step >= 0)
+    np.logical_or.at(grid, step[hit], (masks[hit, None] & _BIT_WEIGHTS) != 0)  # 같은 스텝 중복 가능
+    return grid, bpm
+
+
+def midi_to_grid(midi_path: Path) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    MIDI -> (그리드, 벨로시티 uint8 [스텝, 9], BPM). 양자화는 midi_to_drum_tokens와 같아서
+    그리드는 토큰 경로와 일치하고, 벨로시티는 한 칸에 여러 노트가 모이면 최댓값입니다.
+    """
+    notes, bpm = _load_midi(midi_path)
+    drums = notes[notes["is_drum"]]
+    if not len(drums):
+        return np.zeros((0, N_CLASSES), dtype=bool), np.zeros((0, N_CLASSES), np.uint8), bpm
+    starts = drums["start"]
+    pitches = drums["pitch"].astype(np.int64)
+    vels = drums["velocity"]
+    steps = np.round(starts / ((60.0 / bpm) / 4.0)).astype(np.int64)
+    steps -= steps.min()
+    vel = np.zeros((int(steps.max()) + 1, N_CLASSES), dtype=np.uint8)
+    np.maximum.at(vel, (steps, _PITCH_LUT[pitches]), vels)
+    return vel > 0, vel, bpm
+
+
+def window_offsets(bits: np.ndarray, window: int, stride: int, skip_empty: bool) -> np.ndarray:
+    """한 곡 안에서 stride 간격(마디 경계)의 윈도 시작 위치. skip_empty면 히트 없는 윈도 제외."""
+    n = len(bits)
+    if n < window:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.arange(0, n - window + 1, stride, dtype=np.int64)
+    if skip_empty:
+        nz = np.concatenate(([0], np.cumsum(bits != 0)))
+        starts = starts[nz[starts + window] > nz[starts]]
+    return starts
+
+
+class GridWriter:
+    """곡 단위로 그리드를 모아 close() 때 묶음 파일들을 씁니다 (각 파일은 임시 파일 후 교체)."""
+
+    def __init__(
+        self,
+        prefix: Path,
+        velocity: bool = False,
+        window: int = WINDOW_STEPS,
+        stride: int = STEPS_PER_BAR,
+        skip_empty: bool = True,
+    ):
+        self.prefix = Path(prefix)
+        self.velocity = velocity
+        self.window = window
+        self.stride = stride
+        self.skip_empty = skip_empty
+        self.names: List[str] = []
+        self._bits: List[np.ndarray] = []
+        self._vel: List[np.ndarray] = []
+        self._bpm: List[float] = []
+
+    def add(
+        self, name: str, grid: np.ndarray, bpm: float, vel: Optional[np.ndarray] = None
+    ) -> None:
+        if self.velocity:
+            if vel is None:
+                raise ValueError(f"{name}: velocity planes requested but none given")
+            self._vel.append(vel.astype(np.uint8, copy=False))
+        self.names.append(name)
+        self._bits.append(pack_bits(grid))
+        self._bpm.append(bpm)
+
+    def close(self) -> Dict[str, int]:
+        lengths = np.array([len(b) for b in self._bits], dtype=np.int64)
+        songs = np.zeros(len(lengths), dtype=SONG_DTYPE)
+        songs["offset"] = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lengths) else 0
+        songs["length"] = lengths
+        songs["bpm"] = self._bpm
+        starts = [window_offsets(b, self.window, self.stride, self.skip_empty) for b in self._bits]
+        windows = np.zeros(sum(len(s) for s in starts), dtype=WINDOW_DTYPE)
+        if len(windows):
+            windows["offset"] = np.concatenate(
+                [songs["offset"][i] + s for i, s in enumerate(starts)]
+            )
+            windows["song"] = np.concatenate([np.full(len(s), i) for i, s in enumerate(starts)])
+
+        arrays = {
+            "bits": np.concatenate(self._bits) if self._bits else np.zeros(0, np.uint16),
+            "songs": songs,
+            "win": windows,
+        }
+        if self.velocity:
+            arrays["vel"] = (
+                np.concatenate(self._vel) if self._vel else np.zeros((0, N_CLASSES), np.uint8)
+            )
+        meta = {
+            "version": GRID_VERSION,
+            "classes": list(_CLASSES),
+            "steps_per_bar": STEPS_PER_BAR,
+            "window": self.window,
+            "stride": self.stride,
+            "velocity": self.velocity,
+            "names": self.names,
+        }
+        paths = grid_paths(self.prefix)
+        paths["meta"].parent.mkdir(parents=True, exist_ok=True)
+        for key, arr in arrays.items():
+            tmp = paths[key].with_name(paths[key].name + ".tmp.npy")
+            np.save(tmp, arr)
+            os.replace(tmp, paths[key])
+        if not self.velocity:
+            paths["vel"].unlink(missing_ok=True)  # 이전 빌드의 벨로시티 면이 남지 않게
+        tmp = paths["meta"].with_name(paths["meta"].name + ".tmp")
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, paths["meta"])  # 메타가 마지막: 메타가 있으면 나머지도 완성된 것
+        return {"songs": len(songs), "steps": int(lengths.sum()), "windows": len(windows)}
+
+
+class DrumGrids:
+    """
+    묶음 파일을 메모리 매핑으로 엽니다.
+    fetch(idx)는 윈도 번호 배열을 한 번의 팬시 인덱싱으로 [n, window] 비트마스크로 모으고,
+    batch(rng, n)는 무작위 윈도 n개를 float32 [n, window, 9]로 풀어 돌려줍니다.
+    """
+
+    def __init__(self, prefix: Path):
+        paths = grid_paths(prefix)
+        self.meta = json.loads(paths["meta"].read_text(encoding="utf-8"))
+        if self.meta.get("version") != GRID_VERSION:
+            raise ValueError(f"{paths['meta']}: grid version {self.meta.get('version')}")
+        self.bits = np.load(paths["bits"], mmap_mode="r")
+        self.songs = np.load(paths["songs"])
+        self.windows = np.load(paths["win"])
+        self.vel = np.load(paths["vel"], mmap_mode="r") if self.meta["velocity"] else None
+        self.window = int(self.meta["window"])
+        self._steps = np.arange(self.window, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+    @property
+    def names(self) -> List[str]:
+        return self.meta["names"]
+
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """무작위 윈도 번호 n개"""
+        return rng.integers(0, len(self.windows), size=n)
+
+    def fetch(self, idx: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """윈도 번호들 -> (비트마스크 uint16 [n, W], 벨로시티 uint8 [n, W, 9] 또는 None)"""
+        rows = self.windows["offset"][idx].astype(np.int64)[:, None] + self._steps
+        return self.bits[rows], (self.vel[rows] if self.vel is not None else None)
+
+    def batch(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """
+        무작위 크롭 배치 float32 [n, W, 9]: 벨로시티 면이 있으면 velocity/127, 없으면 0/1 히트.
+        """
+        bits, vel = self.fetch(self.sample(rng, n))
+        if vel is not None:
+            return vel.astype(np.float32) / 127.0
+        return unpack_bits(bits)
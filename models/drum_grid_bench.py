@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pretty_midi
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.drum_grid import (  # noqa: E402
+    WINDOW_STEPS,
+    DrumGrids,
+    GridWriter,
+    grid_paths,
+    midi_to_grid,
+    tokens_to_grid,
+    unpack_bits,
+)
+from models.tokenizer_drums import _grid_to_tokens, midi_to_drum_tokens  # noqa: E402
+from web.backend.pipeline import controls_for, stub_generate  # noqa: E402
+
+PROMPTS = ["lofi chill 80bpm", "fast house 124bpm", "rock 110bpm", "hiphop 90bpm", "jazz 140bpm"]
+
+
+def synthetic_corpus(n: int, seed: int = 0):
+    """스텁 생성기 드럼 토큰 n곡 (4~32마디)"""
+    rng = np.random.default_rng(seed)
+    return [
+        stub_generate(controls_for(PROMPTS[i % len(PROMPTS)]), i, int(rng.integers(4, 33)))["drums"]
+        for i in range(n)
+    ]
+
+
+def reparse_batch(corpus, rng: np.random.Generator, n: int) -> np.ndarray:
+    """기준: 배치마다 토큰열을 다시 파싱해 그리드를 만들고 4마디를 자름"""
+    out = np.zeros((n, WINDOW_STEPS, 9), dtype=np.float32)
+    for row, i in enumerate(rng.integers(0, len(corpus), size=n)):
+        grid, _ = tokens_to_grid(corpus[i])
+        start = 16 * int(rng.integers(0, max(1, (len(grid) - WINDOW_STEPS) // 16 + 1)))
+        crop = grid[start : start + WINDOW_STEPS]
+        out[row, : len(crop)] = crop
+    return out
+
+
+def check_midi(tmp: Path) -> None:
+    """MIDI 경로의 그리드가 토큰 경로와 같고 벨로시티가 살아 있는지"""
+    pm = pretty_midi.PrettyMIDI(initial_tempo=120)
+    inst = pretty_midi.Instrument(0, is_drum=True)
+    rng = np.random.default_rng(1)
+    for k in range(128):
+        t = k * 0.125 + float(rng.normal(0, 0.01))
+        pitch = int(rng.choice([36, 38, 42, 46, 49, 39, 60]))
+        inst.notes.append(pretty_midi.Note(int(rng.integers(30, 128)), pitch, max(t, 0), t + 0.1))
+    pm.instruments.append(inst)
+    path = tmp / "check.mid"
+    pm.write(str(path))
+    grid, vel, _ = midi_to_grid(path)
+    ref, _ = tokens_to_grid(midi_to_drum_tokens(path))
+    assert np.array_equal(grid, ref[: len(grid)]) and not ref[len(grid) :].any()
+    assert vel.max() > 0 and ((vel > 0) == grid).all()
+
+
+def main(n_songs: int, batch: int, iters: int) -> None:
+    corpus = synthetic_corpus(n_songs)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        t0 = time.perf_counter()
+        writer = GridWriter(tmp / "drums_grid_train")
+        for i, tokens in enumerate(corpus):
+            grid, bpm = tokens_to_grid(tokens)
+            assert _grid_to_tokens(grid) == tokens[2:-1], f"round trip failed for song {i}"
+            writer.add(f"song{i}", grid, bpm)
+        stats = writer.close()
+        build = time.perf_counter() - t0
+        size = sum(
+            p.stat().st_size for p in grid_paths(tmp / "drums_grid_train").values() if p.exists()
+        )
+        token_bytes = sum(len(" ".join(t)) for t in corpus)
+        print(
+            f"{stats['songs']} songs, {stats['steps']} steps, {stats['windows']} 4-bar windows; "
+            f"packed {size / 1e3:.0f} kB vs {token_bytes / 1e3:.0f} kB of token text "
+            f"(build {build:.2f}s, token round trip exact)"
+        )
+
+        grids = DrumGrids(tmp / "drums_grid_train")
+        bits, _ = grids.fetch(np.arange(len(grids)))
+        song = grids.windows["song"]
+        assert all(  # 윈도는 곡 경계를 넘지 않음
+            o + WINDOW_STEPS <= grids.songs["offset"][s] + grids.songs["length"][s]
+            for o, s in zip(grids.windows["offset"], song)
+        )
+        for k in np.random.default_rng(1).integers(0, len(grids), size=20):
+            s = int(song[k])
+            start = int(grids.windows["offset"][k] - grids.songs["offset"][s])
+            ref = tokens_to_grid(corpus[s])[0][start : start + WINDOW_STEPS]
+            assert np.array_equal(unpack_bits(bits[k]), ref)
+        check_midi(tmp)
+        print("windows stay inside songs, unpacked crops match the token grids, MIDI velocity ok")
+
+        rng = np.random.default_rng(0)
+        t0 = time.perf_counter()
+        for _ in range(iters):
+            reparse_batch(corpus, rng, batch)
+        t_old = (time.perf_counter() - t0) / iters
+        t0 = time.perf_counter()
+        for _ in range(iters):
+            grids.batch(rng, batch)
+        t_new = (time.perf_counter() - t0) / iters
+        print(
+            f"batch {batch}: reparse tokens {1e3 * t_old:.2f} ms, packed fetch+unpack "
+            f"{1e3 * t_new:.3f} ms (x{t_old / t_new:.0f})"
+        )
+
+        try:  # 학습용 배치 공급기 (torch 필요): 같은 시드면 grids.batch와 같은 배치
+            import torch
+
+            from models.d_groove.grid_loader import GridBatcher
+        except ModuleNotFoundError as e:
+            print(f"GridBatcher: skipped ({e.name} is not installed)")
+            return
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        batcher = GridBatcher(tmp / "drums_grid_train", batch, device=device, seed=3)
+        rng = np.random.default_rng(3)
+        for _ in range(3):  # 슬롯 두 개를 모두 다시 씀
+            got = batcher().cpu().numpy()
+            assert np.array_equal(got, grids.batch(rng, batch))
+        staged = batcher._bits[0].element_size()
+        print(
+            f"GridBatcher ({device}): batches match DrumGrids.batch, staging {staged} bytes/step "
+            f"= 1/{4 * 9 // staged} of the float grid"
+        )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--songs", type=int, default=400)
+    ap.add_argument("--batch", type=int, default=128, help="TRAINING_CFG drum_vae.batch_size")
+    ap.add_argument("--iters", type=int, default=50)
+    args = ap.parse_args()
+    main(args.songs, args.batch, args.iters)
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+
+from models.token_shards import ID_DTYPE
+from models.vocab import Vocab
+
+# 토큰 인코딩 버전 (토큰 파일의 "encoding" 필드, 없으면 1)
+#   1: 16분음표 스텝마다 TS:1, 한 스텝의 드럼 히트마다 DRUM:<CLASS>
+#   2: 연속된 TS:1을 TS:n (n <= MAX_SHIFT, 한 마디)으로 묶고,
+#      한 스텝의 드럼 히트들을 9클래스 비트마스크 토큰 DRUMS:<mask> 하나로 묶음
+# 두 형식은 서로 손실 없이 바뀝니다 (expand_tokens(compact_tokens(v1)) == v1).
+ENCODING_VERSION = 2
+MAX_SHIFT = 16  # 4/4 한 마디
+
+# 드럼 클래스 순서 = DRUMS:<mask>의 비트 순서 (drum_grid의 비트마스크와 같음)
+DRUM_CLASSES = ("KICK", "SNARE", "HHC", "HHO", "TOM", "RIDE", "CRASH", "CLAP", "PERC")
+_DRUM_BIT = {c: i for i, c in enumerate(DRUM_CLASSES)}
+
+# 어휘에 항상 들어가는 토큰 (build_vocab이 빈도와 관계없이 모두 넣음, TS:1은 특별 토큰).
+# DRUM:<CLASS>도 모두 넣어야 말뭉치에 없던 클래스가 든 DRUMS:<mask>를 v1로 펼칠 수 있음
+DRUM_TOKENS = tuple(f"DRUM:{c}" for c in DRUM_CLASSES)
+TS_TOKENS = tuple(f"TS:{n}" for n in range(2, MAX_SHIFT + 1))
+DRUMS_TOKENS = tuple(f"DRUMS:{m}" for m in range(1, 1 << len(DRUM_CLASSES)))
+
+
+def mask_classes(mask: int) -> List[str]:
+    """DRUMS 비트마스크 -> 클래스 이름 (비트 순)"""
+    return [c for i, c in enumerate(DRUM_CLASSES) if mask >> i & 1]
+
+
+def expand_tokens(tokens: Sequence[str]) -> List[str]:
+    """v2 -> v1: TS:n은 TS:1 n개로, DRUMS:<mask>는 비트 순 DRUM:<CLASS>들로 펼칩니다."""
+    out: List[str] = []
+    for tok in tokens:
+        kind, _, value = tok.partition(":")
+        if kind == "TS" and value.isdigit() and value != "1":
+            out += ["TS:1"] * int(value)
+        elif kind == "DRUMS" and value.isdigit() and 0 < int(value) < 1 << len(DRUM_CLASSES):
+            out += [f"DRUM:{c}" for c in mask_classes(int(value))]
+        else:
+            out.append(tok)
+    return out
+
+
+def compact_tokens(tokens: Sequence[str], max_shift: int = MAX_SHIFT) -> List[str]:
+    """
+    v1 (또는 v2) -> v2. 연속된 TS:1은 앞에서부터 max_shift씩 TS:n으로 묶고,
+    연달아 나오는 DRUM:<CLASS>는 클래스 순서가 올라가는 동안 DRUMS:<mask> 하나로 묶습니다
+    (순서가 다시 내려가면 새 토큰을 시작하므로 펼치면 원래 순서가 그대로 나옴).
+    v2 입력은 먼저 펼쳐서 다시 묶으므로 결과가 같습니다.
+    """
+    out: List[str] = []
+    run = 0  # 아직 내보내지 않은 TS 스텝 수
+    mask, top = 0, -1  # 묶는 중인 드럼 비트마스크와 마지막 비트
+
+    def flush() -> None:
+        nonlocal run, mask, top
+        while run > 0:
+            n = min(run, max_shift)
+            out.append(f"TS:{n}")
+            run -= n
+        if mask:
+            out.append(f"DRUMS:{mask}")
+            mask, top = 0, -1
+
+    for tok in expand_tokens(tokens):
+        if tok == "TS:1":
+            if mask:
+                flush()
+            run += 1
+            continue
+        bit = _DRUM_BIT.get(tok[5:], -1) if tok.startswith("DRUM:") else -1
+        if bit >= 0:
+            if run or bit <= top:
+                flush()
+            mask |= 1 << bit
+            top = bit
+            continue
+        flush()
+        out.append(tok)
+    flush()
+    return out
+
+
+def convert_tokens(tokens: Sequence[str], encoding: int = ENCODING_VERSION) -> List[str]:
+    """토큰열을 주어진 인코딩으로 (입력 버전은 몰라도 됨)"""
+    return compact_tokens(tokens) if encoding >= 2 else expand_tokens(tokens)
+
+
+def save_tokens(tokens: List[str], out_json: Path, encoding: int = ENCODING_VERSION) -> None:
+    """토큰 리스트를 인코딩 버전과 함께 JSON 파일로 저장"""
+    out_json.parent.mkdir(parents=True, exist_ok=True)
+    out_json.write_text(
+        json.dumps({"tokens": tokens, "encoding": encoding}, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+
+
+class Codec:
+    """
+    어휘 id 배열에서 바로 v1 <-> v2를 바꾸는 변환기 (compact_tokens/expand_tokens와 같은 결과).
+    - expand: id마다 펼친 v1 id열을 이어 붙인 표 하나로 래기드 gather
+    - compact: TS:1 연속 구간과 드럼 묶음의 시작 위치를 찾아 구간 길이/비트 합으로 새 id를 만듦
+    어휘에 없는 토큰은 UNK가 됩니다 (build_vocab은 TS_TOKENS/DRUMS_TOKENS를 항상 넣음).
+    """
+
+    def __init__(self, vocab: Vocab, max_shift: int = MAX_SHIFT):
+        self.vocab = vocab
+        self.max_shift = max_shift
+        seqs = [vocab.encode(expand_tokens([tok])) for tok in vocab.tokens.tolist()]
+        self.exp_len = np.array([len(s) for s in seqs], dtype=np.int64)
+        self.exp_start = np.concatenate(([0], np.cumsum(self.exp_len)[:-1]))
+        self.exp_flat = np.concatenate(seqs).astype(ID_DTYPE)
+        self.drum_bit = np.full(vocab.size, -1, dtype=np.int64)
+        for c, i in _DRUM_BIT.items():
+            j = vocab.token_to_id.get(f"DRUM:{c}")
+            if j is not None:
+                self.drum_bit[j] = i
+
+    def expand(self, ids: np.ndarray) -> np.ndarray:
+        """v2 id -> v1 id"""
+        ids = np.asarray(ids, dtype=np.int64)
+        lens = self.exp_len[ids]
+        ends = np.cumsum(lens)
+        pos = np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - lens, lens)
+        return self.exp_flat[np.repeat(self.exp_start[ids], lens) + pos]
+
+    def compact(self, ids: np.ndarray) -> np.ndarray:
+        """v1 (또는 v2) id -> v2 id"""
+        ids = self.expand(ids).astype(np.int64)
+        n = len(ids)
+        if not n:
+            return ids.astype(ID_DTYPE)
+        is_ts = ids == self.vocab.ts1
+        bit = self.drum_bit[ids]
+        is_drum = bit >= 0
+        prev_ts = np.concatenate(([False], is_ts[:-1]))
+        prev_bit = np.concatenate(([-1], bit[:-1]))  # 앞 토큰이 드럼이 아니면 -1
+        # 구간 시작: TS 연속의 첫 TS, 드럼 묶음의 첫 드럼 (앞이 드럼이 아니거나 클래스 순서가
+        # 끊김), 그 밖의 모든 토큰
+        head = (is_ts & ~prev_ts) | (is_drum & ((prev_bit < 0) | (bit <= prev_bit)))
+        head |= ~(is_ts | is_drum)
+        heads = np.flatnonzero(head)
+        seg = np.diff(np.append(heads, n))
+        ts_head = is_ts[heads]
+        count = np.where(ts_head, -(-seg // self.max_shift), 1)  # 긴 TS 구간은 여러 토큰
+        src = np.repeat(np.arange(len(heads)), count)
+        k = np.arange(len(src)) - np.repeat(np.cumsum(count) - count, count)
+        out = ids[heads][src]
+        ts = ts_head[src]
+        shift = np.minimum(self.max_shift, seg[src] - k * self.max_shift)
+        out[ts] = self.vocab.family_ids("TS", shift[ts])
+        drums = is_drum[heads][src]
+        if drums.any():
+            masks = np.add.reduceat(np.where(is_drum, 1 << np.maximum(bit, 0), 0), heads)
+            out[drums] = self.vocab.family_ids("DRUMS", masks[src][drums])
+        return out.astype(ID_DTYPE)
+
+    def convert(self, ids: np.ndarray, encoding: int = ENCODING_VERSION) -> np.ndarray:
+        """id 배열을 주어진 인코딩으로 (입력 버전은 몰라도 됨)"""
+        return self.compact(ids) if encoding >= 2 else self.expand(ids).astype(ID_DTYPE)
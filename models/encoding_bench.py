@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pretty_midi
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.detokenize import tokens_to_instrument  # noqa: E402
+from models.drum_grid import tokens_to_grid  # noqa: E402
+from models.encoding import Codec, compact_tokens, expand_tokens  # noqa: E402
+from models.tokenizer_drums import midi_to_drum_ids, midi_to_drum_tokens  # noqa: E402
+from models.vocab import get_vocab  # noqa: E402
+
+PROC_DIR = ROOT / "data" / "midi_proc"
+MAX_LEN = 1024  # pack_dataset 기본 max_len
+
+
+def synth_drums(tmp: Path, n: int, rng: np.random.Generator) -> List[Path]:
+    """GMD처럼 16분음표 그리드에 여러 클래스가 겹치는 드럼 MIDI (빈 마디, 필인 포함)"""
+    paths = []
+    for k in range(n):
+        pm = pretty_midi.PrettyMIDI(initial_tempo=float(rng.integers(70, 160)))
+        step = 60.0 / pm.get_tempo_changes()[1][0] / 4
+        inst = pretty_midi.Instrument(0, is_drum=True)
+        for s in range(16 * int(rng.integers(8, 64))):
+            if s // 16 % 7 == 6:  # 가끔 빈 마디
+                continue
+            hits = [42] if s % 2 == 0 else []
+            hits += [36] if s % 8 == 0 else []
+            hits += [38] if s % 8 == 4 else []
+            if rng.random() < 0.08:
+                hits.append(int(rng.choice([46, 49, 51, 39, 48, 45, 56])))
+            for pitch in hits:
+                t = s * step
+                inst.notes.append(pretty_midi.Note(int(rng.integers(40, 128)), pitch, t, t + 0.05))
+        pm.instruments.append(inst)
+        paths.append(tmp / f"drums{k:03d}.mid")
+        pm.write(str(paths[-1]))
+    return paths
+
+
+def fuzz_tokens(rng: np.random.Generator, n: int) -> List[str]:
+    """경계 사례: 한 마디보다 긴 TS 연속, 순서가 뒤섞인/중복 DRUM, 모르는 토큰, 섞인 v2 토큰"""
+    pool = ["TS:1"] * 8 + ["BAR", "NOTE:60", "DUR:3", "UNKNOWN:x", "TS:5", "DRUMS:7"]
+    pool += [f"DRUM:{c}" for c in ("KICK", "SNARE", "HHC", "PERC", "NOPE")]
+    return ["BOS"] + [pool[i] for i in rng.integers(0, len(pool), size=n)] + ["EOS"]
+
+
+def check_roundtrip(tokens: List[str], codec: Codec, vocab) -> List[str]:
+    """
+    v1 -> v2 -> v1이 같고, id 변환기와 문자열 변환이 같은 결과인지 확인하고 v2를 돌려줌
+    (입력에 v2 토큰이 섞여 있어도 됨)
+    """
+    v1 = expand_tokens(tokens)
+    v2 = compact_tokens(tokens)
+    assert expand_tokens(v2) == v1, "expand(compact(v1)) != v1"
+    assert compact_tokens(v2) == v2, "compact is not idempotent"
+    ids1 = vocab.encode(v1)
+    assert codec.compact(ids1).tolist() == vocab.encode(v2).tolist(), "Codec.compact differs"
+    assert codec.compact(vocab.encode(tokens)).tolist() == vocab.encode(v2).tolist()
+    assert codec.expand(vocab.encode(v2)).tolist() == ids1.tolist(), "Codec.expand differs"
+    return v2
+
+
+def report(name: str, v1_lens: List[int], v2_lens: List[int]) -> Dict[str, float]:
+    a, b = np.array(v1_lens, dtype=np.float64), np.array(v2_lens, dtype=np.float64)
+    row = {
+        "files": len(a),
+        "mean_v1": float(a.mean()),
+        "mean_v2": float(b.mean()),
+        "reduction": float(1 - b.sum() / a.sum()),
+        "attention_cost": float((b**2).sum() / (a**2).sum()),  # 자기 주의 O(L^2) 합 비율
+        "over_max_v1": float((a > MAX_LEN).mean()),
+        "over_max_v2": float((b > MAX_LEN).mean()),
+    }
+    print(
+        f"  {name:7s}: {row['files']} files, mean length {row['mean_v1']:.0f} -> "
+        f"{row['mean_v2']:.0f} tokens ({100 * row['reduction']:.1f}% shorter, "
+        f"x{a.sum() / b.sum():.2f}), attention cost x{row['attention_cost']:.3f}, "
+        f"> {MAX_LEN} tokens: {100 * row['over_max_v1']:.0f}% -> {100 * row['over_max_v2']:.0f}%"
+    )
+    return row
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--limit", type=int, default=None, help="Token files per corpus")
+    ap.add_argument("--drums", type=int, default=30, help="Synthetic drum MIDI files")
+    ap.add_argument("--fuzz", type=int, default=300, help="Random token streams to round-trip")
+    args = ap.parse_args()
+
+    vocab = get_vocab()
+    codec = Codec(vocab)
+    rng = np.random.default_rng(0)
+
+    for _ in range(args.fuzz):
+        check_roundtrip(fuzz_tokens(rng, int(rng.integers(0, 200))), codec, vocab)
+    print(f"fuzz: {args.fuzz} random streams round-trip losslessly (strings and ids)")
+
+    print("sequence length, encoding 1 -> 2:")
+    # 멜로디: 이미 토큰화된 파일 (예전 형식이면 그대로 v1, v2 파일이면 펼쳐서 v1)
+    for kind in ("melody", "drums"):
+        files = sorted((PROC_DIR / kind).glob("*.json"))[: args.limit]
+        if not files:
+            continue
+        v1_lens, v2_lens = [], []
+        t_ids = 0.0
+        for p in files:
+            v1 = expand_tokens(json.loads(p.read_text(encoding="utf-8"))["tokens"])
+            v2 = check_roundtrip(v1, codec, vocab)
+            ids = vocab.encode(v1)
+            t0 = time.perf_counter()
+            codec.compact(ids)
+            t_ids += time.perf_counter() - t0
+            v1_lens.append(len(v1))
+            v2_lens.append(len(v2))
+        report(kind, v1_lens, v2_lens)
+        print(f"           convert: Codec {1e3 * t_ids / len(files):.2f} ms/file (ids)")
+
+    # 드럼: MIDI에서 두 인코딩을 직접 만들어 서로, 그리고 디코더 결과와 비교
+    with tempfile.TemporaryDirectory() as tmp:
+        v1_lens, v2_lens = [], []
+        for p in synth_drums(Path(tmp), args.drums, rng):
+            v1 = midi_to_drum_tokens(p, encoding=1)
+            v2 = midi_to_drum_tokens(p)
+            assert check_roundtrip(v1, codec, vocab) == v2, f"{p.name}: tokenizer v2 != compact"
+            assert midi_to_drum_ids(p, vocab).tolist() == vocab.encode(v2).tolist()
+            assert midi_to_drum_ids(p, vocab, encoding=1).tolist() == vocab.encode(v1).tolist()
+            g1, g2 = tokens_to_grid(v1)[0], tokens_to_grid(v2)[0]
+            assert np.array_equal(g1, g2), f"{p.name}: grids differ"
+            n1 = tokens_to_instrument(v1, 120.0).notes
+            n2 = tokens_to_instrument(v2, 120.0).notes
+            key = lambda n: (n.start, n.pitch)  # noqa: E731
+            assert [key(n) for n in sorted(n1, key=key)] == [key(n) for n in sorted(n2, key=key)]
+            v1_lens.append(len(v1))
+            v2_lens.append(len(v2))
+        report("drums*", v1_lens, v2_lens)
+    print("  (* synthetic GMD-like drum MIDI; tokenizer, Codec, grid and detokenizer agree)")
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import mmap
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from models.token_shards import CropIndex, TokenShard, shard_exists, windows_path
+
+# JSONL 길이 인덱스: <file>.len.npy, 줄 바이트 오프셋 / 줄 길이 / 토큰 수
+LINE_DTYPE = np.dtype([("offset", "<u8"), ("nbytes", "<u4"), ("length", "<u4")])
+_IDS_KEY = b'"ids"'
+
+
+def _ids_span(line: bytes) -> tuple[int, int]:
+    """줄에서 "ids": [ ... ] 안쪽의 (시작, 끝) 바이트 위치"""
+    a = line.index(b"[", line.index(_IDS_KEY)) + 1
+    return a, line.index(b"]", a)
+
+
+def index_path(path: Path) -> Path:
+    return Path(str(path) + ".len.npy")
+
+
+def build_line_index(path: Path) -> np.ndarray:
+    """
+    pack_dataset.py의 {kind}_{split}.jsonl을 한 번 훑어 줄마다 오프셋과 토큰 수를 기록합니다.
+    json.loads 없이 ids 배열의 쉼표 수만 셉니다.
+    """
+    rows = []
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                a, b = _ids_span(line)
+                body = line[a:b]
+                n = body.count(b",") + 1 if body.strip() else 0
+                rows.append((offset, len(line), n))
+            offset += len(line)
+    return np.array(rows, dtype=LINE_DTYPE)
+
+
+def load_line_index(path: Path) -> np.ndarray:
+    """저장된 인덱스가 JSONL보다 새것이면 재사용하고, 아니면 다시 만들어 저장합니다."""
+    idx = index_path(path)
+    if idx.exists() and idx.stat().st_mtime_ns >= Path(path).stat().st_mtime_ns:
+        return np.load(idx)
+    index = build_line_index(path)
+    tmp = idx.with_name(idx.name + ".tmp.npy")
+    np.save(tmp, index)
+    tmp.replace(idx)
+    return index
+
+
+class PackedRecords:
+    """
+    학습 데이터 분할 하나 (어휘집 ID). 길이는 전부 미리 알고, 레코드는 요청할 때만 읽습니다.
+    - <prefix>.jsonl          : 줄 인덱스 + 메모리 매핑, 해당 줄의 ids만 파싱
+    - <prefix>.bin/.idx       : 토큰 샤드 (pack_dataset.py --out_format shard)
+    - <prefix>.win.npy 가 있으면 샤드 대신 크롭 윈도 단위 (--stride)
+    파일 핸들은 피클하지 않으므로 DataLoader 워커로 보내면 워커마다 다시 엽니다.
+    """
+
+    def __init__(self, prefix: Union[str, Path], max_len: Optional[int] = None):
+        self.prefix = Path(prefix)
+        self.jsonl = Path(str(self.prefix) + ".jsonl")
+        if self.jsonl.exists():
+            self.kind = "jsonl"
+            self.index = load_line_index(self.jsonl)
+            lengths = self.index["length"]
+        elif windows_path(self.prefix).exists():
+            self.kind = "windows"
+            lengths = np.load(windows_path(self.prefix), mmap_mode="r")["length"]
+        elif shard_exists(self.prefix):
+            self.kind = "shard"
+            lengths = TokenShard(self.prefix).lengths
+        else:
+            raise FileNotFoundError(f"No packed dataset at {self.prefix}(.jsonl|.bin/.idx)")
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        if max_len is not None:
+            self.lengths = np.minimum(self.lengths, max_len)  # 읽을 때도 앞쪽 max_len만
+        self._handle = None
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __getstate__(self) -> Dict:
+        return {**self.__dict__, "_handle": None}
+
+    def _open(self):
+        if self._handle is None:
+            if self.kind == "jsonl":
+                with open(self.jsonl, "rb") as f:
+                    self._handle = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            elif self.kind == "windows":
+                self._handle = CropIndex(self.prefix)
+            else:
+                self._handle = TokenShard(self.prefix)
+        return self._handle
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        h = self._open()
+        n = int(self.lengths[i])
+        if self.kind != "jsonl":
+            return h[i][:n]
+        off, nbytes, _ = self.index[i]
+        line = h[int(off) : int(off) + int(nbytes)]
+        a, b = _ids_span(line)
+        return np.fromstring(line[a:b].decode("ascii"), dtype=np.int64, sep=",")[:n]
+
+
+def bucket_batches(
+    lengths: np.ndarray,
+    batch_size: int,
+    seed: int = 0,
+    epoch: int = 0,
+    pool_batches: int = 64,
+    drop_last: bool = False,
+) -> List[np.ndarray]:
+    """
+    길이가 비슷한 레코드끼리 배치를 묶습니다.
+    에폭마다 전체를 섞은 뒤 batch_size * pool_batches개씩 끊어 그 안에서만 길이순으로 정렬하므로,
+    배치 안의 패딩은 줄고 배치 구성은 에폭마다 달라집니다. 배치 순서도 다시 섞습니다.
+    seed/epoch가 같으면 어느 프로세스에서든 같은 결과가 나오므로 워커/랭크 분할의 기준이 됩니다.
+    """
+    rng = np.random.default_rng([seed, epoch])
+    order = rng.permutation(len(lengths))
+    pool = batch_size * max(1, pool_batches)
+    batches = []
+    for s in range(0, len(order), pool):
+        chunk = order[s : s + pool]
+        chunk = chunk[np.argsort(lengths[chunk], kind="stable")]
+        batches += [chunk[i : i + batch_size] for i in range(0, len(chunk), batch_size)]
+    if drop_last:
+        batches = [b for b in batches if len(b) == batch_size]
+    return [batches[i] for i in rng.permutation(len(batches))]
+
+
+def split_batches(batches: List[np.ndarray], part: int, n_parts: int, even: bool = False):
+    """
+    배치 목록을 n_parts개로 나눈 것 중 part번째 (겹치지 않고 합치면 전체).
+    even=True면 남는 배치를 버려 모든 부분의 스텝 수를 맞춥니다 (분산 학습 랭크용).
+    """
+    if even and n_parts > 1:
+        batches = batches[: len(batches) - len(batches) % n_parts]
+    return batches[part::n_parts]
+
+
+def padded_len(n: int, pad_multiple: int = 8) -> int:
+    """배치 폭: 가장 긴 레코드를 pad_multiple 배수로 올림 (텐서 코어/커널 모양 재사용)"""
+    return -(-n // pad_multiple) * pad_multiple if pad_multiple > 1 else n
+
+
+def padding_stats(
+    lengths: np.ndarray,
+    batches: List[np.ndarray],
+    pad_multiple: int = 8,
+    seq_len: Optional[int] = None,
+) -> Dict[str, float]:
+    """
+    배치 계획의 패딩 비율 (패딩 토큰 / 배치 텐서 전체 토큰).
+    seq_len을 주면 모든 배치를 그 길이로 채우는 단순 로더 기준으로 계산합니다.
+    """
+    real = padded = 0
+    for b in batches:
+        lens = lengths[b]
+        width = seq_len if seq_len is not None else padded_len(int(lens.max()), pad_multiple)
+        real += int(lens.sum())
+        padded += len(b) * width
+    return {
+        "batches": len(batches),
+        "tokens": real,
+        "padded_tokens": padded,
+        "padding_ratio": 1.0 - real / max(padded, 1),
+    }
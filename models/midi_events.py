@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+# 파일 하나의 노트 = 구조화 배열 한 행. 시각은 템포 맵을 반영한 초 단위입니다.
+NOTE_DTYPE = np.dtype(
+    [("start", "<f8"), ("end", "<f8"), ("pitch", "u1"), ("velocity", "u1"), ("is_drum", "?")]
+)
+# 템포 맵: 변경 시점(초)과 그 구간의 BPM. 첫 행은 0초 (첫 이벤트가 0틱보다 뒤면 기본 120으로 채움).
+# 템포 이벤트가 하나도 없는 파일은 빈 배열입니다 (시각 변환은 120 BPM 기준).
+TEMPO_DTYPE = np.dtype([("time", "<f8"), ("bpm", "<f8")])
+# 박자표: 변경 시점(초)과 분자/분모 (예: 6/8 -> num=6, den=8). 이벤트가 없으면 빈 배열 (4/4로 간주).
+METER_DTYPE = np.dtype([("time", "<f8"), ("num", "u1"), ("den", "u1")])
+
+DEFAULT_BPM = 120.0
+DRUM_CHANNEL = 9  # GM 드럼 채널 (0부터 셈)
+MAX_TICK = 10_000_000  # pretty_midi와 같은 한계: 이보다 긴 파일은 손상으로 간주
+
+# 상태 바이트별 데이터 바이트 수 (채널 메시지 0x80-0xEF, 시스템 커먼 0xF1-0xF3)
+_DATA_LEN = bytes(
+    [0] * 0x80
+    + [2] * 0x40  # 0x80-0xBF: note off / note on / poly aftertouch / control change
+    + [1] * 0x20  # 0xC0-0xDF: program change / channel aftertouch
+    + [2] * 0x10  # 0xE0-0xEF: pitch bend
+    + [0, 1, 2, 1]  # 0xF0-0xF3: (sysex는 별도 처리), quarter frame, song position, song select
+    + [0] * 0x0C
+)
+
+
+def _varlen(buf: bytes, pos: int) -> Tuple[int, int]:
+    """가변 길이 정수 -> (값, 다음 위치)"""
+    value = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        value = (value << 7) | (b & 0x7F)
+        if b < 0x80:
+            return value, pos
+
+
+def _read_track(
+    buf: bytes,
+    pos: int,
+    end: int,
+    tempos: Union[List[Tuple[int, int]], None],
+    meters: Union[List[Tuple[int, int, int]], None] = None,
+) -> Tuple[List[Tuple[int, int, int, int, bool]], int]:
+    """
+    MTrk 청크 하나를 훑어 (시작 틱, 끝 틱, 피치, 벨로시티, 드럼 여부) 목록과 마지막 틱을 돌려줍니다.
+    tempos가 주어지면 템포 메타 이벤트 (틱, 4분음표당 마이크로초)를 거기에 모읍니다.
+    meters가 주어지면 박자표 메타 이벤트 (틱, 분자, 분모)를 모읍니다.
+
+    노트 짝짓기는 pretty_midi와 같습니다: (채널, 피치)마다 열린 노트-온을 쌓아 두고,
+    노트-오프(또는 벨로시티 0 노트-온)는 다른 틱에 시작한 열린 노트를 모두 닫습니다.
+    같은 틱의 노트-온은 다른 노트가 함께 닫힐 때만 남고, 짝 없는 노트-오프는 무시합니다.
+    """
+    notes: List[Tuple[int, int, int, int, bool]] = []
+    held: Dict[int, List[Tuple[int, int]]] = {}
+    tick = 0
+    status = 0
+    data_len = _DATA_LEN
+    while pos < end:
+        b = buf[pos]  # 델타 타임 (가변 길이 정수, 인라인)
+        pos += 1
+        delta = b & 0x7F
+        while b & 0x80:
+            b = buf[pos]
+            pos += 1
+            delta = (delta << 7) | (b & 0x7F)
+        tick += delta
+
+        b = buf[pos]
+        if b & 0x80:
+            pos += 1
+            if b == 0xFF:  # 메타 이벤트: 러닝 스테이터스에 영향 없음
+                kind = buf[pos]
+                length, pos = _varlen(buf, pos + 1)
+                if kind == 0x51 and length == 3 and tempos is not None:
+                    tempos.append((tick, int.from_bytes(buf[pos : pos + 3], "big")))
+                elif kind == 0x58 and length >= 2 and meters is not None:
+                    meters.append((tick, buf[pos], 1 << min(buf[pos + 1], 7)))
+                pos += length
+                continue
+            if b == 0xF0 or b == 0xF7:  # SysEx: 길이만큼 건너뜀
+                length, pos = _varlen(buf, pos)
+                pos += length
+                continue
+            status = b
+        elif not status:
+            raise ValueError("running status without a preceding status byte")
+
+        kind = status & 0xF0
+        if kind != 0x90 and kind != 0x80:
+            pos += data_len[status]
+            continue
+        pitch = buf[pos]
+        velocity = buf[pos + 1]
+        pos += 2
+        key = (status & 0x0F) << 7 | pitch
+        if kind == 0x90 and velocity:
+            held.setdefault(key, []).append((tick, velocity))
+            continue
+        opened = held.pop(key, None)
+        if not opened:
+            continue
+        drum = status & 0x0F == DRUM_CHANNEL
+        closed = [n for n in opened if n[0] != tick]
+        for start, vel in closed:
+            notes.append((start, tick, pitch, vel, drum))
+        if closed and len(closed) < len(opened):
+            held[key] = [n for n in opened if n[0] == tick]
+    return notes, tick
+
+
+def _tick_scales(tempos: List[Tuple[int, int]], resolution: int) -> List[Tuple[int, float]]:
+    """템포 이벤트 -> (틱, 틱당 초) 구간 목록. 0틱 이벤트는 기본값을 대체, 같은 값 반복은 무시."""
+    scales = [(0, 60.0 / (DEFAULT_BPM * resolution))]
+    for tick, usec in tempos:
+        scale = 60.0 / ((6e7 / usec) * resolution)
+        if tick == 0:
+            scales = [(0, scale)]
+        elif scale != scales[-1][1]:
+            scales.append((tick, scale))
+    return scales
+
+
+def _ticks_to_seconds(ticks: np.ndarray, scales: List[Tuple[int, float]]) -> np.ndarray:
+    """
+    구간별 선형 변환. 구간 시작 시각을 pretty_midi와 같은 순서로 누적하므로
+    결과가 비트 단위로 같습니다.
+    """
+    starts = np.array([t for t, _ in scales], dtype=np.int64)
+    slopes = np.array([s for _, s in scales], dtype=np.float64)
+    offsets = np.zeros(len(scales), dtype=np.float64)
+    for i in range(1, len(scales)):
+        offsets[i] = offsets[i - 1] + slopes[i - 1] * (starts[i] - starts[i - 1])
+    k = np.searchsorted(starts, ticks, side="right") - 1
+    return offsets[k] + slopes[k] * (ticks - starts[k])
+
+
+def parse_midi(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    SMF 바이트 -> (노트 NOTE_DTYPE [N], 템포 맵 TEMPO_DTYPE [K]).
+    이벤트 객체를 만들지 않고 트랙 청크를 바이트 단위로 한 번만 훑습니다.
+    노트는 (시작, 피치) 순으로 정렬되고, 템포는 pretty_midi처럼 첫 트랙의 이벤트만 씁니다.
+    MTrk가 아닌 청크는 건너뛰고, SysEx/메타 이벤트는 러닝 스테이터스를 바꾸지 않습니다.
+    """
+    notes, tempo, _ = _parse(data, None)
+    return notes, tempo
+
+
+def parse_midi_meter(data: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    parse_midi + 박자표 METER_DTYPE [M] (모든 트랙의 박자표 이벤트, 시각순, 같은 값 반복 제거).
+    카탈로그처럼 박자 정보가 필요한 곳에서만 씁니다.
+    """
+    meters: List[Tuple[int, int, int]] = []
+    return _parse(data, meters)
+
+
+def _parse(
+    data: bytes, meters: Union[List[Tuple[int, int, int]], None]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """parse_midi 본체. meters가 None이면 박자표는 모으지 않고 빈 배열을 돌려줍니다."""
+    buf = bytes(data)
+    if buf[:4] != b"MThd" or len(buf) < 14:
+        raise ValueError("not a Standard MIDI File (missing MThd header)")
+    header_len = int.from_bytes(buf[4:8], "big")
+    n_tracks = int.from_bytes(buf[10:12], "big")
+    resolution = int.from_bytes(buf[12:14], "big")
+    if resolution & 0x8000 or resolution == 0:
+        raise ValueError("SMPTE time division is not supported")
+
+    rows: List[Tuple[int, int, int, int, bool]] = []
+    tempos: List[Tuple[int, int]] = []
+    max_tick = 0
+    pos = 8 + header_len
+    track = 0
+    while track < n_tracks and pos + 8 <= len(buf):
+        name = buf[pos : pos + 4]
+        size = int.from_bytes(buf[pos + 4 : pos + 8], "big")
+        pos += 8
+        if name == b"MTrk":
+            end = min(pos + size, len(buf))
+            try:
+                notes, last = _read_track(buf, pos, end, tempos if track == 0 else None, meters)
+            except IndexError:
+                raise ValueError(f"truncated MIDI track {track}") from None
+            rows.extend(notes)
+            max_tick = max(max_tick, last)
+            track += 1
+        pos += size
+    if max_tick + 1 > MAX_TICK:
+        raise ValueError(f"MIDI file has a largest tick of {max_tick + 1}, it is likely corrupt")
+
+    scales = _tick_scales(tempos, resolution)
+    tempo = np.empty(len(scales) if tempos else 0, dtype=TEMPO_DTYPE)
+    if tempos:
+        ticks = np.array([t for t, _ in scales], dtype=np.int64)
+        tempo["time"] = _ticks_to_seconds(ticks, scales)
+        tempo["bpm"] = [60.0 / (s * resolution) for _, s in scales]
+
+    notes = np.empty(len(rows), dtype=NOTE_DTYPE)
+    if rows:
+        start, end, pitch, vel, drum = (np.array(col) for col in zip(*rows))
+        order = np.lexsort((pitch, start))
+        notes["start"] = _ticks_to_seconds(start[order], scales)
+        notes["end"] = _ticks_to_seconds(end[order], scales)
+        notes["pitch"] = pitch[order]
+        notes["velocity"] = vel[order]
+        notes["is_drum"] = drum[order]
+
+    meter = np.empty(0, dtype=METER_DTYPE)
+    if meters:
+        meters.sort(key=lambda m: m[0])
+        rows_m = [m for i, m in enumerate(meters) if i == 0 or m[1:] != meters[i - 1][1:]]
+        meter = np.empty(len(rows_m), dtype=METER_DTYPE)
+        meter["time"] = _ticks_to_seconds(np.array([m[0] for m in rows_m]), scales)
+        meter["num"] = [m[1] for m in rows_m]
+        meter["den"] = [m[2] for m in rows_m]
+    return notes, tempo, meter
+
+
+def read_midi(path: Union[str, Path]) -> Tuple[np.ndarray, np.ndarray]:
+    """MIDI 파일 -> (노트, 템포 맵). parse_midi 참고."""
+    return parse_midi(Path(path).read_bytes())
+
+
+def read_notes(path: Union[str, Path]) -> np.ndarray:
+    """MIDI 파일 -> NOTE_DTYPE 구조화 배열 (pretty_midi.PrettyMIDI 대신 토크나이저가 씀)"""
+    return read_midi(path)[0]
+
+
+def estimate_tempo(notes: np.ndarray) -> float:
+    """
+    PrettyMIDI.estimate_tempo()를 노트 배열 위에 옮긴 것 (같은 입력에 같은 값).
+    모든 악기의 온셋 간격(IOI)을 25ms 이내끼리 묶어 가장 많은 묶음의 BPM을 돌려줍니다.
+    """
+    onsets = np.sort(notes["start"])
+    ioi = np.diff(onsets)
+    ioi = ioi[ioi > 0.05]
+    ioi = ioi[ioi < 2]
+    low = ioi < 0.2
+    while low.any():  # 30~300 BPM 범위로 두 배씩 (2의 거듭제곱 곱이라 결과가 정확히 같음)
+        ioi[low] *= 2
+        low = ioi < 0.2
+    clusters: List[float] = []
+    counts: List[float] = []
+    for interval in ioi.tolist():
+        diff = np.subtract(clusters, interval)
+        if (np.abs(diff) < 0.025).any():
+            k = int(np.argmin(diff))  # pretty_midi 그대로 (부호 있는 차이의 argmin)
+            clusters[k] = (counts[k] * clusters[k] + interval) / (counts[k] + 1)
+            counts[k] += 1
+        else:
+            clusters.append(interval)
+            counts.append(1.0)
+    if not clusters:
+        raise ValueError(
+            "Can't provide a global tempo estimate when there are fewer than two notes."
+        )
+    best = np.argsort(np.array(counts))[::-1][0]
+    return 60.0 / clusters[best]
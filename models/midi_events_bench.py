@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pretty_midi
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.batch_tokenize import find_midis  # noqa: E402
+from models.midi_events import NOTE_DTYPE, estimate_tempo, parse_midi  # noqa: E402
+
+RAW_DIR = ROOT / "data" / "midi_raw"
+
+
+def pm_notes(pm: pretty_midi.PrettyMIDI) -> np.ndarray:
+    """PrettyMIDI 노트 -> NOTE_DTYPE (비교 기준)"""
+    rows = [
+        (n.start, n.end, n.pitch, n.velocity, inst.is_drum)
+        for inst in pm.instruments
+        for n in inst.notes
+    ]
+    return np.array(rows, dtype=NOTE_DTYPE)
+
+
+def canonical(notes: np.ndarray) -> np.ndarray:
+    """정렬 순서와 무관하게 비교하도록 모든 필드 기준으로 정렬"""
+    order = np.lexsort(
+        (notes["is_drum"], notes["velocity"], notes["end"], notes["pitch"], notes["start"])
+    )
+    return notes[order]
+
+
+def _varlen(value: int) -> bytes:
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def fuzz_smf(rng: np.random.Generator, n_tracks: int, n_events: int) -> bytes:
+    """
+    러닝 스테이터스, 벨로시티 0 노트-오프, 같은 틱 재타격, 겹치는 같은 피치, 짝 없는 노트-오프,
+    SysEx/메타/CC/피치벤드, 첫 트랙의 템포 변경을 섞은 형식 1 SMF를 바이트 단위로 만듭니다.
+    """
+    chunks = []
+    for track in range(n_tracks):
+        out = bytearray()
+        last = None
+        for _ in range(n_events):
+            out += _varlen(int(rng.choice([0, 0, 1, 5, 30, 120, 500])))
+            r = rng.random()
+            if track == 0 and r < 0.03:
+                usec = int(rng.integers(300_000, 1_200_000))
+                out += b"\xff\x51\x03" + usec.to_bytes(3, "big")
+                continue
+            if r < 0.05:
+                out += b"\xf0" + _varlen(3) + b"\x7e\x01\xf7"
+                last = None  # pretty_midi(mido)는 SysEx 뒤 러닝 스테이터스를 다르게 다룸
+                continue
+            if r < 0.07:
+                out += b"\xff\x01" + _varlen(4) + b"text"
+                continue
+            ch = int(rng.choice([0, 1, 9]))
+            if r < 0.55:
+                status, data = 0x90 | ch, [int(rng.integers(36, 48)), int(rng.integers(1, 128))]
+            elif r < 0.9:
+                kind = 0x80 if rng.random() < 0.5 else 0x90
+                status, data = kind | ch, [int(rng.integers(36, 48)), 0]
+            elif r < 0.95:
+                status, data = 0xB0 | ch, [64, int(rng.integers(0, 128))]
+            elif r < 0.98:
+                status, data = 0xE0 | ch, [int(rng.integers(0, 128)), int(rng.integers(0, 128))]
+            else:
+                status, data = 0xC0 | ch, [int(rng.integers(0, 128))]
+            if status != last or rng.random() < 0.3:
+                out.append(status)
+            out += bytes(data)
+            last = status
+        out += b"\x00\xff\x2f\x00"
+        chunks.append(b"MTrk" + len(out).to_bytes(4, "big") + bytes(out))
+    header = b"MThd" + (6).to_bytes(4, "big") + (1).to_bytes(2, "big")
+    header += n_tracks.to_bytes(2, "big") + (480).to_bytes(2, "big")
+    return header + b"".join(chunks)
+
+
+def synth_corpus(tmp: Path, n: int, rng: np.random.Generator) -> List[Path]:
+    """MIDI 원본이 없을 때: 템포 변화가 있는 피아노 연주형 파일과 드럼 파일을 pretty_midi로 씀"""
+    paths = []
+    for k in range(n):
+        pm = pretty_midi.PrettyMIDI(initial_tempo=float(rng.integers(60, 180)))
+        scales = pm._tick_scales  # 템포 변경 몇 개 (pretty_midi에는 공개 API가 없음)
+        for i in range(1, 4):
+            scales.append((i * 20_000, 60.0 / (float(rng.integers(60, 180)) * pm.resolution)))
+        piano = k % 2 == 0
+        inst = pretty_midi.Instrument(0, is_drum=not piano)
+        t = 0.0
+        for _ in range(
+            int(rng.integers(5_000, 20_000)) if piano else int(rng.integers(500, 3_000))
+        ):
+            t += float(rng.exponential(0.06 if piano else 0.12))
+            pitch = int(rng.integers(21, 109)) if piano else int(rng.choice([36, 38, 42, 46, 49]))
+            dur = float(rng.uniform(0.05, 1.5))
+            inst.notes.append(pretty_midi.Note(int(rng.integers(20, 128)), pitch, t, t + dur))
+        inst.control_changes = [
+            pretty_midi.ControlChange(64, int(rng.integers(0, 128)), float(x))
+            for x in np.sort(rng.uniform(0, t, size=len(inst.notes) // 4))
+        ]
+        pm.instruments.append(inst)
+        paths.append(tmp / f"synth{k:03d}.mid")
+        pm.write(str(paths[-1]))
+    return paths
+
+
+def check(data: bytes, pm: pretty_midi.PrettyMIDI, name: str) -> int:
+    notes, tempo = parse_midi(data)
+    ref = pm_notes(pm)
+    assert np.array_equal(canonical(notes), canonical(ref)), f"{name}: notes differ from PrettyMIDI"
+    times, bpms = pm.get_tempo_changes()
+    if not len(tempo):  # 템포 이벤트 없음: pretty_midi는 기본 120 BPM 한 행을 돌려줌
+        tempo = np.array([(0.0, 120.0)], dtype=tempo.dtype)
+    assert np.array_equal(tempo["time"], times) and np.allclose(tempo["bpm"], bpms), name
+    try:
+        ref_bpm = pm.estimate_tempo()
+    except ValueError:
+        ref_bpm = None
+    if ref_bpm is not None:
+        assert estimate_tempo(notes) == ref_bpm, f"{name}: estimate_tempo differs"
+    return len(notes)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", type=Path, default=RAW_DIR, help="Raw MIDI directory (recursive)")
+    ap.add_argument("--limit", type=int, default=None, help="Use only the first N files")
+    ap.add_argument("--synth", type=int, default=12, help="Synthetic files when --dir is empty")
+    ap.add_argument("--fuzz", type=int, default=200, help="Byte-level fuzz files to cross-check")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    n_fuzz = 0
+    for i in range(args.fuzz):
+        data = fuzz_smf(rng, int(rng.integers(1, 4)), int(rng.integers(10, 400)))
+        with tempfile.NamedTemporaryFile(suffix=".mid") as f:
+            f.write(data)
+            f.flush()
+            n_fuzz += check(data, pretty_midi.PrettyMIDI(f.name), f"fuzz{i}")
+    print(f"fuzz: {args.fuzz} hand-built SMF files ({n_fuzz} notes) identical to PrettyMIDI")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = find_midis(args.dir)[: args.limit] if args.dir.exists() else []
+        source = str(args.dir)
+        if not files:
+            files = synth_corpus(Path(tmp), args.synth, rng)
+            source = f"{len(files)} synthetic files (no MIDI under {args.dir})"
+
+        blobs = [p.read_bytes() for p in files]  # 디스크 I/O는 두 경로 모두 측정에서 제외
+        t_pm = t_raw = 0.0
+        n_notes = 0
+        for p, data in zip(files, blobs):
+            t0 = time.perf_counter()
+            pm = pretty_midi.PrettyMIDI(p)
+            t1 = time.perf_counter()
+            parse_midi(data)
+            t2 = time.perf_counter()
+            t_pm += t1 - t0
+            t_raw += t2 - t1
+            n_notes += check(data, pm, p.name)
+
+        biggest = max(range(len(files)), key=lambda i: len(blobs[i]))
+        tracemalloc.start()
+        pretty_midi.PrettyMIDI(files[biggest])
+        mem_pm = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        parse_midi(blobs[biggest])
+        mem_raw = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+
+    mb = sum(map(len, blobs)) / 1e6
+    print(f"corpus: {source}, {mb:.1f} MB, {n_notes} notes, identical notes/tempo/estimate_tempo")
+    for label, t in (("PrettyMIDI ", t_pm), ("midi_events", t_raw)):
+        print(
+            f"  {label}: {1e3 * t / len(files):7.1f} ms/file  {n_notes / t / 1e3:7.0f} k notes/s"
+            f"  {mb / t:5.1f} MB/s"
+        )
+    print(f"  speedup x{t_pm / t_raw:.1f}")
+    print(
+        f"  peak heap on largest file: PrettyMIDI {mem_pm / 1e6:.1f} MB, "
+        f"midi_events {mem_raw / 1e6:.1f} MB"
+    )
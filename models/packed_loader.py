@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+from models.augment import Augmenter
+from models.length_index import (
+    PackedRecords,
+    bucket_batches,
+    padded_len,
+    split_batches,
+)
+
+Batch = Tuple[torch.Tensor, torch.Tensor]  # (ids [B, L] int64, lengths [B] int64)
+
+
+class LengthBucketDataset(IterableDataset):
+    """
+    길이 버킷 배치를 내는 IterableDataset (DataLoader에는 batch_size=None으로 넘김).
+    - 배치 계획(bucket_batches)은 seed/epoch만으로 정해지므로 모든 랭크·워커가 같은 목록을
+      만들고, 랭크 -> 워커 순으로 겹치지 않게 나눠 가집니다 (중복 샘플 없음).
+    - 배치 폭은 배치 안 최장 레코드를 pad_multiple로 올린 값이며 seq_len을 넘지 않습니다.
+    - augment(models/augment.py Augmenter)를 주면 채운 배치에 조옮김/템포 LUT를 적용합니다.
+    """
+
+    def __init__(
+        self,
+        records: PackedRecords,
+        batch_size: int,
+        seq_len: int = 1024,
+        seed: int = 0,
+        pool_batches: int = 64,
+        pad_multiple: int = 8,
+        pad_id: int = 0,
+        drop_last: bool = False,
+        rank: int = 0,
+        world_size: int = 1,
+        augment: Optional[Augmenter] = None,
+    ):
+        super().__init__()
+        self.records = records
+        self.lengths = np.minimum(records.lengths, seq_len)
+        self.batch_size = batch_size
+        self.seq_len = seq_len
+        self.seed = seed
+        self.pool_batches = pool_batches
+        self.pad_multiple = pad_multiple
+        self.pad_id = pad_id
+        self.drop_last = drop_last
+        self.rank = rank
+        self.world_size = world_size
+        self.augment = augment
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        """에폭마다 호출. 워커는 iter()마다 새로 떠서 현재 epoch 값을 받아 갑니다."""
+        self.epoch = epoch
+
+    def plan(self):
+        """이 랭크가 이번 에폭에 낼 배치 (레코드 번호 배열 목록)"""
+        batches = bucket_batches(
+            self.lengths,
+            self.batch_size,
+            self.seed,
+            self.epoch,
+            self.pool_batches,
+            self.drop_last,
+        )
+        return split_batches(batches, self.rank, self.world_size, even=True)
+
+    def __len__(self) -> int:
+        return len(self.plan())
+
+    def __iter__(self) -> Iterator[Batch]:
+        batches = self.plan()
+        info = get_worker_info()
+        worker = 0
+        if info is not None:
+            worker = info.id
+            batches = split_batches(batches, info.id, info.num_workers)
+        rng = np.random.default_rng([self.seed, self.epoch, self.rank, worker])
+        # 워커 안에서는 폭이 seq_len인 버퍼 하나를 재사용해 채우고, 내보낼 때만 [B, L]로 복사
+        buf = np.full((self.batch_size, self.seq_len), self.pad_id, dtype=np.int64)
+        for b in batches:
+            lens = self.lengths[b]
+            width = min(padded_len(int(lens.max()), self.pad_multiple), self.seq_len)
+            for row, i in enumerate(b.tolist()):
+                n = int(lens[row])
+                buf[row, :n] = self.records[i][:n]
+                buf[row, n:width] = self.pad_id
+            ids = buf[: len(b), :width]
+            ids = self.augment(ids, rng)[0] if self.augment is not None else ids.copy()
+            yield torch.from_numpy(ids), torch.from_numpy(lens.copy())
+
+
+class PinnedBatches:
+    """
+    DataLoader 출력을 미리 잡아 둔 pinned 버퍼 링([slots, B, seq_len])에 복사한 뒤
+    non_blocking으로 장치에 올립니다. 배치마다 pinned 메모리를 새로 할당하지 않으며
+    (DataLoader pin_memory=True와 달리), 슬롯은 그 슬롯의 복사가 끝난 뒤에만 다시 씁니다.
+    CPU 장치면 슬롯 뷰를 그대로 내므로 slots개 배치 안에 다 써야 합니다.
+    stats(): 지금까지의 samples/sec, tokens/sec, 패딩 비율.
+    """
+
+    def __init__(
+        self,
+        loader: DataLoader,
+        batch_size: int,
+        seq_len: int,
+        device: Union[str, torch.device] = "cuda",
+        slots: int = 3,
+    ):
+        self.loader = loader
+        self.device = torch.device(device)
+        self.cuda = self.device.type == "cuda"
+        self.buf = torch.empty((slots, batch_size, seq_len), dtype=torch.int64)
+        if self.cuda:
+            self.buf = self.buf.pin_memory()
+        self.events = [None] * slots
+        self.samples = self.tokens = self.padded = 0
+        self.seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self.loader)
+
+    def set_epoch(self, epoch: int) -> None:
+        self.loader.dataset.set_epoch(epoch)
+
+    def __iter__(self) -> Iterator[Batch]:
+        t0 = time.perf_counter()
+        for k, (ids, lengths) in enumerate(self.loader):
+            slot = k % len(self.buf)
+            if self.events[slot] is not None:
+                self.events[slot].synchronize()  # 이 슬롯의 이전 H2D 복사가 끝날 때까지
+            b, width = ids.shape
+            view = self.buf[slot, :b, :width]
+            view.copy_(ids)
+            self.samples += b
+            self.tokens += int(lengths.sum())
+            self.padded += b * width
+            if self.cuda:
+                out = view.to(self.device, non_blocking=True)
+                self.events[slot] = torch.cuda.Event()
+                self.events[slot].record()
+                lengths = lengths.to(self.device, non_blocking=True)
+            else:
+                out = view
+            self.seconds += time.perf_counter() - t0
+            yield out, lengths
+            t0 = time.perf_counter()  # 학습 스텝 시간은 빼고 로더 시간만 셈
+
+    def stats(self) -> Dict[str, float]:
+        sec = max(self.seconds, 1e-9)
+        return {
+            "samples": self.samples,
+            "samples_per_sec": self.samples / sec,
+            "tokens_per_sec": self.tokens / sec,
+            "padding_ratio": 1.0 - self.tokens / max(self.padded, 1),
+        }
+
+
+def make_loader(
+    prefix: Union[str, Path],
+    batch_size: int = 24,
+    seq_len: int = 1024,
+    num_workers: int = 2,
+    device: Optional[Union[str, torch.device]] = None,
+    seed: int = 0,
+    rank: int = 0,
+    world_size: int = 1,
+    **kwargs,
+) -> PinnedBatches:
+    """
+    data/ds/{kind}_{split} 접두 경로 -> 장치로 올라간 (ids, lengths) 배치 반복자.
+    기본값은 docs/TRAINING_CFG.md의 melody_transformer batch_size / seq_len_tokens.
+    kwargs는 LengthBucketDataset로 넘어갑니다
+    (pool_batches, pad_multiple, pad_id, drop_last, augment).
+    """
+    records = PackedRecords(prefix, max_len=seq_len)
+    dataset = LengthBucketDataset(
+        records, batch_size, seq_len, seed=seed, rank=rank, world_size=world_size, **kwargs
+    )
+    loader = DataLoader(
+        dataset,
+        batch_size=None,
+        num_workers=num_workers,
+        prefetch_factor=4 if num_workers > 0 else None,
+    )
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    return PinnedBatches(loader, batch_size, seq_len, device)
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from data.pack_dataset import OUT_DIR, load_vocab, to_ids  # noqa: E402
+from models.length_index import (  # noqa: E402
+    PackedRecords,
+    bucket_batches,
+    padding_stats,
+    split_batches,
+)
+from web.backend.pipeline import controls_for, stub_generate  # noqa: E402
+
+
+def write_synthetic(path: Path, kind: str, n: int, seq_len: int, seed: int = 0) -> None:
+    """data/ds가 없을 때: 스텁 생성기 토큰으로 pack_dataset.py 형식의 JSONL을 만듭니다."""
+    tok2id = load_vocab()
+    rng = np.random.default_rng(seed)
+    prompts = ["lofi chill 80bpm", "fast house 124bpm", "calm piano 70bpm", "hiphop 90bpm"]
+    with path.open("w", encoding="utf-8") as f:
+        for i in range(n):
+            bars = int(rng.choice([1, 2, 4, 4, 8, 16]))  # 드럼 루프는 대부분 짧음
+            tokens = stub_generate(controls_for(prompts[i % len(prompts)]), i, bars)[kind]
+            ids = to_ids(tokens, tok2id, seq_len)
+            f.write(json.dumps({"ids": ids, "src": f"synthetic_{i}", "kind": kind}) + "\n")
+
+
+def check_split(lengths: np.ndarray, batch_size: int, ranks: int, workers: int) -> int:
+    """랭크 x 워커로 나눈 배치를 합치면 각 레코드가 정확히 한 번씩 나오는지 확인"""
+    batches = bucket_batches(lengths, batch_size, seed=0, epoch=1)
+    seen = []
+    for r in range(ranks):
+        mine = split_batches(batches, r, ranks, even=True)
+        for w in range(workers):
+            seen += [i for b in split_batches(mine, w, workers) for i in b.tolist()]
+    assert len(seen) == len(set(seen)), "duplicate samples across ranks/workers"
+    return len(seen)
+
+
+def main(prefix: Path, batch_size: int, seq_len: int, workers: int, epochs: int) -> None:
+    t0 = time.perf_counter()
+    records = PackedRecords(prefix, max_len=seq_len)
+    print(f"{prefix.name}: {len(records)} records, length index in {time.perf_counter() - t0:.2f}s")
+    lengths = records.lengths
+    print(
+        f"lengths: median {np.median(lengths):.0f}, p90 {np.percentile(lengths, 90):.0f}, "
+        f"max {lengths.max()} tokens"
+    )
+
+    plan = bucket_batches(lengths, batch_size)
+    naive_plan = [
+        np.arange(i, min(i + batch_size, len(lengths))) for i in range(0, len(lengths), batch_size)
+    ]
+    naive = padding_stats(lengths, naive_plan, seq_len=seq_len)
+    per_batch = padding_stats(lengths, naive_plan)
+    bucketed = padding_stats(lengths, plan)
+    print(f"padding: pad to {seq_len} {naive['padding_ratio']:.1%}, ", end="")
+    print(f"pad to batch max {per_batch['padding_ratio']:.1%}, ", end="")
+    print(f"length buckets {bucketed['padding_ratio']:.1%}")
+    shrink = naive["padded_tokens"] / bucketed["padded_tokens"]
+    print(f"batch tensor tokens per epoch: {shrink:.1f}x fewer than padding to {seq_len}")
+
+    n = check_split(lengths, batch_size, ranks=2, workers=max(workers, 1))
+    print(f"2 ranks x {max(workers, 1)} workers: {n} samples, no duplicates")
+
+    try:  # 위의 길이 인덱스/패딩 검사는 numpy만 쓰므로 torch 없이도 돌아감
+        from models.packed_loader import make_loader
+    except ModuleNotFoundError as e:
+        print(f"loader: skipped ({e.name} is not installed)")
+        return
+    loader = make_loader(prefix, batch_size, seq_len, num_workers=workers)
+    for epoch in range(epochs):
+        loader.set_epoch(epoch)
+        for _ in loader:
+            pass
+    s = loader.stats()
+    print(
+        f"loader ({workers} workers, {loader.device}): {s['samples_per_sec']:.0f} samples/s, "
+        f"{s['tokens_per_sec'] / 1e3:.0f}k tokens/s, padding {s['padding_ratio']:.1%}"
+    )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--kind", choices=["melody", "drums"], default="drums")
+    ap.add_argument("--split", default="train")
+    ap.add_argument("--batch_size", type=int, default=24)
+    ap.add_argument("--seq_len", type=int, default=1024)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--epochs", type=int, default=2)
+    ap.add_argument("--synthetic", type=int, default=2000, help="Records if data/ds is missing")
+    args = ap.parse_args()
+
+    prefix = OUT_DIR / f"{args.kind}_{args.split}"
+    if Path(str(prefix) + ".jsonl").exists() or Path(str(prefix) + ".idx").exists():
+        main(prefix, args.batch_size, args.seq_len, args.workers, args.epochs)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            prefix = Path(tmp) / f"{args.kind}_{args.split}"
+            write_synthetic(Path(str(prefix) + ".jsonl"), args.kind, args.synthetic, args.seq_len)
+            print(f"No {args.kind}_{args.split} in {OUT_DIR}; using {args.synthetic} stub records")
+            main(prefix, args.batch_size, args.seq_len, args.workers, args.epochs)
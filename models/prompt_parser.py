@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import re  # 정규 표현식 모듈
-from typing import List, Optional
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
 
 # --- Lexicons ---------------------------------------------------------------
 # 다양한 장르에 대한 매핑. 사용자 입력에서 일반적인 표현을 표준화합니다.
@@ -79,12 +80,62 @@ DEFAULT_BPM = {
 DEFAULTS = {"genre": "lofi", "mood": "calm", "density": "mid", "key": "C_major", "bpm": 90}
 
 
+# --- Compiled matchers ------------------------------------------------------
+# 한 번만 컴파일해 두는 BPM/키 패턴
+_BPM_WITH_UNIT = re.compile(r"(\d{2,3})\s*bpm", flags=re.I)  # '숫자 bpm' 패턴
+_BPM_BARE = re.compile(r"\b(\d{2,3})\b")  # 독립적인 숫자 패턴
+# '음표(A-G)[#b]? (major|minor|maj|min)?' 패턴
+_KEY = re.compile(r"\b([A-Ga-g])([#b]?)(?:\s|-)?(major|minor|maj|min)?\b")
+
+# 어휘 테이블 순서: 결과 슬롯 0=genre, 1=mood, 2=density
+_TABLES = (GENRE_MAP, MOOD_MAP, DENSITY_MAP)
+
+
+def _trie_pattern(keys: Iterable[str]) -> str:
+    """키 목록을 공통 접두사를 묶은 트라이 형태의 정규식 조각으로 만듭니다 (긴 분기 우선)."""
+    trie: Dict[str, dict] = {}
+    for k in keys:
+        node = trie
+        for ch in k:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # 키 끝 표시
+
+    def emit(node: dict) -> str:
+        alts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body  # 여기서 끝나는 키가 있으면 나머지는 선택
+
+    return emit(trie)
+
+
+def _compile_lexicons() -> Tuple[re.Pattern, Dict[str, List[Tuple[int, int, str]]]]:
+    """
+    세 어휘 테이블의 모든 키를 하나의 트라이 정규식으로 묶습니다.
+    전방탐색 (?=(...)) 이라 겹치는 위치도 모두 찾고, 한 위치에서는 가장 긴 키가 잡힙니다.
+    같은 위치에서 시작하는 더 짧은 키는 반드시 그 접두사이므로, 키마다 접두사 키들의
+    (슬롯, 테이블 내 순서, 값)을 미리 모아 둡니다 (예: 'chillhop'은 MOOD의 'chill'도 인정).
+    """
+    entries: Dict[str, List[Tuple[int, int, str]]] = {}
+    for slot, table in enumerate(_TABLES):
+        for order, (k, v) in enumerate(table.items()):
+            entries.setdefault(k, []).append((slot, order, v))
+    credits = {k: [e for k2 in entries if k.startswith(k2) for e in entries[k2]] for k in entries}
+    pattern = re.compile("(?=(" + _trie_pattern(entries) + "))")
+    return pattern, credits
+
+
+_LEXICON_RE, _CREDITS = _compile_lexicons()
+
+
 # --- Helpers ----------------------------------------------------------------
 def _find_bpm(text: str) -> Optional[int]:
     """프롬프트에서 BPM 값을 찾습니다. '85 bpm' 또는 '92'와 같은 패턴을 찾습니다."""
-    m = re.search(r"(\d{2,3})\s*bpm", text, flags=re.I)  # '숫자 bpm' 패턴 찾기
+    # '숫자 bpm' 패턴 찾기 (소문자 텍스트에 'bpm'이 없으면 정규식 스캔 생략)
+    m = _BPM_WITH_UNIT.search(text) if "bpm" in text else None
     if not m:
-        m = re.search(r"\b(\d{2,3})\b", text)  # 독립적인 숫자 패턴 찾기
+        m = _BPM_BARE.search(text)  # 독립적인 숫자 패턴 찾기
     if m:
         bpm = int(m.group(1))
         if 40 <= bpm <= 220:  # BPM 유효 범위 확인
@@ -94,8 +145,7 @@ def _find_bpm(text: str) -> Optional[int]:
 
 def _find_key(text: str) -> Optional[str]:
     """프롬프트에서 키(예: C minor, G# major)를 찾습니다."""
-    # '음표(A-G)[#b]? (major|minor|maj|min)?' 패턴 찾기
-    m = re.search(r"\b([A-Ga-g])([#b]?)(?:\s|-)?(major|minor|maj|min)?\b", text)
+    m = _KEY.search(text)
     if not m:
         return None
     note = m.group(1).upper() + m.group(2)  # 음표와 #/b 조합
@@ -106,12 +156,34 @@ def _find_key(text: str) -> Optional[str]:
     return f"{note}_{qual}"  # 'C_major' 형식으로 반환
 
 
-def _first_match(text: str, table: dict) -> Optional[str]:
-    """주어진 텍스트에서 테이블의 첫 번째 키 매치를 찾아 해당 값을 반환합니다."""
-    for k, v in table.items():
-        if k in text:  # 텍스트에 키가 포함되어 있으면
-            return v  # 해당 값 반환
-    return None
+def _match_lexicons(text: str) -> List[Optional[str]]:
+    """
+    한 번의 스캔으로 장르/분위기/밀도 값을 찾습니다.
+    테이블마다 텍스트에 (부분 문자열로) 등장하는 키 중 테이블 순서가 가장 앞선 것의 값을 고르므로
+    키를 차례로 `k in text` 검사하던 방식과 결과가 같습니다.
+    """
+    best: List[Optional[Tuple[int, str]]] = [None] * len(_TABLES)
+    for hit in _LEXICON_RE.findall(text):
+        for slot, order, value in _CREDITS[hit]:
+            if best[slot] is None or order < best[slot][0]:
+                best[slot] = (order, value)
+    return [b[1] if b else None for b in best]
+
+
+@lru_cache(maxsize=4096)
+def _parse_normalized(t: str) -> Tuple[str, ...]:
+    """정규화된(소문자) 프롬프트 -> 제어 토큰 튜플 (LRU 캐시)"""
+    genre, mood, density = _match_lexicons(t)
+    genre = genre or DEFAULTS["genre"]
+    mood = mood or DEFAULTS["mood"]
+    density = density or DEFAULTS["density"]
+    bpm = _find_bpm(t) or DEFAULT_BPM.get(
+        genre, DEFAULTS["bpm"]
+    )  # BPM 찾기, 없으면 장르별 기본값, 없으면 전체 기본값
+    key = _find_key(t) or DEFAULTS["key"]  # 키 찾기, 없으면 기본값
+
+    # 최종 토큰 생성
+    return (f"GENRE:{genre}", f"MOOD:{mood}", f"BPM:{int(bpm)}", f"KEY:{key}", f"DENSITY:{density}")
 
 
 # --- Public -----------------------------------------------------------------
@@ -120,19 +192,18 @@ def parse_prompt(prompt: str) -> List[str]:
     주어진 텍스트 프롬프트를 제어 토큰 리스트로 파싱합니다.
     예: ['GENRE:lofi','MOOD:calm','BPM:85','KEY:C_major','DENSITY:low']
     """
-    t = prompt.lower()  # 입력 프롬프트를 소문자로 변환
+    # 소문자 + 양끝 공백 제거로 정규화한 문자열을 캐시 키로 사용 (결과에는 영향 없음)
+    return list(_parse_normalized(prompt.lower().strip()))
+
+
+def parse_prompts(prompts: Iterable[str]) -> List[List[str]]:
+    """여러 프롬프트를 한 번에 파싱합니다. 같은 프롬프트는 캐시에서 바로 반환됩니다."""
+    return [parse_prompt(p) for p in prompts]
 
-    # 각 요소에 대해 매핑 테이블에서 첫 번째 일치하는 항목을 찾거나 기본값을 사용합니다.
-    genre = _first_match(t, GENRE_MAP) or DEFAULTS["genre"]
-    mood = _first_match(t, MOOD_MAP) or DEFAULTS["mood"]
-    density = _first_match(t, DENSITY_MAP) or DEFAULTS["density"]
-    bpm = _find_bpm(t) or DEFAULT_BPM.get(
-        genre, DEFAULTS["bpm"]
-    )  # BPM 찾기, 없으면 장르별 기본값, 없으면 전체 기본값
-    key = _find_key(t) or DEFAULTS["key"]  # 키 찾기, 없으면 기본값
 
-    # 최종 토큰 리스트 생성
-    return [f"GENRE:{genre}", f"MOOD:{mood}", f"BPM:{int(bpm)}", f"KEY:{key}", f"DENSITY:{density}"]
+def parse_cache_info():
+    """프롬프트 캐시 통계 (hits, misses, maxsize, currsize)"""
+    return _parse_normalized.cache_info()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import argparse
+import ctypes
+import os
+import platform
+import sys
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+import torch
+import torch.ao.nn.quantized.dynamic as nnqd
+import torch.nn as nn
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.s_melody.model import MelodyTransformer  # noqa: E402
+
+# 체크포인트 "arch" -> 설정(config)으로 fp32 모델을 만드는 함수.
+# 드럼 VAE가 들어오면 같은 {'config', 'state_dict'} 형식으로 여기에 등록합니다.
+ARCHS: Dict[str, Callable[..., nn.Module]] = {
+    "melody": MelodyTransformer,
+}
+THREADS_ENV = "BGM_TORCH_THREADS"  # 워커 프로세스당 intra-op 스레드 수 (기본 1)
+
+
+def configure_threads(threads: Optional[int] = None) -> int:
+    """
+    현재 프로세스의 intra-op 스레드 수와 양자화 엔진을 정합니다.
+    워커 N개가 각각 코어를 전부 쓰면 서로 밀어내므로 기본값은 1 (BGM_TORCH_THREADS로 변경).
+    """
+    n = max(1, int(threads or os.environ.get(THREADS_ENV, "1")))
+    torch.set_num_threads(n)
+    try:
+        torch.set_num_interop_threads(1)  # 첫 병렬 작업 전에만 바꿀 수 있음
+    except RuntimeError:
+        pass
+    engines = torch.backends.quantized.supported_engines
+    arm = platform.machine().lower() in ("arm64", "aarch64")
+    for engine in ("qnnpack", "fbgemm") if arm else ("fbgemm", "qnnpack"):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            break
+    return n
+
+
+def _build(ckpt: dict) -> nn.Module:
+    arch = ckpt.get("arch", "melody")  # arch 키가 없는 예전 체크포인트는 멜로디 모델
+    if arch not in ARCHS:
+        raise ValueError(f"unknown arch {arch!r} (known: {', '.join(ARCHS)})")
+    return ARCHS[arch](**ckpt["config"])
+
+
+def _skeleton(ckpt: dict, int8: bool) -> nn.Module:
+    """
+    load_state_dict(assign=True)로 채울 모델 틀. int8이면 nn.Linear를 빈 동적 양자화 Linear로
+    바꿔 둡니다 (quantize_dynamic처럼 fp32 사본을 만들어 양자화하지 않음).
+    meta 장치는 쓰지 않음: 첫 meta 텐서가 torch._meta_registrations(sympy 등)를 임포트해
+    워커마다 ~150 MB가 늘어남. 대신 초기화된 fp32 가중치는 _release_freed가 OS에 돌려줍니다.
+    """
+    model = _build(ckpt).eval()
+    if int8:
+        for parent in list(model.modules()):
+            for name, child in list(parent.named_children()):
+                if type(child) is nn.Linear:
+                    qlinear = nnqd.Linear(
+                        child.in_features,
+                        child.out_features,
+                        bias_=child.bias is not None,
+                        dtype=torch.qint8,
+                    )
+                    setattr(parent, name, qlinear)
+    return model
+
+
+def _release_freed() -> None:
+    """틀의 초기화 가중치처럼 해제된 힙 메모리를 OS에 돌려줌 (glibc만, 그 밖에는 무시)"""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def quantize(model: nn.Module) -> nn.Module:
+    """nn.Linear만 int8 동적 양자화 (임베딩/LayerNorm은 fp32 그대로)"""
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {nn.Linear}, dtype=torch.qint8)
+
+
+def export_int8(src: Union[str, Path], dst: Union[str, Path], arch: str = "melody") -> dict:
+    """
+    fp32 체크포인트 -> int8 체크포인트. 형식은 같고 "quantized": "int8" 키가 붙습니다.
+    반환: 앞뒤 파일 크기 (바이트).
+    """
+    ckpt = torch.load(str(src), map_location="cpu")
+    ckpt.setdefault("arch", arch)
+    model = _build(ckpt)
+    model.load_state_dict(ckpt["state_dict"])
+    qmodel = quantize(model)
+    extra = {k: v for k, v in ckpt.items() if k not in ("state_dict", "quantized")}
+    torch.save({**extra, "state_dict": qmodel.state_dict(), "quantized": "int8"}, str(dst))
+    return {"fp32_bytes": Path(src).stat().st_size, "int8_bytes": Path(dst).stat().st_size}
+
+
+@torch.inference_mode()
+def warm_up(model: nn.Module) -> None:
+    """첫 요청이 커널 선택/메모리 할당 비용을 내지 않도록 프리필 + 디코드를 한 번씩 돌림"""
+    if isinstance(model, MelodyTransformer):
+        cache = model.new_cache(1)
+        idx = torch.ones(1, 8, dtype=torch.long)
+        model(idx, cache)
+        model(idx[:, :1], cache)
+
+
+def load_for_inference(
+    path: Union[str, Path], threads: Optional[int] = None, warm: bool = True
+) -> nn.Module:
+    """
+    fp32 또는 int8 체크포인트 -> CPU 추론 모델.
+    - torch.load(mmap=True) + load_state_dict(assign=True): 임베딩/LayerNorm 등 fp32 텐서는
+      파일 페이지를 그대로 가리키므로 같은 파일을 읽는 워커들이 페이지 캐시를 공유합니다.
+    - int8 Linear 가중치는 엔진 형식으로 다시 패킹되어 프로세스마다 복사본을 갖습니다
+      (fp32의 1/4 크기).
+    - int8은 빈 양자화 Linear 틀에 바로 읽으므로 fp32 Linear 사본을 양자화하지 않습니다.
+    """
+    configure_threads(threads)
+    ckpt = torch.load(str(path), map_location="cpu", mmap=True)
+    int8 = ckpt.get("quantized") == "int8"
+    model = _skeleton(ckpt, int8)
+    model.load_state_dict(ckpt["state_dict"], assign=True)
+    if isinstance(model, MelodyTransformer) and not int8:
+        model.head.weight = model.tok.weight  # assign이 끊은 입출력 임베딩 공유를 되살림
+    if warm:
+        warm_up(model)
+    _release_freed()
+    return model
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export an fp32 checkpoint as int8 for CPU inference")
+    ap.add_argument("src", type=Path)
+    ap.add_argument("dst", type=Path)
+    ap.add_argument("--arch", default="melody", choices=sorted(ARCHS))
+    args = ap.parse_args()
+    sizes = export_int8(args.src, args.dst, args.arch)
+    print(
+        f"{args.src} ({sizes['fp32_bytes'] / 1e6:.1f} MB) -> "
+        f"{args.dst} ({sizes['int8_bytes'] / 1e6:.1f} MB)"
+    )
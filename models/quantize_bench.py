@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.quantize import export_int8, load_for_inference, quantize  # noqa: E402
+from models.s_melody.model import (  # noqa: E402
+    DEFAULT_CONFIG,
+    MelodyTransformer,
+    load_checkpoint,
+    save_checkpoint,
+)
+
+VAL = ROOT / "data" / "ds" / "melody_val.jsonl"  # data/pack_dataset.py 출력
+
+
+def _median_ms(fn, repeats: int) -> float:
+    fn()  # 첫 호출은 제외
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return 1000 * float(np.median(times))
+
+
+@torch.inference_mode()
+def latency(model: MelodyTransformer, batch: int, prompt: int, decode: int, repeats: int):
+    """(프리필 ms, 디코드 토큰당 ms): 샘플러와 같은 KV 캐시 경로"""
+    idx = torch.randint(0, model.config["vocab_size"], (batch, prompt + decode))
+
+    def prefill():
+        model(idx[:, :prompt], model.new_cache(batch))
+
+    def generate():
+        cache = model.new_cache(batch)
+        model(idx[:, :prompt], cache)
+        for t in range(prompt, prompt + decode):
+            model(idx[:, t : t + 1], cache)
+
+    pre = _median_ms(prefill, repeats)
+    return pre, (_median_ms(generate, repeats) - pre) / decode
+
+
+def load_val(path: Path, limit: int, max_len: int) -> List[torch.Tensor]:
+    out = []
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            ids = json.loads(line)["ids"][:max_len]
+            if len(ids) > 1:
+                out.append(torch.tensor(ids, dtype=torch.long))
+            if len(out) >= limit:
+                break
+    return out
+
+
+@torch.inference_mode()
+def evaluate(model: MelodyTransformer, seqs: List[torch.Tensor]) -> Dict[str, float]:
+    """teacher forcing 검증 perplexity와 다음 토큰 top-1 정확도"""
+    nll, hits, n = 0.0, 0, 0
+    for ids in seqs:
+        logits = model(ids[None, :-1])[0]
+        nll += float(F.cross_entropy(logits, ids[1:], reduction="sum"))
+        hits += int((logits.argmax(-1) == ids[1:]).sum())
+        n += len(ids) - 1
+    return {"ppl": float(np.exp(nll / n)), "acc": hits / n, "tokens": n}
+
+
+@torch.inference_mode()
+def check_load(ckpt: Path, models: Dict[str, MelodyTransformer]) -> float:
+    """
+    mmap + assign 경로가 평범한 load_checkpoint와 같은 모델을 만드는지 확인합니다.
+    fp32: 로짓이 정확히 같고 head/tok 가중치 공유가 유지됨, int8: head는 양자화된 별도 모듈이고
+    빈 틀에 읽은 모델이 fp32 모델을 quantize한 것과 로짓까지 같음.
+    반환: int8과 fp32 로짓의 최대 차이 (로짓 범위 대비 비율)
+    """
+    ref = load_checkpoint(ckpt)
+    fp32, int8 = models["fp32"], models["int8"]
+    assert fp32.head.weight is fp32.tok.weight, "fp32 head/tok weights are no longer tied"
+    assert isinstance(int8.head, torch.ao.nn.quantized.dynamic.Linear), type(int8.head)
+    idx = torch.randint(0, ref.config["vocab_size"], (2, 96))
+    want = ref(idx)
+    assert torch.equal(fp32(idx), want), "mmap/assign fp32 load changed the logits"
+    got = int8(idx)
+    assert torch.equal(got, quantize(load_checkpoint(ckpt))(idx)), "int8 skeleton load differs"
+    cache = fp32.new_cache(2)  # KV 캐시 경로도 같은 가중치를 씀
+    fp32(idx[:, :95], cache)
+    assert torch.allclose(fp32(idx[:, 95:], cache)[:, -1], want[:, -1], atol=1e-4)
+    return float((got - want).abs().max() / (want.max() - want.min()))
+
+
+def load_rss(path: Path, threads: int) -> Dict[str, float]:
+    """
+    새 프로세스에서 체크포인트를 읽은 뒤 늘어난 메모리 (MB).
+    RssFile은 워커끼리 공유되는 mmap 페이지, RssAnon은 프로세스 전용.
+    """
+    out = subprocess.run(
+        [sys.executable, __file__, "--_rss", str(path), "--threads", str(threads)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _report_rss(path: Path, threads: int) -> None:
+    base = _proc_status()
+    model = load_for_inference(path, threads)  # 재는 동안 살아 있어야 mmap 페이지가 잡힘
+    now = _proc_status()
+    del model
+    print(json.dumps({k: now[k] - base.get(k, 0.0) for k in now}))
+
+
+def _proc_status() -> Dict[str, float]:
+    keys = ("VmRSS", "RssAnon", "RssFile")
+    out = {}
+    for line in Path("/proc/self/status").read_text().splitlines():
+        name, _, value = line.partition(":")
+        if name in keys:
+            out[name] = int(value.split()[0]) / 1024  # kB -> MB
+    return out
+
+
+def run(ckpt: Path, threads: int, val: Optional[Path], limit: int, bound: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        int8 = Path(tmp) / "int8.pt"
+        sizes = export_int8(ckpt, int8)
+        models = {
+            "fp32": load_for_inference(ckpt, threads),
+            "int8": load_for_inference(int8, threads),
+        }
+        paths = {"fp32": ckpt, "int8": int8}
+        print(f"threads={threads}, engine={torch.backends.quantized.engine}")
+        err = check_load(ckpt, models)
+        print(
+            f"load: fp32 (mmap, assign, tied head) matches load_checkpoint exactly, "
+            f"int8 logits within {err:.2%} of the logit range"
+        )
+        rss = {}
+        for name, model in models.items():
+            torch.manual_seed(0)
+            pre, dec = latency(model, batch=4, prompt=64, decode=64, repeats=5)
+            size = sizes[f"{name}_bytes"] / 1e6
+            line = f"{name}: prefill {pre:7.2f} ms, decode {dec:6.2f} ms/token, file {size:6.1f} MB"
+            if Path("/proc/self/status").exists():
+                r = rss[name] = load_rss(paths[name], threads)
+                line += (
+                    f", load RSS +{r['VmRSS']:.1f} MB "
+                    f"(private {r['RssAnon']:.1f}, shared mmap {r['RssFile']:.1f})"
+                )
+            print(line)
+        if rss:  # 워커 메모리를 줄이려는 경로이므로 fp32보다 작아야 함
+            assert rss["int8"]["VmRSS"] < rss["fp32"]["VmRSS"], "int8 load uses more memory"
+
+        if val is None or not val.exists():
+            print(f"No validation set at {val}; run data/pack_dataset.py to check perplexity")
+            return
+        seqs = load_val(val, limit, models["fp32"].max_len)
+        res = {name: evaluate(model, seqs) for name, model in models.items()}
+        for name, r in res.items():
+            print(f"{name}: ppl {r['ppl']:.3f}, top-1 {r['acc']:.4f} on {r['tokens']} tokens")
+        rel = res["int8"]["ppl"] / res["fp32"]["ppl"] - 1
+        assert rel <= bound, f"int8 perplexity {rel:+.2%} exceeds bound {bound:.0%}"
+        print(f"int8 perplexity {rel:+.2%} (bound {bound:.0%})")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--checkpoint", type=Path, default=None, help="fp32 checkpoint (default: random)"
+    )
+    ap.add_argument("--threads", type=int, default=1, help="Intra-op threads (as per worker)")
+    ap.add_argument("--val", type=Path, default=VAL)
+    ap.add_argument("--val_records", type=int, default=200)
+    ap.add_argument("--bound", type=float, default=0.05, help="Max relative perplexity increase")
+    ap.add_argument("--_rss", type=Path, default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args._rss is not None:
+        _report_rss(args._rss, args.threads)
+        sys.exit(0)
+
+    if args.checkpoint is not None:
+        run(args.checkpoint, args.threads, args.val, args.val_records, args.bound)
+    else:
+        # 학습된 체크포인트가 없으면 TRAINING_CFG 크기의 무작위 모델로 속도/메모리만 비교
+        with tempfile.TemporaryDirectory() as tmp:
+            torch.manual_seed(0)
+            path = Path(tmp) / "fp32.pt"
+            save_checkpoint(MelodyTransformer(**DEFAULT_CONFIG).eval(), path)
+            run(path, args.threads, args.val, args.val_records, args.bound)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+VOCAB = ROOT / "data" / "vocab.json"
+
+# 시퀀스 머리에만 오는 제어 토큰 (본문 중간에는 샘플링 금지)
+CONTROL_PREFIXES = ("BPM:", "KEY:", "GENRE:", "MOOD:", "DENSITY:")
+
+# 문법 상태: FREE = 다음에 TS/BAR/NOTE가 올 수 있음, AFTER_NOTE = DUR만, DONE = 끝남 (PAD만)
+FREE, AFTER_NOTE, DONE = 0, 1, 2
+N_STATES = 3
+
+
+def load_vocab(path: Path = VOCAB) -> Dict[str, int]:
+    """data/vocab.json의 token_to_id"""
+    return json.loads(Path(path).read_text(encoding="utf-8"))["token_to_id"]
+
+
+class MelodyGrammar:
+    """
+    멜로디 토큰 문법을 어휘 크기의 표로 미리 계산해 둔 것 (샘플링 루프에서는 표 조회만 함).
+    masks[state]      : 그 상태에서 샘플링할 수 있는 토큰 (bool, [N_STATES, V])
+    next_state[token] : 토큰을 낸 뒤의 상태 (NOTE -> AFTER_NOTE, EOS -> DONE, 나머지 -> FREE)
+    ts_steps[token]   : 토큰이 진행시키는 16분음표 스텝 수 (TS:n -> n)
+    EOS는 샘플링하지 않습니다. 목표 길이에 도달하면 샘플러가 직접 끝냅니다.
+    """
+
+    def __init__(self, token_to_id: Dict[str, int]):
+        self.token_to_id = dict(token_to_id)
+        size = max(token_to_id.values()) + 1
+        self.id_to_token = [""] * size
+        for tok, i in token_to_id.items():  # 정식 토큰이 버킷 별칭보다 먼저 나옴
+            if not self.id_to_token[i]:
+                self.id_to_token[i] = tok
+        self.id_to_token = [t or "UNK" for t in self.id_to_token]
+        self.pad_id = token_to_id.get("PAD", 0)
+        self.bos_id = token_to_id["BOS"]
+        self.eos_id = token_to_id["EOS"]
+
+        kinds = np.array([t.partition(":")[0] for t in self.id_to_token])
+        note = kinds == "NOTE"
+        dur = kinds == "DUR"
+        ts = kinds == "TS"
+        bar = np.array([t == "BAR" for t in self.id_to_token])
+
+        self.masks = np.zeros((N_STATES, size), dtype=bool)
+        self.masks[FREE] = ts | bar | note
+        self.masks[AFTER_NOTE] = dur
+        self.masks[DONE, self.pad_id] = True
+
+        self.next_state = np.full(size, FREE, dtype=np.int64)
+        self.next_state[note] = AFTER_NOTE
+        self.next_state[self.eos_id] = DONE
+        self.next_state[self.pad_id] = DONE
+
+        self.ts_steps = np.zeros(size, dtype=np.int64)
+        for i, tok in enumerate(self.id_to_token):
+            if tok.startswith("TS:") and tok[3:].isdigit():
+                self.ts_steps[i] = int(tok[3:])
+
+    @classmethod
+    def from_vocab(cls, path: Path = VOCAB) -> "MelodyGrammar":
+        return cls(load_vocab(path))
+
+    @property
+    def vocab_size(self) -> int:
+        return len(self.id_to_token)
+
+    def prefix(self, header: Sequence[str]) -> List[int]:
+        """BOS + 어휘에 있는 제어 토큰 id (어휘에 없는 값은 조건에서 빠짐)"""
+        ids = [self.bos_id]
+        for tok in header:
+            if tok.startswith(CONTROL_PREFIXES) and tok in self.token_to_id:
+                ids.append(self.token_to_id[tok])
+        return ids
+
+    def decode(self, ids: Sequence[int]) -> List[str]:
+        """id 목록 -> 토큰 (PAD는 버림)"""
+        return [self.id_to_token[i] for i in ids if i != self.pad_id]
+
+    def validate(self, ids: Sequence[int], state: int = FREE) -> Optional[int]:
+        """문법을 어기는 첫 위치 (없으면 None). 샘플러 출력 검사용."""
+        for pos, i in enumerate(ids):
+            if not self.masks[state, i] and not (i == self.eos_id and state == FREE):
+                return pos
+            state = self.next_state[i]
+        return None
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+# docs/TRAINING_CFG.md의 melody_transformer / common.seq_len_tokens 값
+DEFAULT_CONFIG: Dict[str, Union[int, float]] = {
+    "vocab_size": 823,
+    "d_model": 256,
+    "n_layers": 6,
+    "n_heads": 8,
+    "ff_dim": 1024,
+    "max_len": 1024,
+    "dropout": 0.1,
+}
+
+
+class KVCache:
+    """
+    층별 키/값 캐시. [층, 배치, 헤드, max_len, head_dim] 버퍼를 미리 잡아 두고
+    length까지 채워 쓰므로, 토큰 하나를 디코딩할 때 이전 위치의 K/V를 다시 계산하지 않습니다.
+    """
+
+    def __init__(
+        self,
+        n_layers: int,
+        batch: int,
+        n_heads: int,
+        max_len: int,
+        head_dim: int,
+        dtype: torch.dtype = torch.float32,
+        device: Union[str, torch.device] = "cpu",
+    ):
+        shape = (n_layers, batch, n_heads, max_len, head_dim)
+        self.k = torch.zeros(shape, dtype=dtype, device=device)
+        self.v = torch.zeros(shape, dtype=dtype, device=device)
+        self.length = 0
+
+    @property
+    def max_len(self) -> int:
+        return self.k.shape[3]
+
+    def select(self, rows: torch.Tensor) -> None:
+        """배치에서 rows 행만 남깁니다 (끝난 후보를 빼서 이후 스텝 계산을 줄임)."""
+        self.k = self.k[:, rows]
+        self.v = self.v[:, rows]
+
+
+class CausalSelfAttention(nn.Module):
+    def __init__(self, d_model: int, n_heads: int, dropout: float):
+        super().__init__()
+        assert d_model % n_heads == 0, "d_model must be divisible by n_heads"
+        self.n_heads = n_heads
+        self.qkv = nn.Linear(d_model, 3 * d_model)
+        self.proj = nn.Linear(d_model, d_model)
+        self.dropout = dropout
+
+    def forward(self, x: torch.Tensor, cache: Optional[KVCache], layer: int) -> torch.Tensor:
+        b, t, d = x.shape
+        q, k, v = self.qkv(x).view(b, t, 3, self.n_heads, d // self.n_heads).unbind(2)
+        q, k, v = (z.transpose(1, 2) for z in (q, k, v))  # [B, H, T, Dh]
+        mask, causal = None, True
+        if cache is not None:
+            s = cache.length
+            cache.k[layer, :, :, s : s + t] = k
+            cache.v[layer, :, :, s : s + t] = v
+            k = cache.k[layer, :, :, : s + t]
+            v = cache.v[layer, :, :, : s + t]
+            if s > 0:  # 새 쿼리 위치 s..s+t-1 은 키 0..자기 위치까지만 봄
+                causal = False
+                if t > 1:
+                    qpos = torch.arange(s, s + t, device=x.device)[:, None]
+                    mask = torch.arange(s + t, device=x.device)[None, :] <= qpos
+        y = F.scaled_dot_product_attention(
+            q,
+            k,
+            v,
+            attn_mask=mask,
+            is_causal=causal,
+            dropout_p=self.dropout if self.training else 0.0,
+        )
+        return self.proj(y.transpose(1, 2).reshape(b, t, d))
+
+
+class Block(nn.Module):
+    """사전 LayerNorm 트랜스포머 블록"""
+
+    def __init__(self, d_model: int, n_heads: int, ff_dim: int, dropout: float):
+        super().__init__()
+        self.ln1 = nn.LayerNorm(d_model)
+        self.attn = CausalSelfAttention(d_model, n_heads, dropout)
+        self.ln2 = nn.LayerNorm(d_model)
+        self.ff = nn.Sequential(
+            nn.Linear(d_model, ff_dim), nn.GELU(), nn.Linear(ff_dim, d_model), nn.Dropout(dropout)
+        )
+        self.drop = nn.Dropout(dropout)
+
+    def forward(self, x: torch.Tensor, cache: Optional[KVCache], layer: int) -> torch.Tensor:
+        x = x + self.drop(self.attn(self.ln1(x), cache, layer))
+        return x + self.ff(self.ln2(x))
+
+
+class MelodyTransformer(nn.Module):
+    """
+    제어 토큰 머리(BOS, KEY, BPM, ...)에 조건화된 디코더 전용 멜로디 트랜스포머.
+    forward(idx, cache)는 cache가 있으면 cache.length 위치부터 이어서 계산하고 캐시를 채웁니다.
+    """
+
+    def __init__(self, **config):
+        super().__init__()
+        self.config = {**DEFAULT_CONFIG, **config}
+        c = self.config
+        self.tok = nn.Embedding(c["vocab_size"], c["d_model"])
+        self.pos = nn.Embedding(c["max_len"], c["d_model"])
+        self.drop = nn.Dropout(c["dropout"])
+        self.blocks = nn.ModuleList(
+            Block(c["d_model"], c["n_heads"], c["ff_dim"], c["dropout"])
+            for _ in range(c["n_layers"])
+        )
+        self.norm = nn.LayerNorm(c["d_model"])
+        self.head = nn.Linear(c["d_model"], c["vocab_size"], bias=False)
+        self.head.weight = self.tok.weight  # 입출력 임베딩 공유
+        self.apply(self._init)
+
+    @staticmethod
+    def _init(m: nn.Module) -> None:
+        if isinstance(m, (nn.Linear, nn.Embedding)):
+            nn.init.normal_(m.weight, std=0.02)
+        if isinstance(m, nn.Linear) and m.bias is not None:
+            nn.init.zeros_(m.bias)
+
+    @property
+    def max_len(self) -> int:
+        return int(self.config["max_len"])
+
+    def new_cache(self, batch: int) -> KVCache:
+        c = self.config
+        p = self.tok.weight  # int8 양자화 후에도 fp32로 남는 파라미터
+        return KVCache(
+            c["n_layers"],
+            batch,
+            c["n_heads"],
+            c["max_len"],
+            c["d_model"] // c["n_heads"],
+            dtype=p.dtype,
+            device=p.device,
+        )
+
+    def forward(self, idx: torch.Tensor, cache: Optional[KVCache] = None) -> torch.Tensor:
+        """idx: [B, T] 토큰 id -> [B, T, V] 로짓"""
+        start = cache.length if cache is not None else 0
+        t = idx.shape[1]
+        if start + t > self.max_len:
+            raise ValueError(f"sequence length {start + t} exceeds max_len {self.max_len}")
+        pos = torch.arange(start, start + t, device=idx.device)
+        h = self.drop(self.tok(idx) + self.pos(pos))
+        for i, block in enumerate(self.blocks):
+            h = block(h, cache, i)
+        if cache is not None:
+            cache.length += t
+        return self.head(self.norm(h))
+
+
+def save_checkpoint(model: MelodyTransformer, path: Union[str, Path], **extra) -> None:
+    """{'config', 'state_dict', ...extra} 형식으로 저장"""
+    torch.save({"config": model.config, "state_dict": model.state_dict(), **extra}, str(path))
+
+
+def load_checkpoint(
+    path: Union[str, Path], device: Union[str, torch.device] = "cpu"
+) -> MelodyTransformer:
+    """save_checkpoint로 저장한 체크포인트 -> 추론 모드의 모델"""
+    ckpt = torch.load(str(path), map_location=device)
+    model = MelodyTransformer(**ckpt["config"])
+    model.load_state_dict(ckpt["state_dict"])
+    return model.to(device).eval()
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.quantize import load_for_inference  # noqa: E402
+from models.s_melody.grammar import FREE, MelodyGrammar  # noqa: E402
+from models.s_melody.model import MelodyTransformer  # noqa: E402
+from models.tempo import quantize_bpm  # noqa: E402
+from models.vocab import key_token, parse_key  # noqa: E402
+
+CHECKPOINT = ROOT / "checkpoints" / "melody.pt"  # MELODY_CKPT 환경 변수로 바꿀 수 있음
+STEPS_PER_BAR = 16
+
+
+class GrammarTables:
+    """MelodyGrammar 표를 샘플링 장치의 텐서로 한 번만 옮겨 둔 것"""
+
+    def __init__(self, grammar: MelodyGrammar, device: torch.device):
+        self.grammar = grammar
+        # 허용 안 되는 토큰은 -inf: 로짓에 더하기만 하면 마스크가 적용됨
+        self.bias = torch.zeros(grammar.masks.shape, device=device)
+        self.bias[~torch.from_numpy(grammar.masks).to(device)] = float("-inf")
+        self.next_state = torch.from_numpy(grammar.next_state).to(device)
+        self.ts_steps = torch.from_numpy(grammar.ts_steps).to(device)
+
+
+def _filter_top_k(logits: torch.Tensor, top_k: int) -> torch.Tensor:
+    if top_k <= 0 or top_k >= logits.shape[-1]:
+        return logits
+    kth = torch.topk(logits, top_k, dim=-1).values[:, -1:]
+    return logits.masked_fill(logits < kth, float("-inf"))
+
+
+@torch.inference_mode()
+def sample(
+    model: MelodyTransformer,
+    grammar: MelodyGrammar,
+    prefix: Sequence[int],
+    target_steps: int,
+    n_samples: int = 4,
+    temperature: float = 1.0,
+    top_k: int = 0,
+    seed: Optional[int] = None,
+    use_cache: bool = True,
+    logit_bias: Optional[torch.Tensor] = None,
+) -> List[Tuple[List[int], float]]:
+    """
+    prefix(BOS + 제어 토큰)에 이어 n_samples개의 후보를 한 배치로 샘플링합니다.
+    - 매 스텝 문법 상태별로 미리 계산한 로짓 마스크만 더해 NOTE 뒤에는 DUR만,
+      본문 중간에는 제어 토큰이 나오지 않게 합니다.
+    - 남은 스텝보다 긴 TS:n은 후보별로 막으므로 TS 스텝 누적은 target_steps(요청 BPM의
+      30초 루프)를 넘지 않고, 정확히 닿은 후보는 EOS로 끝내고 KV 캐시와 배치에서 빼므로
+      남은 후보만 계속 계산합니다.
+    - logit_bias([V])는 모든 스텝의 로짓에 더해집니다 (예: NOTE/TS 비율로 밀도 조절).
+    - use_cache=False면 매 스텝 전체 문맥을 다시 계산합니다 (벤치마크 비교용).
+    temperature는 0보다 커야 합니다.
+    반환: 후보별 (생성 토큰 id 목록, 평균 로그 확률), 입력 순서 그대로.
+    """
+    device = model.tok.weight.device
+    tables = GrammarTables(grammar, device)
+    bias = tables.bias if logit_bias is None else tables.bias + logit_bias.to(device)
+    gen = torch.Generator(device=device)
+    if seed is not None:
+        gen.manual_seed(seed)
+    max_new = model.max_len - len(prefix)
+
+    ctx = torch.tensor([list(prefix)] * n_samples, dtype=torch.long, device=device)
+    cache = model.new_cache(n_samples) if use_cache else None
+    logits = model(ctx, cache)[:, -1]
+    rows = torch.arange(n_samples, device=device)  # 살아 있는 후보의 원래 번호
+    state = torch.full((n_samples,), FREE, dtype=torch.long, device=device)
+    steps = torch.zeros(n_samples, dtype=torch.long, device=device)
+    out: List[List[int]] = [[] for _ in range(n_samples)]
+    logp = torch.zeros(n_samples, device=device)
+
+    for _ in range(max_new):
+        scores = logits.float() / temperature + bias[state]
+        over = tables.ts_steps > (target_steps - steps)[:, None]  # 목표를 지나치는 TS:n
+        scores = _filter_top_k(scores.masked_fill(over, float("-inf")), top_k)
+        probs = torch.softmax(scores, dim=-1)
+        tok = torch.multinomial(probs, 1, generator=gen).squeeze(1)
+        logp[rows] += torch.log(probs.gather(1, tok[:, None]).squeeze(1))
+        for r, t in zip(rows.tolist(), tok.tolist()):
+            out[r].append(t)
+        state = tables.next_state[tok]
+        steps = steps + tables.ts_steps[tok]
+        # TS 토큰 뒤에는 항상 FREE이므로 목표에 닿는 순간 멈춰도 NOTE/DUR 짝이 깨지지 않음
+        finished = steps >= target_steps
+        if finished.any():
+            for r in rows[finished].tolist():
+                out[r].append(grammar.eos_id)
+            keep = ~finished
+            if not keep.any():
+                break
+            rows, state, steps, tok = rows[keep], state[keep], steps[keep], tok[keep]
+            if cache is not None:
+                cache.select(keep.nonzero().squeeze(1))
+            else:
+                ctx = ctx[keep]
+        if cache is not None:
+            if cache.length >= cache.max_len:
+                break
+            logits = model(tok[:, None], cache)[:, -1]
+        else:
+            ctx = torch.cat([ctx, tok[:, None]], dim=1)
+            if ctx.shape[1] > model.max_len:
+                break
+            logits = model(ctx)[:, -1]
+    return [(ids, float(logp[i]) / max(len(ids), 1)) for i, ids in enumerate(out)]
+
+
+def target_steps_for(bpm: float, bars: Optional[int] = None) -> int:
+    """요청 BPM에서 30초 루프(가장 가까운 마디 수)의 16분음표 스텝 수"""
+    from render.loop_tools.loop import loop_bars
+
+    return (bars or loop_bars(bpm)) * STEPS_PER_BAR
+
+
+@lru_cache(maxsize=1)
+def _load(path: str) -> Tuple[MelodyTransformer, MelodyGrammar]:
+    """
+    워커 프로세스마다 한 번만 체크포인트와 어휘를 읽음.
+    fp32/int8(models/quantize.py export) 모두 받으며 스레드 수는 BGM_TORCH_THREADS를 따름.
+    """
+    return load_for_inference(path), MelodyGrammar.from_vocab()
+
+
+def checkpoint_path() -> str:
+    """generate가 읽을 체크포인트 (서버가 캐시 키에 이 파일을 해시함)"""
+    return os.environ.get("MELODY_CKPT", str(CHECKPOINT))
+
+
+def generate(controls: Sequence[str], seed: int, bars: int) -> Dict[str, List[str]]:
+    """
+    web/backend 생성기 규약 (--generator models.s_melody.sample:generate).
+    후보 4개를 한 배치로 뽑아 평균 로그 확률이 가장 높은 것을 멜로디 토큰으로 돌려줍니다.
+    드럼 스트림은 드럼 모델이 붙기 전까지 비워 둡니다.
+    """
+    model, grammar = _load(checkpoint_path())
+    cv = dict(tok.split(":", 1) for tok in controls)
+    bpm = float(cv.get("BPM", 90))
+    # 어휘의 조성 토큰은 샤프 표기(Bb -> A#), BPM 토큰은 5 BPM 격자뿐
+    # (렌더 템포는 호출자가 정확한 bpm으로 따로 넘김)
+    key = parse_key(cv.get("KEY", "")) or (0, "major")
+    header = [key_token(*key), f"BPM:{quantize_bpm(bpm)}"] + [
+        t for t in controls if not t.startswith(("KEY:", "BPM:"))
+    ]
+    prefix = grammar.prefix(header)
+    cands = sample(model, grammar, prefix, target_steps_for(bpm, bars), seed=seed)
+    ids, _ = max(cands, key=lambda c: c[1])
+    return {"melody": ["BOS"] + header[:2] + grammar.decode(ids), "drums": []}
@@ -0,0 +1,100 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import torch
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.s_melody.grammar import MelodyGrammar  # noqa: E402
+from models.s_melody.model import DEFAULT_CONFIG, MelodyTransformer  # noqa: E402
+from models.s_melody.sample import sample, target_steps_for  # noqa: E402
+from models.tempo import quantize_bpm  # noqa: E402
+
+# 무작위 초기화 모델로 돌리는 작은 설정 (문법/캐시 검증과 속도 비교용)
+TINY = {"d_model": 64, "n_layers": 2, "n_heads": 4, "ff_dim": 256, "dropout": 0.0}
+
+
+def check_cache(model: MelodyTransformer, vocab_size: int, n: int = 48) -> float:
+    """한 번에 계산한 로짓과 KV 캐시로 한 토큰씩 계산한 로짓의 최대 차이"""
+    torch.manual_seed(0)
+    idx = torch.randint(0, vocab_size, (2, n))
+    with torch.inference_mode():
+        full = model(idx)
+        cache = model.new_cache(2)
+        steps = [model(idx[:, :8], cache)]  # 프리필 8개 + 이후 한 개씩
+        steps += [model(idx[:, t : t + 1], cache) for t in range(8, n)]
+    return float((torch.cat(steps, dim=1) - full).abs().max())
+
+
+def density_bias(grammar: MelodyGrammar, ts_boost: float = 6.0) -> torch.Tensor:
+    """
+    무작위 모델이 음표만 끝없이 내지 않도록 TS:1/BAR 로짓을 올림 (실제 멜로디 밀도 흉내).
+    긴 TS:n까지 올리면 몇 토큰 만에 목표 스텝에 닿아 속도 비교가 의미 없어지므로 TS:1만 올림.
+    """
+    bias = torch.zeros(grammar.vocab_size)
+    for i, tok in enumerate(grammar.id_to_token):
+        if tok in ("TS:1", "BAR"):
+            bias[i] = ts_boost
+    return bias
+
+
+def run(model, grammar, prefix, target, n_samples, use_cache, bias, seed=0):
+    t0 = time.perf_counter()
+    cands = sample(
+        model, grammar, prefix, target, n_samples, seed=seed, use_cache=use_cache, logit_bias=bias
+    )
+    sec = time.perf_counter() - t0
+    return cands, sec, sum(len(ids) for ids, _ in cands)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--full", action="store_true", help="Use the TRAINING_CFG model size")
+    ap.add_argument("--bpm", type=float, default=90.0)
+    ap.add_argument("--samples", type=int, default=4, help="Candidates sampled as one batch")
+    ap.add_argument("--threads", type=int, default=1)
+    args = ap.parse_args()
+    torch.set_num_threads(args.threads)
+
+    grammar = MelodyGrammar.from_vocab()
+    config = {**DEFAULT_CONFIG, "vocab_size": grammar.vocab_size}
+    if not args.full:
+        config.update(TINY)
+    torch.manual_seed(0)
+    model = MelodyTransformer(**config).eval()
+    print(f"Model: {sum(p.numel() for p in model.parameters()) / 1e6:.2f}M params, {config}")
+
+    err = check_cache(model, grammar.vocab_size)
+    assert err < 1e-4, err
+    print(f"KV cache matches full forward (max |diff| = {err:.2e})")
+
+    prefix = grammar.prefix(["KEY:C_major", f"BPM:{quantize_bpm(args.bpm)}"])
+    assert len(prefix) == 3, prefix
+    target = target_steps_for(args.bpm)
+    bias = density_bias(grammar)
+    cands, _, _ = run(model, grammar, prefix, target, args.samples, True, bias)
+    for ids, lp in cands:
+        bad = grammar.validate(ids)
+        assert bad is None, (bad, grammar.decode(ids[max(0, bad - 3) : bad + 1]))
+        steps = int(sum(grammar.ts_steps[i] for i in ids))
+        assert ids[-1] == grammar.eos_id and steps == target, (steps, target)
+    print(f"{args.samples} candidates valid, each stops at {target} steps (30s at {args.bpm} BPM)")
+    naive, _, _ = run(model, grammar, prefix, target, args.samples, False, bias)
+    same = sum(a == b for (a, _), (b, _) in zip(cands, naive))
+    lp_err = max(abs(a - b) for (_, a), (_, b) in zip(cands, naive))
+    print(f"same seed: {same}/{args.samples} candidates identical with and without KV cache")
+    print(f"           (max mean-logprob diff {lp_err:.1e})")
+    assert same == args.samples, "KV-cached sampling diverged from the full-context path"
+
+    for n in (1, args.samples):
+        _, t_naive, n_naive = run(model, grammar, prefix, target, n, False, bias)
+        _, t_kv, n_kv = run(model, grammar, prefix, target, n, True, bias)
+        print(
+            f"batch={n}: naive {n_naive / t_naive:8.1f} tok/s ({t_naive:.2f}s), "
+            f"KV cache {n_kv / t_kv:8.1f} tok/s ({t_kv:.2f}s), x{t_naive / t_kv:.1f}, "
+            f"{n_kv / n:.0f} tokens/candidate"
+        )
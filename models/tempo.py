@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+# BPM 토큰 격자: BPM_MIN..BPM_MAX를 BPM_GRID 간격으로 (build_vocab이 전부 어휘에 넣음)
+BPM_MIN, BPM_MAX = 40, 220
+BPM_GRID = 5
+BPM_TOKENS = tuple(f"BPM:{b}" for b in range(BPM_MIN, BPM_MAX + 1, BPM_GRID))
+FALLBACK_BPM = 90.0  # 템포 맵도 온셋도 없을 때
+FOLD_LO = 85.0  # 온셋 히스토그램은 BPM을 [FOLD_LO, 2*FOLD_LO) 한 옥타브로 접어서 셈 (120 중심)
+_FOLD_BINS = 120  # 옥타브당 히스토그램 구간 수 (85 BPM 부근 약 0.5, 170 부근 약 1 BPM)
+
+
+def quantize_bpm(bpm: float, grid: int = BPM_GRID) -> int:
+    """BPM -> [BPM_MIN, BPM_MAX] 안의 가장 가까운 grid 배수 (grid=1이면 정수 반올림)"""
+    lo = -(-BPM_MIN // grid) * grid
+    hi = BPM_MAX // grid * grid
+    return int(min(hi, max(lo, round(bpm / grid) * grid)))
+
+
+def map_tempo(tempo: np.ndarray, end: float) -> float:
+    """
+    템포 맵(midi_events.TEMPO_DTYPE) -> 0..end초 구간에서 머문 시간으로 가중한 BPM 중앙값.
+    짧은 리타르단도나 끝부분의 템포 변경에 끌려가지 않습니다.
+    """
+    if len(tempo) == 1:
+        return float(tempo["bpm"][0])
+    edges = np.minimum(np.append(tempo["time"], max(end, 0.0)), max(end, 0.0))
+    dur = np.diff(edges)
+    if dur.sum() <= 0:  # 노트가 모두 첫 변경 전에 끝남
+        return float(tempo["bpm"][0])
+    order = np.argsort(tempo["bpm"], kind="stable")
+    cum = np.cumsum(dur[order])
+    return float(tempo["bpm"][order][np.searchsorted(cum, 0.5 * cum[-1])])
+
+
+def onset_tempo(starts: np.ndarray, fold_lo: float = FOLD_LO) -> Optional[float]:
+    """
+    템포 맵이 없는 파일용: 연속 온셋 간격(50ms~2s)을 BPM으로 바꿔 log2 축에서 한 옥타브
+    [fold_lo, 2*fold_lo)로 접고, 원형 히스토그램의 최빈 구간 평균을 돌려줍니다.
+    간격이 없으면 None. estimate_tempo의 파이썬 군집 루프 대신 배열 연산 몇 번으로 끝납니다.
+    """
+    onsets = np.unique(starts)
+    ioi = np.diff(onsets)
+    ioi = ioi[(ioi > 0.05) & (ioi < 2.0)]
+    if not len(ioi):
+        return None
+    pos = np.log2(60.0 / ioi / fold_lo) % 1.0  # 옥타브 안 위치 [0, 1)
+    counts = np.bincount((pos * _FOLD_BINS).astype(np.int64) % _FOLD_BINS, minlength=_FOLD_BINS)
+    padded = np.concatenate((counts[-2:], counts, counts[:2])).astype(np.float64)
+    smooth = np.convolve(padded, [1.0, 2.0, 3.0, 2.0, 1.0], "valid")  # 옥타브 경계를 넘어 평활
+    center = (int(np.argmax(smooth)) + 0.5) / _FOLD_BINS
+    d = (pos - center + 0.5) % 1.0 - 0.5  # 최빈 구간 중심과의 원형 거리
+    near = np.abs(d) <= 2.5 / _FOLD_BINS
+    return float(fold_lo * 2.0 ** ((center + d[near].mean()) % 1.0))
+
+
+def resolve_tempo(
+    notes: np.ndarray, tempo: np.ndarray, fold_lo: float = FOLD_LO
+) -> Tuple[float, str]:
+    """
+    (BPM, 출처) - 출처는 "map"(파일의 템포 이벤트), "onsets"(온셋 히스토그램), "default".
+    BPM은 [BPM_MIN, BPM_MAX]로 자른 실수값이라 스텝 길이 계산에 그대로 쓰고,
+    토큰에는 quantize_bpm()을 씁니다.
+    """
+    if len(tempo):
+        end = float(notes["end"].max()) if len(notes) else 0.0
+        bpm, source = map_tempo(tempo, end), "map"
+    else:
+        bpm, source = onset_tempo(notes["start"], fold_lo), "onsets"
+        if bpm is None:
+            return FALLBACK_BPM, "default"
+    if not np.isfinite(bpm) or bpm <= 0:
+        return FALLBACK_BPM, "default"
+    return float(min(BPM_MAX, max(BPM_MIN, bpm))), source
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.batch_tokenize import find_midis  # noqa: E402
+from models.midi_events import estimate_tempo, parse_midi  # noqa: E402
+from models.tempo import BPM_MAX, BPM_MIN, quantize_bpm, resolve_tempo  # noqa: E402
+
+RAW_DIR = ROOT / "data" / "midi_raw"
+RESOLUTION = 480
+
+
+def _varlen(value: int) -> bytes:
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def smf_bytes(notes: np.ndarray, channel: int, tempos: List[Tuple[int, int]]) -> bytes:
+    """(시작 틱, 끝 틱, 피치) 배열 + 템포 이벤트 (틱, usec) -> 형식 0 SMF 바이트"""
+    events = [(t, 0, b"\xff\x51\x03" + u.to_bytes(3, "big")) for t, u in tempos]
+    for start, end, pitch in notes.tolist():
+        events.append((start, 2, bytes([0x90 | channel, pitch, 100])))
+        events.append((end, 1, bytes([0x80 | channel, pitch, 0])))
+    events.sort(key=lambda e: (e[0], e[1]))
+    body = bytearray()
+    tick = 0
+    for t, _, msg in events:
+        body += _varlen(t - tick) + msg
+        tick = t
+    body += b"\x00\xff\x2f\x00"
+    header = b"MThd" + (6).to_bytes(4, "big") + (0).to_bytes(2, "big") + (1).to_bytes(2, "big")
+    header += RESOLUTION.to_bytes(2, "big")
+    return header + b"MTrk" + len(body).to_bytes(4, "big") + bytes(body)
+
+
+def synth_file(rng: np.random.Generator, kind: str) -> Tuple[bytes, Optional[float]]:
+    """
+    실제 템포를 아는 합성 파일 -> (SMF 바이트, 정답 BPM).
+    drums  : GMD처럼 0틱 템포 이벤트 + 16분음표 그리드 드럼
+    changes: 템포 변경이 있는 파일 (정답 = 가장 오래 머문 템포)
+    perform: MAESTRO 연주처럼 템포 이벤트 없이 흔들리는 온셋
+    """
+    bpm = float(rng.integers(BPM_MIN + 20, BPM_MAX - 20))
+    n = int(rng.integers(400, 4000))
+    sixteenth = RESOLUTION // 4
+    if kind == "perform":  # 기본 120 BPM 틱으로 초 단위 시각을 기록 (틱 = 초 * 960)
+        steps = np.sort(rng.choice(np.arange(n * 2), n, replace=False))
+        sec = steps * (60.0 / bpm / 4) + rng.normal(0, 0.008, n)
+        start = np.maximum(0, np.round((sec - sec.min()) * 2 * RESOLUTION)).astype(np.int64)
+        notes = np.stack([start, start + 200, rng.integers(40, 90, n)], axis=1)
+        return smf_bytes(notes, 0, []), bpm
+    steps = np.sort(rng.choice(np.arange(n * 2), n, replace=False)).astype(np.int64)
+    start = steps * sixteenth
+    notes = np.stack([start, start + sixteenth // 2, rng.choice([36, 38, 42, 46], n)], axis=1)
+    tempos = [(0, int(round(6e7 / bpm)))]
+    if kind == "changes":  # 끝부분 20%는 다른 템포 (리타르단도 등)
+        tempos.append((int(start[int(n * 0.8)]), int(round(6e7 / (bpm * 0.7)))))
+    return smf_bytes(notes, 9, tempos), bpm
+
+
+def octave_close(est: float, truth: float, tol: float = 0.03) -> bool:
+    """옥타브(2배/절반) 차이를 무시하고 tol 이내인지"""
+    r = np.log2(est / truth)
+    return abs(r - round(r)) < np.log2(1 + tol)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", type=Path, default=RAW_DIR, help="Raw MIDI directory (recursive)")
+    ap.add_argument("--limit", type=int, default=None, help="Use only the first N files")
+    ap.add_argument("--synth", type=int, default=60, help="Synthetic files when --dir is empty")
+    args = ap.parse_args()
+
+    files = find_midis(args.dir)[: args.limit] if args.dir.exists() else []
+    rng = np.random.default_rng(0)
+    if files:
+        corpus = [(p.name, p.read_bytes(), None) for p in files]
+        source = f"{len(files)} files under {args.dir}"
+    else:
+        kinds = ("drums", "changes", "perform")
+        corpus = [(kinds[i % 3], *synth_file(rng, kinds[i % 3])) for i in range(args.synth)]
+        source = f"{args.synth} synthetic files (no MIDI under {args.dir})"
+
+    t_old = t_new = 0.0
+    old_vals, new_vals, sources = [], [], []
+    hits_old = hits_new = n_truth = 0
+    for name, data, truth in corpus:
+        notes, tempo = parse_midi(data)  # 파싱은 두 경로가 같으므로 측정에서 제외
+        t0 = time.perf_counter()
+        try:  # 기존 tokenizer_drums._estimate_bpm (PrettyMIDI.estimate_tempo + 40~220 제한)
+            old = min(BPM_MAX, max(BPM_MIN, estimate_tempo(notes)))
+        except ValueError:
+            old = 90.0
+        t1 = time.perf_counter()
+        new, src = resolve_tempo(notes, tempo)
+        t2 = time.perf_counter()
+        t_old += t1 - t0
+        t_new += t2 - t1
+        old_vals.append(int(round(old)))
+        new_vals.append(quantize_bpm(new))
+        sources.append(src)
+        if truth is not None:
+            n_truth += 1
+            if name == "perform":  # 템포 정보가 없으면 옥타브 모호성은 어느 쪽도 풀 수 없음
+                hits_old += octave_close(old, truth)
+                hits_new += octave_close(new, truth)
+            else:
+                hits_old += abs(old - truth) <= 2.5
+                hits_new += quantize_bpm(new) == quantize_bpm(truth)
+
+    n = len(corpus)
+    print(f"corpus: {source}")
+    print(f"  estimate_tempo : {1e3 * t_old / n:8.3f} ms/file")
+    print(f"  resolve_tempo  : {1e3 * t_new / n:8.3f} ms/file  (x{t_old / t_new:.0f} faster)")
+    print(
+        f"  saved {1e3 * (t_old - t_new):.0f} ms over {n} files; "
+        f"sources: " + ", ".join(f"{s}={sources.count(s)}" for s in sorted(set(sources)))
+    )
+    print(
+        f"  distinct BPM tokens: estimate_tempo {len(set(old_vals))}, "
+        f"resolve_tempo + grid {len(set(new_vals))}"
+    )
+    if n_truth:
+        print(
+            f"  matches known tempo: estimate_tempo {hits_old}/{n_truth}, "
+            f"resolve_tempo {hits_new}/{n_truth}"
+        )
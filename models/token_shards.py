@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+# 샤드 형식:
+#   <prefix>.bin : 모든 레코드의 토큰 ID를 uint16으로 이어 붙인 원시 배열
+#   <prefix>.idx : 헤더(매직, 레코드 수, 메타 길이) + offsets(uint64) + lengths(uint32)
+#                  + 메타 JSON (토큰 표, 레코드별 원본 이름, 서명)
+# 토큰 표를 샤드마다 따로 두므로 어휘집을 만들기 전(토큰화 직후)에도 쓸 수 있고,
+# 어휘집 ID로 바꿀 때는 작은 조회 테이블 하나로 벡터화하여 변환합니다.
+IDX_MAGIC = b"AMTIDX01"
+_HEADER = struct.Struct("<8sQQ")
+ID_DTYPE = np.uint16
+MAX_TABLE = int(np.iinfo(ID_DTYPE).max) + 1
+
+TokenSeq = Union[Sequence[str], np.ndarray]
+
+
+def shard_paths(prefix: Path) -> tuple[Path, Path]:
+    """샤드 접두 경로 -> (.bin, .idx) 경로"""
+    prefix = Path(prefix)
+    return Path(str(prefix) + ".bin"), Path(str(prefix) + ".idx")
+
+
+def shard_exists(prefix: Path) -> bool:
+    """두 파일이 모두 있어야 유효한 샤드로 봅니다."""
+    return all(p.exists() for p in shard_paths(prefix))
+
+
+class ShardWriter:
+    """
+    레코드를 차례로 추가하여 샤드를 씁니다. close() 시점에 원자적으로 교체됩니다.
+    tokens를 주면 그 순서를 ID로 고정하고 (예: 어휘집 순서), 없으면 등장 순서대로 표를 늘립니다.
+    """
+
+    def __init__(self, prefix: Path, tokens: Optional[List[str]] = None, unk: str = "UNK"):
+        self.bin_path, self.idx_path = shard_paths(prefix)
+        self.bin_path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_bin = self.bin_path.with_name(self.bin_path.name + ".tmp")
+        self._f = open(self._tmp_bin, "wb")
+        self._fixed = tokens is not None
+        self.tokens: List[str] = list(tokens or [])
+        self._tok2id: Dict[str, int] = {t: i for i, t in enumerate(self.tokens)}
+        self._unk = self._tok2id.get(unk)
+        self.names: List[str] = []
+        self.sigs: List[Optional[str]] = []
+        self._offsets: List[int] = []
+        self._lengths: List[int] = []
+        self._pos = 0
+
+    def _id(self, tok: str) -> int:
+        i = self._tok2id.get(tok)
+        if i is None:
+            if self._fixed:
+                if self._unk is None:
+                    raise KeyError(f"Token {tok!r} not in the fixed table")
+                return self._unk
+            i = len(self.tokens)
+            if i >= MAX_TABLE:
+                raise ValueError("Token table exceeds uint16 range")
+            self.tokens.append(tok)
+            self._tok2id[tok] = i
+        return i
+
+    def add(self, name: str, tokens: TokenSeq, sig: Optional[str] = None) -> None:
+        """
+        레코드 하나를 추가합니다.
+        tokens: 문자열 토큰 리스트 또는 이 샤드의 토큰 표 기준 ID 배열
+        sig: 원본 파일 서명 (증분 재구성 시 재사용 판단용)
+        """
+        if isinstance(tokens, np.ndarray):
+            ids = tokens.astype(ID_DTYPE, copy=False)
+        else:
+            ids = np.fromiter((self._id(t) for t in tokens), dtype=ID_DTYPE, count=len(tokens))
+        self._f.write(ids.tobytes())
+        self.names.append(name)
+        self.sigs.append(sig)
+        self._offsets.append(self._pos)
+        self._lengths.append(ids.size)
+        self._pos += ids.size
+
+    def close(self) -> None:
+        """인덱스를 쓰고 임시 파일을 최종 경로로 교체합니다."""
+        if self._f.closed:
+            return
+        self._f.close()
+        meta = json.dumps(
+            {"tokens": self.tokens, "names": self.names, "sigs": self.sigs}, ensure_ascii=False
+        ).encode("utf-8")
+        tmp_idx = self.idx_path.with_name(self.idx_path.name + ".tmp")
+        with open(tmp_idx, "wb") as f:
+            f.write(_HEADER.pack(IDX_MAGIC, len(self.names), len(meta)))
+            f.write(np.asarray(self._offsets, dtype=np.uint64).tobytes())
+            f.write(np.asarray(self._lengths, dtype=np.uint32).tobytes())
+            f.write(meta)
+        os.replace(self._tmp_bin, self.bin_path)
+        os.replace(tmp_idx, self.idx_path)
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:  # 실패하면 기존 샤드를 건드리지 않음
+            self._f.close()
+            self._tmp_bin.unlink(missing_ok=True)
+
+
+class TokenShard:
+    """
+    샤드를 메모리 매핑으로 엽니다. shard[i]는 복사 없는 uint16 NumPy 뷰이며,
+    여러 프로세스가 같은 파일을 열면 페이지 캐시를 공유합니다.
+    """
+
+    def __init__(self, prefix: Path):
+        self.bin_path, self.idx_path = shard_paths(prefix)
+        raw = self.idx_path.read_bytes()
+        magic, n, meta_len = _HEADER.unpack_from(raw, 0)
+        if magic != IDX_MAGIC:
+            raise ValueError(f"Not a token shard index: {self.idx_path}")
+        pos = _HEADER.size
+        self.offsets = np.frombuffer(raw, dtype=np.uint64, count=n, offset=pos)
+        pos += 8 * n
+        self.lengths = np.frombuffer(raw, dtype=np.uint32, count=n, offset=pos)
+        pos += 4 * n
+        meta = json.loads(raw[pos : pos + meta_len].decode("utf-8"))
+        self.tokens: List[str] = meta["tokens"]
+        self.names: List[str] = meta["names"]
+        self.sigs: List[Optional[str]] = meta.get("sigs") or [None] * n
+        if self.bin_path.stat().st_size == 0:  # 빈 파일은 mmap할 수 없음
+            self.ids = np.zeros(0, dtype=ID_DTYPE)
+        else:
+            self.ids = np.memmap(self.bin_path, dtype=ID_DTYPE, mode="r")
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        o = int(self.offsets[i])
+        return self.ids[o : o + int(self.lengths[i])]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def decode(self, i: int) -> List[str]:
+        """레코드를 문자열 토큰으로 되돌립니다 (디버깅용)."""
+        table = self.tokens
+        return [table[j] for j in self[i].tolist()]
+
+    def lookup_table(self, tok2id: Dict[str, int], unk: str = "UNK") -> np.ndarray:
+        """이 샤드의 ID -> 어휘집 ID 조회 테이블 (없는 토큰은 UNK)"""
+        unk_id = tok2id[unk]
+        return np.array([tok2id.get(t, unk_id) for t in self.tokens], dtype=ID_DTYPE)
+
+
+def write_json_dir_shard(token_dir: Path, prefix: Path) -> dict:
+    """
+    토큰 디렉터리의 <name>.json 파일들을 하나의 샤드로 묶습니다 (이름순).
+    기존 샤드에 같은 이름·서명(size:mtime_ns)의 레코드가 있으면 JSON을 다시 읽지 않고 재사용합니다.
+    반환: 통계 dict
+    """
+    old = TokenShard(prefix) if shard_exists(prefix) else None
+    reuse = {}
+    if old is not None:
+        reuse = {name: i for i, name in enumerate(old.names) if old.sigs[i] is not None}
+
+    stats = {"records": 0, "reused": 0, "parsed": 0, "errors": 0}
+    w = ShardWriter(prefix)
+    with w:
+        # 기존 샤드 ID -> 새 샤드 ID (실제로 쓰인 토큰만 새 표에 등록, -1은 미등록)
+        old_to_new = np.full(len(old.tokens) if old else 0, -1, dtype=np.int64)
+        for p in sorted(token_dir.glob("*.json")):
+            st = p.stat()
+            sig = f"{st.st_size}:{st.st_mtime_ns}"
+            i = reuse.get(p.name)
+            if i is not None and old.sigs[i] == sig:
+                rec = old[i]
+                used = np.unique(rec)
+                for j in used[old_to_new[used] < 0].tolist():
+                    old_to_new[j] = w._id(old.tokens[j])
+                w.add(p.name, old_to_new[rec], sig=sig)
+                stats["reused"] += 1
+            else:
+                try:
+                    obj = json.loads(p.read_text(encoding="utf-8"))
+                except ValueError as e:
+                    print(f"[WARN] Skip {p.name}: {e}")
+                    stats["errors"] += 1
+                    continue
+                w.add(p.name, obj.get("tokens", []), sig=sig)
+                stats["parsed"] += 1
+            stats["records"] += 1
+        # 교체 전에 기존 매핑을 해제 (Windows에서는 매핑된 파일을 교체할 수 없음)
+        old = rec = None
+    return stats
+
+
+# 크롭 윈도 인덱스: <prefix>.win.npy, 레코드 번호 / 시작 오프셋 / 길이 (모두 uint32)
+WINDOW_DTYPE = np.dtype([("record", "<u4"), ("start", "<u4"), ("length", "<u4")])
+
+
+def windows_path(prefix: Path) -> Path:
+    """샤드 접두 경로 -> 윈도 인덱스 경로"""
+    return Path(str(prefix) + ".win.npy")
+
+
+def window_starts(
+    ids: np.ndarray, crop_len: int, stride: int, min_len: int = 1, bar_id: Optional[int] = None
+) -> np.ndarray:
+    """
+    한 레코드의 크롭 시작 위치들을 계산합니다.
+    stride 간격으로 이동하되, bar_id를 주면 각 시작을 그 이후 첫 마디 경계
+    (BAR 바로 다음)로 맞춥니다.
+    크롭 길이가 min_len보다 짧아지는 시작 위치는 버립니다.
+    """
+    n = len(ids)
+    if n <= crop_len:
+        return np.zeros(1 if n >= min_len else 0, dtype=np.int64)
+    if bar_id is None:
+        starts = np.arange(0, n - min_len + 1, max(1, stride), dtype=np.int64)
+    else:
+        cand = np.concatenate(([0], np.flatnonzero(ids == bar_id) + 1)).astype(np.int64)
+        cand = cand[cand <= n - min_len]
+        picked = [0]
+        while True:  # 윈도 수만큼만 반복 (searchsorted로 다음 경계를 바로 찾음)
+            j = np.searchsorted(cand, picked[-1] + max(1, stride))
+            if j >= len(cand):
+                break
+            picked.append(int(cand[j]))
+        starts = np.asarray(picked, dtype=np.int64)
+    return starts
+
+
+class CropIndex:
+    """
+    샤드 + 윈도 인덱스. index[i]는 i번째 크롭의 복사 없는 뷰이고,
+    sample()은 크롭을 만들지 않고 무작위 윈도 번호만 고릅니다 (O(1)).
+    """
+
+    def __init__(self, prefix: Path):
+        self.shard = TokenShard(prefix)
+        self.windows = np.load(windows_path(prefix), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        rec, start, length = self.windows[i]
+        o = int(self.shard.offsets[rec]) + int(start)
+        return self.shard.ids[o : o + int(length)]
+
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """무작위 윈도 번호 n개"""
+        return rng.integers(0, len(self.windows), size=n)
@@ -1,13 +1,19 @@
 from __future__ import annotations
 
-import json
-import math
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
-import pretty_midi
+import numpy as np
+
+from models.encoding import DRUM_CLASSES, DRUMS_TOKENS, ENCODING_VERSION, TS_TOKENS
+from models.encoding import save_tokens as _save_encoded
+from models.midi_events import parse_midi
+from models.tempo import quantize_bpm, resolve_tempo
+from models.token_shards import ID_DTYPE
+from models.vocab import Vocab, get_vocab
 
 STEPS_PER_BAR = 16  # 4/4 그리드 기준
+TOKENIZER_VERSION = "2"  # 출력 토큰이 바뀌면 올림 (일괄 토큰화 매니페스트가 재처리 판단에 사용)
 
 # GM 드럼 → 압축된 클래스 매핑
 _PITCH2CLS: Dict[int, str] = {
@@ -33,18 +39,8 @@ _PITCH2CLS: Dict[int, str] = {
     52: "RIDE",  # 라이드 심벌
     39: "CLAP",  # 클랩
 }
-# 사용될 클래스 목록 (순서 중요)
-_CLASSES = [
-    "KICK",
-    "SNARE",
-    "HHC",
-    "HHO",
-    "TOM",
-    "RIDE",
-    "CRASH",
-    "CLAP",
-    "PERC",
-]  # PERC는 그 외 퍼커션
+# 사용될 클래스 목록 (순서 중요: DRUMS:<mask>의 비트 순서, PERC는 그 외 퍼커션)
+_CLASSES = list(DRUM_CLASSES)
 
 
 def _cls_for_pitch(p: int) -> str:
@@ -52,68 +48,139 @@ def _cls_for_pitch(p: int) -> str:
     return _PITCH2CLS.get(p, "PERC")
 
 
-def _estimate_bpm(pm: pretty_midi.PrettyMIDI) -> float:
-    """BPM 추정 함수 (이상값 발생 시 90으로 대체)"""
-    try:
-        bpm = float(pm.estimate_tempo())
-        if not math.isfinite(bpm) or bpm <= 0:
-            return 90.0  # 유효하지 않거나 0 이하 BPM은 90으로 대체
-        return max(40.0, min(220.0, bpm))  # BPM 범위를 40~220으로 제한
-    except Exception:
-        return 90.0  # BPM 추정 중 오류 발생 시 90 반환
+def _load_midi(midi_path: Path) -> Tuple[np.ndarray, float]:
+    """
+    MIDI -> (노트 배열, BPM). BPM은 파일의 템포 맵을 먼저 쓰고 없을 때만 온셋으로 추정합니다
+    (models.tempo.resolve_tempo). 스텝 길이는 이 실수 BPM으로 계산하고 토큰에는 격자로
+    양자화한 값을 씁니다.
+    """
+    notes, tempo = parse_midi(Path(midi_path).read_bytes())
+    return notes, resolve_tempo(notes, tempo)[0]
+
+
+# 클래스 인덱스 및 피치 -> 클래스 인덱스 조회 테이블 (매핑 없는 피치는 PERC)
+_CLS_INDEX = {c: i for i, c in enumerate(_CLASSES)}
+_PITCH_LUT = np.full(128, _CLS_INDEX["PERC"], dtype=np.int8)
+for _p, _c in _PITCH2CLS.items():
+    _PITCH_LUT[_p] = _CLS_INDEX[_c]
+# 스텝별 슬롯에 대응하는 토큰 표: 0=TS:1, 1=BAR, 2..=DRUM:<CLASS> (_CLASSES 순서, 인코딩 1)
+_SLOT_TOKENS = np.array(["TS:1", "BAR"] + [f"DRUM:{c}" for c in _CLASSES], dtype=object)
+# 인코딩 2: TS:n (n-1 위치), DRUMS:<mask> (mask 위치, 0은 빈 자리)
+_TS_TOKENS = np.array(("TS:1",) + TS_TOKENS, dtype=object)
+_DRUMS_TOKENS = np.array(("",) + DRUMS_TOKENS, dtype=object)
+_BIT_WEIGHTS = 1 << np.arange(len(_CLASSES), dtype=np.int64)
 
 
-def midi_to_drum_tokens(midi_path: Path) -> List[str]:
+def _drum_onsets(notes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """드럼 채널 노트의 시작 시각(초)과 피치를 배열로 모읍니다."""
+    drums = notes[notes["is_drum"]]
+    return drums["start"], drums["pitch"].astype(np.int64)
+
+
+def drum_hit_grid(starts: np.ndarray, pitches: np.ndarray, step_sec: float) -> np.ndarray:
+    """
+    노트 시작 시각을 16분음표 스텝으로 한 번에 양자화하여
+    (스텝 수 × 9) 불리언 히트 그리드를 만듭니다. 첫 히트가 스텝 0이 되도록 이동하며,
+    노트가 없으면 (0, 9) 배열을 반환합니다.
+    """
+    if starts.size == 0:
+        return np.zeros((0, len(_CLASSES)), dtype=bool)
+    steps = np.round(starts / step_sec).astype(np.int64)  # round()와 같은 짝수 반올림
+    steps -= steps.min()
+    grid = np.zeros((int(steps.max()) + 1, len(_CLASSES)), dtype=bool)
+    grid[steps, _PITCH_LUT[pitches]] = True
+    return grid
+
+
+def _grid_slots(grid: np.ndarray) -> np.ndarray:
+    """
+    히트 그리드 -> 채워진 슬롯 번호열 (_SLOT_TOKENS 인덱스).
+    스텝마다 [TS:1, BAR?, 클래스 9개] 슬롯 행렬을 만들고 채워진 슬롯만 행 우선으로 꺼냅니다.
+    """
+    n = grid.shape[0]
+    slots = np.full((n, 2 + len(_CLASSES)), -1, dtype=np.int8)
+    slots[:, 0] = 0  # 매 스텝 TS:1
+    slots[np.arange(1, n + 1) % STEPS_PER_BAR == 0, 1] = 1  # 16스텝마다 BAR
+    slots[:, 2:] = np.where(grid, np.arange(2, 2 + len(_CLASSES), dtype=np.int8), -1)
+    flat = slots.ravel()
+    return flat[flat >= 0]
+
+
+def _grid_events(grid: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    히트 그리드 -> 인코딩 2의 이벤트 스텝별 (TS 이동량, BAR 여부, DRUMS 마스크).
+    이벤트 스텝 = 히트가 있거나 마디 끝(BAR)인 스텝. 16스텝마다 BAR가 있으므로
+    이동량은 항상 한 마디(16) 이하이고, 마지막 스텝에는 항상 히트가 있습니다.
+    """
+    n = grid.shape[0]
+    bar = np.arange(1, n + 1) % STEPS_PER_BAR == 0
+    mask = grid.astype(np.int64) @ _BIT_WEIGHTS
+    events = np.flatnonzero(bar | (mask > 0))
+    shift = np.diff(events, prepend=-1)
+    return shift, bar[events], mask[events]
+
+
+def _event_rows(grid: np.ndarray, ts, bar, drums) -> np.ndarray:
+    """
+    이벤트마다 [TS:n, BAR?, DRUMS:mask?] 세 칸을 채운 뒤 빈 칸을 빼고 행 우선으로 꺼냅니다.
+    ts/drums는 이동량/마스크 -> 토큰(또는 id) 표, bar는 BAR 토큰(또는 id).
+    """
+    shift, is_bar, mask = _grid_events(grid)
+    rows = np.empty((len(shift), 3), dtype=ts.dtype)
+    rows[:, 0] = ts[shift - 1]
+    rows[:, 1] = bar
+    rows[:, 2] = drums[mask]
+    keep = np.stack((np.ones(len(shift), dtype=bool), is_bar, mask > 0), axis=1)
+    return rows[keep]
+
+
+def _grid_to_tokens(grid: np.ndarray, encoding: int = ENCODING_VERSION) -> List[str]:
+    """히트 그리드를 토큰열로 변환합니다 (1: TS:1/BAR/DRUM:<CLASS>, 2: TS:n/BAR/DRUMS:<mask>)."""
+    if encoding < 2:
+        return _SLOT_TOKENS[_grid_slots(grid)].tolist()
+    return _event_rows(grid, _TS_TOKENS, "BAR", _DRUMS_TOKENS).tolist()
+
+
+def _grid_to_ids(grid: np.ndarray, vocab: Vocab, encoding: int = ENCODING_VERSION) -> np.ndarray:
+    """_grid_to_tokens와 같은 토큰열을 어휘 id로 바로 (토큰 -> id 표를 한 번씩만 조회)"""
+    if encoding < 2:
+        return vocab.encode(_SLOT_TOKENS.tolist())[_grid_slots(grid)]
+    ts = vocab.family_ids("TS", np.arange(1, len(_TS_TOKENS) + 1))
+    drums = vocab.family_ids("DRUMS", np.arange(len(_DRUMS_TOKENS)))
+    return _event_rows(grid, ts, vocab.bar, drums)
+
+
+def midi_to_drum_ids(
+    midi_path: Path, vocab: Optional[Vocab] = None, encoding: int = ENCODING_VERSION
+) -> np.ndarray:
+    """
+    midi_to_drum_tokens와 같은 토큰열을 문자열 없이 어휘 id(np.uint16)로 바로 만듭니다.
+    이동량/마스크 -> id 표로 변환하므로 토큰 문자열 객체가 생기지 않습니다.
+    """
+    vocab = vocab or get_vocab()
+    notes, bpm = _load_midi(midi_path)
+    grid = drum_hit_grid(*_drum_onsets(notes), (60.0 / bpm) / 4.0)
+    head = [vocab.bos, int(vocab.family_ids("BPM", quantize_bpm(bpm)))]
+    return np.concatenate(
+        (np.array(head, dtype=ID_DTYPE), _grid_to_ids(grid, vocab, encoding), [vocab.eos])
+    ).astype(ID_DTYPE)
+
+
+def midi_to_drum_tokens(midi_path: Path, encoding: int = ENCODING_VERSION) -> List[str]:
     """
     드럼 토큰화 함수:
-    토큰: BOS, BPM:<int>, TS:1 (시간 이동), BAR (마디 구분), DRUM:<CLASS> (드럼 클래스), …, EOS
+    토큰: BOS, BPM:<int>, TS:n (시간 이동), BAR (마디 구분), DRUMS:<mask> (한 스텝의 드럼 클래스
+    조합), …, EOS. encoding=1이면 예전 형식 (스텝마다 TS:1, 히트마다 DRUM:<CLASS>).
     """
-    pm = pretty_midi.PrettyMIDI(str(midi_path))  # MIDI 파일 로드
-    bpm = _estimate_bpm(pm)  # BPM 추정
+    notes, bpm = _load_midi(midi_path)  # 노트 배열 + 템포 (PrettyMIDI 객체 없이)
     step_sec = (60.0 / bpm) / 4.0  # 16분 음표당 초 (4/4 기준)
 
-    hits = {}  # 각 스텝(시간)에 어떤 드럼 클래스가 있는지 저장: {step: set(classes)}
-    min_step, max_step = None, 0  # 최소/최대 스텝 기록
-    for inst in pm.instruments:
-        if not inst.is_drum:
-            continue  # 드럼 악기가 아닌 경우 건너뜀
-        for n in inst.notes:
-            s = int(round(n.start / step_sec))  # 노트 시작 시간을 스텝 단위로 변환
-            hits.setdefault(s, set()).add(_cls_for_pitch(n.pitch))  # 해당 스텝에 드럼 클래스 추가
-            if min_step is None or s < min_step:
-                min_step = s  # 최소 스텝 업데이트
-            if s > max_step:
-                max_step = s  # 최대 스텝 업데이트
-    if min_step is None:  # 처리할 노트가 없으면 기본 토큰 반환
-        return ["BOS", f"BPM:{int(round(bpm))}", "EOS"]
-
-    # 시작 스텝을 0으로 맞추기 위한 쉬프트 계산
-    shift = min_step or 0
-    if shift:
-        # 모든 스텝을 shift만큼 빼서 시작 스텝을 0으로 만듦
-        hits = {s - shift: v for s, v in hits.items()}
-        max_step -= shift
-
-    tokens = ["BOS", f"BPM:{int(round(bpm))}"]  # 시작, BPM 토큰 추가
-    bar_step = 0  # 현재 마디 내 스텝 카운트
-    for step in range(max_step + 1):  # 최대 스텝까지 반복
-        tokens.append("TS:1")  # 시간 이동 토큰 추가
-        bar_step += 1
-        if bar_step >= STEPS_PER_BAR:  # STEPS_PER_BAR (16) 도달 시 마디 구분 토큰 추가
-            tokens.append("BAR")
-            bar_step = 0
-        if step in hits:  # 현재 스텝에 드럼 히트가 있는 경우
-            for cls in _CLASSES:  # 정의된 클래스 순서대로 확인
-                if cls in hits[step]:  # 해당 클래스가 히트된 경우
-                    tokens.append(f"DRUM:{cls}")  # DRUM:<CLASS> 토큰 추가
-    tokens.append("EOS")  # 끝 토큰 추가
-    return tokens
-
-
-def save_tokens(tokens: List[str], out_json: Path) -> None:
-    """토큰 리스트를 JSON 파일로 저장하는 함수"""
-    out_json.parent.mkdir(parents=True, exist_ok=True)  # 출력 디렉터리 생성
-    # UTF-8 인코딩으로 JSON 파일에 저장
-    out_json.write_text(
-        json.dumps({"tokens": tokens}, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
+    grid = drum_hit_grid(*_drum_onsets(notes), step_sec)
+    if grid.shape[0] == 0:  # 처리할 노트가 없으면 기본 토큰 반환
+        return ["BOS", f"BPM:{quantize_bpm(bpm)}", "EOS"]
+    return ["BOS", f"BPM:{quantize_bpm(bpm)}"] + _grid_to_tokens(grid, encoding) + ["EOS"]
+
+
+def save_tokens(tokens: List[str], out_json: Path, encoding: int = ENCODING_VERSION) -> None:
+    """토큰 리스트를 JSON 파일로 저장하는 함수 (인코딩 버전을 함께 기록)"""
+    _save_encoded(tokens, out_json, encoding)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from models.token_shards import ID_DTYPE
+
+ROOT = Path(__file__).resolve().parents[1]
+VOCAB = ROOT / "data" / "vocab.json"
+
+SPECIAL = ("PAD", "BOS", "EOS", "BAR", "TS:1", "UNK")
+
+# 조성 토큰은 빈도와 관계없이 24개를 모두 어휘에 둡니다 (조옮김 증강이 UNK를 만들지 않도록).
+PITCH_CLASSES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+KEY_TOKENS = tuple(f"KEY:{pc}_{q}" for q in ("major", "minor") for pc in PITCH_CLASSES)
+_NATURAL_PC = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+
+def parse_key(name: str) -> Optional[Tuple[int, str]]:
+    """'A#_minor', 'Bb_major' 같은 조 이름 -> (피치 클래스, major|minor). 모르면 None."""
+    note, _, qual = name.partition("_")
+    if not note or note[0].upper() not in _NATURAL_PC or qual not in ("major", "minor"):
+        return None
+    acc = note[1:]
+    if acc not in ("", "#", "b"):
+        return None
+    return (_NATURAL_PC[note[0].upper()] + {"": 0, "#": 1, "b": -1}[acc]) % 12, qual
+
+
+def key_token(pc: int, qual: str) -> str:
+    """정식 조성 토큰 (샤프 표기)"""
+    return f"KEY:{PITCH_CLASSES[pc % 12]}_{qual}"
+
+
+class _UnkDict(dict):
+    """없는 키는 UNK id를 돌려주는 dict (__getitem__을 map에 바로 넘기기 위함)"""
+
+    def __init__(self, items: Dict[str, int], unk: int):
+        super().__init__(items)
+        self.unk = unk
+
+    def __missing__(self, key: str) -> int:
+        return self.unk
+
+
+class Vocab:
+    """
+    data/vocab.json을 한 번 읽어 정수 id 연산용 표로 바꿔 둔 것.
+    - ranges[family]   : 계열(NOTE, DUR, BPM, ...)의 정식 토큰 id 구간 [start, stop)
+      (build_vocab.py가 토큰을 정렬해서 쓰므로 계열마다 연속 구간)
+    - value_lut[family]: 정수 값 -> id 조회 테이블 (버킷 별칭 포함, 없는 값은 UNK)
+    - values[id]       : 정수 계열 토큰의 값 (그 외 -1)
+    토크나이저는 family_ids()로 문자열 없이 np.uint16 id 배열을 바로 만들 수 있고,
+    decode()는 디버깅용으로만 씁니다.
+    """
+
+    def __init__(self, token_to_id: Dict[str, int]):
+        self.token_to_id = dict(token_to_id)
+        size = max(token_to_id.values()) + 1
+        if size > np.iinfo(ID_DTYPE).max + 1:
+            raise ValueError(f"vocab size {size} does not fit {np.dtype(ID_DTYPE).name}")
+        id_to_token: List[Optional[str]] = [None] * size
+        for tok, i in token_to_id.items():  # 정식 토큰이 별칭보다 먼저 나옴
+            if id_to_token[i] is None:
+                id_to_token[i] = tok
+        self.tokens = np.array(id_to_token, dtype=object)
+        self.size = size
+        self.pad, self.bos, self.eos, self.bar, self.ts1, self.unk = (
+            token_to_id[t] for t in SPECIAL
+        )
+
+        self.values = np.full(size, -1, dtype=np.int64)
+        self.ranges: Dict[str, Tuple[int, int]] = {}
+        by_family: Dict[str, Dict[int, int]] = {}
+        for tok, i in token_to_id.items():
+            family, sep, value = tok.partition(":")
+            canonical = self.tokens[i] == tok
+            if canonical and tok not in SPECIAL:
+                start, stop = self.ranges.get(family, (i, i + 1))
+                self.ranges[family] = (min(start, i), max(stop, i + 1))
+            if sep and value.lstrip("-").isdigit():
+                by_family.setdefault(family, {})[int(value)] = i
+                if canonical:
+                    self.values[i] = int(value)
+        self.value_lut: Dict[str, np.ndarray] = {}
+        for family, m in by_family.items():
+            lut = np.full(max(max(m) + 1, 1), self.unk, dtype=ID_DTYPE)
+            for v, i in m.items():
+                if v >= 0:
+                    lut[v] = i
+            self.value_lut[family] = lut
+
+        self._lookup = _UnkDict(self.token_to_id, unk=self.unk)
+
+    @classmethod
+    def from_json(cls, path: Union[str, Path] = VOCAB) -> "Vocab":
+        return cls(json.loads(Path(path).read_text(encoding="utf-8"))["token_to_id"])
+
+    def __len__(self) -> int:
+        return self.size
+
+    def id(self, tok: str) -> int:
+        return self.token_to_id.get(tok, self.unk)
+
+    def family_ids(self, family: str, values: Union[int, np.ndarray]) -> np.ndarray:
+        """정수 값 배열 -> 그 계열의 id 배열 (np.uint16). 어휘에 없는 값은 UNK."""
+        lut = self.value_lut.get(family)
+        v = np.asarray(values, dtype=np.int64)
+        if lut is None:
+            return np.full(v.shape, self.unk, dtype=ID_DTYPE)
+        ok = (v >= 0) & (v < len(lut))
+        return np.where(ok, lut[np.where(ok, v, 0)], self.unk).astype(ID_DTYPE)
+
+    def in_family(self, ids: np.ndarray, family: str) -> np.ndarray:
+        """ids 중 그 계열의 정식 토큰인 위치 (bool 배열)"""
+        start, stop = self.ranges.get(family, (0, 0))
+        ids = np.asarray(ids)
+        return (ids >= start) & (ids < stop)
+
+    def encode(self, tokens: Sequence[str]) -> np.ndarray:
+        """
+        문자열 토큰 -> np.uint16 id (없는 토큰은 UNK). 예전 JSON 토큰 파일 변환용.
+        C 수준 map + np.fromiter로 파이썬 리스트를 거치지 않고 바로 배열을 채웁니다.
+        """
+        return np.fromiter(map(self._lookup.__getitem__, tokens), dtype=ID_DTYPE, count=len(tokens))
+
+    def decode(self, ids: np.ndarray) -> List[str]:
+        """id 배열 -> 정식 토큰 문자열 (디버깅용)"""
+        return self.tokens[np.asarray(ids, dtype=np.int64)].tolist()
+
+
+@lru_cache(maxsize=None)
+def get_vocab(path: str = str(VOCAB)) -> Vocab:
+    """프로세스마다 한 번만 읽는 기본 어휘"""
+    return Vocab.from_json(path)
+
+
+def save_ids(ids: np.ndarray, path: Union[str, Path]) -> None:
+    """id 배열을 .npy로 저장 (save_tokens의 JSON 문자열 목록 대신)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(path, np.asarray(ids, dtype=ID_DTYPE))
+
+
+def load_ids(path: Union[str, Path], mmap: bool = False) -> np.ndarray:
+    return np.load(path, mmap_mode="r" if mmap else None)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pretty_midi
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from data.pack_dataset import PROC_DIRS, load_vocab, to_ids  # noqa: E402
+from models.midi_events import read_notes  # noqa: E402
+from models.tokenizer_drums import (  # noqa: E402
+    _SLOT_TOKENS,
+    _drum_onsets,
+    _grid_slots,
+    _grid_to_tokens,
+    drum_hit_grid,
+    midi_to_drum_ids,
+    midi_to_drum_tokens,
+)
+from models.vocab import get_vocab, load_ids, save_ids  # noqa: E402
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def _retained(fn):
+    """fn()의 결과가 붙잡고 있는 파이썬 힙 바이트 (tracemalloc)"""
+    gc.collect()
+    tracemalloc.start()
+    out = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, size
+
+
+def melody(files, tmp: Path) -> None:
+    vocab = get_vocab()
+    tok2id = load_vocab()
+
+    songs, t_json = _timed(
+        lambda: [json.loads(p.read_text(encoding="utf-8"))["tokens"] for p in files]
+    )
+    n_tokens = sum(len(t) for t in songs)
+    ids_str, t_dict = _timed(lambda: [to_ids(t, tok2id, len(t)) for t in songs])
+    ids_vec, t_vec = _timed(lambda: [vocab.encode(t) for t in songs])
+    for a, b, t in zip(ids_str, ids_vec, songs):
+        assert a == b.tolist(), "vectorized encode differs from to_ids"
+        canon = [vocab.decode([i])[0] for i in a]
+        assert vocab.decode(b) == canon
+    for p, ids in zip(files, ids_vec):
+        save_ids(ids, tmp / (p.stem + ".npy"))
+    npys = [tmp / (p.stem + ".npy") for p in files]
+    _, t_npy = _timed(lambda: [load_ids(p) for p in npys])
+
+    _, mem_str = _retained(
+        lambda: [json.loads(p.read_text(encoding="utf-8"))["tokens"] for p in files]
+    )
+    _, mem_list = _retained(
+        lambda: [
+            to_ids(json.loads(p.read_text(encoding="utf-8"))["tokens"], tok2id, 10**9)
+            for p in files
+        ]
+    )
+    _, mem_ids = _retained(lambda: [load_ids(p) for p in npys])
+
+    json_bytes = sum(p.stat().st_size for p in files)
+    npy_bytes = sum(p.stat().st_size for p in npys)
+    print(f"melody: {len(files)} files, {n_tokens} tokens")
+    print(
+        f"  load    : JSON {1e3 * t_json:7.1f} ms ({json_bytes / 1e6:.1f} MB)   "
+        f".npy {1e3 * t_npy:6.1f} ms ({npy_bytes / 1e6:.2f} MB)   x{t_json / t_npy:.0f}"
+    )
+    print(
+        f"  encode  : dict lookup {1e3 * t_dict:6.1f} ms   "
+        f"Vocab.encode {1e3 * t_vec:6.1f} ms   x{t_dict / t_vec:.1f}"
+    )
+    print(
+        f"  memory  : str tokens {mem_str / 1e6:6.1f} MB   int lists {mem_list / 1e6:6.1f} MB   "
+        f"uint16 {mem_ids / 1e6:5.2f} MB   ({mem_str / mem_ids:.0f}x less than strings)"
+    )
+
+
+def drums(tmp: Path, n: int) -> None:
+    vocab = get_vocab()
+    tok2id = load_vocab()
+    rng = np.random.default_rng(0)
+    paths = []
+    for k in range(n):
+        pm = pretty_midi.PrettyMIDI(initial_tempo=float(rng.integers(70, 160)))
+        inst = pretty_midi.Instrument(0, is_drum=True)
+        for s in range(int(rng.integers(200, 800))):
+            t = s * 0.125
+            pitch = int(rng.choice([36, 38, 42, 46, 49, 51, 39, 48, 60]))
+            inst.notes.append(pretty_midi.Note(int(rng.integers(40, 128)), pitch, t, t + 0.1))
+        pm.instruments.append(inst)
+        paths.append(tmp / f"drums{k}.mid")
+        pm.write(str(paths[-1]))
+
+    ref = [to_ids(t, tok2id, 10**9) for t in map(midi_to_drum_tokens, paths)]
+    out = [midi_to_drum_ids(p, vocab) for p in paths]
+    assert [o.tolist() for o in out] == ref, "midi_to_drum_ids differs from the string path"
+
+    # MIDI 파싱을 뺀 토큰화 단계만: 같은 그리드에서 문자열 경로 vs id 경로
+    grids = [drum_hit_grid(*_drum_onsets(read_notes(p)), 0.125) for p in paths]
+    slot_ids = vocab.encode(_SLOT_TOKENS.tolist())
+    _, t_str = _timed(lambda: [to_ids(_grid_to_tokens(g), tok2id, 10**9) for g in grids])
+    _, t_int = _timed(lambda: [slot_ids[_grid_slots(g)] for g in grids])
+    steps = sum(len(g) for g in grids)
+    print(
+        f"drums: {n} MIDI files ({steps} steps), midi_to_drum_ids == tokens + to_ids; "
+        f"grid -> ids {1e3 * t_str:.1f} ms via strings, {1e3 * t_int:.2f} ms direct "
+        f"(x{t_str / t_int:.0f})"
+    )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--limit", type=int, default=None, help="Melody token files to use")
+    ap.add_argument("--drums", type=int, default=20, help="Synthetic drum MIDI files")
+    args = ap.parse_args()
+    files = sorted(PROC_DIRS["melody"].glob("*.json"))[: args.limit]
+    with tempfile.TemporaryDirectory() as tmp:
+        if files:
+            melody(files, Path(tmp))
+        else:
+            print(f"No melody token files in {PROC_DIRS['melody']}")
+        drums(Path(tmp), args.drums)
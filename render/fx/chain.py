@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from scipy.ndimage import minimum_filter1d
+from scipy.signal import butter, lfilter
+
+# 모델을 임포트하기 전에 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from render.synth import SR  # noqa: E402
+
+BLOCK = 1024  # 기본 처리 블록 크기 (샘플)
+
+
+def _as_2d(block: np.ndarray) -> np.ndarray:
+    """(n,) 모노 블록도 (n, 1) 뷰로 다룹니다 (복사 없음)."""
+    return block.reshape(len(block), -1)
+
+
+def _db_to_gain(db):
+    return 10.0 ** (np.asarray(db) / 20.0)
+
+
+class Node:
+    """
+    FX 노드 기본형. process(block, key)는 float32 (n, 채널) 블록을 제자리에서 바꿉니다.
+    key는 사이드체인 입력 블록(같은 길이)이며, 쓰지 않는 노드는 무시합니다.
+    상태(필터 zi, 지연선 등)는 블록 사이에 이어지고 reset()으로 초기화합니다.
+    """
+
+    name = "node"
+    latency = 0  # 출력 지연 (샘플)
+    tail = 0  # 입력이 끝난 뒤에도 출력에 남는 길이 (샘플, 리버브 꼬리 등)
+
+    def process(self, block: np.ndarray, key: Optional[np.ndarray] = None) -> None:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        pass
+
+
+class Gain(Node):
+    name = "gain"
+
+    def __init__(self, db: float = 0.0):
+        self.gain = np.float32(_db_to_gain(db))
+
+    def process(self, block, key=None):
+        block *= self.gain
+
+
+class IIRFilter(Node):
+    """scipy.signal.lfilter 기반 IIR 필터. 채널별 zi를 블록 사이에 이어 붙입니다."""
+
+    name = "iir"
+
+    def __init__(self, b, a, name: Optional[str] = None):
+        self.b = np.asarray(b, dtype=np.float64)
+        self.a = np.asarray(a, dtype=np.float64)
+        self.name = name or self.name
+        self.zi: Optional[np.ndarray] = None
+
+    @classmethod
+    def lowpass(cls, cutoff: float, sr: int = SR, order: int = 2):
+        b, a = butter(order, cutoff, btype="lowpass", fs=sr)
+        return cls(b, a, name=f"lowpass{int(cutoff)}")
+
+    @classmethod
+    def highpass(cls, cutoff: float, sr: int = SR, order: int = 2):
+        b, a = butter(order, cutoff, btype="highpass", fs=sr)
+        return cls(b, a, name=f"highpass{int(cutoff)}")
+
+    def process(self, block, key=None):
+        x = _as_2d(block)
+        if self.zi is None or self.zi.shape[1] != x.shape[1]:
+            self.zi = np.zeros((max(len(self.a), len(self.b)) - 1, x.shape[1]))
+        y, self.zi = lfilter(self.b, self.a, x, axis=0, zi=self.zi)
+        x[...] = y
+
+    def reset(self):
+        self.zi = None
+
+
+def synthetic_ir(sr: int = SR, seconds: float = 1.2, rt60: float = 0.9, channels: int = 2):
+    """지수 감쇠 노이즈 임펄스 응답 (채널마다 다른 노이즈로 스테레오 폭, 시드 고정)"""
+    rng = np.random.default_rng(7)
+    n = int(seconds * sr)
+    env = np.exp(-6.91 * np.arange(n) / (rt60 * sr))  # rt60 동안 -60 dB
+    ir = rng.standard_normal((n, channels)) * env[:, None]
+    ir[: int(0.01 * sr)] *= np.linspace(0.0, 1.0, int(0.01 * sr))[:, None]  # 부드러운 시작
+    return (ir / np.sqrt((ir**2).sum(axis=0))).astype(np.float32)
+
+
+class ConvolutionReverb(Node):
+    """
+    균일 분할 FFT 컨볼루션 리버브 (uniformly partitioned overlap-save).
+    IR을 블록 크기 P 조각 K개로 나눠 미리 FFT해 두고, 입력 스펙트럼을 주파수 영역 지연선에
+    쌓아 블록마다 K개의 곱-합만 계산합니다. 지연은 0 (블록 크기 단위로 바로 출력).
+    들어오는 블록 길이는 P의 배수가 아니어도 됩니다: 아직 덜 찬 조각은 나머지를 0으로 둔 채
+    다시 계산하고 (출력은 인과적이므로 채워진 구간까지는 정확), 조각이 P개 샘플로 다 찼을 때만
+    지연선과 직전 블록을 넘깁니다.
+    """
+
+    name = "reverb"
+
+    def __init__(self, ir: np.ndarray, block: int = BLOCK, wet: float = 0.25, dry: float = 1.0):
+        ir = _as_2d(np.asarray(ir, dtype=np.float32))
+        self.p = block
+        self.k = max(1, -(-len(ir) // block))
+        padded = np.zeros((self.k * block, ir.shape[1]), dtype=np.float32)
+        padded[: len(ir)] = ir
+        parts = padded.reshape(self.k, block, ir.shape[1])
+        # 조각별 스펙트럼 (K, P+1, 채널), 2P 길이 FFT
+        self.h = np.fft.rfft(parts, n=2 * block, axis=1).astype(np.complex64)
+        self.wet, self.dry = np.float32(wet), np.float32(dry)
+        self.tail = self.k * block
+        self.reset()
+
+    def reset(self):
+        self.fdl: Optional[np.ndarray] = None  # 주파수 영역 지연선 (K, P+1, 채널)
+        self.prev: Optional[np.ndarray] = None  # 직전 입력 블록 (overlap-save)
+        self.cur: Optional[np.ndarray] = None  # 채우는 중인 입력 조각 (P, 채널)
+        self.fill = 0  # cur에 들어온 샘플 수
+        self.pos = 0
+
+    def process(self, block, key=None):
+        x = _as_2d(block)
+        n, ch = x.shape
+        if self.fdl is None or self.fdl.shape[2] != ch:
+            self.fdl = np.zeros((self.k, self.p + 1, ch), dtype=np.complex64)
+            self.prev = np.zeros((self.p, ch), dtype=np.float32)
+            self.cur = np.zeros((self.p, ch), dtype=np.float32)
+            self.fill = 0
+            self.pos = 0
+        if self.h.shape[2] not in (1, ch):
+            raise ValueError(f"IR has {self.h.shape[2]} channels, block has {ch}")
+        s = 0
+        while s < n:  # 조각 경계에서 나눠 처리 (블록이 P보다 크거나 조각 중간에서 시작)
+            m = min(self.p - self.fill, n - s)
+            seg = x[s : s + m]
+            if self.fill == 0:  # 새 조각: 가장 최근 스펙트럼이 pos 에 오도록 링 회전
+                self.pos = (self.pos - 1) % self.k
+            self.cur[self.fill : self.fill + m] = seg
+            self.fdl[self.pos] = np.fft.rfft(np.concatenate([self.prev, self.cur]), axis=0)
+            order = (self.pos + np.arange(self.k)) % self.k  # k번째 지연 스펙트럼 위치
+            spec = np.einsum("kfc,kfc->fc", self.h, self.fdl[order])
+            wet = np.fft.irfft(spec, n=2 * self.p, axis=0)[self.p + self.fill :][:m]
+            self.fill += m
+            if self.fill == self.p:  # 조각 완성: 다음 조각의 overlap-save 이전 블록이 됨
+                self.prev, self.cur = self.cur, self.prev
+                self.cur[:] = 0.0
+                self.fill = 0
+            seg *= self.dry
+            seg += self.wet * wet.astype(np.float32)
+            s += m
+
+
+class SidechainDucker(Node):
+    """
+    사이드체인 덕킹 컴프레서: key(예: 드럼 스템)의 레벨이 threshold를 넘으면 입력을 줄입니다.
+    검출기는 key 제곱의 1극 평활(attack 시정수), 이득은 다시 1극 평활(release)합니다.
+    key가 없으면 입력 자체를 키로 쓰는 일반 컴프레서로 동작합니다.
+    """
+
+    name = "ducker"
+
+    def __init__(
+        self,
+        threshold_db: float = -24.0,
+        ratio: float = 4.0,
+        attack_ms: float = 5.0,
+        release_ms: float = 150.0,
+        sr: int = SR,
+    ):
+        self.threshold_db, self.ratio = threshold_db, ratio
+        a_det = np.exp(-1.0 / (attack_ms * 1e-3 * sr))
+        a_rel = np.exp(-1.0 / (release_ms * 1e-3 * sr))
+        self.det = ([1.0 - a_det], [1.0, -a_det])
+        self.rel = ([1.0 - a_rel], [1.0, -a_rel])
+        self.reset()
+
+    def reset(self):
+        self.zi_det = np.zeros(1)
+        self.zi_rel = np.zeros(1)  # 이득 감소량(dB) 평활 상태
+        self.max_cut_db = 0.0  # 지금까지의 최대 이득 감소량 (리포트용)
+
+    def process(self, block, key=None):
+        x = _as_2d(block)
+        k = _as_2d(key) if key is not None else x
+        power = np.max(k.astype(np.float64) ** 2, axis=1)
+        env, self.zi_det = lfilter(*self.det, power, zi=self.zi_det)
+        level_db = 10.0 * np.log10(np.maximum(env, 1e-12))
+        cut_db = np.maximum(level_db - self.threshold_db, 0.0) * (1.0 - 1.0 / self.ratio)
+        cut_db, self.zi_rel = lfilter(*self.rel, cut_db, zi=self.zi_rel)
+        x *= _db_to_gain(-cut_db).astype(np.float32)[:, None]
+        if len(cut_db):
+            self.max_cut_db = max(self.max_cut_db, float(cut_db.max()))
+
+
+class Limiter(Node):
+    """
+    룩어헤드 피크 리미터. 필요한 이득을 룩어헤드 창에서 최솟값 유지 후 같은 길이로 이동 평균해
+    출력 피크가 ceiling을 넘지 않으면서도 이득 변화가 매끄럽습니다. 출력은 룩어헤드만큼 지연됩니다.
+    """
+
+    name = "limiter"
+
+    def __init__(
+        self,
+        ceiling_db: float = -1.0,
+        lookahead_ms: float = 5.0,
+        release_ms: float = 80.0,
+        sr: int = SR,
+    ):
+        self.ceiling = float(_db_to_gain(ceiling_db))
+        self.look = max(1, int(lookahead_ms * 1e-3 * sr))
+        a = np.exp(-1.0 / (release_ms * 1e-3 * sr))
+        self.rel = ([1.0 - a], [1.0, -a])
+        self.reset()
+
+    @property
+    def latency(self) -> int:
+        return self.look
+
+    def reset(self):
+        self.delay: Optional[np.ndarray] = None  # 입력 지연선 (look, 채널)
+        self.req_hist = np.ones(self.look)  # 필요 이득 기록 (최솟값 유지용)
+        self.hold_hist = np.ones(self.look)  # 최솟값 유지 결과 기록 (이동 평균용)
+        self.zi_rel = np.array([-self.rel[1][1]])  # 이득 1에서 시작하는 1극 필터 상태
+
+    def process(self, block, key=None):
+        x = _as_2d(block)
+        n, ch = x.shape
+        if self.delay is None or self.delay.shape[1] != ch:
+            self.delay = np.zeros((self.look, ch), dtype=np.float32)
+        peak = np.abs(x).max(axis=1).astype(np.float64)
+        req = np.minimum(1.0, self.ceiling / np.maximum(peak, 1e-12))
+        # 뒤쪽 look+1 샘플의 최솟값: 중앙 정렬 창 [i - S//2, i - S//2 + S - 1]의 끝이
+        # r의 look + t 가 되도록 i = t + S//2 로 잘라 씀 (경계값 영향 없음)
+        r = np.concatenate([self.req_hist, req])
+        size = self.look + 1
+        hold = minimum_filter1d(r, size)[size // 2 : size // 2 + n]
+        # 최솟값 유지 결과의 look 길이 이동 평균 (누적합)
+        hh = np.concatenate([self.hold_hist, hold])
+        c = np.concatenate([[0.0], np.cumsum(hh)])
+        smooth = (c[self.look + 1 :] - c[1 : -self.look]) / self.look
+        # 느린 릴리스: 평활된 값과의 최솟값이라 필요 이득을 넘지 않음
+        slow, self.zi_rel = lfilter(*self.rel, smooth, zi=self.zi_rel)
+        gain = np.minimum(smooth, slow)
+        self.req_hist, self.hold_hist = r[-self.look :], hh[-self.look :]
+        # 지연선: 출력 = look 샘플 전 입력 * 이득
+        delayed = np.concatenate([self.delay, x])
+        self.delay = delayed[-self.look :].copy()
+        x[...] = delayed[:n] * gain.astype(np.float32)[:, None]
+
+
+class Chain:
+    """노드 목록을 순서대로 적용하는 FX 체인. 노드별 누적 처리 시간을 timings에 기록합니다."""
+
+    def __init__(self, nodes: List[Node]):
+        self.nodes = nodes
+        self.timings: Dict[str, float] = {n.name: 0.0 for n in nodes}
+
+    @property
+    def latency(self) -> int:
+        return sum(node.latency for node in self.nodes)
+
+    @property
+    def tail(self) -> int:
+        return sum(node.tail for node in self.nodes)
+
+    def process(self, block: np.ndarray, key: Optional[np.ndarray] = None) -> None:
+        for node in self.nodes:
+            t0 = time.perf_counter()
+            node.process(block, key)
+            self.timings[node.name] += time.perf_counter() - t0
+
+    def reset(self):
+        for node in self.nodes:
+            node.reset()
+        self.timings = {n.name: 0.0 for n in self.nodes}
+
+    def block_processor(self, key: Optional[np.ndarray] = None) -> Callable[[np.ndarray], None]:
+        """
+        write_wav_blocks(process=...)에 넘길 콜백. 블록이 들어온 순서대로 같은 위치의
+        key 구간을 잘라 사이드체인으로 넘깁니다 (key는 처리할 신호와 길이가 같아야 함).
+        """
+        pos = 0
+
+        def process(block):
+            nonlocal pos
+            k = key[pos : pos + len(block)] if key is not None else None
+            self.process(block, k)
+            pos += len(block)
+
+        return process
+
+    def process_buffer(
+        self, x: np.ndarray, key: Optional[np.ndarray] = None, block: int = BLOCK
+    ) -> np.ndarray:
+        """버퍼 전체를 고정 크기 블록 뷰로 나눠 제자리 처리합니다."""
+        process = self.block_processor(key)
+        for i in range(0, len(x), block):
+            process(x[i : i + block])
+        return x
+
+    def process_loop(
+        self, x: np.ndarray, key: Optional[np.ndarray] = None, block: int = BLOCK
+    ) -> np.ndarray:
+        """
+        build_loop이 만든 루프 버퍼를 이음매가 유지되게 제자리 처리합니다 (key도 같은 길이의 루프).
+        process_buffer로 한 번만 흘리면 루프 시작에 리버브 꼬리가 없고 리미터 지연만큼 0이 들어가
+        이음매가 끊깁니다. 그래서 상태를 초기화하고 루프를 꼬리 길이만큼 (최소 한 바퀴) 먼저 흘려
+        정상 상태로 만든 뒤 (꼬리가 루프 시작에 감겨 들어감), 마지막 바퀴 출력을 latency만큼
+        앞당겨 돌립니다. 처리 시간은 예열 바퀴 수만큼 늘어납니다.
+        """
+        self.reset()
+        for _ in range(max(1, -(-self.tail // max(len(x), 1)))):
+            self.process_buffer(x.copy(), key, block)
+        self.process_buffer(x, key, block)
+        x[...] = np.roll(x, -(self.latency % max(len(x), 1)), axis=0)
+        return x
+
+
+def default_chain(sr: int = SR, block: int = BLOCK, channels: int = 2) -> Chain:
+    """BGM 기본 체인: 저역 정리 -> 고역 완화 -> 리버브 -> 드럼 키 덕킹 -> 리미터"""
+    return Chain(
+        [
+            IIRFilter.highpass(40.0, sr),
+            IIRFilter.lowpass(9000.0, sr),
+            ConvolutionReverb(synthetic_ir(sr, channels=channels), block=block, wet=0.2),
+            SidechainDucker(sr=sr),
+            Limiter(sr=sr),
+        ]
+    )
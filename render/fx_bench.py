@@ -0,0 +1,140 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pretty_midi
+
+# render 패키지 임포트를 위해 프로젝트 루트를 sys.path에 추가
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from render.fx.chain import (  # noqa: E402
+    BLOCK,
+    Chain,
+    ConvolutionReverb,
+    IIRFilter,
+    Limiter,
+    SidechainDucker,
+    default_chain,
+    synthetic_ir,
+)
+from render.loop_tools.loop import build_loop, seam_discontinuity  # noqa: E402
+from render.synth import SR, render_stems  # noqa: E402
+
+
+def make_stems(bpm: float = 90.0):
+    """30초 루프용 코드/베이스/드럼 스템 (스테레오로 복제, 오른쪽은 살짝 작게)"""
+    beat = 60.0 / bpm
+    pm = pretty_midi.PrettyMIDI(initial_tempo=bpm)
+    keys = pretty_midi.Instrument(program=4)
+    bass = pretty_midi.Instrument(program=33)
+    drums = pretty_midi.Instrument(program=0, is_drum=True)
+    chords = [(57, 60, 64), (53, 57, 60), (48, 52, 55), (55, 59, 62)]
+    for b in range(int(32 / beat)):
+        t0 = b * beat
+        if b % 4 == 0:
+            for p in chords[(b // 4) % 4]:
+                keys.notes.append(pretty_midi.Note(70, p, t0, t0 + 4 * beat))
+            bass.notes.append(pretty_midi.Note(90, chords[(b // 4) % 4][0] - 24, t0, t0 + 2 * beat))
+        drums.notes.append(pretty_midi.Note(100, 36 if b % 2 == 0 else 38, t0, t0 + 0.1))
+        drums.notes.append(pretty_midi.Note(60, 42, t0 + beat / 2, t0 + beat / 2 + 0.05))
+    pm.instruments.extend([keys, bass, drums])
+    stems = render_stems(pm, SR)
+    music = build_loop([stems["melody"]], bpm, SR)
+    drum = build_loop([stems["drums"]], bpm, SR)
+    to_stereo = lambda x: np.stack([x, 0.9 * x], axis=1)  # noqa: E731
+    return to_stereo(music), to_stereo(drum)
+
+
+def bench_node(node, x, key, block):
+    """노드 하나를 블록 단위로 적용한 시간 (입력은 매번 복사본)"""
+    buf = x.copy()
+    chain = Chain([node])
+    t0 = time.perf_counter()
+    chain.process_buffer(buf, key, block)
+    return time.perf_counter() - t0, buf
+
+
+def main(block: int):
+    music, drum = make_stems()
+    audio_sec = len(music) / SR
+    print(f"buffer: {audio_sec:.1f}s stereo @ {SR} Hz, block={block}")
+    nodes = [
+        IIRFilter.highpass(40.0, SR),
+        IIRFilter.lowpass(9000.0, SR),
+        ConvolutionReverb(synthetic_ir(SR), block=block, wet=0.2),
+        SidechainDucker(sr=SR),
+        Limiter(sr=SR),
+    ]
+    for node in nodes:
+        elapsed, out = bench_node(node, music, drum, block)
+        extra = ""
+        if isinstance(node, SidechainDucker):
+            extra = f"  max cut={node.max_cut_db:.1f} dB"
+        print(f"{node.name:>14}: {elapsed * 1000:7.1f} ms  RTF={elapsed / audio_sec:.4f}{extra}")
+
+    # 전체 체인: 블록 경계와 무관하게 같은 결과인지 (큰 블록 처리와 비교)
+    mix = music + 0.5 * drum  # 리미터가 일하도록 드럼을 섞어 피크를 올림
+    mix *= 2.0
+    chain = default_chain(SR, block)
+    out = mix.copy()
+    t0 = time.perf_counter()
+    chain.process_buffer(out, drum, block)
+    elapsed = time.perf_counter() - t0
+    ceiling = chain.nodes[-1].ceiling
+    print(f"{'chain':>14}: {elapsed * 1000:7.1f} ms  RTF={elapsed / audio_sec:.4f}")
+    for name, sec in chain.timings.items():
+        print(f"{'':>14}  {name}: {sec * 1000:.1f} ms")
+    peak = float(np.abs(out).max())
+    print(f"peak in={float(np.abs(mix).max()):.2f} out={peak:.3f} (ceiling {ceiling:.3f})")
+    assert peak <= ceiling + 1e-4
+
+    # 블록 크기를 바꿔도 (리버브 분할 크기는 고정) 출력이 같아야 함.
+    # 분할 크기의 배수가 아닌 블록도 확인 (리버브만 한 번에 처리한 결과와도 비교)
+    ir = synthetic_ir(SR)
+    once = Chain([ConvolutionReverb(ir, block=block, wet=0.2)]).process_buffer(
+        mix.copy(), None, len(mix)
+    )
+    for size in (block * 4, 700, block // 2 + 1, 3 * block // 2):
+        chain2 = default_chain(SR, block)
+        out2 = mix.copy()
+        chain2.process_buffer(out2, drum, size)
+        err = float(np.abs(out - out2).max())
+        rev = Chain([ConvolutionReverb(ir, block=block, wet=0.2)]).process_buffer(
+            mix.copy(), None, size
+        )
+        rev_err = float(np.abs(once - rev).max())
+        print(f"block-size invariance ({size}): chain diff={err:.2e}, reverb diff={rev_err:.2e}")
+        assert err < 1e-3 and rev_err < 1e-3
+
+    # 루프 버퍼: process_buffer 한 번은 이음매를 깸 (시작에 리버브 꼬리 없음, 리미터 지연만큼 0).
+    # process_loop는 루프를 이어 재생한 정상 상태 출력과 같아야 함. build_loop의 이음매는
+    # 다운비트 어택 위라 차이가 잘 안 보이므로, 반 바퀴 돌려 음이 울리는 중간에 이음매를 둠
+    n = len(mix)
+    loop_mix, loop_drum = np.roll(mix, -(n // 2), axis=0), np.roll(drum, -(n // 2), axis=0)
+    chain = default_chain(SR, block)
+    naive = chain.process_buffer(loop_mix.copy(), loop_drum, block)
+    looped = chain.process_loop(loop_mix.copy(), loop_drum, block)
+    lat = chain.latency
+    tiled = default_chain(SR, block).process_buffer(
+        np.tile(loop_mix, (3, 1)), np.tile(loop_drum, (3, 1)), block
+    )
+    steady = tiled[n + lat : 2 * n + lat]  # 한 바퀴 예열 뒤, 지연만큼 밀린 두 번째 바퀴
+    steady_err = float(np.abs(looped - steady).max())
+    seams = [seam_discontinuity(y) for y in (loop_mix, naive, looped)]
+    print(
+        f"loop seam: dry={seams[0]:.2f} fx once={seams[1]:.2f} fx loop={seams[2]:.2f}"
+        f" (latency {lat}, steady-state diff={steady_err:.2e})"
+    )
+    assert steady_err < 1e-3
+    assert seams[2] < 1.0 and seams[1] > 5 * seams[2]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--block", type=int, default=BLOCK, help="Processing block size (samples)")
+    args = ap.parse_args()
+    main(args.block)
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pretty_midi
+import soundfile as sf
+
+# render 패키지 임포트를 위해 프로젝트 루트를 sys.path에 추가
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from render.loop_tools.loop import (  # noqa: E402
+    XFADE_MS,
+    build_loop,
+    loop_bars,
+    loop_samples,
+    seam_discontinuity,
+    write_wav_blocks,
+    xfade_curves,
+)
+from render.synth import SR, render_stems  # noqa: E402
+
+OUT_DIR = os.path.join("render", "out")
+os.makedirs(OUT_DIR, exist_ok=True)
+
+# ---- 마지막 마디에서 루프 끝을 넘어 울리는 패드/베이스가 있는 4마디 진행 (90 BPM)
+bpm = 90.0
+beat = 60.0 / bpm
+bars = loop_bars(bpm)  # 30초에 가장 가까운 마디 수
+pm = pretty_midi.PrettyMIDI(initial_tempo=bpm)
+pad = pretty_midi.Instrument(program=88)  # 패드 (서스테인)
+bass = pretty_midi.Instrument(program=33)
+drums = pretty_midi.Instrument(program=0, is_drum=True)
+chords = [(57, 60, 64), (53, 57, 60), (48, 52, 55), (55, 59, 62)]
+for b in range(bars):
+    t0 = b * 4 * beat
+    for p in chords[b % 4]:  # 마디 끝까지 + 조금 더 (다음 마디와 겹침)
+        pad.notes.append(pretty_midi.Note(70, p, t0, t0 + 4 * beat + 0.2))
+    bass.notes.append(
+        pretty_midi.Note(90, chords[b % 4][0] - 24, t0 + 3 * beat, t0 + 4 * beat + 0.3)
+    )
+    for s in range(4):
+        drums.notes.append(
+            pretty_midi.Note(100, 36 if s % 2 == 0 else 38, t0 + s * beat, t0 + s * beat + 0.1)
+        )
+pm.instruments.extend([pad, bass, drums])
+
+t0 = time.perf_counter()
+stems = render_stems(pm, SR)
+render_sec = time.perf_counter() - t0
+n = loop_samples(bpm, SR, bars)
+assert len(stems["melody"]) > n  # 꼬리가 루프 끝을 넘어감
+
+# (A) 단순 자르기 vs 루프 조립: 이음매 불연속 지표
+naive = stems["melody"][:n] + stems["drums"][:n]
+t0 = time.perf_counter()
+y = build_loop(stems, bpm, SR)
+loop_sec = time.perf_counter() - t0
+assert len(y) == n and y.dtype == np.float32
+naive_seam, loop_seam = seam_discontinuity(naive), seam_discontinuity(y)
+# 드럼 노이즈가 없는 멜로디 스템만으로도 확인 (잘린 패드 릴리스가 그대로 드러남)
+mel_naive = seam_discontinuity(stems["melody"][:n])
+mel_loop = seam_discontinuity(build_loop([stems["melody"]], bpm, SR))
+print(f"bars={bars} len={n / SR:.3f}s seam naive={naive_seam:.2f} loop={loop_seam:.2f}")
+print(f"melody stem seam naive={mel_naive:.1f} loop={mel_loop:.2f}")
+assert loop_seam < 1.0 and naive_seam > 10 * loop_seam
+assert mel_loop < 1.0 and mel_naive > 50 * mel_loop
+
+# (B) 동일 파워 크로스페이드: 창 뒤는 스템 합 그대로, 창 안은 머리 * sin + 꼬리 * cos
+nx = int(round(XFADE_MS * SR / 1000.0))
+fade_in, fade_out = xfade_curves(nx)
+assert np.allclose(fade_in**2 + fade_out**2, 1.0, atol=1e-6)
+expected = np.zeros(n, dtype=np.float64)
+for s in stems.values():
+    head = s[:n].astype(np.float64)
+    head[:nx] *= fade_in[: len(head)]
+    expected[: len(head)] += head
+    tail = s[n : n + nx]
+    expected[: len(tail)] += tail * fade_out[: len(tail)]
+assert np.abs(y - expected).max() < 1e-5
+
+# (C) 미리 할당한 버퍼 재사용 + 스테레오 스템
+out = np.empty((n, 2), dtype=np.float32)
+stereo = [np.stack([s, 0.5 * s], axis=1) for s in stems.values()]
+y2 = build_loop(stereo, bpm, SR, out=out)
+assert y2 is out and np.allclose(out[:, 0], y, atol=1e-6)
+
+# (D) 블록 단위 스트리밍 WAV (두 번 이어 써서 이음매 확인용)
+peak = float(np.abs(y).max())
+y *= 0.89 / peak
+wav_path = os.path.join(OUT_DIR, "loop_x2.wav")
+written = write_wav_blocks(wav_path, y, SR, repeats=2)
+back, _ = sf.read(wav_path, dtype="float32")
+assert written == 2 * n and len(back) == 2 * n
+assert np.abs(back[:n] - y).max() < 1e-4
+share = loop_sec / render_sec
+print(f"render {render_sec * 1000:.1f} ms, loop {loop_sec * 1000:.2f} ms ({share:.1%} of render)")
+print("Wrote:", wav_path)
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+# 모델을 임포트하기 전에 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from render.synth import SR  # noqa: E402
+
+TARGET_SEC = 30.0  # 목표 루프 길이 (가장 가까운 마디 수로 맞춤)
+BEATS_PER_BAR = 4  # 4/4 박자
+XFADE_MS = 5.0  # 이음매 크로스페이드 길이
+WAV_BLOCK = 1 << 16  # WAV 스트리밍 블록 크기 (샘플)
+
+Stems = Union[Dict[str, np.ndarray], Iterable[np.ndarray]]
+
+
+def loop_bars(bpm: float, target_sec: float = TARGET_SEC, beats_per_bar: int = BEATS_PER_BAR):
+    """목표 길이에 가장 가까운 마디 수 (최소 1)"""
+    bar_sec = 60.0 / bpm * beats_per_bar
+    return max(1, int(round(target_sec / bar_sec)))
+
+
+def loop_samples(bpm: float, sr: int, bars: int, beats_per_bar: int = BEATS_PER_BAR) -> int:
+    """bars 마디의 정확한 샘플 수 (마디 길이를 누적한 뒤 한 번만 반올림)"""
+    return int(round(bars * beats_per_bar * 60.0 / bpm * sr))
+
+
+def xfade_curves(nx: int) -> Tuple[np.ndarray, np.ndarray]:
+    """동일 파워 크로스페이드 곡선 (들어오는 sin 0 -> 1, 나가는 cos 1 -> 0; in² + out² = 1)"""
+    fade_in = np.sin(0.5 * np.pi * (np.arange(nx) + 0.5) / max(nx, 1)).astype(np.float32)
+    return fade_in, fade_in[::-1].copy()  # 중점 표본이라 뒤집으면 정확히 cos
+
+
+def build_loop(
+    stems: Stems,
+    bpm: float,
+    sr: int = SR,
+    bars: Optional[int] = None,
+    target_sec: float = TARGET_SEC,
+    xfade_ms: float = XFADE_MS,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    렌더링된 스템들을 정확히 마디 단위 길이의 끊김 없는 루프로 조립합니다.
+    1) 스템을 루프 길이 L까지 out에 더하고
+    2) 시작 xfade_ms 구간에서 새 주기의 머리(sin 페이드인)와 L 이후의 꼬리(릴리스/잔향,
+       cos 페이드아웃)를 동일 파워로 크로스페이드합니다. 꼬리는 L-1 과 연속이므로 이음매
+       양쪽이 이어지고, 창 뒤의 꼬리는 버립니다 (xfade_ms=0 이면 꼬리 없이 자르기).
+    스템은 (n,) 모노 또는 (n, 채널) 배열이고, out을 주면 그 버퍼(길이 L)를 제자리에서 채웁니다.
+    결과에 FX 체인을 걸 때는 Chain.process_loop를 쓰세요 (리버브 꼬리/리미터 지연을 루프에 감음).
+    """
+    stems = list(stems.values()) if isinstance(stems, dict) else list(stems)
+    bars = bars or loop_bars(bpm, target_sec)
+    n = loop_samples(bpm, sr, bars)
+    shape = (n,) + (stems[0].shape[1:] if stems else ())
+    if out is None:
+        out = np.zeros(shape, dtype=np.float32)
+    else:
+        if out.shape != shape:
+            raise ValueError(f"out has shape {out.shape}, expected {shape}")
+        out[...] = 0.0
+    nx = min(n, max(0, int(round(xfade_ms * sr / 1000.0))))
+    fade_in, fade_out = xfade_curves(nx)
+    if out.ndim > 1:
+        fade_in, fade_out = fade_in[:, None], fade_out[:, None]
+
+    for s in stems:
+        head = s[:n]
+        k = min(nx, len(head))
+        out[:k] += head[:k] * fade_in[:k]
+        out[k : len(head)] += head[k:]
+        tail = s[n : n + nx]  # 루프 끝 직후 = 이전 주기의 연속
+        out[: len(tail)] += tail * fade_out[: len(tail)]
+    return out
+
+
+def seam_discontinuity(y: np.ndarray) -> float:
+    """
+    루프 이음매의 불연속 정도: 이음매를 지나는 2차 차분을 루프 내부 2차 차분의 RMS로 나눈 값.
+    매끄러운 이음매는 평소 샘플 변화와 비슷한 1 안팎, 잘린 음/클릭은 훨씬 큰 값이 됩니다.
+    다채널이면 채널 중 최댓값입니다.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if y.ndim == 1:
+        y = y[:, None]
+    if len(y) < 4:
+        return 0.0
+    seam = np.abs(y[0] - 2.0 * y[-1] + y[-2])  # 루프를 다시 재생할 때 y[-2], y[-1] -> y[0]
+    seam = np.maximum(seam, np.abs(y[1] - 2.0 * y[0] + y[-1]))
+    inner = np.sqrt(np.mean(np.diff(y, n=2, axis=0) ** 2, axis=0))
+    return float(np.max(seam / np.maximum(inner, 1e-12)))
+
+
+def write_wav_blocks(
+    path: Union[str, Path],
+    y: np.ndarray,
+    sr: int = SR,
+    block: int = WAV_BLOCK,
+    process: Optional[Callable[[np.ndarray], None]] = None,
+    repeats: int = 1,
+) -> int:
+    """
+    y를 고정 크기 블록 단위로 WAV에 씁니다 (블록은 y의 뷰라 전체 복사본을 만들지 않음).
+    process: 쓰기 직전 각 블록을 제자리에서 처리하는 콜백 (예: 이펙트 체인).
+             주의: 블록이 y의 뷰이므로 y 자체가 바뀌며, repeats > 1과 함께 쓰면 누적됩니다.
+    repeats: 루프를 몇 번 이어 쓸지 (이음매 청취 확인용). 반환값은 쓴 샘플 수입니다.
+    """
+    import soundfile as sf
+
+    channels = 1 if y.ndim == 1 else y.shape[1]
+    written = 0
+    with sf.SoundFile(str(path), "w", samplerate=sr, channels=channels, subtype="PCM_16") as f:
+        for _ in range(repeats):
+            for i in range(0, len(y), block):
+                view = y[i : i + block]
+                if process is not None:
+                    process(view)
+                f.write(view)
+                written += len(view)
+    return written
+
+
+if __name__ == "__main__":
+    import pretty_midi
+
+    from render.synth import render_stems
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("midi", help="Input MIDI file")
+    ap.add_argument("wav", help="Output loop WAV file")
+    ap.add_argument("--bpm", type=float, default=None, help="Tempo (default: first tempo in MIDI)")
+    ap.add_argument("--bars", type=int, default=None, help="Loop length in bars (default ~30s)")
+    ap.add_argument("--sr", type=int, default=SR, help="Sample rate")
+    ap.add_argument("--repeats", type=int, default=1, help="Write the loop N times back to back")
+    args = ap.parse_args()
+    pm = pretty_midi.PrettyMIDI(args.midi)
+    bpm = args.bpm or float(pm.get_tempo_changes()[1][0])
+    t0 = time.perf_counter()
+    stems = render_stems(pm, args.sr)
+    t1 = time.perf_counter()
+    y = build_loop(stems, bpm, args.sr, bars=args.bars)
+    t2 = time.perf_counter()
+    write_wav_blocks(args.wav, y, args.sr, repeats=args.repeats)
+    print(
+        f"Wrote {args.wav}: {len(y) / args.sr:.2f}s loop at {bpm:.1f} BPM "
+        f"(render {1000 * (t1 - t0):.1f} ms, loop {1000 * (t2 - t1):.2f} ms, "
+        f"seam={seam_discontinuity(y):.2f})"
+    )
@@ -1,9 +1,20 @@
 import os
+import sys
+import time
+from pathlib import Path
 
 import numpy as np
 import pretty_midi
 import soundfile as sf
 
+# render.synth 임포트를 위해 프로젝트 루트를 sys.path에 추가
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from render.stream import BarRenderer, pcm16, wav_header  # noqa: E402
+from render.synth import SR, render_stems, render_timed  # noqa: E402
+
 # 출력 디렉터리 설정 및 생성
 OUT_DIR = os.path.join("render", "out")
 os.makedirs(OUT_DIR, exist_ok=True)
@@ -22,20 +33,85 @@ pm.instruments.append(piano)
 midi_path = os.path.join(OUT_DIR, "test.mid")
 pm.write(midi_path)  # MIDI 파일로 저장
 
-# ---- (B) 빠른 WAV 생성 (간단한 사인파 톤; 외부 신디사이저 불필요)
-sr = 22050  # 샘플링 레이트
-audio = []
-for p in pitches:
-    freq = 440.0 * (2 ** ((p - 69) / 12))  # MIDI 음높이를 Hz로 변환
-    n = int(sr * dur)  # 음표 길이(초) * 샘플링 레이트 = 샘플 수
-    x = np.linspace(0, dur, n, endpoint=False)  # 0부터 dur까지 n개의 샘플 포인트 생성
-    # 클릭음을 피하기 위한 아주 작은 페이드인/페이드아웃 적용
-    env = np.minimum(x / 0.02, 1.0) * np.minimum((dur - x) / 0.02, 1.0)
-    tone = 0.2 * np.sin(2 * np.pi * freq * x) * env  # 사인파 생성 및 엔벨로프 적용
-    audio.append(tone.astype(np.float32))  # 32비트 부동소수점 형식으로 변환하여 리스트에 추가
-audio = np.concatenate(audio, axis=0)  # 모든 오디오 세그먼트를 하나로 합침
+# ---- (B) 벡터화 신디사이저로 WAV 생성 (외부 신디사이저 불필요)
+sr = SR  # 샘플링 레이트
+audio, stats = render_timed(pm, sr)
 wav_path = os.path.join(OUT_DIR, "test.wav")
 sf.write(wav_path, audio, sr)  # WAV 파일로 저장
 
 print("Wrote:", midi_path)
-print("Wrote:", wav_path)
+print("Wrote:", wav_path, f"(RTF={stats['rtf']:.4f})")
+
+# ---- (C) 30초 폴리포닉 루프: 코드 + 베이스 + 멜로디 + 드럼 (겹치는 노트 믹스)
+bpm = 90.0
+beat = 60.0 / bpm
+loop = pretty_midi.PrettyMIDI(initial_tempo=bpm)
+keys = pretty_midi.Instrument(program=4)  # 일렉트릭 피아노
+bass = pretty_midi.Instrument(program=33)  # 핑거 베이스
+lead = pretty_midi.Instrument(program=80)  # 리드
+drums = pretty_midi.Instrument(program=0, is_drum=True)
+chords = [(57, 60, 64), (53, 57, 60), (48, 52, 55), (55, 59, 62)]  # Am F C G
+n_beats = int(30.0 / beat)
+for b in range(n_beats):
+    start = b * beat
+    if b % 4 == 0:  # 마디마다 코드 (4박 유지) + 루트 베이스
+        chord = chords[(b // 4) % len(chords)]
+        for p in chord:
+            keys.notes.append(pretty_midi.Note(70, p, start, start + 4 * beat))
+        bass.notes.append(pretty_midi.Note(90, chord[0] - 24, start, start + 2 * beat))
+    for s in range(2):  # 8분음표 멜로디 (노트가 조금씩 겹치도록 길게)
+        p = chords[(b // 4) % len(chords)][(b + s) % 3] + 12
+        t0 = start + s * beat / 2
+        lead.notes.append(pretty_midi.Note(75, p, t0, t0 + 0.6 * beat))
+    drums.notes.append(pretty_midi.Note(100, 36 if b % 2 == 0 else 38, start, start + 0.1))
+    for s in range(2):  # 8분음표 하이햇
+        t0 = start + s * beat / 2
+        drums.notes.append(pretty_midi.Note(70, 42, t0, t0 + 0.05))
+loop.instruments.extend([keys, bass, lead, drums])
+n_notes = sum(len(i.notes) for i in loop.instruments)
+loop_audio, loop_stats = render_timed(loop, sr)
+loop_path = os.path.join(OUT_DIR, "loop30.wav")
+sf.write(loop_path, loop_audio, sr)
+print(
+    f"Wrote: {loop_path} ({n_notes} notes, {loop_stats['audio_sec']:.1f}s audio in "
+    f"{loop_stats['render_sec'] * 1000:.1f} ms, RTF={loop_stats['rtf']:.4f})"
+)
+
+# ---- (D) 마디 단위 점진 렌더링: 첫 마디까지의 시간 vs 전체, 전체 렌더와 같은 소리인지 확인
+bar_sec = 4 * beat
+n_bars = int(round(30.0 / bar_sec))
+bars = [
+    [pretty_midi.Instrument(i.program, i.is_drum) for i in loop.instruments] for _ in range(n_bars)
+]
+for k, inst in enumerate(loop.instruments):
+    for n in inst.notes:
+        bars[min(int(n.start / bar_sec + 1e-9), n_bars - 1)][k].notes.append(n)
+stream_path = os.path.join(OUT_DIR, "loop30_stream.wav")
+t0 = time.perf_counter()
+renderer = BarRenderer(bpm, sr, xfade_ms=0.0)
+parts = []
+with open(stream_path, "wb") as f:
+    f.write(wav_header(sr))  # 길이 미정 헤더
+    for b, insts in enumerate(bars):
+        parts.append(renderer.add_instruments(b, insts))
+        f.write(pcm16(parts[-1] * 0.5))
+        if b == 0:
+            first_sec = time.perf_counter() - t0
+stream_sec = time.perf_counter() - t0
+streamed = np.concatenate(parts)
+read_back, _ = sf.read(stream_path)
+assert len(read_back) == len(streamed), (len(read_back), len(streamed))
+# 마디 경계의 샘플 반올림(최대 1샘플) 외에는 전체 렌더와 같은 신호여야 함
+full = render_stems(loop, sr)
+ref = (full["melody"] + full["drums"])[: len(streamed)]
+corr = float(np.dot(ref, streamed) / (np.linalg.norm(ref) * np.linalg.norm(streamed)))
+assert corr > 0.99, corr
+# 머리 페이드를 건 스트림도 루프 조립에는 페이드 전 신호를 넘김 (build_loop이 다시 페이드)
+faded = BarRenderer(bpm, sr)
+faded_parts = [faded.add_instruments(b, insts) for b, insts in enumerate(bars)]
+assert not np.array_equal(faded_parts[0], parts[0])
+assert np.array_equal(faded.loop_source(faded_parts), np.concatenate(parts + [renderer.tail()]))
+print(
+    f"Wrote: {stream_path} (first bar after {first_sec * 1000:.1f} ms, "
+    f"all {n_bars} bars {stream_sec * 1000:.1f} ms, corr={corr:.4f})"
+)
@@ -0,0 +1,184 @@
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pretty_midi
+
+# render 패키지 임포트를 위해 프로젝트 루트를 sys.path에 추가
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from render.soundfont import SoundFont, load_soundfont  # noqa: E402
+from render.synth import SR, render  # noqa: E402
+
+OUT_DIR = os.path.join("render", "out")
+os.makedirs(OUT_DIR, exist_ok=True)
+
+
+# ---- 테스트용 초소형 SF2 작성기 --------------------------------------------
+def _chunk(cid: bytes, data: bytes) -> bytes:
+    return cid + struct.pack("<I", len(data)) + data + (b"\0" if len(data) & 1 else b"")
+
+
+def _list(kind: bytes, *chunks: bytes) -> bytes:
+    return _chunk(b"LIST", kind + b"".join(chunks))
+
+
+def _name(s: str) -> bytes:
+    return s.encode("ascii")[:19].ljust(20, b"\0")
+
+
+def write_sf2(path, samples, instruments, presets):
+    """
+    samples: [(이름, int16 배열, 샘플레이트, 루트 키, (루프 시작, 루프 끝) 또는 None)]
+    instruments: [(이름, [존 = [(제너레이터, 값), ...]])]  (sampleID가 없는 첫 존은 전역 존)
+    presets: [(이름, 뱅크, 프로그램, 악기 번호)]
+    """
+    smpl, shdr, pos = b"", b"", 0
+    for name, data, rate, root, loop in samples:
+        ls, le = loop or (0, 0)
+        shdr += _name(name) + struct.pack(
+            "<IIIIIBbHH", pos, pos + len(data), pos + ls, pos + le, rate, root, 0, 0, 1
+        )
+        smpl += data.astype("<i2").tobytes() + b"\0" * 92  # 샘플 뒤 46개의 0 샘플
+        pos += len(data) + 46
+    shdr += _name("EOS") + b"\0" * 26
+
+    def zones_to_bytes(headers, zone_lists):
+        bags, gens, n_gen = b"", b"", 0
+        for zones in zone_lists:
+            for z in zones:
+                bags += struct.pack("<HH", n_gen, 0)
+                for oper, amount in z:
+                    gens += struct.pack("<HH", oper, amount & 0xFFFF)
+                    n_gen += 1
+        return headers, bags + struct.pack("<HH", n_gen, 0), gens + b"\0" * 4
+
+    inst, n_bag = b"", 0
+    for name, zones in instruments:
+        inst += _name(name) + struct.pack("<H", n_bag)
+        n_bag += len(zones)
+    inst += _name("EOI") + struct.pack("<H", n_bag)
+    _, ibag, igen = zones_to_bytes(inst, [z for _, z in instruments])
+
+    phdr = b""
+    for i, (name, bank, program, _) in enumerate(presets):
+        phdr += _name(name) + struct.pack("<HHHIII", program, bank, i, 0, 0, 0)
+    phdr += _name("EOP") + struct.pack("<HHHIII", 0, 0, len(presets), 0, 0, 0)
+    _, pbag, pgen = zones_to_bytes(phdr, [[[(41, p[3])]] for p in presets])
+
+    body = b"sfbk" + _list(
+        b"INFO", _chunk(b"ifil", struct.pack("<HH", 2, 1)), _chunk(b"INAM", b"tiny\0")
+    )
+    body += _list(b"sdta", _chunk(b"smpl", smpl))
+    body += _list(
+        b"pdta",
+        _chunk(b"phdr", phdr),
+        _chunk(b"pbag", pbag),
+        _chunk(b"pmod", b"\0" * 10),
+        _chunk(b"pgen", pgen),
+        _chunk(b"inst", inst),
+        _chunk(b"ibag", ibag),
+        _chunk(b"imod", b"\0" * 10),
+        _chunk(b"igen", igen),
+        _chunk(b"shdr", shdr),
+    )
+    Path(path).write_bytes(_chunk(b"RIFF", body))
+
+
+def make_tiny_sf2(path):
+    """440 Hz 루프 사인 (루트 69) 악기와 킥/하이햇 2개뿐인 드럼 킷"""
+    rate = 44000
+    sine = (12000 * np.sin(2 * np.pi * np.arange(2000) / 100)).astype(np.int16)  # 100샘플 = 440Hz
+    t = np.arange(int(0.2 * 22050)) / 22050
+    kick = (20000 * np.sin(2 * np.pi * 60 * t) * np.exp(-t / 0.05)).astype(np.int16)
+    rng = np.random.default_rng(0)
+    hat = (8000 * rng.standard_normal(1100) * np.exp(-np.arange(1100) / 200)).astype(np.int16)
+    samples = [
+        ("sine", sine, rate, 69, (1000, 1900)),
+        ("kick", kick, 22050, 60, None),
+        ("hat", hat, 22050, 60, None),
+    ]
+    instruments = [
+        ("SineInst", [[(38, -1200)], [(54, 1), (53, 0)]]),  # 전역 존: 릴리스 0.5초, 루프 재생
+        ("Kit", [[(43, 36 | 36 << 8), (53, 1)], [(43, 42 | 42 << 8), (53, 2)]]),
+    ]
+    presets = [("Sine", 0, 0, 0), ("Drums", 128, 0, 1)]
+    write_sf2(path, samples, instruments, presets)
+
+
+def _render_in_worker(args):
+    """워커 프로세스: 프로세스별로 한 번 파싱, 샘플은 memmap 페이지 공유"""
+    path, midi_path = args
+    return render(pretty_midi.PrettyMIDI(midi_path), soundfont=load_soundfont(path))
+
+
+def _peak_hz(x, sr):
+    spec = np.abs(np.fft.rfft(x))
+    return np.fft.rfftfreq(len(x), 1.0 / sr)[np.argmax(spec)]
+
+
+if __name__ == "__main__":
+    sf2_path = os.path.join(OUT_DIR, "tiny.sf2")
+    make_tiny_sf2(sf2_path)
+    font = SoundFont(sf2_path)
+    assert set(font.presets) == {(0, 0), (128, 0)}, font.presets.keys()
+    assert isinstance(font.samples, np.memmap)
+    print("Parsed:", sf2_path, font.preset_names)
+
+    # (A) 피치: 루트 69의 샘플을 키 69, 81로 연주 -> 440Hz, 880Hz
+    for key, hz in ((69, 440.0), (81, 880.0)):
+        pm = pretty_midi.PrettyMIDI()
+        inst = pretty_midi.Instrument(program=0)
+        inst.notes.append(pretty_midi.Note(100, key, 0.0, 1.0))
+        pm.instruments.append(inst)
+        audio = render(pm, SR, normalize=False, soundfont=font)
+        peak = _peak_hz(audio[:SR], SR)
+        assert abs(peak - hz) < 3.0, (key, peak)
+        # (B) 루프: 2000샘플(약 45ms)짜리 샘플이 1초 노트 끝까지 유지되고, 릴리스 후 사라짐
+        tail = np.abs(audio[int(0.9 * SR) : SR]).max()
+        assert tail > 0.05, tail
+        assert np.abs(audio[-100:]).max() < 0.01
+    print("Pitch/loop OK")
+
+    # (C) 드럼: 킷에 없는 35(KICK), 44(HHC 페달)는 같은 클래스의 36, 42로 연주
+    pm = pretty_midi.PrettyMIDI()
+    drums = pretty_midi.Instrument(program=0, is_drum=True)
+    for i, key in enumerate((35, 44, 36, 42)):
+        drums.notes.append(pretty_midi.Note(100, key, 0.5 * i, 0.5 * i + 0.01))
+    pm.instruments.append(drums)
+    stems = font.render_stems(pm, SR)
+    hits = [
+        np.abs(stems["drums"][int(0.5 * i * SR) : int((0.5 * i + 0.1) * SR)]).max()
+        for i in range(4)
+    ]
+    assert min(hits) > 0.05 and abs(hits[0] - hits[2]) < 1e-6, hits
+    assert not stems["melody"].any()
+    print("Drum key mapping OK")
+
+    # (D) 30초 폴리포닉 + 드럼, 워커 프로세스 2개에서도 같은 결과
+    pm = pretty_midi.PrettyMIDI(initial_tempo=120)
+    lead = pretty_midi.Instrument(program=0)
+    drums = pretty_midi.Instrument(program=0, is_drum=True)
+    for b in range(60):
+        for p in (57, 60, 64):
+            lead.notes.append(pretty_midi.Note(80, p + 12 * (b % 2), 0.5 * b, 0.5 * b + 0.9))
+        drums.notes.append(pretty_midi.Note(100, 36 if b % 2 == 0 else 42, 0.5 * b, 0.5 * b + 0.1))
+    pm.instruments.extend([lead, drums])
+    midi_path = os.path.join(OUT_DIR, "sf2_loop.mid")
+    pm.write(midi_path)
+    t0 = time.perf_counter()
+    audio = render(pm, SR, soundfont=font)
+    elapsed = time.perf_counter() - t0
+    with ProcessPoolExecutor(max_workers=2) as ex:
+        outs = list(ex.map(_render_in_worker, [(sf2_path, midi_path)] * 2))
+    ref = render(pretty_midi.PrettyMIDI(midi_path), SR, soundfont=font)
+    assert all(np.array_equal(o, ref) for o in outs)
+    audio_sec = len(audio) / SR
+    print(f"Rendered {audio_sec:.1f}s in {elapsed * 1000:.1f} ms (RTF={elapsed / audio_sec:.4f})")
+    print("Worker processes OK")
@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import argparse
+import mmap
+import struct
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pretty_midi
+
+# 모델을 임포트하기 전에 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.tokenizer_drums import _CLASSES, _PITCH2CLS  # noqa: E402
+from render.synth import SR, overlap_add  # noqa: E402
+
+SOUNDFONT_DIR = ROOT / "render" / "soundfonts"  # 기본 SF2 파일 위치
+DRUM_BANK = 128  # SF2 관례: 퍼커션 프리셋 뱅크
+RELEASE_CUT_DB = 60.0  # 릴리스가 이 만큼 줄어들면 보이스를 끝냄
+
+# --- pdta 레코드 형식 (SF2 2.01 사양, 리틀 엔디언) -----------------------------------
+_PHDR = np.dtype(
+    [
+        ("name", "S20"),
+        ("preset", "<u2"),
+        ("bank", "<u2"),
+        ("bag", "<u2"),
+        ("library", "<u4"),
+        ("genre", "<u4"),
+        ("morphology", "<u4"),
+    ]
+)
+_BAG = np.dtype([("gen", "<u2"), ("mod", "<u2")])
+_GEN = np.dtype([("oper", "<u2"), ("amount", "<u2")])
+_INST = np.dtype([("name", "S20"), ("bag", "<u2")])
+_SHDR = np.dtype(
+    [
+        ("name", "S20"),
+        ("start", "<u4"),
+        ("end", "<u4"),
+        ("loop_start", "<u4"),
+        ("loop_end", "<u4"),
+        ("rate", "<u4"),
+        ("root", "u1"),
+        ("correction", "i1"),
+        ("link", "<u2"),
+        ("type", "<u2"),
+    ]
+)
+
+# 사용하는 제너레이터 번호
+_G_START, _G_END, _G_LOOP_START, _G_LOOP_END = 0, 1, 2, 3
+_G_START_COARSE, _G_END_COARSE = 4, 12
+_G_ATTACK, _G_DECAY, _G_SUSTAIN, _G_RELEASE = 34, 36, 37, 38
+_G_INSTRUMENT, _G_KEY_RANGE, _G_VEL_RANGE = 41, 43, 44
+_G_LOOP_START_COARSE, _G_LOOP_END_COARSE = 45, 50
+_G_ATTENUATION, _G_COARSE_TUNE, _G_FINE_TUNE = 48, 51, 52
+_G_SAMPLE_ID, _G_SAMPLE_MODES, _G_SCALE_TUNING, _G_ROOT_KEY = 53, 54, 56, 58
+# 프리셋 레벨 값이 악기 레벨 값에 더해지는 제너레이터
+_ADDITIVE = (
+    _G_ATTACK,
+    _G_DECAY,
+    _G_SUSTAIN,
+    _G_RELEASE,
+    _G_ATTENUATION,
+    _G_COARSE_TUNE,
+    _G_FINE_TUNE,
+    _G_SCALE_TUNING,
+)
+_DEFAULTS = {
+    _G_ATTACK: -12000,  # 타임센트 (약 1ms)
+    _G_DECAY: -12000,
+    _G_SUSTAIN: 0,  # 센티벨 감쇠
+    _G_RELEASE: -12000,
+    _G_SCALE_TUNING: 100,  # 키당 센트
+    _G_ROOT_KEY: -1,  # -1이면 샘플 헤더의 원래 피치
+}
+
+# 키 범위에 맞춰 펼친 리전 표 (프리셋마다 하나의 구조화 배열)
+REGION = np.dtype(
+    [
+        ("key_lo", "i2"),
+        ("key_hi", "i2"),
+        ("vel_lo", "i2"),
+        ("vel_hi", "i2"),
+        ("start", "i8"),
+        ("end", "i8"),
+        ("loop_start", "i8"),
+        ("loop_end", "i8"),
+        ("loop", "?"),
+        ("root", "f8"),  # 루트 키 - 튜닝(반음)
+        ("scale", "f8"),  # 키당 반음 (scaleTuning / 100)
+        ("rate", "f8"),
+        ("gain", "f8"),  # initialAttenuation -> 선형 이득
+        ("attack", "f8"),  # 초
+        ("decay", "f8"),  # 초 (0 dB -> -100 dB)
+        ("sustain_db", "f8"),
+        ("release", "f8"),  # 초 (-100 dB까지)
+    ]
+)
+
+# 드럼 클래스별 대체 키: 킷에 없는 GM 드럼 키는 같은 클래스의 다른 키로 연주
+_CLASS_KEYS: Dict[str, List[int]] = {c: [] for c in _CLASSES}
+for _p, _c in sorted(_PITCH2CLS.items()):
+    _CLASS_KEYS[_c].append(_p)
+
+
+def _signed(v: int) -> int:
+    return v - 0x10000 if v >= 0x8000 else v
+
+
+def _timecents(v: int) -> float:
+    """타임센트 -> 초"""
+    return float(2.0 ** (v / 1200.0))
+
+
+def _chunks(buf, start: int, end: int):
+    """RIFF 하위 청크 (id, 데이터 오프셋, 크기) 순회 (홀수 크기는 1바이트 패딩)"""
+    pos = start
+    while pos + 8 <= end:
+        cid, size = struct.unpack_from("<4sI", buf, pos)
+        yield cid, pos + 8, size
+        pos += 8 + size + (size & 1)
+
+
+class SoundFont:
+    """
+    SF2 사운드폰트. 프리셋/악기/샘플 청크는 열 때 한 번만 파싱하고,
+    샘플 데이터 블록(smpl)은 np.memmap으로 매핑해 여러 워커 프로세스가 같은 페이지를 공유합니다.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            riff, _, form = struct.unpack_from("<4sI4s", mm, 0)
+            if riff != b"RIFF" or form != b"sfbk":
+                raise ValueError(f"{self.path} is not a SoundFont 2 file")
+            lists = {}
+            for cid, off, size in _chunks(mm, 12, len(mm)):
+                if cid == b"LIST":
+                    lists[bytes(mm[off : off + 4])] = (off + 4, off + size)
+            if b"sdta" not in lists or b"pdta" not in lists:
+                raise ValueError(f"{self.path}: missing sdta/pdta chunk")
+            smpl = next((o, s) for c, o, s in _chunks(mm, *lists[b"sdta"]) if c == b"smpl")
+            pdta = {c.decode(): bytes(mm[o : o + s]) for c, o, s in _chunks(mm, *lists[b"pdta"])}
+        # 16비트 샘플은 복사하지 않고 페이지 캐시를 그대로 사용
+        self.samples = np.memmap(
+            self.path, dtype="<i2", mode="r", offset=smpl[0], shape=(smpl[1] // 2,)
+        )
+        tables = {
+            "phdr": _PHDR,
+            "pbag": _BAG,
+            "pgen": _GEN,
+            "inst": _INST,
+            "ibag": _BAG,
+            "igen": _GEN,
+            "shdr": _SHDR,
+        }
+        t = {k: np.frombuffer(pdta[k], dtype=dt) for k, dt in tables.items()}
+        self.sample_headers = t["shdr"]
+        izones = self._zones(t["inst"], t["ibag"], t["igen"], _G_SAMPLE_ID)
+        pzones = self._zones(t["phdr"], t["pbag"], t["pgen"], _G_INSTRUMENT)
+        self.presets: Dict[Tuple[int, int], np.ndarray] = {}
+        self.preset_names: Dict[Tuple[int, int], str] = {}
+        for i, h in enumerate(t["phdr"][:-1]):  # 마지막은 종료 레코드 (EOP)
+            key = (int(h["bank"]), int(h["preset"]))
+            self.presets[key] = self._regions(pzones[i], izones)
+            self.preset_names[key] = h["name"].split(b"\0")[0].decode("latin-1")
+
+    @staticmethod
+    def _zones(headers, bags, gens, terminal: int) -> List[List[Dict[int, int]]]:
+        """헤더별 존 목록. 첫 존에 종결 제너레이터가 없으면 전역 존으로 나머지 존에 합칩니다."""
+        out = []
+        for i in range(len(headers) - 1):
+            zones = []
+            for b in range(int(headers[i]["bag"]), int(headers[i + 1]["bag"])):
+                g = gens[int(bags[b]["gen"]) : int(bags[b + 1]["gen"])]
+                zones.append(dict(zip(g["oper"].tolist(), g["amount"].tolist())))
+            if zones and terminal not in zones[0]:
+                glob = zones.pop(0)
+                zones = [{**glob, **z} for z in zones]
+            out.append([z for z in zones if terminal in z])
+        return out
+
+    def _regions(self, pzones, izones) -> np.ndarray:
+        """프리셋 존 x 악기 존을 펼쳐 REGION 배열을 만듭니다."""
+        rows = []
+        for pz in pzones:
+            for iz in izones[pz[_G_INSTRUMENT]]:
+                g = {k: _signed(v) for k, v in iz.items() if k not in (_G_KEY_RANGE, _G_VEL_RANGE)}
+                for k in _ADDITIVE:
+                    g[k] = g.get(k, _DEFAULTS.get(k, 0)) + _signed(pz.get(k, 0))
+                ranges = []
+                for r in (_G_KEY_RANGE, _G_VEL_RANGE):  # 프리셋과 악기 범위의 교집합
+                    a, b = iz.get(r, 0x7F00), pz.get(r, 0x7F00)
+                    ranges += [max(a & 0xFF, b & 0xFF), min(a >> 8, b >> 8)]
+                sh = self.sample_headers[g[_G_SAMPLE_ID]]
+                root = g.get(_G_ROOT_KEY, -1)
+                root = int(sh["root"]) if root < 0 else root
+                tune = g[_G_COARSE_TUNE] + (g[_G_FINE_TUNE] + int(sh["correction"])) / 100.0
+                rows.append(
+                    (
+                        *ranges,
+                        int(sh["start"]) + g.get(_G_START, 0) + 32768 * g.get(_G_START_COARSE, 0),
+                        int(sh["end"]) + g.get(_G_END, 0) + 32768 * g.get(_G_END_COARSE, 0),
+                        int(sh["loop_start"])
+                        + g.get(_G_LOOP_START, 0)
+                        + 32768 * g.get(_G_LOOP_START_COARSE, 0),
+                        int(sh["loop_end"])
+                        + g.get(_G_LOOP_END, 0)
+                        + 32768 * g.get(_G_LOOP_END_COARSE, 0),
+                        g.get(_G_SAMPLE_MODES, 0) & 1 == 1,  # 1, 3: 루프 재생
+                        root - tune,
+                        g[_G_SCALE_TUNING] / 100.0,
+                        float(sh["rate"]),
+                        10.0 ** (-max(0, g[_G_ATTENUATION]) / 200.0),
+                        _timecents(g[_G_ATTACK]),
+                        _timecents(g[_G_DECAY]),
+                        min(100.0, max(0, g[_G_SUSTAIN]) / 10.0),
+                        _timecents(g[_G_RELEASE]),
+                    )
+                )
+        return np.array(rows, dtype=REGION)
+
+    # --- Rendering ----------------------------------------------------------
+    def preset(self, bank: int, program: int) -> np.ndarray:
+        """(뱅크, 프로그램) 리전 표. 없으면 같은 뱅크의 프로그램 0, 그다음 아무 프리셋으로 대체"""
+        for key in ((bank, program), (bank, 0), (0, program), (0, 0)):
+            if key in self.presets:
+                return self.presets[key]
+        return next(iter(self.presets.values()))
+
+    def _voices(self, inst: pretty_midi.Instrument, sr: int):
+        """
+        악기의 노트를 (노트, 리전) 보이스 배열 묶음으로 펼칩니다.
+        노트 하나가 여러 리전(레이어)을 울릴 수 있습니다.
+        """
+        regions = self.preset(DRUM_BANK if inst.is_drum else 0, inst.program)
+        a = np.array([(n.start, n.end, n.pitch, n.velocity) for n in inst.notes], dtype=np.float64)
+        start, end, pitch, vel = a.reshape(-1, 4).T
+        key = pitch.astype(np.int64)
+
+        def match(k, v):
+            return (
+                (k[:, None] >= regions["key_lo"])
+                & (k[:, None] <= regions["key_hi"])
+                & (v[:, None] >= regions["vel_lo"])
+                & (v[:, None] <= regions["vel_hi"])
+            )
+
+        hit = match(key, vel)
+        if inst.is_drum:  # 킷에 없는 GM 드럼 키 -> 같은 드럼 클래스의 다른 키
+            for i in np.flatnonzero(~hit.any(axis=1)):
+                for alt in _CLASS_KEYS[_PITCH2CLS.get(int(key[i]), "PERC")]:
+                    row = match(np.array([alt]), vel[i : i + 1])[0]
+                    if row.any():
+                        key[i], hit[i] = alt, row
+                        break
+        note, reg = np.nonzero(hit)
+        r = regions[reg]
+        ratio = 2.0 ** ((key[note] - r["root"]) * r["scale"] / 12.0) * r["rate"] / sr
+        on = np.round(start[note] * sr).astype(np.int64)
+        n_on = np.maximum(np.round(end[note] * sr).astype(np.int64) - on, 1)
+        rel = np.ceil(r["release"] * (RELEASE_CUT_DB / 100.0) * sr).astype(np.int64) + 1
+        # 루프 없는 샘플은 샘플이 끝나면 보이스도 끝 (드럼은 노트 끝과 무관하게 원샷)
+        sample_len = np.floor((r["end"] - r["start"] - 1) / ratio).astype(np.int64)
+        length = np.where(r["loop"], n_on + rel, np.minimum(n_on + rel, sample_len))
+        if inst.is_drum:
+            n_on = np.where(r["loop"], n_on, sample_len)
+            length = np.where(r["loop"], length, sample_len)
+        gain = r["gain"] * (vel[note] / 127.0) ** 2
+        return on, np.maximum(length, 0), n_on, ratio, gain, r
+
+    def _voice_fn(self, n_on, ratio, gain, r, sr: int):
+        """샘플을 선형 보간으로 리샘플링하고 볼륨 엔벨로프를 곱하는 voice 함수"""
+        data = self.samples
+        f32 = np.float32
+        # 보이스별 값은 샘플마다 다시 모으므로 구조화 배열 대신 연속 배열로 미리 꺼내 둠
+        start = r["start"].astype(np.float64)
+        # 시작 기준 루프 구간 (루프가 없으면 끝없이 먼 곳)
+        loop_end = np.where(r["loop"], r["loop_end"] - r["start"], np.inf)
+        loop_start = (r["loop_start"] - r["start"]).astype(np.float64)
+        loop_len = np.maximum(r["loop_end"] - r["loop_start"], 1).astype(np.float64)
+        inv_loop_len = 1.0 / loop_len
+        loop_end_abs = np.where(r["loop"], r["loop_end"], np.iinfo(np.int64).max)
+        loop_start_abs = r["loop_start"]
+        att = np.maximum(r["attack"] * sr, 1.0).astype(f32)
+        decay_rate = (100.0 / np.maximum(r["decay"] * sr, 1.0)).astype(f32)  # dB/샘플
+        rel_rate = (100.0 / np.maximum(r["release"] * sr, 1.0)).astype(f32)
+        sustain_db = r["sustain_db"].astype(f32)
+        n_on = n_on.astype(f32)
+        gain = (gain / 32768.0).astype(f32)
+        db_to_gain = f32(-np.log(10.0) / 20.0)
+
+        def voice(v, k):
+            pos = k * ratio[v]
+            over = pos >= loop_end[v]  # 루프 구간을 넘은 위치는 루프 시작으로 되감기
+            if over.any():  # 마스크 인덱싱 대신 where= 로 제자리 계산 (더 빠름)
+                turns = np.floor((pos - loop_start[v]) * inv_loop_len[v])
+                turns *= loop_len[v]
+                np.subtract(pos, turns, out=pos, where=over)
+            pos += start[v]
+            i0 = pos.astype(np.int64)
+            frac = (pos - i0).astype(f32)
+            i1 = i0 + 1
+            wrap = i1 >= loop_end_abs[v]  # 루프 끝 다음 샘플 = 루프 시작
+            if wrap.any():
+                i1[wrap] = loop_start_abs[v[wrap]]
+            x = data[i0].astype(f32)
+            x += (data[i1] - x) * frac
+            # 엔벨로프 (dB): 감쇠 -> 서스테인, 노트 끝 이후 릴리스
+            kf = k.astype(f32)
+            db = np.minimum(np.maximum(kf - att[v], 0) * decay_rate[v], sustain_db[v])
+            db += np.maximum(kf - n_on[v], 0) * rel_rate[v]
+            amp = np.exp(db * db_to_gain)
+            amp *= np.minimum(kf / att[v], 1)
+            amp *= gain[v]
+            x *= amp
+            return x
+
+        return voice
+
+    def render_stems(self, pm: pretty_midi.PrettyMIDI, sr: int = SR) -> Dict[str, np.ndarray]:
+        """render.synth.render_stems와 같은 형식의 'melody'/'drums' 모노 스템 (팬은 무시)"""
+        voices = []
+        for inst in pm.instruments:
+            if inst.notes:
+                voices.append(("drums" if inst.is_drum else "melody", self._voices(inst, sr)))
+        n_total = max([int((v[0] + v[1]).max()) for _, v in voices if len(v[0])], default=0)
+        stems = {
+            "melody": np.zeros(n_total, dtype=np.float32),
+            "drums": np.zeros(n_total, dtype=np.float32),
+        }
+        for stem, (on, length, n_on, ratio, gain, r) in voices:
+            if len(on):
+                overlap_add(stems[stem], on, length, self._voice_fn(n_on, ratio, gain, r, sr))
+        return stems
+
+
+@lru_cache(maxsize=4)
+def load_soundfont(path: str | Path) -> SoundFont:
+    """프로세스마다 한 번만 파싱 (샘플 페이지는 memmap으로 프로세스 간 공유)"""
+    return SoundFont(path)
+
+
+def find_soundfont(directory: Path = SOUNDFONT_DIR) -> Optional[Path]:
+    """render/soundfonts 의 첫 번째 .sf2 파일 (없으면 None)"""
+    found = sorted(Path(directory).glob("*.sf2"))
+    return found[0] if found else None
+
+
+if __name__ == "__main__":
+    import soundfile as sf
+
+    from render.synth import render
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("midi", help="Input MIDI file")
+    ap.add_argument("wav", help="Output WAV file")
+    ap.add_argument("--sf2", default=None, help="SoundFont (default: first in render/soundfonts)")
+    ap.add_argument("--sr", type=int, default=SR, help="Sample rate")
+    args = ap.parse_args()
+    sf2 = args.sf2 or find_soundfont()
+    if sf2 is None:
+        raise SystemExit(f"No .sf2 given and none found in {SOUNDFONT_DIR}")
+    t0 = time.perf_counter()
+    font = load_soundfont(sf2)
+    t1 = time.perf_counter()
+    audio = render(pretty_midi.PrettyMIDI(args.midi), args.sr, soundfont=font)
+    t2 = time.perf_counter()
+    sf.write(args.wav, audio, args.sr)
+    print(
+        f"Wrote {args.wav}: {len(audio) / args.sr:.2f}s audio "
+        f"(load {1000 * (t1 - t0):.1f} ms, render {1000 * (t2 - t1):.1f} ms)"
+    )
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import io
+import struct
+import sys
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pretty_midi
+
+# 모델을 임포트하기 전에 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.detokenize import BarDetokenizer  # noqa: E402
+from render.loop_tools.loop import XFADE_MS, loop_samples, xfade_curves  # noqa: E402
+from render.synth import SR, render_stems  # noqa: E402
+
+STREAM_GAIN = 0.6  # 스트리밍은 전체 피크를 미리 알 수 없으므로 고정 이득 + 클리핑
+UNKNOWN_SIZE = 0xFFFFFFFF  # 길이를 모르는 WAV 스트림의 RIFF/data 크기 관례 값
+
+BarNotes = Tuple[int, List[pretty_midi.Note], List[pretty_midi.Note]]  # (마디, 멜로디, 드럼)
+
+
+def wav_header(sr: int = SR, channels: int = 1, size: Optional[int] = None) -> bytes:
+    """
+    16비트 PCM WAV 헤더. size(data 바이트 수)를 모르면 RIFF/data 크기를 0xFFFFFFFF로 둡니다
+    (브라우저와 ffmpeg/libsndfile은 이를 '파일 끝까지 읽기'로 처리).
+    """
+    block = 2 * channels
+    data = UNKNOWN_SIZE if size is None else size
+    riff = UNKNOWN_SIZE if size is None else 36 + size
+    return (
+        b"RIFF"
+        + struct.pack("<I", riff)
+        + b"WAVEfmt "
+        + struct.pack("<IHHIIHH", 16, 1, channels, sr, sr * block, block, 16)
+        + b"data"
+        + struct.pack("<I", data)
+    )
+
+
+def pcm16(y: np.ndarray) -> bytes:
+    """float 오디오 -> 리틀엔디언 16비트 PCM 바이트 (범위 밖은 클리핑)"""
+    return (np.clip(y, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+class FlacEncoder:
+    """
+    float 오디오 -> 16비트 FLAC 바이트 청크 (점진적 인코딩).
+    libFLAC은 블록(4096 샘플)이 찰 때마다 프레임을 쓰므로 write는 그때까지 완성된 바이트만
+    돌려주고(빈 바이트일 수 있음) 나머지는 close가 돌려줍니다. 닫을 때 고쳐 쓰는 STREAMINFO는
+    이미 보낸 머리에 닿지 않으므로, frames(총 샘플 수)를 알면 첫 청크의 STREAMINFO에 미리
+    적습니다. 모르면 0(길이 미정)으로 남고 MD5는 어느 쪽이든 비어 있습니다.
+    """
+
+    def __init__(self, sr: int = SR, channels: int = 1, frames: Optional[int] = None):
+        import soundfile as sf
+
+        self.frames = frames
+        self._buf = io.BytesIO()
+        self._sent = 0
+        self._f = sf.SoundFile(self._buf, "w", sr, channels, format="FLAC", subtype="PCM_16")
+
+    def _take(self) -> bytes:
+        data = self._buf.getbuffer()[self._sent :].tobytes()
+        if self._sent == 0 and data and self.frames is not None:
+            # "fLaC" + 블록 머리(4) 뒤 STREAMINFO: 10바이트 다음 64비트의 하위 36비트가 총 샘플 수
+            info = int.from_bytes(data[18:26], "big") & ~((1 << 36) - 1) | self.frames
+            data = data[:18] + info.to_bytes(8, "big") + data[26:]
+        self._sent += len(data)
+        return data
+
+    def write(self, y: np.ndarray) -> bytes:
+        self._f.write(np.frombuffer(pcm16(y), dtype="<i2"))  # WAV 스트림과 같은 정수 샘플
+        return self._take()
+
+    def close(self) -> bytes:
+        self._f.close()
+        return self._take()
+
+
+class BarRenderer:
+    """
+    확정된 마디의 노트를 받아 그 마디 끝까지의 오디오를 돌려주는 점진적 렌더러.
+    마디 b에서 시작하는 노트만 render_stems로 렌더링해 누적 버퍼의 마디 시작 위치에 더하고,
+    이후 마디의 노트는 마디 b 끝 이전에 울릴 수 없으므로
+    [이미 보낸 곳, 마디 끝) 구간을 확정해 내보냅니다.
+    릴리스/원샷 꼬리는 버퍼에 남았다가 다음 마디와 합쳐집니다.
+    """
+
+    def __init__(
+        self,
+        bpm: float,
+        sr: int = SR,
+        xfade_ms: float = XFADE_MS,
+        render: Callable[[pretty_midi.PrettyMIDI, int], Dict[str, np.ndarray]] = render_stems,
+    ):
+        self.bpm = bpm
+        self.sr = sr
+        self.render = render  # render_stems 또는 SoundFont.render_stems
+        self.sent = 0  # 지금까지 내보낸 샘플 수
+        self._acc = np.zeros(0, dtype=np.float32)  # self.sent부터의 미확정 오디오
+        self._fade = xfade_curves(max(0, int(round(xfade_ms * sr / 1000.0))))[0]
+        self._head = np.zeros(0, dtype=np.float32)  # 페이드 전 머리 (루프 조립용)
+
+    def _add(self, offset: int, y: np.ndarray) -> None:
+        """절대 샘플 위치 offset에 y를 더합니다 (offset >= self.sent)."""
+        i = offset - self.sent
+        need = i + len(y)
+        if need > len(self._acc):
+            grown = np.zeros(max(need, 2 * len(self._acc)), dtype=np.float32)
+            grown[: len(self._acc)] = self._acc
+            self._acc = grown
+        self._acc[i:need] += y
+
+    def add_bar(
+        self,
+        bar: int,
+        melody: Sequence[pretty_midi.Note],
+        drums: Sequence[pretty_midi.Note],
+        program: int = 0,
+    ) -> np.ndarray:
+        """마디 하나의 노트를 렌더링하고 마디 끝까지 확정된 오디오를 돌려줍니다."""
+        insts = []
+        for notes, is_drum in ((melody, False), (drums, True)):
+            if notes:
+                insts.append(pretty_midi.Instrument(program=program, is_drum=is_drum))
+                insts[-1].notes = list(notes)
+        return self.add_instruments(bar, insts)
+
+    def add_instruments(
+        self, bar: int, instruments: Sequence[pretty_midi.Instrument]
+    ) -> np.ndarray:
+        """add_bar의 여러 악기 버전: 마디 bar에서 시작하는 노트(절대 시간)를 악기별로 받습니다."""
+        start = loop_samples(self.bpm, self.sr, bar)
+        shift = start / self.sr
+        pm = pretty_midi.PrettyMIDI(initial_tempo=self.bpm)
+        for src in instruments:
+            if not src.notes:
+                continue
+            inst = pretty_midi.Instrument(program=src.program, is_drum=src.is_drum)
+            # 마디 시작 샘플의 반올림 오차로 첫 스텝이 음수가 되지 않도록 0에서 자름
+            inst.notes = [
+                pretty_midi.Note(n.velocity, n.pitch, max(n.start - shift, 0.0), n.end - shift)
+                for n in src.notes
+            ]
+            pm.instruments.append(inst)
+        if pm.instruments:
+            stems = self.render(pm, self.sr)
+            self._add(start, stems["melody"] + stems["drums"])
+        return self.take(loop_samples(self.bpm, self.sr, bar + 1))
+
+    def take(self, end: int) -> np.ndarray:
+        """[self.sent, end) 구간을 확정해 돌려줍니다 (첫 샘플들에는 build_loop의 머리 페이드인)."""
+        n = max(0, end - self.sent)
+        if n > len(self._acc):
+            self._add(self.sent, np.zeros(n, dtype=np.float32))
+        out = self._acc[:n].copy()
+        self._acc = self._acc[n:]
+        k = min(len(self._fade) - self.sent, n)
+        if k > 0:  # build_loop 크로스페이드의 들어오는 쪽과 같은 sin 곡선
+            self._head = np.concatenate([self._head, out[:k]])
+            out[:k] *= self._fade[self.sent : self.sent + k]
+        self.sent += n
+        return out
+
+    def tail(self) -> np.ndarray:
+        """루프 끝 이후 남은 꼬리 (한 번 재생용 스트림에서는 버리고, 루프 조립에는 사용)"""
+        return self._acc.copy()
+
+    def loop_source(self, parts: Sequence[np.ndarray]) -> np.ndarray:
+        """
+        take가 돌려준 청크들 + 꼬리 -> build_loop에 넘길 한 줄 신호. 머리는 페이드 전 값으로
+        되돌려 build_loop의 크로스페이드가 두 번 걸리지 않게 합니다.
+        """
+        y = np.concatenate(list(parts) + [self._acc])
+        y[: len(self._head)] = self._head
+        return y
+
+
+def iter_bars(
+    melody: Optional[Iterable[str]], drums: Optional[Iterable[str]], bpm: float, bars: int
+) -> Iterator[BarNotes]:
+    """
+    멜로디/드럼 토큰 스트림을 마디 단위로 맞춰 (마디, 멜로디 노트, 드럼 노트)를 순서대로 냅니다.
+    두 스트림을 번갈아 읽어 양쪽에서 모두 확정된 마디만 내보내므로, 토큰이 생성되는 대로
+    (이터레이터로) 넘겨도 첫 마디가 확정되는 즉시 렌더링을 시작할 수 있습니다.
+    """
+    its = [iter(melody or ()), iter(drums or ())]
+    detoks = [BarDetokenizer(bpm, is_drum=False), BarDetokenizer(bpm, is_drum=True)]
+    ready: List[Dict[int, List[pretty_midi.Note]]] = [{}, {}]
+    live = [True, True]
+    nxt = 0
+    while nxt < bars and any(live):
+        for i in (0, 1):
+            if not live[i]:
+                continue
+            # 이 스트림에서 마디 nxt가 확정될 때까지 읽음
+            while nxt not in ready[i]:
+                tok = next(its[i], None)
+                if tok is None:
+                    live[i] = False
+                    for b, notes in detoks[i].flush(bars):
+                        ready[i][b] = notes
+                    break
+                for b, notes in detoks[i].feed(tok):
+                    ready[i][b] = notes
+        while nxt < bars and all(nxt in ready[i] or not live[i] for i in (0, 1)):
+            yield nxt, ready[0].pop(nxt, []), ready[1].pop(nxt, [])
+            nxt += 1
+    for b in range(nxt, bars):
+        yield b, ready[0].pop(b, []), ready[1].pop(b, [])
+
+
+def stream_pcm(
+    melody: Optional[Iterable[str]],
+    drums: Optional[Iterable[str]],
+    bpm: float,
+    bars: int,
+    sr: int = SR,
+    gain: float = STREAM_GAIN,
+    renderer: Optional[BarRenderer] = None,
+) -> Iterator[bytes]:
+    """
+    토큰 스트림 -> 마디별 16비트 PCM 바이트 청크 (헤더 제외). 전체 길이는 정확히 bars 마디입니다.
+    renderer를 넘기면 끝난 뒤 renderer.tail()로 루프 접기용 꼬리를 얻을 수 있습니다.
+    """
+    renderer = renderer or BarRenderer(bpm, sr)
+    for bar, mel, drm in iter_bars(melody, drums, bpm, bars):
+        yield pcm16(renderer.add_bar(bar, mel, drm) * gain)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from models.detokenize import header_bpm
+    from web.backend.pipeline import controls_for, stub_generate
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("wav", help="Output WAV file written bar by bar")
+    ap.add_argument("--prompt", default="calm lofi beat")
+    ap.add_argument("--bars", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    tokens = stub_generate(controls_for(args.prompt), args.seed, args.bars)
+    bpm = header_bpm(tokens["melody"])
+    t0 = time.perf_counter()
+    first = None
+    with open(args.wav, "wb") as f:
+        f.write(wav_header(SR))
+        for chunk in stream_pcm(tokens["melody"], tokens["drums"], bpm, args.bars):
+            first = first or time.perf_counter() - t0
+            f.write(chunk)
+    total = time.perf_counter() - t0
+    print(f"Wrote {args.wav}: first bar {1000 * first:.1f} ms, all {1000 * total:.1f} ms")
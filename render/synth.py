@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pretty_midi
+
+# 모델을 임포트하기 전에 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.tokenizer_drums import _CLASSES, _PITCH_LUT  # noqa: E402
+
+SR = 22050  # 기본 샘플링 레이트
+TABLE_LEN = 4096  # 단일 주기 웨이브테이블 길이
+ENV_SEC = 4.0  # 미리 계산하는 엔벨로프 길이 (이후는 마지막 값 유지)
+RELEASE_SEC = 0.08  # 노트 끝 이후 릴리스 길이
+_FRAC_BITS = 20  # 웨이브테이블 위상의 소수부 비트 수
+_FRAC_MASK = (1 << _FRAC_BITS) - 1
+_PHASE_MASK = (TABLE_LEN << _FRAC_BITS) - 1  # TABLE_LEN은 2의 거듭제곱
+BLOCK_SAMPLES = 1 << 17  # 오버랩-애드 한 묶음에서 펼치는 최대 샘플 수 (캐시에 맞는 크기)
+
+# 악기 계열: (배음 진폭, 어택 초, 감쇠 시정수 초, 서스테인 레벨)
+_FAMILIES = {
+    "keys": ((1.0, 0.5, 0.25, 0.12, 0.06), 0.005, 0.6, 0.15),
+    "bass": ((1.0, 0.6, 0.3, 0.1), 0.008, 1.0, 0.4),
+    "lead": (tuple(1.0 / n for n in range(1, 9)), 0.02, 2.0, 0.7),
+}
+
+
+def _family(program: int) -> str:
+    """GM 프로그램 번호 -> 악기 계열 (0-23 건반/오르간, 32-39 베이스, 나머지 리드/패드)"""
+    if program < 24:
+        return "keys"
+    if 32 <= program < 40:
+        return "bass"
+    return "lead"
+
+
+# --- Precomputed tables -----------------------------------------------------
+@lru_cache(maxsize=None)
+def _family_tables(family: str, sr: int) -> Tuple[np.ndarray, np.ndarray]:
+    """계열별 단일 주기 웨이브테이블 (TABLE_LEN + 1, 보간용 끝점 포함)과 엔벨로프 곡선"""
+    harmonics, attack, tau, sustain = _FAMILIES[family]
+    ph = np.arange(TABLE_LEN + 1) * (2 * np.pi / TABLE_LEN)
+    table = sum(a * np.sin(h * ph) for h, a in enumerate(harmonics, start=1))
+    table = (table / np.abs(table).max()).astype(np.float32)
+    k = np.arange(int(ENV_SEC * sr))
+    env = np.minimum(k / max(1.0, attack * sr), 1.0)
+    env *= sustain + (1.0 - sustain) * np.exp(-k / (tau * sr))
+    return table, env.astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def _phase_inc(sr: int) -> np.ndarray:
+    """피치별 샘플당 웨이브테이블 위상 증가량 (128,)"""
+    freq = 440.0 * 2.0 ** ((np.arange(128) - 69) / 12.0)
+    return freq * TABLE_LEN / sr
+
+
+@lru_cache(maxsize=None)
+def _drum_kit(sr: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    드럼 클래스별 원샷 샘플 (_CLASSES 순서, 길이를 맞춘 2차원 배열)과 클래스별 길이.
+    합성 음색이므로 시드를 고정해 항상 같은 소리가 나게 합니다.
+    """
+    rng = np.random.default_rng(0)
+
+    def t(sec):
+        return np.arange(int(sec * sr)) / sr
+
+    def noise(sec, hp=False):
+        x = rng.standard_normal(int(sec * sr))
+        return np.diff(x, prepend=0.0) * 0.5 if hp else x  # 1차 차분 = 간단한 하이패스
+
+    def sweep(sec, f0, f1, decay):
+        tt = t(sec)
+        f = f1 + (f0 - f1) * np.exp(-tt / 0.03)  # 피치가 빠르게 떨어지는 사인
+        return np.sin(2 * np.pi * np.cumsum(f) / sr) * np.exp(-tt / decay)
+
+    shots = {
+        "KICK": sweep(0.35, 160.0, 50.0, 0.12),
+        "SNARE": 0.5 * noise(0.25) * np.exp(-t(0.25) / 0.06) + 0.5 * sweep(0.25, 220, 180, 0.05),
+        "HHC": 0.4 * noise(0.06, hp=True) * np.exp(-t(0.06) / 0.015),
+        "HHO": 0.35 * noise(0.4, hp=True) * np.exp(-t(0.4) / 0.12),
+        "TOM": 0.8 * sweep(0.4, 200.0, 110.0, 0.15),
+        "RIDE": 0.25 * noise(0.8, hp=True) * np.exp(-t(0.8) / 0.3),
+        "CRASH": 0.35 * noise(1.2, hp=True) * np.exp(-t(1.2) / 0.45),
+        "CLAP": 0.5 * noise(0.2) * np.exp(-((t(0.2) % 0.012) + t(0.2) * 3) / 0.01),
+        "PERC": 0.4 * np.sin(2 * np.pi * 800.0 * t(0.1)) * np.exp(-t(0.1) / 0.03),
+    }
+    lengths = np.array([len(shots[c]) for c in _CLASSES], dtype=np.int64)
+    kit = np.zeros((len(_CLASSES), lengths.max()), dtype=np.float32)
+    for i, c in enumerate(_CLASSES):
+        kit[i, : lengths[i]] = shots[c]
+    return kit, lengths
+
+
+# --- Overlap-add ------------------------------------------------------------
+def overlap_add(
+    out: np.ndarray,
+    onsets: np.ndarray,
+    lengths: np.ndarray,
+    voice: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    block: int = BLOCK_SAMPLES,
+) -> np.ndarray:
+    """
+    모든 노트를 미리 할당된 버퍼 out에 한 번에 더합니다 (노트별 연결 없음).
+    노트 i는 out[onsets[i] + k] (0 <= k < lengths[i]) 에 voice(i, k) 값을 더합니다.
+    voice는 노트 번호 배열과 노트 내 오프셋 배열을 받아 샘플 값 배열을 돌려줘야 합니다.
+    펼친 샘플 수가 block을 넘지 않도록 노트를 묶어 처리하고, 묶음마다 bincount로 합칩니다.
+    """
+    # 시작 순으로 정렬해 각 묶음이 버퍼의 좁은 구간만 건드리게 함
+    order = np.argsort(onsets, kind="stable")
+    onsets = np.asarray(onsets, dtype=np.int64)[order]
+    lengths = np.minimum(np.asarray(lengths, dtype=np.int64)[order], len(out) - onsets).clip(0)
+    ends = np.cumsum(lengths)
+    i = 0
+    while i < len(onsets):
+        # 펼친 길이 합이 block 이하가 되는 마지막 노트까지 (최소 한 노트)
+        base = ends[i - 1] if i else 0
+        j = max(i + 1, int(np.searchsorted(ends, base + block, side="right")))
+        n = lengths[i:j]
+        total = int(n.sum())
+        if total:
+            note = np.repeat(np.arange(i, j), n)
+            k = np.arange(total) - np.repeat(np.cumsum(n) - n, n)  # 노트 내 오프셋
+            idx = onsets[note] + k
+            lo, hi = int(idx.min()), int(idx.max()) + 1
+            vals = voice(order[note], k)
+            out[lo:hi] += np.bincount(idx - lo, weights=vals, minlength=hi - lo)
+        i = j
+    return out
+
+
+def _wavetable_voice(table, env, inc, vel, n_on, rel):
+    """웨이브테이블(선형 보간) * 엔벨로프 * 릴리스 램프로 노트 샘플을 만드는 voice 함수"""
+    # 고정소수점 위상: 상위 비트 = 테이블 위치, 하위 _FRAC_BITS = 보간 비율 (정수 연산만 사용)
+    inc_fx = np.round(inc * (1 << _FRAC_BITS)).astype(np.int64)
+    vel = vel.astype(np.float32)
+    end = (n_on + rel).astype(np.float32)
+
+    def voice(note, k):
+        phase = (k * inc_fx[note]) & _PHASE_MASK
+        i0 = phase >> _FRAC_BITS
+        frac = (phase & _FRAC_MASK).astype(np.float32) * np.float32(1.0 / (1 << _FRAC_BITS))
+        x = table[i0]
+        x += (table[i0 + 1] - x) * frac
+        x *= env[np.minimum(k, len(env) - 1)]
+        # 노트 끝에서 선형 릴리스
+        x *= np.minimum((end[note] - k) * np.float32(1.0 / rel), np.float32(1.0))
+        x *= vel[note]
+        return x
+
+    return voice
+
+
+# --- Public -----------------------------------------------------------------
+def render_stems(pm: pretty_midi.PrettyMIDI, sr: int = SR) -> Dict[str, np.ndarray]:
+    """
+    PrettyMIDI를 'melody'(비드럼 악기 전체)와 'drums' 모노 float32 스템으로 렌더링합니다.
+    두 스템은 길이가 같습니다 (마지막 노트의 릴리스/원샷 꼬리까지).
+    """
+    rel = max(1, int(RELEASE_SEC * sr))
+    kit, kit_len = _drum_kit(sr)
+    melodic, drums = {}, []
+    for inst in pm.instruments:
+        if inst.is_drum:
+            drums.extend(inst.notes)
+        else:
+            melodic.setdefault(_family(inst.program), []).extend(inst.notes)
+
+    def arrays(notes):
+        a = np.array([(n.start, n.end, n.pitch, n.velocity) for n in notes], dtype=np.float64)
+        return a.reshape(-1, 4).T
+
+    # 버퍼 길이: 가장 늦게 끝나는 소리 (노트 끝 + 릴리스, 드럼 원샷 끝)
+    n_total = 0
+    for notes in melodic.values():
+        if notes:
+            n_total = max(n_total, int(round(max(n.end for n in notes) * sr)) + rel)
+    d_start, _, d_pitch, d_vel = arrays(drums)
+    d_cls = _PITCH_LUT[d_pitch.astype(np.int64)].astype(np.int64)
+    d_on = np.round(d_start * sr).astype(np.int64)
+    if len(drums):
+        n_total = max(n_total, int((d_on + kit_len[d_cls]).max()))
+
+    stems = {"melody": np.zeros(n_total, dtype=np.float32)}
+    stems["drums"] = np.zeros(n_total, dtype=np.float32)
+    for family, notes in melodic.items():
+        start, end, pitch, vel = arrays(notes)
+        table, env = _family_tables(family, sr)
+        on = np.round(start * sr).astype(np.int64)
+        n_on = np.maximum(np.round(end * sr).astype(np.int64) - on, 1)
+        voice = _wavetable_voice(
+            table, env, _phase_inc(sr)[pitch.astype(np.int64)], 0.25 * vel / 127.0, n_on, rel
+        )
+        overlap_add(stems["melody"], on, n_on + rel, voice)
+    if len(drums):
+        gain = (0.6 * d_vel / 127.0).astype(np.float32)
+        overlap_add(
+            stems["drums"], d_on, kit_len[d_cls], lambda note, k: kit[d_cls[note], k] * gain[note]
+        )
+    return stems
+
+
+def render(
+    pm: pretty_midi.PrettyMIDI, sr: int = SR, normalize: bool = True, soundfont=None
+) -> np.ndarray:
+    """
+    PrettyMIDI -> 모노 float32 오디오.
+    normalize=True면 클리핑 직전(-1 dBFS)으로 피크를 낮춥니다.
+    soundfont: render.soundfont.SoundFont를 주면 내장 음색 대신 SF2 샘플로 렌더링합니다.
+    """
+    stems = soundfont.render_stems(pm, sr) if soundfont is not None else render_stems(pm, sr)
+    audio = stems["melody"]
+    audio += stems["drums"]
+    peak = float(np.abs(audio).max()) if len(audio) else 0.0
+    if normalize and peak > 0.89:
+        audio *= 0.89 / peak
+    return audio
+
+
+def render_timed(
+    pm: pretty_midi.PrettyMIDI, sr: int = SR, soundfont=None
+) -> Tuple[np.ndarray, Dict[str, float]]:
+    """render()와 같고, 렌더 시간과 실시간 배율(RTF = 렌더 시간 / 오디오 길이)을 함께 반환합니다."""
+    t0 = time.perf_counter()
+    audio = render(pm, sr, soundfont=soundfont)
+    elapsed = time.perf_counter() - t0
+    audio_sec = len(audio) / sr
+    return audio, {
+        "render_sec": elapsed,
+        "audio_sec": audio_sec,
+        "rtf": elapsed / audio_sec if audio_sec else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import soundfile as sf
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("midi", help="Input MIDI file")
+    ap.add_argument("wav", help="Output WAV file")
+    ap.add_argument("--sr", type=int, default=SR, help="Sample rate")
+    args = ap.parse_args()
+    audio, stats = render_timed(pretty_midi.PrettyMIDI(args.midi), args.sr)
+    sf.write(args.wav, audio, args.sr)
+    print(
+        f"Wrote {args.wav}: {stats['audio_sec']:.2f}s audio in {stats['render_sec'] * 1000:.1f} ms "
+        f"(RTF={stats['rtf']:.4f})"
+    )
@@ -0,0 +1,513 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+# 모델을 임포트하기 전에 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from web.backend.cache import (  # noqa: E402
+    CACHE_DIR,
+    GenerationCache,
+    cache_key,
+    model_fingerprint,
+)
+from web.backend.pipeline import (  # noqa: E402
+    SR,
+    Controls,
+    controls_for,
+    generator_checkpoint,
+    init_worker,
+    run_job,
+    stream_job,
+    wav_to_flac,
+)
+
+MAX_BODY = 64 * 1024  # 요청 본문 상한 (프롬프트 JSON이면 충분)
+KEEPALIVE_SEC = 30.0  # 유휴 연결을 닫기까지의 시간
+RETRY_AFTER_SEC = 1  # 큐가 가득 찼을 때 클라이언트에게 알려 줄 재시도 간격
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+_CONTENT_TYPES = {"wav": "audio/wav", "flac": "audio/flac", "midi": "audio/midi"}
+
+
+def _chain(src: asyncio.Future, dst: asyncio.Future) -> None:
+    """src의 결과/예외를 dst로 옮깁니다."""
+    if dst.done():
+        return
+    if src.cancelled():
+        dst.cancel()
+    elif src.exception() is not None:
+        dst.set_exception(src.exception())
+    else:
+        dst.set_result(src.result())
+
+
+class Busy(Exception):
+    """서로 다른 진행 중 작업 수가 queue_depth에 도달함 (503으로 응답)"""
+
+
+class BodyTooLarge(Exception):
+    """요청 본문이 MAX_BODY를 넘음 (413으로 응답)"""
+
+
+def _ping() -> int:
+    """워커 프로세스를 미리 띄우고 파이프라인 모듈을 임포트해 두기 위한 빈 작업"""
+    return 0
+
+
+class GenerationService:
+    """
+    prompt -> parse_prompt -> 생성 -> 렌더 파이프라인을 프로세스 풀에서 실행하는 서비스.
+    - 모델/렌더 작업은 크기가 정해진 ProcessPoolExecutor에서만 돌아 이벤트 루프를 막지 않습니다.
+    - 결과는 (제어 토큰, 시드, 모델 지문) 내용 주소로 2단 캐시(메모리 LRU + 디스크)에 저장됩니다.
+    - 같은 키의 진행 중 요청은 하나의 작업으로 합쳐집니다 (요청 병합).
+    - 서로 다른 진행 중 작업이 queue_depth개면 새 작업은 Busy로 거절합니다 (백프레셔).
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        queue_depth: int = 8,
+        generator: str = "stub",
+        soundfont: Optional[str] = None,
+        cache: Optional[GenerationCache] = None,
+        checkpoint: Optional[str] = None,
+    ):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.generator = generator
+        self.soundfont = soundfont
+        self.cache = cache
+        # 워커가 읽을 파일과 캐시 키에 해시하는 파일이 같도록 경로를 한 번 정해 둠
+        self.checkpoint = generator_checkpoint(generator, checkpoint)
+        self.fingerprint = model_fingerprint(generator, self.checkpoint, soundfont)
+        # spawn: 이벤트 루프가 돌고 있는 프로세스를 fork하지 않음
+        self.pool = ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.checkpoint,),
+        )
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"jobs": 0, "streams": 0, "coalesced": 0, "rejected": 0, "failed": 0}
+        self._manager = None  # 스트리밍 청크를 워커에서 받아 올 큐를 만드는 Manager
+
+    async def start(self) -> None:
+        """워커를 미리 띄워 첫 요청이 프로세스 시작 비용을 치르지 않게 합니다."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _ping) for _ in range(self.workers)))
+        ctx = multiprocessing.get_context("spawn")
+        self._manager = await loop.run_in_executor(None, ctx.Manager)
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+    async def stream(
+        self, prompt: str, seed: int = 0, fmt: str = "wav"
+    ) -> Tuple[Optional[Dict[str, object]], Optional[AsyncIterator[bytes]], str]:
+        """
+        점진적 응답: (완성 결과, None, 출처) 또는 (None, fmt(wav/flac) 바이트 청크 이터레이터,
+        'stream').
+        캐시에 있거나 같은 키의 작업이 이미 진행 중이면 완성된 결과를 그대로 돌려주고,
+        아니면 stream_job을 워커에서 돌리며 마디가 렌더링될 때마다 청크를 넘깁니다.
+        스트림 작업도 진행 중 작업으로 등록되므로 그동안의 /generate 요청은 그 결과에 병합되고,
+        끝나면 꼬리를 접은 루프가 캐시에 들어갑니다.
+        """
+        controls = controls_for(prompt)
+        key = cache_key(controls, seed, self.fingerprint)
+        if self.cache is not None:
+            hit = self.cache.get_memory(key)
+            if hit is not None:
+                return hit, None, "memory"
+        if key in self.inflight:
+            result, source = await self.generate(prompt, seed)
+            return result, None, source
+        if len(self.inflight) >= self.queue_depth:
+            self.stats["rejected"] += 1
+            raise Busy()
+        loop = asyncio.get_running_loop()
+        # 디스크 조회 동안 자리 표시 future로 키를 잡아 두어, 그 사이 들어온 같은 요청도 병합되게 함
+        placeholder = loop.create_future()
+        self.inflight[key] = placeholder
+        try:
+            hit = None
+            if self.cache is not None:
+                hit = await loop.run_in_executor(None, self.cache.get, key)
+        except BaseException as e:
+            self.inflight.pop(key, None)
+            placeholder.set_exception(e)
+            raise
+        if hit is not None:
+            self.inflight.pop(key, None)
+            placeholder.set_result((hit, "disk"))
+            return hit, None, "disk"
+        self.stats["streams"] += 1
+        queue = self._manager.Queue()
+        job = loop.run_in_executor(
+            self.pool,
+            stream_job,
+            controls,
+            int(seed),
+            self.generator,
+            SR,
+            self.soundfont,
+            queue,
+            fmt,
+        )
+        fut = asyncio.ensure_future(self._cache_after(key, job))
+        self.inflight[key] = fut
+        fut.add_done_callback(lambda f, k=key: self._done(k, f))
+        fut.add_done_callback(lambda f: _chain(f, placeholder))  # 자리 표시에 병합된 요청
+
+        first = await loop.run_in_executor(None, queue.get)  # 첫 청크 또는 실패 시 None
+        if first is None:
+            await asyncio.shield(fut)  # 워커 예외를 그대로 올림
+            raise RuntimeError("stream ended before any audio")
+
+        async def chunks() -> AsyncIterator[bytes]:
+            item = first
+            while item is not None:
+                yield item
+                item = await loop.run_in_executor(None, queue.get)
+
+        return None, chunks(), "stream"
+
+    async def _cache_after(self, key: str, job: asyncio.Future) -> Tuple[Dict, str]:
+        result = await job
+        if self.cache is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.cache.put, key, result)
+        return result, "miss"
+
+    async def generate(self, prompt: str, seed: int = 0) -> Tuple[Dict[str, object], str]:
+        """
+        (결과 dict, 출처). 출처는 'memory' / 'disk' / 'miss'(새로 생성) / 'coalesced'
+        (같은 키의 진행 중 작업을 함께 기다림) 중 하나입니다.
+        """
+        controls = controls_for(prompt)
+        key = cache_key(controls, seed, self.fingerprint)
+        if self.cache is not None:
+            hit = self.cache.get_memory(key)  # 메모리 적중은 이벤트 루프에서 바로 응답
+            if hit is not None:
+                return hit, "memory"
+        fut = self.inflight.get(key)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            result, _ = await asyncio.shield(fut)
+            return result, "coalesced"
+        if len(self.inflight) >= self.queue_depth:
+            self.stats["rejected"] += 1
+            raise Busy()
+        # 디스크 조회도 진행 중 작업에 포함시켜, 그동안 들어온 같은 요청이 병합되게 함
+        fut = asyncio.ensure_future(self._produce(key, controls, int(seed)))
+        self.inflight[key] = fut
+        fut.add_done_callback(lambda f, k=key: self._done(k, f))
+        # shield: 한 클라이언트가 끊겨도 같은 작업을 기다리는 다른 요청은 계속 진행
+        return await asyncio.shield(fut)
+
+    async def _produce(self, key: str, controls: Controls, seed: int) -> Tuple[Dict, str]:
+        """디스크 캐시 -> 없으면 워커 풀에서 생성 후 캐시에 저장"""
+        loop = asyncio.get_running_loop()
+        if self.cache is not None:
+            hit = await loop.run_in_executor(None, self.cache.get, key)
+            if hit is not None:
+                return hit, "disk"
+        self.stats["jobs"] += 1
+        result = await loop.run_in_executor(
+            self.pool, run_job, controls, seed, self.generator, SR, self.soundfont
+        )
+        if self.cache is not None:
+            await loop.run_in_executor(None, self.cache.put, key, result)
+        return result, "miss"
+
+    def _done(self, key: str, fut: asyncio.Future) -> None:
+        self.inflight.pop(key, None)
+        if not fut.cancelled() and fut.exception() is not None:
+            self.stats["failed"] += 1
+
+    def health(self) -> Dict[str, object]:
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "inflight": len(self.inflight),
+            "generator": self.generator,
+            **self.stats,
+            "cache": self.cache.info() if self.cache is not None else None,
+        }
+
+
+# ---- 최소 HTTP/1.1 서버 (표준 라이브러리 asyncio 스트림) -------------------
+async def _read_request(
+    reader: asyncio.StreamReader,
+) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """
+    (메서드, 대상, 헤더, 본문) 또는 연결이 끝났으면 None.
+    요청 줄/헤더 형식이 틀리면 ValueError (400), 본문이 MAX_BODY를 넘으면 BodyTooLarge (413).
+    """
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_SEC)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    lines = head[:-4].decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) != 3 or not parts[0] or not parts[1] or not parts[2].startswith("HTTP/"):
+        raise ValueError("malformed request line")
+    method, target, _ = parts
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if not sep or not name.strip():
+            raise ValueError("malformed header line")
+        headers[name.strip().lower()] = value.strip()
+    raw = headers.get("content-length", "0") or "0"
+    if not (raw.isascii() and raw.isdigit()):  # int()는 "-1", "1_0", " 1"도 받음
+        raise ValueError("invalid Content-Length")
+    length = int(raw)
+    if length > MAX_BODY:
+        raise BodyTooLarge()
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+def _head(
+    status: int,
+    content_type: str,
+    length: Optional[int],
+    headers: Optional[Dict[str, str]] = None,
+    keep_alive: bool = True,
+) -> bytes:
+    """응답 헤더. length가 None이면 길이 미정 chunked 전송입니다."""
+    lines = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {length}" if length is not None else "Transfer-Encoding: chunked",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def _response(
+    status: int,
+    body: bytes = b"",
+    content_type: str = "application/json",
+    headers: Optional[Dict[str, str]] = None,
+    keep_alive: bool = True,
+) -> bytes:
+    return _head(status, content_type, len(body), headers, keep_alive) + body
+
+
+def _json(status: int, obj: object, **kw) -> bytes:
+    return _response(status, json.dumps(obj).encode(), **kw)
+
+
+def _seed(value) -> int:
+    """요청의 seed 값 -> int. 정수(또는 정수 문자열)가 아니면 ValueError (HTTP 400)."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError("seed must be an integer")
+    try:
+        seed = int(value)
+    except (TypeError, ValueError, OverflowError):  # 문자열이 아닌 수, inf
+        raise ValueError("seed must be an integer") from None
+    if isinstance(value, float) and value != seed:
+        raise ValueError("seed must be an integer")
+    if not -(2**63) <= seed < 2**63:  # 생성기 RNG 시드 범위 (int64)
+        raise ValueError("seed out of range")
+    return seed
+
+
+def _generate_args(method: str, target: str, body: bytes) -> Tuple[str, int, str]:
+    """POST JSON {prompt, seed, format} 또는 GET ?prompt=&seed=&format= -> (prompt, seed, format)"""
+    if method == "POST":
+        req = json.loads(body or b"{}")
+        if not isinstance(req, dict):
+            raise ValueError("JSON object expected")
+    else:
+        req = {k: v[0] for k, v in parse_qs(urlsplit(target).query).items()}
+    prompt = str(req.get("prompt", "")).strip()
+    if not prompt:
+        raise ValueError("prompt is required")
+    fmt = str(req.get("format", "wav"))
+    if fmt not in _CONTENT_TYPES:
+        raise ValueError("format must be 'wav', 'flac' or 'midi'")
+    return prompt, _seed(req.get("seed", 0)), fmt
+
+
+# 응답: 전체 바이트 또는 (헤더, 본문 청크 이터레이터) — 후자는 chunked로 보냄
+Response = Union[bytes, Tuple[bytes, AsyncIterator[bytes]]]
+
+
+async def handle(service: GenerationService, method: str, target: str, body: bytes) -> Response:
+    """요청 하나를 처리해 HTTP 응답을 돌려줍니다."""
+    path = urlsplit(target).path
+    if path == "/health":
+        return _json(200, service.health())
+    if path not in ("/generate", "/stream"):
+        return _json(404, {"error": f"no route {path}"})
+    if method not in ("GET", "POST"):
+        return _json(405, {"error": "use GET or POST"}, headers={"Allow": "GET, POST"})
+    try:
+        prompt, seed, fmt = _generate_args(method, target, body)
+        if path == "/stream" and fmt == "midi":
+            raise ValueError("/stream serves wav or flac")
+    except ValueError as e:  # json.JSONDecodeError 포함
+        return _json(400, {"error": str(e)})
+    chunks = None
+    try:
+        if path == "/stream":
+            result, chunks, source = await service.stream(prompt, seed, fmt)
+        else:
+            result, source = await service.generate(prompt, seed)
+    except Busy:
+        return _json(503, {"error": "queue full"}, headers={"Retry-After": str(RETRY_AFTER_SEC)})
+    except Exception as e:  # 워커 안에서 난 오류
+        return _json(500, {"error": f"{type(e).__name__}: {e}"})
+    headers = {
+        "X-Controls": " ".join(controls_for(prompt)),
+        "X-Seed": str(seed),
+        "X-Cache": source,
+        "X-Coalesced": "1" if source == "coalesced" else "0",
+    }
+    if chunks is not None:
+        return _head(200, _CONTENT_TYPES[fmt], None, headers), chunks
+    headers["X-Job-Ms"] = f"{1000 * result['timings']['total']:.1f}"
+    data = result["midi"] if fmt == "midi" else result["wav"]
+    if fmt == "flac":  # 캐시/병합 결과는 WAV
+        data = await asyncio.get_running_loop().run_in_executor(None, wav_to_flac, data)
+    return _response(200, data, content_type=_CONTENT_TYPES[fmt], headers=headers)
+
+
+async def serve_connection(
+    service: GenerationService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """keep-alive 연결 하나에서 요청을 차례로 처리합니다."""
+    try:
+        while True:
+            try:
+                req = await _read_request(reader)
+            except BodyTooLarge:
+                writer.write(_json(413, {"error": "body too large"}, keep_alive=False))
+                break
+            except ValueError as e:  # 요청 줄/헤더 형식 오류
+                writer.write(_json(400, {"error": str(e)}, keep_alive=False))
+                break
+            if req is None:
+                break
+            method, target, headers, body = req
+            keep_alive = headers.get("connection", "").lower() != "close"
+            resp = await handle(service, method, target, body)
+            head, chunks = resp if isinstance(resp, tuple) else (resp, None)
+            if not keep_alive:
+                head = head.replace(b"Connection: keep-alive", b"Connection: close", 1)
+            writer.write(head)
+            await writer.drain()
+            if chunks is not None:
+                async for chunk in chunks:  # 마디마다 한 청크씩 바로 흘려보냄
+                    writer.write(b"%x\r\n%b\r\n" % (len(chunk), chunk))
+                    await writer.drain()
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def run_server(
+    host: str, port: int, service: GenerationService, ready: Optional[asyncio.Event] = None
+) -> None:
+    """
+    서버를 띄우고 멈출 때까지 요청을 받습니다. SIGTERM(프로세스 관리자, terminate())을 받으면
+    SIGINT와 마찬가지로 워커 풀과 Manager를 정리한 뒤 돌아옵니다 (자식 프로세스가 남지 않음).
+    """
+    await service.start()
+    server = await asyncio.start_server(
+        lambda r, w: serve_connection(service, r, w), host, port, backlog=512
+    )
+    addr = server.sockets[0].getsockname()
+    print(f"Serving on http://{addr[0]}:{addr[1]} ({service.workers} workers)", flush=True)
+    if ready is not None:
+        ready.set()
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+    except (NotImplementedError, RuntimeError, ValueError):  # Windows, 메인 스레드가 아님
+        pass
+    try:
+        async with server:
+            await stop.wait()  # 서버는 start_server에서 이미 요청을 받는 중
+    finally:
+        try:
+            loop.remove_signal_handler(signal.SIGTERM)
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass
+        service.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=2, help="Generation worker processes")
+    ap.add_argument("--threads", type=int, default=1, help="Torch intra-op threads per worker")
+    ap.add_argument(
+        "--queue_depth", type=int, default=8, help="Max distinct in-flight jobs before 503"
+    )
+    ap.add_argument(
+        "--generator", default="stub", help="'stub' or 'module:function' token generator"
+    )
+    ap.add_argument("--soundfont", default=None, help="SF2 file for rendering (default: synth)")
+    ap.add_argument(
+        "--checkpoint", default=None, help="Checkpoint file (default: the generator's own)"
+    )  # 생성기가 읽는 파일 = 캐시 키에 해시하는 파일
+    ap.add_argument("--cache_dir", type=Path, default=CACHE_DIR, help="Disk cache directory")
+    ap.add_argument("--cache_mb", type=int, default=256, help="In-memory cache size")
+    ap.add_argument("--disk_cache_mb", type=int, default=4096, help="Disk cache size")
+    ap.add_argument("--no_cache", action="store_true", help="Disable the generation cache")
+    args = ap.parse_args()
+    os.environ["BGM_TORCH_THREADS"] = str(
+        args.threads
+    )  # spawn 워커가 물려받음 (models/quantize.py)
+    cache = None
+    if not args.no_cache:
+        cache = GenerationCache(args.cache_dir, args.cache_mb << 20, args.disk_cache_mb << 20)
+    service = GenerationService(
+        args.workers,
+        args.queue_depth,
+        args.generator,
+        args.soundfont,
+        cache=cache,
+        checkpoint=args.checkpoint,
+    )
+    t0 = time.perf_counter()
+    try:
+        asyncio.run(run_server(args.host, args.port, service))
+    except KeyboardInterrupt:
+        pass
+    print(f"Stopped after {time.perf_counter() - t0:.0f}s: {service.health()}")
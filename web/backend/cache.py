@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 모델을 임포트하기 전에 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from web.backend.pipeline import (  # noqa: E402
+    SR,
+    Controls,
+    controls_for,
+    generator_checkpoint,
+    init_worker,
+    run_job,
+)
+
+CACHE_VERSION = "1"  # 디스크 형식이나 결과 내용이 바뀌면 올림 (기존 항목은 키가 달라져 무시됨)
+CACHE_DIR = ROOT / "data" / "gen_cache"
+MEMORY_BYTES = 256 << 20  # 메모리 LRU 상한
+DISK_BYTES = 4 << 30  # 디스크 저장소 상한
+
+_HEADER = struct.Struct("<I")  # 디스크 항목: [JSON 길이][JSON 메타][wav][midi]
+
+
+def _sha1(*parts: str) -> str:
+    return hashlib.sha1("\0".join(parts).encode()).hexdigest()
+
+
+def _file_sha1(path: Optional[str]) -> str:
+    """파일 내용 해시 (없으면 빈 문자열). 체크포인트/사운드폰트 지문에 사용합니다."""
+    if not path:
+        return ""
+    from models.batch_tokenize import file_sha1  # 토크나이저 매니페스트와 같은 청크 해시
+
+    return file_sha1(Path(path))
+
+
+def tokenizer_fingerprint() -> str:
+    """멜로디/드럼 토크나이저 버전(TOKENIZER_VERSION + 인코딩) 조합의 해시 (모듈이 없으면 '-')"""
+    from models.batch_tokenize import TOKENIZERS, tokenizer_version
+
+    versions = []
+    for kind in sorted(TOKENIZERS):
+        try:
+            versions.append(f"{kind}={tokenizer_version(kind)}")
+        except ImportError:
+            versions.append(f"{kind}=-")
+    return _sha1(*versions)
+
+
+def model_fingerprint(
+    generator: str = "stub",
+    checkpoint: Optional[str] = None,
+    soundfont: Optional[str] = None,
+    sr: int = SR,
+) -> str:
+    """
+    결과를 좌우하는 모델/렌더 설정의 해시: 생성기 이름, 체크포인트 파일 내용,
+    토크나이저 버전, 사운드폰트 내용, 샘플레이트. 하나라도 바뀌면 캐시 키가 달라집니다.
+    """
+    return _sha1(
+        CACHE_VERSION,
+        generator,
+        _file_sha1(checkpoint),
+        tokenizer_fingerprint(),
+        _file_sha1(soundfont),
+        str(sr),
+    )
+
+
+def cache_key(controls: Sequence[str], seed: int, fingerprint: str) -> str:
+    """정규화된 제어 토큰 튜플 + 시드 + 모델 지문 -> 내용 주소 (SHA-1 hex)"""
+    return _sha1(*controls, f"seed={int(seed)}", fingerprint)
+
+
+def _entry_size(result: Dict[str, object]) -> int:
+    return len(result["wav"]) + len(result["midi"])
+
+
+class GenerationCache:
+    """
+    생성 결과(MIDI + 인코딩된 오디오)의 2단 캐시.
+    1단: 바이트 상한이 있는 메모리 LRU (OrderedDict)
+    2단: 디스크 저장소 <dir>/<키 앞 2자>/<키>.bin. 임시 파일에 쓴 뒤 os.replace로 교체해
+         읽는 쪽이 반쯤 쓰인 파일을 보지 않고, 용량을 넘으면 가장 오래 쓰이지 않은(mtime)
+         항목부터 지웁니다.
+    이벤트 루프와 스레드 풀에서 함께 부를 수 있도록 색인은 잠금으로 보호하고, 파일 I/O는
+    잠금 밖에서 하므로 get_memory(빠른 경로)가 디스크 쓰기를 기다리지 않습니다.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = CACHE_DIR,
+        memory_bytes: int = MEMORY_BYTES,
+        disk_bytes: int = DISK_BYTES,
+    ):
+        self.dir = Path(directory) if directory else None
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._mem: "OrderedDict[str, Dict[str, object]]" = OrderedDict()
+        self._mem_used = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()  # 키 -> 파일 크기, 오래된 순
+        self._disk_used = 0
+        self.stats = Counter(
+            memory_hits=0, disk_hits=0, misses=0, memory_evictions=0, disk_evictions=0, puts=0
+        )
+        self._lock = threading.Lock()
+        if self.dir is not None:
+            self._scan()
+
+    # ---- 디스크 ------------------------------------------------------------
+    def _path(self, key: str) -> Path:
+        return self.dir / key[:2] / f"{key}.bin"
+
+    def _scan(self) -> None:
+        """기존 디스크 항목을 mtime 순으로 색인합니다 (남은 임시 파일은 지움)."""
+        entries = []
+        if self.dir.exists():
+            for sub in self.dir.iterdir():
+                if not sub.is_dir():
+                    continue
+                for p in sub.iterdir():
+                    if p.suffix == ".tmp":
+                        p.unlink(missing_ok=True)
+                    elif p.suffix == ".bin":
+                        st = p.stat()
+                        entries.append((st.st_mtime, p.stem, st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_used += size
+        for victim in self._evict_disk():
+            victim.unlink(missing_ok=True)
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, object]]:
+        """디스크 항목을 읽습니다 (잠금 밖에서 호출). 없거나 손상되었으면 색인에서 빼고 None."""
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            (n,) = _HEADER.unpack_from(data)
+            meta = json.loads(data[_HEADER.size : _HEADER.size + n])
+            body = _HEADER.size + n
+            n_wav = meta.pop("wav_bytes")
+            if body + n_wav > len(data):
+                raise ValueError("truncated entry")
+            os.utime(path)  # LRU: 최근 사용 표시
+        except FileNotFoundError:  # 다른 프로세스가 지웠거나 색인이 오래됨
+            with self._lock:
+                self._forget_disk(key)
+            return None
+        except (struct.error, ValueError, KeyError, AttributeError) as e:  # 잘린/손상된 파일은 미스
+            print(f"[WARN] Dropping corrupt cache entry {path.name}: {e}")
+            with self._lock:
+                self._forget_disk(key)
+            path.unlink(missing_ok=True)
+            return None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        return dict(meta, wav=data[body : body + n_wav], midi=data[body + n_wav :])
+
+    def _write_disk(self, key: str, result: Dict[str, object]) -> None:
+        """임시 파일에 쓰고 교체한 뒤 색인만 잠금 안에서 갱신합니다 (잠금 밖에서 호출)."""
+        meta = {k: v for k, v in result.items() if k not in ("wav", "midi", "cache")}
+        meta["wav_bytes"] = len(result["wav"])
+        head = json.dumps(meta).encode()
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(len(head)))
+            f.write(head)
+            f.write(result["wav"])
+            f.write(result["midi"])
+        os.replace(tmp, path)
+        size = _HEADER.size + len(head) + _entry_size(result)
+        with self._lock:
+            self._forget_disk(key)
+            self._disk[key] = size
+            self._disk_used += size
+            victims = self._evict_disk()
+        for victim in victims:
+            victim.unlink(missing_ok=True)
+
+    def _forget_disk(self, key: str) -> None:
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_used -= size
+
+    def _evict_disk(self) -> List[Path]:
+        """용량을 넘는 만큼 오래된 항목을 색인에서 빼고 지울 파일을 돌려줍니다 (잠금 안에서)"""
+        victims = []
+        while self._disk_used > self.disk_bytes and len(self._disk) > 1:
+            key, size = self._disk.popitem(last=False)
+            self._disk_used -= size
+            victims.append(self._path(key))
+            self.stats["disk_evictions"] += 1
+        return victims
+
+    # ---- 메모리 ------------------------------------------------------------
+    def _put_memory(self, key: str, result: Dict[str, object]) -> None:
+        size = _entry_size(result)
+        if size > self.memory_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_used -= _entry_size(old)
+        self._mem[key] = result
+        self._mem_used += size
+        while self._mem_used > self.memory_bytes:
+            _, old = self._mem.popitem(last=False)
+            self._mem_used -= _entry_size(old)
+            self.stats["memory_evictions"] += 1
+
+    # ---- 공개 API -----------------------------------------------------------
+    def get_memory(self, key: str) -> Optional[Dict[str, object]]:
+        """메모리 단계만 조회 (이벤트 루프에서 바로 호출해도 되는 빠른 경로)"""
+        with self._lock:
+            result = self._mem.get(key)
+            if result is not None:
+                self._mem.move_to_end(key)
+                self.stats["memory_hits"] += 1
+            return result
+
+    def get(self, key: str) -> Optional[Dict[str, object]]:
+        """메모리 -> 디스크 순으로 조회. 디스크 적중은 메모리로 올립니다. 실패하면 None."""
+        result = self.get_memory(key)
+        if result is not None:
+            return result
+        if self.dir is not None and key in self._disk:
+            result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._put_memory(key, result)
+            return result
+
+    def put(self, key: str, result: Dict[str, object]) -> None:
+        """결과를 두 단계 모두에 저장합니다."""
+        with self._lock:
+            self.stats["puts"] += 1
+            self._put_memory(key, result)
+        if self.dir is not None:
+            self._write_disk(key, result)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._mem or key in self._disk
+
+    def info(self) -> Dict[str, object]:
+        return {
+            **self.stats,
+            "memory_entries": len(self._mem),
+            "memory_bytes": self._mem_used,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_used,
+        }
+
+
+# ---- 사전 렌더링 (pre-warm) -------------------------------------------------
+def popular_controls(prompt_log: Optional[Path] = None, top: int = 48) -> List[Controls]:
+    """
+    사전 렌더링할 제어 토큰 조합. 프롬프트 로그(한 줄에 하나)가 있으면 정규화된 조합의
+    빈도 상위 top개, 없으면 장르 x 분위기 기본 조합을 씁니다.
+    """
+    if prompt_log is not None:
+        lines = Path(prompt_log).read_text(encoding="utf-8").splitlines()
+        counts = Counter(controls_for(line) for line in lines if line.strip())
+        return [c for c, _ in counts.most_common(top)]
+    from models.prompt_parser import DEFAULT_BPM, MOOD_MAP
+
+    combos = dict.fromkeys(
+        controls_for(f"{mood} {genre}")
+        for genre in DEFAULT_BPM
+        for mood in dict.fromkeys(MOOD_MAP.values())
+    )
+    return list(combos)[:top]
+
+
+def prewarm(
+    cache: GenerationCache,
+    combos: Iterable[Controls],
+    seeds: Sequence[int] = (0,),
+    generator: str = "stub",
+    checkpoint: Optional[str] = None,
+    soundfont: Optional[str] = None,
+    workers: int = 2,
+) -> Tuple[int, int]:
+    """캐시에 없는 (조합, 시드)를 워커 풀에서 렌더링해 저장합니다. (새로 만든 수, 이미 있던 수)"""
+    checkpoint = generator_checkpoint(generator, checkpoint)
+    fp = model_fingerprint(generator, checkpoint, soundfont)
+    todo = []
+    skipped = 0
+    for controls in combos:
+        for seed in seeds:
+            key = cache_key(controls, seed, fp)
+            if key in cache:
+                skipped += 1
+            else:
+                todo.append((key, controls, seed))
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(checkpoint,)) as ex:
+        futs = {
+            ex.submit(run_job, controls, seed, generator, SR, soundfont): key
+            for key, controls, seed in todo
+        }
+        for fut in as_completed(futs):
+            cache.put(futs[fut], fut.result())
+    return len(todo), skipped
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", choices=["prewarm", "stats"])
+    ap.add_argument("--dir", type=Path, default=CACHE_DIR, help="Disk cache directory")
+    ap.add_argument("--disk_mb", type=int, default=DISK_BYTES >> 20, help="Disk cache size limit")
+    ap.add_argument("--prompts", type=Path, default=None, help="Prompt log, one prompt per line")
+    ap.add_argument("--top", type=int, default=48, help="Number of control combinations")
+    ap.add_argument("--seeds", type=int, default=1, help="Seeds 0..N-1 per combination")
+    ap.add_argument("--generator", default="stub")
+    ap.add_argument(
+        "--checkpoint", default=None, help="Checkpoint file (default: the generator's own)"
+    )  # 생성기가 읽는 파일 = 캐시 키에 해시하는 파일
+    ap.add_argument("--soundfont", default=None)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = ap.parse_args()
+
+    cache = GenerationCache(args.dir, disk_bytes=args.disk_mb << 20)
+    if args.command == "prewarm":
+        combos = popular_controls(args.prompts, args.top)
+        t0 = time.perf_counter()
+        made, skipped = prewarm(
+            cache,
+            combos,
+            range(args.seeds),
+            args.generator,
+            args.checkpoint,
+            args.soundfont,
+            args.workers,
+        )
+        print(
+            f"Pre-warmed {made} entries ({skipped} already cached) from {len(combos)} combinations "
+            f"in {time.perf_counter() - t0:.1f}s"
+        )
+    print(json.dumps(cache.info()))
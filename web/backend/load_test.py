@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+
+PROMPTS = [
+    "calm lofi beat at 80 bpm in A minor",
+    "energetic electronic track 128 bpm",
+    "sad jazz ballad, slow and sparse",
+    "uplifting citypop groove in F major",
+    "dark hiphop beat 90 bpm dense",
+    "peaceful classical piece in D major",
+]
+
+
+async def _request(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, prompt: str, seed: int
+) -> Tuple[int, Dict[str, str], int]:
+    """keep-alive 연결에 POST /generate 하나를 보내고 (상태, 헤더, 본문 길이)를 돌려줍니다."""
+    body = json.dumps({"prompt": prompt, "seed": seed}).encode()
+    writer.write(
+        b"POST /generate HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        + f"Content-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    status = int(head[0].split(" ")[1])
+    headers = {}
+    for line in head[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    n = int(headers.get("content-length", "0"))
+    await reader.readexactly(n)
+    return status, headers, n
+
+
+async def _client(
+    host: str, port: int, n_requests: int, pool: List[Tuple[str, int]], rng: random.Random
+) -> List[Tuple[float, int, str]]:
+    """한 클라이언트: 연결 하나로 n_requests번 요청, (지연 초, 상태, X-Cache 출처) 목록"""
+    reader, writer = await asyncio.open_connection(host, port)
+    out = []
+    try:
+        for _ in range(n_requests):
+            prompt, seed = rng.choice(pool)
+            t0 = time.perf_counter()
+            status, headers, _ = await _request(reader, writer, prompt, seed)
+            out.append((time.perf_counter() - t0, status, headers.get("x-cache", "")))
+            if status == 503:  # 백프레셔: 서버가 알려 준 만큼 쉬었다가 다음 요청
+                await asyncio.sleep(float(headers.get("retry-after", "1")) * 0.1)
+    finally:
+        writer.close()
+    return out
+
+
+async def run_load(
+    host: str, port: int, clients: int, requests: int, unique: int, seed: int = 0
+) -> Dict[str, object]:
+    """clients개의 동시 클라이언트가 각각 requests번 요청했을 때의 지연 통계"""
+    rng = random.Random(seed)
+    # 프롬프트 x 시드 조합 중 unique개만 사용 -> 작을수록 같은 요청이 겹쳐 병합이 늘어남
+    pool = [(PROMPTS[i % len(PROMPTS)], i // len(PROMPTS)) for i in range(unique)]
+    t0 = time.perf_counter()
+    results = await asyncio.gather(
+        *(_client(host, port, requests, pool, random.Random(rng.random())) for _ in range(clients))
+    )
+    wall = time.perf_counter() - t0
+    flat = [r for rs in results for r in rs]
+    ok = np.array([lat for lat, status, _ in flat if status == 200]) * 1000.0
+    pct = np.percentile(ok, [50, 95, 99]) if len(ok) else [float("nan")] * 3
+    return {
+        "requests": len(flat),
+        "status": dict(Counter(status for _, status, _ in flat)),
+        "coalesced": sum(src == "coalesced" for _, _, src in flat),
+        "sources": dict(Counter(src for _, status, src in flat if status == 200)),
+        "p50_ms": float(pct[0]),
+        "p95_ms": float(pct[1]),
+        "p99_ms": float(pct[2]),
+        "throughput_rps": len(ok) / wall,
+        "wall_sec": wall,
+    }
+
+
+def _spawn_server(
+    port: int,
+    workers: int,
+    queue_depth: int,
+    delay_ms: float,
+    cache_dir: Optional[Path] = None,
+) -> subprocess.Popen:
+    """
+    스텁 생성기로 app.py를 자식 프로세스로 띄우고 준비될 때까지 기다립니다.
+    cache_dir이 없으면 캐시를 끄고 순수 생성 지연을 잽니다.
+    """
+    cache_args = ["--cache_dir", str(cache_dir)] if cache_dir else ["--no_cache"]
+    env = dict(os.environ, BGM_STUB_DELAY_MS=str(delay_ms))
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            str(ROOT / "web" / "backend" / "app.py"),
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--queue_depth",
+            str(queue_depth),
+            *cache_args,
+        ],
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = proc.stdout.readline()
+    if not line.startswith("Serving"):
+        proc.kill()
+        raise RuntimeError(f"server failed to start: {line!r}")
+    return proc
+
+
+def stop_server(proc: subprocess.Popen, timeout: float = 10.0) -> None:
+    """
+    _spawn_server로 띄운 서버를 멈춥니다: SIGTERM(app.py가 워커 풀을 정리하고 종료)을 보내고
+    timeout 안에 끝나지 않으면 강제 종료합니다. 물려준 stdout 파이프도 닫습니다.
+    """
+    proc.terminate()
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print(f"[WARN] Server did not stop within {timeout:.0f}s; killing it")
+        proc.kill()
+        proc.wait()
+    if proc.stdout is not None:
+        proc.stdout.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--clients", type=int, default=16, help="Concurrent keep-alive clients")
+    ap.add_argument("--requests", type=int, default=8, help="Requests per client")
+    ap.add_argument("--unique", type=int, default=12, help="Distinct (prompt, seed) pairs")
+    ap.add_argument(
+        "--spawn", action="store_true", help="Start app.py with the stub generator first"
+    )
+    ap.add_argument("--workers", type=int, default=2, help="Workers for --spawn")
+    ap.add_argument("--queue_depth", type=int, default=8, help="Queue depth for --spawn")
+    ap.add_argument("--delay_ms", type=float, default=0.0, help="Stub model latency for --spawn")
+    ap.add_argument(
+        "--cache_dir", type=Path, default=None, help="Enable the cache for --spawn (default: off)"
+    )
+    args = ap.parse_args()
+
+    proc: Optional[subprocess.Popen] = None
+    if args.spawn:
+        proc = _spawn_server(
+            args.port, args.workers, args.queue_depth, args.delay_ms, args.cache_dir
+        )
+    try:
+        stats = asyncio.run(
+            run_load(args.host, args.port, args.clients, args.requests, args.unique)
+        )
+    finally:
+        if proc is not None:
+            stop_server(proc)
+    print(
+        f"{stats['requests']} requests from {args.clients} clients in {stats['wall_sec']:.2f}s: "
+        f"p50={stats['p50_ms']:.1f} ms p95={stats['p95_ms']:.1f} ms p99={stats['p99_ms']:.1f} ms, "
+        f"{stats['throughput_rps']:.1f} req/s, status={stats['status']}, "
+        f"sources={stats['sources']}"
+    )
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import hashlib
+import importlib
+import io
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 모델을 임포트하기 전에 프로젝트 루트를 임포트 가능하게 만듭니다.
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from models.detokenize import tokens_to_midi  # noqa: E402
+from models.prompt_parser import parse_prompt  # noqa: E402
+from models.tokenizer_drums import _CLASSES, _CLS_INDEX, _grid_to_tokens  # noqa: E402
+from render.loop_tools.loop import build_loop, loop_bars, loop_samples  # noqa: E402
+from render.stream import (  # noqa: E402
+    STREAM_GAIN,
+    BarRenderer,
+    FlacEncoder,
+    iter_bars,
+    pcm16,
+    wav_header,
+)
+from render.synth import SR, render_stems  # noqa: E402
+
+Controls = Tuple[str, ...]  # parse_prompt 결과 (GENRE, MOOD, BPM, KEY, DENSITY 토큰)
+Generator = Callable[[Controls, int, int], Dict[str, List[str]]]
+
+# 스텁 생성기가 흉내 내는 모델 지연 (부하 테스트용, 밀리초). 마디마다 나눠서 기다리므로
+# 스트리밍 응답에서는 첫 마디가 전체 지연보다 먼저 나옵니다.
+STUB_DELAY_MS = float(os.environ.get("BGM_STUB_DELAY_MS", "0"))
+
+_MAJOR = (0, 2, 4, 5, 7, 9, 11)
+_MINOR = (0, 2, 3, 5, 7, 8, 10)
+_NOTE_PC = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+# 밀도별 마디당 멜로디 음 수, 장르별 드럼 패턴 (16스텝, 클래스 -> 스텝 목록)
+_DENSITY_NOTES = {"low": 4, "mid": 8, "high": 12}
+_PATTERNS = {
+    "hiphop": {"KICK": (0, 7, 10), "SNARE": (4, 12), "HHC": tuple(range(0, 16, 2))},
+    "lofi": {"KICK": (0, 10), "SNARE": (4, 12), "HHC": tuple(range(0, 16, 2))},
+    "jazz": {"RIDE": (0, 4, 7, 8, 12, 15), "HHC": (4, 12), "KICK": (0,)},
+    "electronic": {"KICK": (0, 4, 8, 12), "CLAP": (4, 12), "HHO": (2, 6, 10, 14)},
+    "citypop": {"KICK": (0, 6, 8), "SNARE": (4, 12), "HHC": tuple(range(16))},
+    "classical": {},
+}
+
+
+def controls_for(prompt: str) -> Controls:
+    """프롬프트 -> 정규화된 제어 토큰 튜플 (요청 병합/캐시 키의 기준)"""
+    return tuple(parse_prompt(prompt))
+
+
+def control_values(controls: Sequence[str]) -> Dict[str, str]:
+    """('GENRE:lofi', ...) -> {'GENRE': 'lofi', ...}"""
+    return dict(tok.split(":", 1) for tok in controls)
+
+
+def _scale(key: str) -> np.ndarray:
+    """'A_minor' -> 해당 음계의 피치 클래스 배열"""
+    note, _, qual = key.partition("_")
+    root = _NOTE_PC.get(note[:1].upper(), 0) + (1 if "#" in note else -1 if note[1:] == "b" else 0)
+    return (root + np.array(_MINOR if qual == "minor" else _MAJOR)) % 12
+
+
+def stub_generate(controls: Controls, seed: int, bars: int) -> Dict[str, List[str]]:
+    """
+    학습된 체크포인트 없이 파이프라인을 돌리기 위한 결정론적 스텁 생성기.
+    제어 토큰과 시드로 음계 안의 멜로디(NOTE/DUR)와 장르별 드럼 패턴을
+    모델과 같은 토큰 형식으로 만듭니다.
+    """
+    cv = control_values(controls)
+    digest = hashlib.sha1(("|".join(controls) + f"|{seed}").encode()).digest()
+    rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+    bpm = int(cv.get("BPM", 90))
+    scale = _scale(cv.get("KEY", "C_major"))
+    per_bar = _DENSITY_NOTES.get(cv.get("DENSITY", "mid"), 8)
+
+    # 멜로디: 마디마다 per_bar개의 시작 스텝, 음계 안에서 작은 도약
+    melody = ["BOS", f"KEY:{cv.get('KEY', 'C_major')}", f"BPM:{bpm}"]
+    degree = int(rng.integers(0, 7))
+    events: Dict[int, Tuple[int, int]] = {}
+    for b in range(bars):
+        steps = np.sort(rng.choice(16, size=per_bar, replace=False))
+        for i, s in enumerate(steps):
+            degree = int(np.clip(degree + rng.integers(-2, 3), 0, 13))
+            pitch = 60 + int(scale[degree % 7]) + 12 * (degree // 7)
+            nxt = steps[i + 1] if i + 1 < len(steps) else 16
+            events[b * 16 + int(s)] = (pitch, int(nxt - s))
+    for step in range(bars * 16):
+        melody.append("TS:1")
+        if (step + 1) % 16 == 0:
+            melody.append("BAR")
+        if step in events:
+            pitch, dur = events[step]
+            melody += [f"NOTE:{pitch}", f"DUR:{dur}"]
+    melody.append("EOS")
+
+    # 드럼: 장르 패턴 + 시드에 따른 고스트 노트
+    grid = np.zeros((bars * 16, len(_CLASSES)), dtype=bool)
+    for cls, steps in _PATTERNS.get(cv.get("GENRE", "lofi"), {}).items():
+        for b in range(bars):
+            grid[[b * 16 + s for s in steps], _CLS_INDEX[cls]] = True
+    if grid.any():
+        ghost = rng.random(bars * 16) < 0.06
+        grid[ghost, _CLS_INDEX["HHC"]] = True
+    drums = ["BOS", f"BPM:{bpm}"] + _grid_to_tokens(grid) + ["EOS"]
+    if STUB_DELAY_MS > 0:
+        return {"melody": _paced(melody, STUB_DELAY_MS / 1000.0 / bars), "drums": drums}
+    return {"melody": melody, "drums": drums}
+
+
+def _paced(tokens: List[str], bar_sec: float) -> Iterator[str]:
+    """토큰을 내보내되 BAR마다 bar_sec씩 기다려 자기회귀 생성 속도를 흉내 냅니다."""
+    for tok in tokens:
+        if tok == "BAR":
+            time.sleep(bar_sec)
+        yield tok
+
+
+GENERATORS: Dict[str, Generator] = {"stub": stub_generate}
+
+
+def load_generator(spec: str) -> Generator:
+    """'stub' 또는 'package.module:function' 형식의 생성기 이름 -> 함수"""
+    if spec in GENERATORS:
+        return GENERATORS[spec]
+    module, _, func = spec.partition(":")
+    if not func:
+        raise ValueError(f"Unknown generator {spec!r} (use 'stub' or 'module:function')")
+    return getattr(importlib.import_module(module), func)
+
+
+def generator_checkpoint(spec: str, checkpoint: Optional[str] = None) -> Optional[str]:
+    """
+    생성기가 실제로 읽을 체크포인트 경로 (캐시 키에 해시할 파일).
+    checkpoint가 주어지면 그것, 아니면 생성기 모듈의 checkpoint_path()가 알려 주는 기본값.
+    """
+    if checkpoint or spec in GENERATORS:
+        return checkpoint
+    default = getattr(importlib.import_module(spec.partition(":")[0]), "checkpoint_path", None)
+    return str(default()) if default is not None else None
+
+
+def init_worker(checkpoint: Optional[str]) -> None:
+    """풀 워커 초기화: 캐시 키에 해시한 체크포인트를 생성기가 읽도록 MELODY_CKPT로 넘김"""
+    if checkpoint:
+        os.environ["MELODY_CKPT"] = checkpoint
+
+
+def encode_wav(y: np.ndarray, sr: int = SR) -> bytes:
+    """float32 오디오 -> 16비트 PCM WAV 바이트"""
+    import soundfile as sf
+
+    buf = io.BytesIO()
+    sf.write(buf, y, sr, format="WAV", subtype="PCM_16")
+    return buf.getvalue()
+
+
+def wav_to_flac(wav: bytes) -> bytes:
+    """WAV 결과 -> FLAC 바이트 (캐시는 WAV만 저장하므로 FLAC 요청은 응답 때 변환)"""
+    import soundfile as sf
+
+    y, sr = sf.read(io.BytesIO(wav), dtype="int16")
+    buf = io.BytesIO()
+    sf.write(buf, y, sr, format="FLAC", subtype="PCM_16")
+    return buf.getvalue()
+
+
+def _stem_renderer(soundfont: Optional[str]) -> Callable:
+    """soundfont가 있으면 SF2 렌더러, 없으면 내장 신시사이저의 render_stems"""
+    if not soundfont:
+        return render_stems
+    from render.soundfont import load_soundfont
+
+    return load_soundfont(soundfont).render_stems
+
+
+def _finish(
+    controls: Controls, seed: int, bars: int, pm, y: np.ndarray, sr: int, timings: Dict
+) -> Dict[str, object]:
+    """루프 오디오를 피크 정규화/인코딩해 작업 결과 dict를 만듭니다."""
+    t0 = time.perf_counter()
+    peak = float(np.abs(y).max()) if len(y) else 0.0
+    if peak > 0.89:
+        y *= 0.89 / peak
+    wav = encode_wav(y, sr)
+    midi = io.BytesIO()
+    pm.write(midi)
+    timings["encode"] = time.perf_counter() - t0
+    timings["total"] = sum(timings.values())
+    return {
+        "controls": list(controls),
+        "seed": seed,
+        "bars": bars,
+        "wav": wav,
+        "midi": midi.getvalue(),
+        "timings": timings,
+    }
+
+
+def run_job(
+    controls: Controls,
+    seed: int,
+    generator: str = "stub",
+    sr: int = SR,
+    soundfont: Optional[str] = None,
+) -> Dict[str, object]:
+    """
+    워커 프로세스에서 실행되는 한 건의 생성 작업: 토큰 생성 -> MIDI -> 렌더 -> 루프 -> WAV.
+    soundfont: SF2 경로 (없으면 내장 신시사이저). 파싱은 워커 프로세스마다 한 번만 합니다.
+    반환값은 피클 가능한 dict (wav/midi 바이트, 제어 토큰, 단계별 소요 시간)입니다.
+    """
+    t0 = time.perf_counter()
+    bpm = float(control_values(controls).get("BPM", 90))
+    bars = loop_bars(bpm)
+    # 생성기는 스트림별 토큰 리스트 또는 이터레이터를 돌려줌 (여기서는 끝까지 받음)
+    tokens = {k: list(v or ()) for k, v in load_generator(generator)(controls, seed, bars).items()}
+    t1 = time.perf_counter()
+    pm = tokens_to_midi(tokens.get("melody"), tokens.get("drums"), bpm=bpm)
+    stems = _stem_renderer(soundfont)(pm, sr)
+    y = build_loop(stems, bpm, sr, bars=bars)
+    timings = {"generate": t1 - t0, "render": time.perf_counter() - t1}
+    return _finish(controls, seed, bars, pm, y, sr, timings)
+
+
+def _recorded(tokens: Iterable[str], out: List[str]) -> Iterator[str]:
+    """토큰을 그대로 흘려보내면서 out에 기록합니다 (스트리밍 후 MIDI 저장용)."""
+    for tok in tokens:
+        out.append(tok)
+        yield tok
+
+
+def stream_job(
+    controls: Controls,
+    seed: int,
+    generator: str = "stub",
+    sr: int = SR,
+    soundfont: Optional[str] = None,
+    queue=None,
+    fmt: str = "wav",
+) -> Dict[str, object]:
+    """
+    run_job의 점진적 버전: 마디가 확정될 때마다 오디오 청크를 queue에 넣습니다 (마지막은 None).
+    fmt='wav'면 길이 미정 WAV 헤더 다음에 16비트 PCM, 'flac'이면 FlacEncoder가 완성한 프레임
+    (빈 청크는 넣지 않음). 생성기가 토큰 이터레이터를 돌려주면 토큰이 나오는 대로 렌더링합니다.
+    스트림은 한 번 재생용 선형 렌더(고정 이득)이고, 끝난 뒤에는 꼬리를 접은 루프를 run_job과
+    같은 형식(WAV)의 결과로 돌려줘 캐시에 넣을 수 있게 합니다.
+    """
+    t0 = time.perf_counter()
+    bpm = float(control_values(controls).get("BPM", 90))
+    bars = loop_bars(bpm)
+    seen: Dict[str, List[str]] = {"melody": [], "drums": []}
+    parts = []
+    try:  # 어떤 오류가 나도 None을 넣어 읽는 쪽이 기다리지 않게 함
+        tokens = load_generator(generator)(controls, seed, bars)
+        streams = {k: _recorded(tokens.get(k) or (), seen[k]) for k in seen}
+        renderer = BarRenderer(bpm, sr, render=_stem_renderer(soundfont))
+        # 길이는 정확히 bars 마디이므로 FLAC 머리에 총 샘플 수를 미리 적음
+        flac = FlacEncoder(sr, frames=loop_samples(bpm, sr, bars)) if fmt == "flac" else None
+        if flac is None:
+            queue.put(wav_header(sr))
+        for bar, mel, drm in iter_bars(streams["melody"], streams["drums"], bpm, bars):
+            y = renderer.add_bar(bar, mel, drm)
+            parts.append(y)
+            chunk = flac.write(y * STREAM_GAIN) if flac else pcm16(y * STREAM_GAIN)
+            if chunk:  # 빈 청크는 chunked 응답의 끝 표시와 같으므로 보내지 않음
+                queue.put(chunk)
+        if flac is not None:
+            queue.put(flac.close())
+    finally:
+        queue.put(None)
+    t1 = time.perf_counter()
+    pm = tokens_to_midi(seen["melody"], seen["drums"], bpm=bpm)
+    y = build_loop([renderer.loop_source(parts)], bpm, sr, bars=bars)
+    return _finish(controls, seed, bars, pm, y, sr, {"stream": t1 - t0})
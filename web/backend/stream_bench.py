@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from web.backend.load_test import PROMPTS, _spawn_server, stop_server  # noqa: E402
+
+WAV_HEADER_BYTES = 44
+
+
+async def _timed_request(
+    host: str, port: int, path: str, prompt: str, seed: int
+) -> Tuple[float, float, int]:
+    """
+    요청 하나의 (첫 오디오 바이트까지 초, 완료까지 초, 오디오 바이트 수).
+    첫 오디오 바이트 = WAV 헤더(44바이트) 다음 바이트. Content-Length / chunked 둘 다 처리합니다.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps({"prompt": prompt, "seed": seed}).encode()
+    t0 = time.perf_counter()
+    request = (
+        f"POST {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    )
+    writer.write(request.encode() + body)
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").lower()
+    status = int(head.split(" ", 2)[1])
+    if status != 200:
+        raise RuntimeError(f"{path}: HTTP {status}")
+    got, first = 0, None
+    if "transfer-encoding: chunked" in head:
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).strip(), 16)
+            if size == 0:
+                break
+            got += len(await reader.readexactly(size + 2)) - 2
+            if first is None and got > WAV_HEADER_BYTES:
+                first = time.perf_counter() - t0
+    else:
+        n = int(head.split("content-length:", 1)[1].split("\r\n", 1)[0])
+        chunk = await reader.read(65536)  # 헤더와 첫 오디오 바이트가 함께 도착
+        first = time.perf_counter() - t0
+        got = len(chunk) + len(await reader.readexactly(n - len(chunk)))
+    total = time.perf_counter() - t0
+    writer.close()
+    return first if first is not None else total, total, got - WAV_HEADER_BYTES
+
+
+async def _fetch(host: str, port: int, path: str, payload: Dict[str, object]) -> bytes:
+    """요청 하나의 응답 본문 전체 (Content-Length / chunked)"""
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode()
+    request = (
+        f"POST {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    )
+    writer.write(request.encode() + body)
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").lower()
+    status = int(head.split(" ", 2)[1])
+    if status != 200:
+        raise RuntimeError(f"{path} {payload}: HTTP {status}")
+    if "transfer-encoding: chunked" in head:
+        out = bytearray()
+        while size := int((await reader.readuntil(b"\r\n")).strip(), 16):
+            out += (await reader.readexactly(size + 2))[:-2]
+    else:
+        out = await reader.read()
+    writer.close()
+    return bytes(out)
+
+
+async def check_flac(host: str, port: int, fresh: bool) -> None:
+    """
+    FLAC 응답을 디코딩하면 같은 요청의 WAV와 샘플까지 같은지 (무손실).
+    fresh(캐시 없는 서버)일 때만 /stream끼리 비교 — 캐시가 있으면 두 번째 요청은 루프 결과가 됨.
+    """
+    import io
+
+    import soundfile as sf
+
+    async def idle() -> None:  # 스트림이 끝난 뒤 루프를 접는 동안 온 요청은 그 결과에 병합됨
+        while json.loads(await _fetch(host, port, "/health", {}))["inflight"]:
+            await asyncio.sleep(0.05)
+
+    paths = ("/generate", "/stream") if fresh else ("/generate",)
+    for path in paths:
+        req = {"prompt": PROMPTS[0], "seed": 4242}
+        wav = await _fetch(host, port, path, dict(req, format="wav"))
+        await idle()
+        flac = await _fetch(host, port, path, dict(req, format="flac"))
+        a, sr_a = sf.read(io.BytesIO(wav), dtype="int16")
+        b, sr_b = sf.read(io.BytesIO(flac), dtype="int16")
+        assert sr_a == sr_b and np.array_equal(a, b), f"{path}: FLAC samples differ from WAV"
+        print(f"{path:10s} FLAC == WAV samples ({len(flac) / len(wav):.0%} of the WAV bytes)")
+
+
+async def run_bench(host: str, port: int, n: int) -> Dict[str, Dict[str, float]]:
+    """/generate(전체 파일)과 /stream(마디별)을 번갈아 n번씩 요청 (매번 새 시드 = 캐시 미스)"""
+    rows: Dict[str, List[Tuple[float, float, int]]] = {"/generate": [], "/stream": []}
+    for i in range(n):
+        for j, path in enumerate(rows):
+            seed = 1000 + 2 * i + j  # 두 경로가 서로의 결과를 캐시/병합으로 쓰지 않도록
+            rows[path].append(
+                await _timed_request(host, port, path, PROMPTS[i % len(PROMPTS)], seed)
+            )
+    out = {}
+    for path, r in rows.items():
+        a = np.array(r, dtype=np.float64)
+        out[path] = {
+            "ttfb_ms": 1000 * float(np.median(a[:, 0])),
+            "complete_ms": 1000 * float(np.median(a[:, 1])),
+            "audio_sec": float(np.median(a[:, 2])) / 2 / 22050,
+        }
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("-n", type=int, default=6, help="Requests per endpoint")
+    ap.add_argument("--spawn", action="store_true", help="Start app.py (stub, no cache) first")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--delay_ms", type=float, default=0.0, help="Stub model latency for --spawn")
+    args = ap.parse_args()
+
+    proc = _spawn_server(args.port, args.workers, 4, args.delay_ms) if args.spawn else None
+    try:
+        stats = asyncio.run(run_bench(args.host, args.port, args.n))
+        asyncio.run(check_flac(args.host, args.port, fresh=args.spawn))
+    finally:
+        if proc is not None:
+            stop_server(proc)
+    for path, s in stats.items():
+        print(
+            f"{path:10s} TTFB {s['ttfb_ms']:7.1f} ms  complete {s['complete_ms']:7.1f} ms  "
+            f"({s['audio_sec']:.1f}s audio, median of {args.n})"
+        )
+    gain = stats["/generate"]["ttfb_ms"] / max(stats["/stream"]["ttfb_ms"], 1e-9)
+    print(f"Time to first sound: {gain:.1f}x faster with /stream")